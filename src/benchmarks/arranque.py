@@ -0,0 +1,191 @@
+"""
+Coste de arranque de main.py.
+
+Mide, siempre en procesos nuevos:
+- `import main`: segundos (mediana de varias ejecuciones) y los módulos que
+  más pesan según `python -X importtime`.
+- Un worker de uvicorn real: segundos hasta que responde /health (liveness),
+  hasta que /ready da 200 (componentes críticos cargados) y hasta que el
+  calentamiento en segundo plano termina, con el tiempo de cada componente.
+
+El worker corre en un directorio temporal con un catálogo CSV y un modelo
+compacto sintéticos (benchmarks/fixtures.py) y el feed XML del servidor
+OpenAI falso.
+
+Uso (desde src/):
+    python -m benchmarks.arranque
+    python -m benchmarks.arranque --repeticiones 5 --articulos 1000
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks import fixtures
+from benchmarks.fake_openai import ConfigFalsa, arrancar_servidor
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado
+
+SUITE = "arranque"
+CODIGO_IMPORTAR = "import time; t0 = time.perf_counter(); import main; print(time.perf_counter() - t0)"
+
+
+def preparar_trabajo(trabajo, articulos, arboles):
+    """CSV + modelo compacto sintéticos en `trabajo` (lo que main.py necesita para estar listo)."""
+    import pandas as pd
+    from benchmarks.micro import entrenar_modelo
+    from predictor_compacto import exportar_pipeline
+
+    ruta_csv = fixtures.generar_catalogo_csv(os.path.join(trabajo, "encuestas_limpio.csv"), articulos)
+    df = pd.read_csv(ruta_csv)
+    exportar_pipeline(entrenar_modelo(df, arboles), os.path.join(trabajo, "modelo_satisfaccion.npz"))
+    return sorted(int(c) for c in df["cod_articulo"].unique())
+
+
+def entorno(url_falsa):
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": DIR_SRC,
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": f"{url_falsa}/v1",
+        "XML_URL": f"{url_falsa}/feed.xml",
+    })
+    return env
+
+
+def medir_importacion(trabajo, env, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-c", CODIGO_IMPORTAR], cwd=trabajo, env=env,
+                                capture_output=True, text=True, check=True)
+        tiempos.append(float(salida.stdout.strip().splitlines()[-1]))
+    return tiempos
+
+
+def modulos_pesados(trabajo, env, n=10):
+    """[(módulo, segundos acumulados)] de los imports directos de main según -X importtime."""
+    salida = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=trabajo, env=env,
+                            capture_output=True, text=True, check=True)
+    # Formato: "import time: self [us] | cumulative | nombre", el anidamiento va en la sangría del nombre
+    directos = []
+    for linea in salida.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        if nombre.startswith("   ") and not nombre.startswith("    "):
+            directos.append((nombre.strip(), int(acumulado) / 1e6))
+    return sorted(directos, key=lambda d: -d[1])[:n]
+
+
+def _get(puerto, ruta):
+    """(status, json) o (None, None) si el servidor todavía no acepta conexiones."""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{puerto}{ruta}", timeout=5) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+    except OSError:
+        return None, None
+
+
+def medir_worker(trabajo, env, timeout_s=120):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        puerto = s.getsockname()[1]
+    t0 = time.perf_counter()
+    proceso = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                "--port", str(puerto), "--log-level", "warning"],
+                               cwd=trabajo, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    r = {"health_s": None, "ready_s": None, "calentado_s": None, "componentes": {}}
+    try:
+        while time.perf_counter() - t0 < timeout_s:
+            if r["health_s"] is None:
+                status, _ = _get(puerto, "/health")
+                if status == 200:
+                    r["health_s"] = time.perf_counter() - t0
+            else:
+                status, datos = _get(puerto, "/ready")
+                if status == 200 and r["ready_s"] is None:
+                    r["ready_s"] = time.perf_counter() - t0
+                if datos and all(c["estado"] in ("listo", "error") for c in datos["componentes"].values()):
+                    r["calentado_s"] = time.perf_counter() - t0
+                    r["componentes"] = datos["componentes"]
+                    break
+            time.sleep(0.02)
+    finally:
+        proceso.terminate()
+        proceso.wait()
+    return r
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Coste de importación y arranque de main.py")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--articulos", type=int, default=200, help="Artículos del catálogo sintético")
+    parser.add_argument("--arboles", type=int, default=100, help="Árboles del forest de prueba")
+    parser.add_argument("--productos-feed", type=int, default=5000)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    trabajo = tempfile.mkdtemp(prefix="arranque_")
+    try:
+        print("⏳ Preparando catálogo y modelo sintéticos…")
+        ids = preparar_trabajo(trabajo, args.articulos, args.arboles)
+        _, url = arrancar_servidor(ConfigFalsa(productos_feed=args.productos_feed, ids_feed=ids))
+        env = entorno(url)
+
+        importacion = medir_importacion(trabajo, env, args.repeticiones)
+        pesados = modulos_pesados(trabajo, env)
+        workers = [medir_worker(trabajo, env) for _ in range(args.repeticiones)]
+    finally:
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    def mediana(clave):
+        valores = [w[clave] for w in workers if w[clave] is not None]
+        return statistics.median(valores) if valores else None
+
+    resumen = {
+        "import main": {"s": statistics.median(importacion)},
+        "worker /health": {"s": mediana("health_s")},
+        "worker /ready": {"s": mediana("ready_s")},
+        "worker calentado": {"s": mediana("calentado_s")},
+    }
+    print(f"\n{'fase':<24}{'mediana s':>12}")
+    for fase, r in resumen.items():
+        print(f"{fase:<24}{r['s']:>12.3f}" if r["s"] is not None else f"{fase:<24}{'—':>12}")
+
+    print("\nImports directos más pesados de main (-X importtime, acumulado):")
+    for nombre, segundos in pesados:
+        print(f"  {nombre:<36}{segundos * 1000:>9.1f} ms")
+
+    print("\nComponentes (último worker):")
+    for nombre, c in workers[-1]["componentes"].items():
+        segundos = f"{c['segundos']:.3f}s" if c["segundos"] is not None else "—"
+        print(f"  {nombre:<14}{'crítico' if c['critico'] else '':<9}{c['estado']:<8}{segundos:>9}  {c['error'] or ''}")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen,
+                                         "importtime": pesados, "componentes": workers[-1]["componentes"]})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"s": False})
+
+
+if __name__ == "__main__":
+    main_cli()
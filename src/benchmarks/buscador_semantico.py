@@ -0,0 +1,165 @@
+"""
+BUSCADOR léxico vs. híbrido (léxico + embeddings de productos).
+
+Sobre un feed sintético (fixtures.generar_feed_xml) y con los embeddings
+locales de n-gramas (sin red; con OpenAI la indexación es una llamada por
+lote y la consulta una llamada por búsqueda):
+1. indexación completa con embeddings_productos.indexar y reindexación
+   tras cambiar el feed (fichas_producto.cambiar_feed): solo se embeben
+   los productos nuevos o cambiados; una pasada sin cambios no embebe
+   nada (si lo hace, sale con código 1);
+2. latencia de logica_buscar_accesorios con BUSCADOR_MODO=lexico y
+   =hibrido sobre el feed completo, cuántas consultas se quedan sin
+   resultados (formulario de contacto) en cada modo y lo que cuesta la
+   parte semántica (embeber la consulta + producto matriz-vector).
+
+Uso (desde src/):
+    python -m benchmarks.buscador_semantico
+    python -m benchmarks.buscador_semantico --productos 50000 --repeticiones 5
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.fichas_producto import cambiar_feed
+from benchmarks.fixtures import generar_feed_xml
+from benchmarks.micro import CONSULTAS_BUSCADOR, importar_main
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado, percentil
+
+SUITE = "buscador_semantico"
+# Sin coincidencias literales en el catálogo sintético: plurales (los n-gramas los cubren) y
+# sinónimos (solo un modelo entrenado como el de OpenAI los relaciona)
+CONSULTAS_SEMANTICAS = ["almohadas viscoelasticas", "somieres articulados", "canapes abatibles",
+                        "protectores impermeables", "fresquito verano", "no pasar calor"]
+
+
+class ModeloContado:
+    """Envuelve un modelo de embeddings contando los textos que embebe."""
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.documentos = 0
+
+    def embed_documents(self, textos):
+        self.documentos += len(textos)
+        return self.modelo.embed_documents(textos)
+
+    def embed_query(self, texto):
+        return self.modelo.embed_query(texto)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="BUSCADOR léxico vs. híbrido con embeddings de productos")
+    parser.add_argument("--productos", type=int, default=20000)
+    parser.add_argument("--cambios", type=float, default=0.01, help="Fracción del feed con precio cambiado")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Pasadas por todas las consultas en cada modo")
+    parser.add_argument("--umbral", type=float, default=None, help="BUSCADOR_UMBRAL_SEMANTICO (por defecto el de main)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    trabajo = tempfile.mkdtemp(prefix="buscador_semantico_")
+    directorio_inicial = os.getcwd()
+    try:
+        # colchones_rag abre ./embeddings_db al importarse: que sea el del directorio temporal
+        os.chdir(trabajo)
+        os.environ["RAG_EMBEDDINGS"] = "ngramas"
+        main = importar_main()
+        from cache_buscador import CacheResultados
+        from embeddings_productos import EmbeddingsProductos, indexar
+        from feed_incremental import FeedIndexado
+        from feed_xml import parsear_feed
+        from rag.src.embeddings_locales import EmbeddingsNgramas
+
+        feed = parsear_feed(generar_feed_xml(args.productos, args.semilla))
+        feed_cambiado = cambiar_feed(feed, args.cambios, args.semilla)
+        print(f"📄 Feed de {len(feed)} productos, embeddings de n-gramas locales\n")
+
+        pasadas, anterior = {}, None
+        modelo = ModeloContado(EmbeddingsNgramas())
+        for nombre, feed_pasada in (("completa", feed), ("incremental", feed_cambiado), ("sin_cambios", feed_cambiado)):
+            modelo.documentos = 0
+            t0 = time.perf_counter()
+            anterior, resumen_pasada = indexar(feed_pasada, anterior, modelo, "ngramas")
+            pasadas[nombre] = {"segundos": time.perf_counter() - t0, "embebidos": modelo.documentos,
+                               "reutilizados": resumen_pasada["reutilizados"]}
+        print(f"{'indexación':<14}{'segundos':>10}{'embebidos':>11}{'reutilizados':>14}")
+        for nombre, p in pasadas.items():
+            print(f"{nombre:<14}{p['segundos']:>10.2f}{p['embebidos']:>11}{p['reutilizados']:>14}")
+        if pasadas["sin_cambios"]["embebidos"]:
+            print("❌ La pasada sin cambios en el feed ha vuelto a embeber productos")
+            sys.exit(1)
+
+        ruta = os.path.join(trabajo, "embeddings_productos")
+        anterior.guardar(ruta)
+        indexado = FeedIndexado.construir(feed_cambiado)
+        main.datos_sistema["feed_indices"] = indexado
+        main.datos_sistema["feed_xml"] = indexado.productos
+        main.ciclo.marcar_listo("feed_xml")
+        productos = EmbeddingsProductos(ruta, EmbeddingsNgramas())
+        main.ciclo.marcar_listo("embeddings_productos", productos)
+        if args.umbral is not None:
+            main.BUSCADOR_UMBRAL_SEMANTICO = args.umbral
+
+        # Las consultas se repiten en cada pasada: sin caché del buscador para medir la búsqueda
+        main.cache_buscador = CacheResultados(0)
+        resumen = {"indexacion": {f"{nombre}_{k}": v for nombre, p in pasadas.items() for k, v in p.items()}}
+        consultas = CONSULTAS_BUSCADOR + CONSULTAS_SEMANTICAS
+        for modo in ("lexico", "hibrido"):
+            main.BUSCADOR_MODO = modo
+            tiempos, sin_resultados = [], set()
+            for _ in range(args.repeticiones):
+                for consulta in consultas:
+                    t0 = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        html = main.logica_buscar_accesorios({"keywords": consulta}, "bench")
+                    tiempos.append((time.perf_counter() - t0) * 1000)
+                    if "no he encontrado productos" in html:
+                        sin_resultados.add(consulta)
+            resumen[modo] = {"busqueda_p50_ms": percentil(tiempos, 50), "busqueda_p95_ms": percentil(tiempos, 95),
+                             "sin_resultados": len(sin_resultados)}
+        semantica = []
+        for _ in range(args.repeticiones):
+            for consulta in consultas:
+                t0 = time.perf_counter()
+                productos.similitudes(consulta)
+                semantica.append((time.perf_counter() - t0) * 1000)
+        resumen["semantica"] = {"similitudes_p50_ms": percentil(semantica, 50),
+                                "matriz_mb": productos.actual()[0].bytes_vectores / 1e6}
+    finally:
+        os.chdir(directorio_inicial)
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    print(f"\n{'modo':<10}{'p50 ms':>10}{'p95 ms':>10}{'sin resultados':>16}")
+    for modo in ("lexico", "hibrido"):
+        r = resumen[modo]
+        print(f"{modo:<10}{r['busqueda_p50_ms']:>10.1f}{r['busqueda_p95_ms']:>10.1f}"
+              f"{r['sin_resultados']:>10}/{len(consultas)}")
+    print(f"\nParte semántica: {resumen['semantica']['similitudes_p50_ms']:.1f} ms p50 "
+          f"(matriz de {resumen['semantica']['matriz_mb']:.0f} MB)")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"busqueda_p50_ms": False, "busqueda_p95_ms": False,
+                                                         "sin_resultados": False, "incremental_embebidos": False,
+                                                         "similitudes_p50_ms": False})
+
+
+if __name__ == "__main__":
+    main_cli()
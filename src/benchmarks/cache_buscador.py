@@ -0,0 +1,154 @@
+"""
+Caché de resultados del BUSCADOR: consultas repetidas con y sin caché.
+
+Sobre un feed sintético servido por el servidor falso y cargado con
+main.cargar_feed_en (el camino real, con FeedIndexado):
+1. la misma secuencia de consultas (distribución de Zipf sobre un
+   vocabulario de consultas, con mayúsculas, tildes y orden variados,
+   como llegan del modelo) sin caché (BUSCADOR_CACHE_ENTRADAS=0) y con
+   caché: latencia p50/p95 y tasa de aciertos; las dos respuestas de cada
+   consulta deben ser idénticas (si no, sale con código 1);
+2. recarga del feed con un producto nuevo que encaja con una consulta ya
+   cacheada: la caché debe invalidarse y la respuesta mostrarlo (si no,
+   sale con código 1).
+
+Uso (desde src/):
+    python -m benchmarks.cache_buscador
+    python -m benchmarks.cache_buscador --productos 50000 --peticiones 2000 --entradas 128
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.fake_openai import ConfigFalsa, arrancar_servidor
+from benchmarks.fixtures import CATEGORIAS, MEDIDAS, generar_feed_xml
+from benchmarks.micro import importar_main
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado, percentil
+
+SUITE = "cache_buscador"
+
+
+def vocabulario(semilla):
+    """Consultas distintas: categoría + material y, a veces, medida."""
+    rnd = random.Random(semilla)
+    consultas = []
+    for categoria, materiales in CATEGORIAS.items():
+        for material in materiales:
+            consultas.append(f"{categoria} {material}")
+            consultas.append(f"{categoria} {material} {rnd.choice(MEDIDAS)}")
+    rnd.shuffle(consultas)
+    return consultas
+
+
+def variante(consulta, rnd):
+    """Misma consulta escrita de otra forma: orden de las palabras, mayúsculas y tildes."""
+    palabras = consulta.split()
+    rnd.shuffle(palabras)
+    texto = " ".join(palabras)
+    if rnd.random() < 0.3:
+        texto = texto.upper()
+    if rnd.random() < 0.3:
+        texto = texto.replace("ó", "o").replace("é", "e").replace("á", "a")
+    return texto
+
+
+def secuencia(consultas, n, zipf_s, semilla):
+    rnd = random.Random(semilla)
+    pesos = [1 / (i + 1) ** zipf_s for i in range(len(consultas))]
+    return [variante(c, rnd) for c in rnd.choices(consultas, weights=pesos, k=n)]
+
+
+def ejecutar(main, peticiones):
+    tiempos, respuestas = [], []
+    for consulta in peticiones:
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            respuestas.append(main.logica_buscar_accesorios({"keywords": consulta}, "bench"))
+            tiempos.append((time.perf_counter() - t0) * 1000)
+    return tiempos, respuestas
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="BUSCADOR con y sin caché de resultados")
+    parser.add_argument("--productos", type=int, default=20000)
+    parser.add_argument("--peticiones", type=int, default=1000)
+    parser.add_argument("--entradas", type=int, default=512, help="BUSCADOR_CACHE_ENTRADAS")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Exponente de la distribución de las consultas")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    main = importar_main()
+    from cache_buscador import CacheResultados, estadisticas_cache
+
+    cfg = ConfigFalsa(productos_feed=args.productos)
+    _, url = arrancar_servidor(cfg)
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.cargar_feed_en(main.datos_sistema, f"{url}/feed.xml")
+    main.ciclo.marcar_listo("feed_xml")
+    main.BUSCADOR_MODO = "lexico"
+    consultas = vocabulario(args.semilla)
+    peticiones = secuencia(consultas, args.peticiones, args.zipf, args.semilla)
+    print(f"📄 Feed de {args.productos} productos, {args.peticiones} peticiones sobre {len(consultas)} consultas "
+          f"(Zipf {args.zipf})\n")
+
+    resumen = {}
+    respuestas = {}
+    for modo, entradas in (("sin_cache", 0), ("con_cache", args.entradas)):
+        main.cache_buscador = CacheResultados(entradas)
+        for clave in estadisticas_cache:
+            estadisticas_cache[clave] = 0
+        tiempos, respuestas[modo] = ejecutar(main, peticiones)
+        estado = main.cache_buscador.estado()
+        resumen[modo] = {"busqueda_p50_ms": percentil(tiempos, 50), "busqueda_p95_ms": percentil(tiempos, 95),
+                         "media_ms": sum(tiempos) / len(tiempos), "tasa_aciertos": estado["tasa_aciertos"] or 0.0}
+    distintas = sum(a != b for a, b in zip(respuestas["sin_cache"], respuestas["con_cache"]))
+    if distintas:
+        print(f"❌ {distintas} respuestas con caché distintas de las calculadas")
+        sys.exit(1)
+
+    print(f"{'modo':<12}{'p50 ms':>10}{'p95 ms':>10}{'media ms':>10}{'aciertos':>10}")
+    for modo, r in resumen.items():
+        print(f"{modo:<12}{r['busqueda_p50_ms']:>10.2f}{r['busqueda_p95_ms']:>10.2f}{r['media_ms']:>10.2f}"
+              f"{r['tasa_aciertos']:>10.0%}")
+
+    # Recarga: un producto nuevo, el primero del feed, con todas las palabras de una consulta ya en caché
+    consulta = consultas[0]
+    ejecutar(main, [consulta])
+    titulo = f"{consulta} Recargado"
+    extra = (f"<title>colchones.es</title><item><g:id>999999</g:id><title>{titulo}</title>"
+             f"<description>{consulta}</description><g:price>1.00 EUR</g:price>"
+             f"<link>https://www.colchones.es/recargado/</link><g:image_link></g:image_link></item>").encode("utf-8")
+    cfg.feed = generar_feed_xml(args.productos).replace(b"<title>colchones.es</title>", extra, 1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.cargar_feed_en(main.datos_sistema, f"{url}/feed.xml")
+    _, (respuesta,) = ejecutar(main, [consulta])
+    if "recargado" not in respuesta:
+        print("❌ Tras recargar el feed la caché ha devuelto el resultado anterior")
+        sys.exit(1)
+    print(f"\n✅ Respuestas idénticas con y sin caché; la recarga del feed invalida "
+          f"{estadisticas_cache['invalidadas']} entradas")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"busqueda_p50_ms": False, "busqueda_p95_ms": False,
+                                                         "media_ms": False, "tasa_aciertos": True})
+
+
+if __name__ == "__main__":
+    main_cli()
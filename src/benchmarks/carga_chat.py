@@ -0,0 +1,238 @@
+"""
+Prueba de carga extremo a extremo de /chat.
+
+Arranca `main.app` con uvicorn contra:
+- un servidor OpenAI falso (benchmarks/fake_openai.py) con latencia configurable
+  y tool_calls enlatados, que además sirve un feed XML sintético;
+- un sustituto local de MySQL (benchmarks/fake_mysql.py).
+
+Lanza tráfico mezclado por intención (recomendador, buscador, ficha, general,
+off-topic) con una concurrencia objetivo y reporta throughput y p50/p95/p99
+por intención. El resultado se guarda en benchmarks/resultados/ y se compara
+con la ejecución anterior para detectar regresiones entre commits.
+
+Uso (desde src/):
+    python -m benchmarks.carga_chat --concurrencia 16 --peticiones 500
+"""
+import argparse
+import asyncio
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.fake_mysql import BaseDatosFalsa
+from benchmarks.fake_openai import ESCENARIO_DEFECTO, ConfigFalsa, arrancar_servidor
+from benchmarks.fixtures import generar_productos
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado, percentil
+
+CLAVE_API = "clave-benchmark"
+SUITE = "carga_chat"
+
+
+def _ids_catalogo():
+    """cod_articulo del CSV real para que el feed sintético cruce con el recomendador."""
+    ruta = os.path.join(DIR_SRC, "encuestas_limpio.csv")
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, encoding="utf-8") as f:
+        return list(dict.fromkeys(fila["cod_articulo"] for fila in csv.DictReader(f)))
+
+
+def _html_ficha():
+    p = generar_productos(1, semilla=7)[0]
+    cuerpo = "".join(f"<tr><td>{m}</td><td>{300 + i * 50} €</td></tr>" for i, m in enumerate(["90x190", "135x190", "150x190"]))
+    return (f"<html><body><div id='centro'><h1>{p['titulo']}</h1><p>{p['descripcion']}</p>"
+            f"<h2>Precios</h2><table>{cuerpo}</table><h2>Plazo de entrega</h2><p>24/48h</p></div></body></html>")
+
+
+def preparar_entorno(args):
+    """Servidores falsos + variables de entorno + directorio de trabajo temporal."""
+    cfg = ConfigFalsa(
+        latencia_router_ms=args.latencia_router_ms,
+        latencia_tools_ms=args.latencia_tools_ms,
+        latencia_final_ms=args.latencia_final_ms,
+        latencia_embeddings_ms=args.latencia_embeddings_ms,
+        productos_feed=args.productos_feed,
+        ids_feed=_ids_catalogo(),
+    )
+    servidor_openai, url = arrancar_servidor(cfg)
+
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": f"{url}/v1",
+        "OPENAI_API_BASE": f"{url}/v1",
+        "XML_URL": f"{url}/feed.xml",
+        "MI_CLAVE_SECRETA": CLAVE_API,
+    })
+
+    # main.py usa rutas relativas (CSV, modelo, Chroma, log): trabajamos en un
+    # directorio temporal para no ensuciar el repo
+    trabajo = tempfile.mkdtemp(prefix="carga_chat_")
+    for fichero in ("encuestas_limpio.csv", "modelo_satisfaccion.pkl"):
+        origen = os.path.join(DIR_SRC, fichero)
+        if os.path.exists(origen):
+            shutil.copy(origen, trabajo)
+    os.chdir(trabajo)
+    return cfg, servidor_openai, trabajo
+
+
+def arrancar_app(args):
+    import uvicorn
+    import main
+    from decision_log import DecisionLogger
+
+    bd = BaseDatosFalsa(latencia_ms=args.latencia_bd_ms)
+    main.get_db_connection = lambda: bd.connect()
+    main.decision_log = DecisionLogger(os.path.join(os.getcwd(), "agent_decisions.log"))
+
+    config = uvicorn.Config(main.app, host="127.0.0.1", port=args.puerto, log_level="warning")
+    servidor = uvicorn.Server(config)
+    threading.Thread(target=servidor.run, name="uvicorn", daemon=True).start()
+    while not servidor.started:
+        time.sleep(0.05)
+    esperar_listo(args.puerto)
+    return servidor, bd
+
+
+def esperar_listo(puerto, timeout_s=60):
+    """Espera a /ready para no medir el calentamiento de main.py como latencia de /chat."""
+    import json
+    import urllib.error
+    import urllib.request
+
+    t0 = time.perf_counter()
+    while True:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/ready"):
+                print(f"✅ App lista en {time.perf_counter() - t0:.2f}s")
+                return
+        except urllib.error.HTTPError as e:
+            criticos = {n: c for n, c in json.loads(e.read())["componentes"].items() if c["critico"]}
+        fallidos = {n: c["error"] for n, c in criticos.items() if c["estado"] == "error"}
+        if fallidos or time.perf_counter() - t0 > timeout_s:
+            print(f"⚠️ La app no está lista, se lanza el tráfico igualmente: {fallidos or criticos}")
+            return
+        time.sleep(0.1)
+
+
+async def lanzar_trafico(args, escenario):
+    import httpx
+
+    rnd = random.Random(args.semilla)
+    pesos = [e["peso"] for e in escenario]
+    html = _html_ficha()
+    usuarios = [f"bench_{i}" for i in range(args.usuarios)]
+    muestras = []
+    restantes = {"n": args.peticiones}
+    fin = time.perf_counter() + args.duracion if args.duracion else None
+
+    async def trabajador(cliente):
+        while True:
+            if fin is not None:
+                if time.perf_counter() >= fin:
+                    return
+            else:
+                if restantes["n"] <= 0:
+                    return
+                restantes["n"] -= 1
+            e = rnd.choices(escenario, weights=pesos)[0]
+            cuerpo = {"user_id": rnd.choice(usuarios), "message": e["mensaje"], "dominio": "colchones.es"}
+            if e.get("con_html"):
+                cuerpo.update({"html_contenido": html, "nombre_producto": "Colchón First Sac", "articulo_id": 662})
+            t0 = time.perf_counter()
+            try:
+                r = await cliente.post("/chat", json=cuerpo, headers={"x-api-key": CLAVE_API})
+                ok = r.status_code == 200
+            except Exception:
+                ok = False
+            muestras.append((e["intencion"], time.perf_counter() - t0, ok))
+
+    limites = httpx.Limits(max_connections=args.concurrencia)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.puerto}", timeout=120, limits=limites) as cliente:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(trabajador(cliente) for _ in range(args.concurrencia)))
+        total = time.perf_counter() - t0
+    return muestras, total
+
+
+def resumir(muestras, total):
+    por_intencion = {}
+    for intencion, lat, ok in muestras:
+        por_intencion.setdefault(intencion, []).append((lat, ok))
+    por_intencion["TOTAL"] = [(lat, ok) for _, lat, ok in muestras]
+
+    resumen = {}
+    for intencion, datos in por_intencion.items():
+        lats = [lat * 1000 for lat, _ in datos]
+        resumen[intencion] = {
+            "peticiones": len(datos),
+            "errores": sum(1 for _, ok in datos if not ok),
+            "rps": len(datos) / total if total else 0,
+            "p50_ms": percentil(lats, 50),
+            "p95_ms": percentil(lats, 95),
+            "p99_ms": percentil(lats, 99),
+        }
+    return resumen
+
+
+def imprimir(resumen, total, cfg, bd):
+    print(f"\n📊 /chat — {resumen['TOTAL']['peticiones']} peticiones en {total:.1f}s")
+    print(f"{'intención':<16}{'n':>6}{'err':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for intencion, r in sorted(resumen.items(), key=lambda kv: kv[0] == "TOTAL"):
+        print(f"{intencion:<16}{r['peticiones']:>6}{r['errores']:>6}{r['rps']:>9.2f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+    print(f"Llamadas a OpenAI falso: {cfg.llamadas} · consultas BD: {bd.consultas}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Prueba de carga de /chat con OpenAI y MySQL locales")
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--peticiones", type=int, default=200)
+    parser.add_argument("--duracion", type=float, default=None, help="Segundos (sustituye a --peticiones)")
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--productos-feed", type=int, default=2000)
+    parser.add_argument("--latencia-router-ms", type=float, default=150.0)
+    parser.add_argument("--latencia-tools-ms", type=float, default=400.0)
+    parser.add_argument("--latencia-final-ms", type=float, default=800.0)
+    parser.add_argument("--latencia-embeddings-ms", type=float, default=80.0)
+    parser.add_argument("--latencia-bd-ms", type=float, default=2.0)
+    parser.add_argument("--puerto", type=int, default=8911)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--baseline", default=None, help="JSON de resultados con el que comparar (por defecto, el último)")
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    cfg, servidor_openai, trabajo = preparar_entorno(args)
+    servidor_app, bd = arrancar_app(args)
+    try:
+        muestras, total = asyncio.run(lanzar_trafico(args, ESCENARIO_DEFECTO))
+    finally:
+        servidor_app.should_exit = True
+        servidor_openai.shutdown()
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    resumen = resumir(muestras, total)
+    imprimir(resumen, total, cfg, bd)
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False})
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,145 @@
+"""
+Dominios secundarios (dominios.json): arranque, primera petición y memoria.
+
+Prepara N dominios sintéticos (catálogo + modelo compacto de
+arranque.preparar_trabajo copiados a un directorio por dominio, y el feed
+del servidor falso) y, en un proceso limpio por medida:
+1. tiempo de `import main` con 0 y N dominios configurados (no debe crecer:
+   nada se carga hasta la primera petición);
+2. recorre los N dominios con el recomendador y el buscador: tiempo de
+   la primera petición (carga perezosa) y de la segunda;
+3. RSS del proceso al terminar, sin límite (DOMINIOS_MAX_ACTIVOS=N, todos
+   residentes) y con DOMINIOS_MAX_ACTIVOS=--activos (LRU).
+
+Uso (desde src/):
+    python -m benchmarks.dominios --dominios 6 --activos 2 --productos-feed 5000
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.arranque import entorno, preparar_trabajo
+from benchmarks.fake_openai import ConfigFalsa, arrancar_servidor
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado
+
+SUITE = "dominios"
+
+# Se ejecuta en el proceso hijo (cwd = directorio de trabajo)
+CODIGO_HIJO = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+importar_s = time.perf_counter() - t0
+from benchmarks.micro import PERFILES
+from dominios import estadisticas_dominios
+
+dominios = json.loads(sys.argv[1])
+primeras, segundas = [], []
+for dominio in dominios:
+    for llamadas in (primeras, segundas):
+        t0 = time.perf_counter()
+        main.logica_recomendar_colchon(dict(PERFILES[0]), "bench", dominio)
+        main.logica_buscar_accesorios({"keywords": "colchon viscoelastico"}, "bench", dominio)
+        llamadas.append((time.perf_counter() - t0) * 1000)
+with open("/proc/self/status") as f:
+    rss = next(int(l.split()[1]) / 1024 for l in f if l.startswith("VmRSS:"))
+activos = main.registro_dominios.estado() if main.registro_dominios else {}
+print(json.dumps({"importar_s": importar_s, "primeras_ms": primeras, "segundas_ms": segundas, "rss_mb": rss,
+                  "activos": len(activos), "memoria_estimada_mb": sum(a["memoria_mb"] for a in activos.values()),
+                  "estadisticas": estadisticas_dominios}))
+"""
+
+
+def preparar_dominios(trabajo, n, articulos, arboles, xml_url):
+    """Directorio por dominio con el catálogo y el modelo, y dominios.json. Devuelve (nombres, ids del catálogo)."""
+    ids = preparar_trabajo(trabajo, articulos, arboles)
+    configuracion = {}
+    for i in range(n):
+        nombre = f"tienda{i}.es"
+        directorio = os.path.join(trabajo, "dominios", nombre)
+        os.makedirs(directorio)
+        for fichero in ("encuestas_limpio.csv", "modelo_satisfaccion.npz"):
+            shutil.copy(os.path.join(trabajo, fichero), directorio)
+        configuracion[nombre] = {"directorio": directorio, "xml_url": xml_url, "tienda": f"Tienda{i}.es"}
+    with open(os.path.join(trabajo, "dominios.json"), "w", encoding="utf-8") as f:
+        json.dump(configuracion, f, indent=2)
+    return list(configuracion), ids
+
+
+def medir(trabajo, env, dominios):
+    salida = subprocess.run([sys.executable, "-c", CODIGO_HIJO, json.dumps(dominios)], cwd=trabajo, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Dominios secundarios: arranque, carga perezosa y memoria con LRU")
+    parser.add_argument("--dominios", type=int, default=6)
+    parser.add_argument("--activos", type=int, default=2, help="DOMINIOS_MAX_ACTIVOS del modo LRU")
+    parser.add_argument("--productos-feed", type=int, default=5000)
+    parser.add_argument("--articulos", type=int, default=300)
+    parser.add_argument("--arboles", type=int, default=100)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    trabajo = tempfile.mkdtemp(prefix="dominios_")
+    try:
+        print(f"⏳ Preparando {args.dominios} dominios ({args.articulos} artículos, {args.arboles} árboles, "
+              f"feed de {args.productos_feed} productos)…")
+        cfg = ConfigFalsa(productos_feed=args.productos_feed, latencia_router_ms=1, latencia_tools_ms=1,
+                          latencia_final_ms=1, latencia_embeddings_ms=1)
+        _, url = arrancar_servidor(cfg)
+        env = entorno(url)
+        dominios, _ = preparar_dominios(trabajo, args.dominios, args.articulos, args.arboles, env["XML_URL"])
+        # Sin caché del buscador: la 2ª petición mide el inquilino ya cargado, no un acierto de la caché
+        env.update({"DOMINIOS_CONFIG": os.path.join(trabajo, "dominios.json"), "DOMINIOS_MEMORIA_MB": "100000",
+                    "DOMINIOS_PRESUPUESTO_MB": "100000", "BUSCADOR_CACHE_ENTRADAS": "0"})
+
+        medidas = {
+            "sin_dominios": medir(trabajo, dict(env, DOMINIOS_CONFIG=""), []),
+            "todos_residentes": medir(trabajo, dict(env, DOMINIOS_MAX_ACTIVOS=str(args.dominios)), dominios),
+            "lru": medir(trabajo, dict(env, DOMINIOS_MAX_ACTIVOS=str(args.activos)), dominios),
+        }
+    finally:
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    resumen = {}
+    print(f"\n{'modo':<18}{'import s':>10}{'1ª pet. ms':>12}{'2ª pet. ms':>12}{'activos':>9}{'estimada MB':>13}{'RSS MB':>9}")
+    for modo, m in medidas.items():
+        n = max(1, len(m["primeras_ms"]))
+        resumen[modo] = {
+            "importar_s": m["importar_s"],
+            "primera_peticion_ms": sum(m["primeras_ms"]) / n,
+            "segunda_peticion_ms": sum(m["segundas_ms"]) / n,
+            "activos": m["activos"],
+            "memoria_estimada_mb": m["memoria_estimada_mb"],
+            "rss_mb": m["rss_mb"],
+        }
+        r = resumen[modo]
+        print(f"{modo:<18}{r['importar_s']:>10.2f}{r['primera_peticion_ms']:>12.1f}{r['segunda_peticion_ms']:>12.1f}"
+              f"{r['activos']:>9}{r['memoria_estimada_mb']:>13.1f}{r['rss_mb']:>9.1f}")
+    print(f"\nDescargas LRU: {medidas['lru']['estadisticas']['descargas_lru']}")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"importar_s": False, "primera_peticion_ms": False,
+                                                         "segunda_peticion_ms": False, "rss_mb": False})
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,208 @@
+"""
+Benchmark de modulos/preparar_encuestas.py (ETL de encuestas ancho → largo).
+
+Genera un CSV sintético con el formato de encuestas_colchones.csv (por
+defecto un millón de pedidos) y compara:
+- referencia: el script anterior (iterrows + to_float/normalize_bool por celda)
+- vectorizado: preparar_encuestas.procesar por lotes, solo CSV
+- vectorizado + Parquet: misma pasada escribiendo también Parquet
+
+Cada variante se ejecuta en un proceso nuevo y se mide su memoria pico
+(RSS). Comprueba que el CSV vectorizado es idéntico byte a byte al de
+referencia.
+
+Uso (desde src/):
+    python -m benchmarks.etl_encuestas --filas 1000000
+    python -m benchmarks.etl_encuestas --filas 1000000 --filas-referencia 100000
+"""
+import argparse
+import filecmp
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.fixtures import generar_encuestas_brutas_csv
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado
+
+SUITE = "etl_encuestas"
+
+
+# ==========================================
+# Referencia: el script anterior, fila a fila
+# ==========================================
+def preparar_iterrows(entrada, salida):
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(entrada, sep=None, engine="python")
+    df.columns = [c.strip() for c in df.columns]
+
+    def normalize_bool(x):
+        if pd.isna(x):
+            return 0
+        x = str(x).strip().lower()
+        if x in ["si", "sí", "1", "true"]:
+            return 1
+        return 0
+
+    def to_float(x):
+        if pd.isna(x):
+            return np.nan
+        x = str(x).strip().replace(",", ".")
+        try:
+            return float(x)
+        except ValueError:
+            return np.nan
+
+    rows = []
+    for _, row in df.iterrows():
+        mujer_presente = not pd.isna(row.get("ID MUJER1", np.nan))
+        hombre_presente = not pd.isna(row.get("ID HOMBRE1", np.nan))
+        duerme_en_pareja = 1 if (mujer_presente and hombre_presente) else 0
+        for sexo, prefijo, presente in (("mujer", "MUJER1", mujer_presente), ("hombre", "HOMBRE1", hombre_presente)):
+            if presente and not pd.isna(row.get(f"{prefijo} altura", np.nan)):
+                rows.append({
+                    "cod_pedido": row.get("COD PEDIDO"),
+                    "cod_articulo": row.get("COD ARTICULO"),
+                    "nombre_articulo": row.get("NOMBRE ARTICULO"),
+                    "nucleo": row.get("NUCLEO"),
+                    "grosor": row.get("GROSOR"),
+                    "firmeza": row.get("FIRMEZA"),
+                    "sexo": sexo,
+                    "altura": to_float(row.get(f"{prefijo} altura")),
+                    "peso": to_float(row.get(f"{prefijo} peso")),
+                    "imc": to_float(row.get(f"{prefijo} imc")),
+                    "valoracion": row.get(f"{prefijo} VALORACION"),
+                    "molestias_antes": normalize_bool(row.get(f"{prefijo} MOLESTIAS ANTES")),
+                    "molestias_despues": normalize_bool(row.get(f"{prefijo} MOLESTIAS DESPUES")),
+                    "duerme_en_pareja": duerme_en_pareja,
+                })
+
+    df_final = pd.DataFrame(rows)
+    df_final = df_final[~df_final["valoracion"].isna()]
+    df_final["valoracion"] = pd.to_numeric(df_final["valoracion"], errors="coerce")
+    df_final = df_final[~df_final["valoracion"].isna()]
+    df_final.to_csv(salida, index=False, float_format="%.3f")
+    return len(df_final)
+
+
+def ejecutar_variante(variante, entrada, trabajo, filas_lote):
+    """Ejecuta una variante y devuelve segundos, filas de salida y memoria pico del proceso."""
+    t0 = time.perf_counter()
+    salida = os.path.join(trabajo, f"{variante}.csv")
+    if variante == "referencia":
+        filas = preparar_iterrows(entrada, salida)
+    else:
+        from modulos.preparar_encuestas import procesar
+        parquet = os.path.join(trabajo, f"{variante}.parquet") if variante.endswith("parquet") else None
+        filas = procesar(entrada, salida, parquet, filas_lote, verbose=False)[0]
+    return {"segundos": time.perf_counter() - t0, "filas_salida": filas, "mem_pico_mb": memoria_pico_mb()}
+
+
+def memoria_pico_mb():
+    """Pico de RSS del proceso (VmHWM en Linux; ru_maxrss se hereda del padre al lanzar el hijo)."""
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _hijo(cola, *args):
+    cola.put(ejecutar_variante(*args))
+
+
+def medir(*args):
+    """Cada variante en un intérprete nuevo para que la memoria pico sea solo suya."""
+    ctx = multiprocessing.get_context("spawn")
+    cola = ctx.Queue()
+    proceso = ctx.Process(target=_hijo, args=(cola,) + args)
+    proceso.start()
+    resultado = cola.get()
+    proceso.join()
+    return resultado
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark del ETL de encuestas")
+    parser.add_argument("--filas", type=int, default=1_000_000, help="Pedidos del CSV sintético")
+    parser.add_argument("--filas-referencia", type=int, default=None,
+                        help="Ejecuta la referencia (lenta) solo sobre las primeras N filas")
+    parser.add_argument("--filas-lote", type=int, default=200_000)
+    parser.add_argument("--sin-referencia", action="store_true")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    trabajo = tempfile.mkdtemp(prefix="etl_encuestas_")
+    try:
+        entrada = os.path.join(trabajo, "encuestas_colchones.csv")
+        print(f"⏳ Generando {args.filas} pedidos sintéticos…")
+        generar_encuestas_brutas_csv(entrada, args.filas, semilla=args.semilla)
+        # Fichero ya en caché de disco para que la primera variante no pague la lectura en frío
+        with open(entrada, "rb") as f:
+            while f.read(1 << 24):
+                pass
+
+        resumen = {
+            "vectorizado": medir("vectorizado", entrada, trabajo, args.filas_lote),
+            "vectorizado+parquet": medir("vectorizado+parquet", entrada, trabajo, args.filas_lote),
+        }
+        resumen["vectorizado+parquet"]["parquet_mb"] = os.path.getsize(
+            os.path.join(trabajo, "vectorizado+parquet.parquet")) / 1e6
+
+        if not args.sin_referencia:
+            entrada_ref = entrada
+            if args.filas_referencia and args.filas_referencia < args.filas:
+                entrada_ref = os.path.join(trabajo, "referencia_entrada.csv")
+                with open(entrada, encoding="utf-8") as f, open(entrada_ref, "w", encoding="utf-8") as g:
+                    for i, linea in enumerate(f):
+                        if i > args.filas_referencia:
+                            break
+                        g.write(linea)
+            print(f"⏳ Referencia (iterrows) sobre {args.filas_referencia or args.filas} pedidos…")
+            resumen["referencia"] = medir("referencia", entrada_ref, trabajo, args.filas_lote)
+
+            from modulos.preparar_encuestas import procesar
+            salida_vec = os.path.join(trabajo, "vectorizado_ref.csv")
+            procesar(entrada_ref, salida_vec, None, args.filas_lote, verbose=False)
+            identico = filecmp.cmp(os.path.join(trabajo, "referencia.csv"), salida_vec, shallow=False)
+            print(f"{'✅' if identico else '❌'} CSV vectorizado {'idéntico' if identico else 'DISTINTO'} al de referencia")
+            resumen["referencia"]["identico"] = identico
+    finally:
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    print(f"\n{'variante':<22}{'pedidos/s':>14}{'segundos':>11}{'filas salida':>14}{'mem pico MB':>13}")
+    for nombre, r in resumen.items():
+        pedidos = args.filas_referencia if nombre == "referencia" and args.filas_referencia else args.filas
+        r["pedidos_s"] = pedidos / r["segundos"]
+        mem = f"{r['mem_pico_mb']:.0f}" if r["mem_pico_mb"] is not None else "-"
+        print(f"{nombre:<22}{r['pedidos_s']:>14.0f}{r['segundos']:>11.2f}{r['filas_salida']:>14}{mem:>13}")
+    if "referencia" in resumen:
+        print(f"\n⚡ Aceleración vectorizado vs. referencia: "
+              f"{resumen['vectorizado']['pedidos_s'] / resumen['referencia']['pedidos_s']:.0f}x")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"pedidos_s": True, "mem_pico_mb": False})
+
+
+if __name__ == "__main__":
+    main_cli()
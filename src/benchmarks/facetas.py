@@ -0,0 +1,152 @@
+"""
+Filtros del BUSCADOR: intersección de bitmaps (facetas.py) vs. recorrer el feed.
+
+Sobre un feed sintético (fixtures.generar_feed_xml):
+1. coste de extraer los atributos de todo el feed (lo que se ahorra en
+   cada recarga con FeedIndexado: solo se extraen los de los productos
+   cambiados) y de construir los bitmaps y arrays ordenados;
+2. cada consulta de FILTROS con Facetas.filtrar vs. comprobar los
+   atributos producto a producto; los dos deben devolver los mismos g:id
+   (si no, sale con código 1);
+3. logica_buscar_accesorios con palabras clave solo y con filtros.
+
+Uso (desde src/):
+    python -m benchmarks.facetas
+    python -m benchmarks.facetas --productos 50000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.fixtures import generar_feed_xml
+from benchmarks.micro import importar_main
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado, percentil
+
+SUITE = "facetas"
+# (palabras clave, filtros de la tool)
+FILTROS = [
+    ("canapé", {"categoria": "canape", "medida": "150x190", "precio_max": 400}),
+    ("colchón", {"categoria": "colchon", "grosor_min": 30, "grosor_max": 30}),
+    ("almohada", {"categoria": "almohada", "material": "viscoelastica"}),
+    ("colchón muelles", {"material": "muelles_ensacados", "precio_min": 300, "precio_max": 800, "medida": "135x190"}),
+    ("somier", {"categoria": "somier", "precio_max": 200}),
+]
+
+
+def cumple(atributos, filtros):
+    """Comprobación directa de un producto (la referencia de Facetas.filtrar)."""
+    from facetas import leer_medida
+
+    precio, ancho, largo, grosor, categoria, materiales = atributos
+
+    def en_rango(valor, minimo, maximo):
+        return valor is not None and (minimo is None or valor >= minimo) and (maximo is None or valor <= maximo)
+
+    if "categoria" in filtros and categoria != filtros["categoria"]:
+        return False
+    if "material" in filtros and filtros["material"] not in materiales:
+        return False
+    if "medida" in filtros and (ancho, largo) != leer_medida(filtros["medida"]):
+        return False
+    if ("precio_min" in filtros or "precio_max" in filtros) and not en_rango(
+            precio, filtros.get("precio_min"), filtros.get("precio_max")):
+        return False
+    if ("grosor_min" in filtros or "grosor_max" in filtros) and not en_rango(
+            grosor, filtros.get("grosor_min"), filtros.get("grosor_max")):
+        return False
+    return True
+
+
+def cronometrar(funcion, repeticiones):
+    tiempos, resultado = [], None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return resultado, tiempos
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Filtros del buscador con bitmaps vs. recorrido del feed")
+    parser.add_argument("--productos", type=int, default=50000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    main = importar_main()
+    from cache_buscador import CacheResultados
+    from facetas import Facetas, extraer_atributos
+    from feed_incremental import FeedIndexado
+    from feed_xml import parsear_feed
+
+    feed = parsear_feed(generar_feed_xml(args.productos, args.semilla))
+    atributos, t_extraer = cronometrar(lambda: [extraer_atributos(item) for item in feed.values()], 1)
+    facetas, t_construir = cronometrar(lambda: Facetas.construir(list(feed), atributos), args.repeticiones)
+    print(f"📄 Feed de {len(feed)} productos: extraer atributos {t_extraer[0]:.0f} ms, "
+          f"construir bitmaps {percentil(t_construir, 50):.1f} ms\n")
+
+    recorrido, bitmaps, encontrados = [], [], []
+    for _, filtros in FILTROS:
+        esperado, t = cronometrar(lambda: [g for g, a in zip(feed, atributos) if cumple(a, filtros)], args.repeticiones)
+        recorrido += t
+        obtenido, t = cronometrar(lambda: facetas.filtrar(**filtros), args.repeticiones)
+        bitmaps += t
+        if obtenido != esperado:
+            print(f"❌ Facetas.filtrar({filtros}) devuelve {len(obtenido)} productos y el recorrido {len(esperado)}")
+            sys.exit(1)
+        encontrados.append(len(obtenido))
+    print(f"✅ Mismos productos con bitmaps que recorriendo el feed ({', '.join(map(str, encontrados))})")
+
+    indexado = FeedIndexado.construir(feed)
+    main.datos_sistema["feed_indices"] = indexado
+    main.datos_sistema["feed_xml"] = indexado.productos
+    main.ciclo.marcar_listo("feed_xml")
+    main.BUSCADOR_MODO = "lexico"
+    # Las consultas se repiten: sin caché del buscador para medir el filtrado y la puntuación
+    main.cache_buscador = CacheResultados(0)
+    indexado.facetas()
+    sin_filtros, con_filtros = [], []
+    for _ in range(args.repeticiones):
+        for palabras, filtros in FILTROS:
+            with contextlib.redirect_stdout(io.StringIO()):
+                t0 = time.perf_counter()
+                main.logica_buscar_accesorios({"keywords": palabras}, "bench")
+                sin_filtros.append((time.perf_counter() - t0) * 1000)
+                t0 = time.perf_counter()
+                main.logica_buscar_accesorios(dict(filtros, keywords=palabras), "bench")
+                con_filtros.append((time.perf_counter() - t0) * 1000)
+
+    resumen = {
+        "indice": {"extraer_ms": t_extraer[0], "construir_p50_ms": percentil(t_construir, 50)},
+        "filtrar": {"recorrido_p50_ms": percentil(recorrido, 50), "bitmaps_p50_ms": percentil(bitmaps, 50)},
+        "buscador": {"sin_filtros_p50_ms": percentil(sin_filtros, 50), "con_filtros_p50_ms": percentil(con_filtros, 50)},
+    }
+    print(f"\n{'':<24}{'p50 ms':>10}")
+    print(f"{'filtrar recorriendo':<24}{resumen['filtrar']['recorrido_p50_ms']:>10.2f}")
+    print(f"{'filtrar con bitmaps':<24}{resumen['filtrar']['bitmaps_p50_ms']:>10.2f}")
+    print(f"{'buscador sin filtros':<24}{resumen['buscador']['sin_filtros_p50_ms']:>10.2f}")
+    print(f"{'buscador con filtros':<24}{resumen['buscador']['con_filtros_p50_ms']:>10.2f}")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"bitmaps_p50_ms": False, "con_filtros_p50_ms": False,
+                                                         "construir_p50_ms": False})
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,84 @@
+"""
+Sustituto local de MySQL para las pruebas de carga.
+
+Implementa el subconjunto de la API de mysql.connector que usa main.py
+(connect -> cursor(dictionary=True) -> execute/fetchall/commit ->
+is_connected/close) sobre un SQLite en memoria compartido por todos los
+hilos. Así /chat lee y guarda historial sin tocar la BD de producción.
+"""
+import re
+import sqlite3
+import threading
+import time
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS my_colchoneses_preguntas_chati (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cod_usuario TEXT, pregunta TEXT, respuesta TEXT, url TEXT, dominio TEXT,
+    articulo INTEGER, nombre_producto TEXT, fecha TEXT, visible INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_usuario_dominio
+    ON my_colchoneses_preguntas_chati (cod_usuario, dominio);
+"""
+
+
+class BaseDatosFalsa:
+    def __init__(self, latencia_ms=0.0):
+        self.latencia_ms = latencia_ms
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(ESQUEMA)
+        self.consultas = 0
+
+    def connect(self, **_config):
+        return ConexionFalsa(self)
+
+
+class ConexionFalsa:
+    def __init__(self, bd):
+        self.bd = bd
+        self.abierta = True
+
+    def cursor(self, dictionary=False):
+        return CursorFalso(self.bd, dictionary)
+
+    def commit(self):
+        with self.bd.lock:
+            self.bd.db.commit()
+
+    def is_connected(self):
+        return self.abierta
+
+    def close(self):
+        self.abierta = False
+
+
+class CursorFalso:
+    def __init__(self, bd, dictionary):
+        self.bd = bd
+        self.dictionary = dictionary
+        self.filas = []
+
+    @staticmethod
+    def _traducir(sql):
+        # Dialecto MySQL -> SQLite (solo lo que usa la app)
+        sql = sql.replace("%s", "?")
+        sql = re.sub(r"NOW\(\)", "CURRENT_TIMESTAMP", sql, flags=re.IGNORECASE)
+        return sql
+
+    def execute(self, sql, params=()):
+        if self.bd.latencia_ms:
+            time.sleep(self.bd.latencia_ms / 1000)
+        with self.bd.lock:
+            self.bd.consultas += 1
+            cur = self.bd.db.execute(self._traducir(sql), tuple(params or ()))
+            filas = cur.fetchall()
+        self.filas = [dict(f) if self.dictionary else tuple(f) for f in filas]
+
+    def fetchall(self):
+        filas, self.filas = self.filas, []
+        return filas
+
+    def close(self):
+        pass
@@ -0,0 +1,203 @@
+"""
+Servidor local compatible con la API de OpenAI para pruebas de carga.
+
+Responde a:
+- POST /v1/chat/completions  -> router (categoría), llamada con tools
+  (devuelve un tool_call enlatado) y respuesta final (texto).
+- POST /v1/embeddings        -> vectores deterministas (float o base64).
+- GET  /feed.xml             -> feed sintético de Google Merchant.
+
+La latencia de cada tipo de llamada es configurable para simular el
+tiempo real de gpt-4o sin gastar créditos.
+
+Uso independiente:
+    python -m benchmarks.fake_openai --puerto 8901 --latencia-ms 300
+"""
+import argparse
+import base64
+import hashlib
+import json
+import re
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from benchmarks.fixtures import generar_feed_xml
+except ImportError:
+    from fixtures import generar_feed_xml
+
+DIMENSIONES_EMBEDDING = 1536
+
+# Escenario por defecto: mensaje -> intención y tool_call que "elegiría" gpt-4o
+ESCENARIO_DEFECTO = [
+    {"intencion": "RECOMENDADOR", "peso": 30, "mensaje": "soy hombre, peso 90kg y mido 180",
+     "argumentos": {"sexo": "hombre", "altura": 180, "peso": 90, "duerme_en_pareja": False, "molestias_antes": False}},
+    {"intencion": "RECOMENDADOR", "peso": 10, "mensaje": "soy mujer, 60 kilos, 165 cm y duermo en pareja, quiero látex",
+     "argumentos": {"sexo": "mujer", "altura": 165, "peso": 60, "duerme_en_pareja": True, "material_preferido": "latex"}},
+    {"intencion": "BUSCADOR", "peso": 20, "mensaje": "busco una almohada visco",
+     "argumentos": {"keywords": "almohada visco"}},
+    {"intencion": "BUSCADOR", "peso": 10, "mensaje": "tenéis canapé abatible de 150x190?",
+     "argumentos": {"keywords": "canapé abatible 150x190"}},
+    {"intencion": "FICHA_PRODUCTO", "peso": 15, "mensaje": "¿qué plazo de entrega tiene este colchón?",
+     "argumentos": {}, "con_html": True},
+    {"intencion": "GENERAL", "peso": 10, "mensaje": "¿cómo funcionan las devoluciones?",
+     "argumentos": {"pregunta": "devoluciones"}},
+    {"intencion": "OFF_TOPIC", "peso": 5, "mensaje": "¿quién ganó la liga el año pasado?",
+     "argumentos": {}},
+]
+
+
+class ConfigFalsa:
+    def __init__(self, escenario=None, latencia_router_ms=150.0, latencia_tools_ms=400.0,
+                 latencia_final_ms=800.0, latencia_embeddings_ms=80.0, productos_feed=2000,
+                 ids_feed=None):
+        self.escenario = {e["mensaje"]: e for e in (escenario or ESCENARIO_DEFECTO)}
+        self.latencia_router_ms = latencia_router_ms
+        self.latencia_tools_ms = latencia_tools_ms
+        self.latencia_final_ms = latencia_final_ms
+        self.latencia_embeddings_ms = latencia_embeddings_ms
+        self.feed = generar_feed_xml(productos_feed, ids_base=ids_feed)
+        self.llamadas = {"router": 0, "tools": 0, "final": 0, "embeddings": 0}
+        self.lock = threading.Lock()
+
+    def contar(self, tipo):
+        with self.lock:
+            self.llamadas[tipo] += 1
+
+
+def _vector_determinista(texto, dims=DIMENSIONES_EMBEDDING):
+    semilla = hashlib.sha256(str(texto).encode("utf-8")).digest()
+    valores = []
+    bloque = semilla
+    while len(valores) < dims:
+        bloque = hashlib.sha256(bloque).digest()
+        valores.extend((b - 127.5) / 127.5 for b in bloque)
+    valores = valores[:dims]
+    norma = sum(v * v for v in valores) ** 0.5 or 1.0
+    return [v / norma for v in valores]
+
+
+def _respuesta_chat(mensaje, modelo):
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": modelo,
+        "choices": [{"index": 0, "message": mensaje,
+                     "finish_reason": "tool_calls" if mensaje.get("tool_calls") else "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+class ManejadorFalso(BaseHTTPRequestHandler):
+    config: ConfigFalsa = None  # se asigna al crear el servidor
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _enviar(self, codigo, cuerpo, tipo="application/json"):
+        datos = cuerpo if isinstance(cuerpo, bytes) else json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        if self.path.startswith("/feed.xml"):
+            return self._enviar(200, self.config.feed, "application/xml")
+        self._enviar(404, {"error": "no encontrado"})
+
+    def do_POST(self):
+        longitud = int(self.headers.get("Content-Length", 0))
+        peticion = json.loads(self.rfile.read(longitud) or b"{}")
+        if self.path.endswith("/chat/completions"):
+            return self._enviar(200, self._chat(peticion))
+        if self.path.endswith("/embeddings"):
+            return self._enviar(200, self._embeddings(peticion))
+        self._enviar(404, {"error": "no encontrado"})
+
+    def _chat(self, peticion):
+        cfg = self.config
+        mensajes = peticion.get("messages", [])
+        modelo = peticion.get("model", "gpt-4o")
+        ultimo_usuario = next((m.get("content", "") for m in reversed(mensajes) if m.get("role") == "user"), "")
+
+        # 1. Router: un único mensaje system con el prompt del clasificador
+        if len(mensajes) == 1 and "clasificador de intenciones" in mensajes[0].get("content", ""):
+            cfg.contar("router")
+            time.sleep(cfg.latencia_router_ms / 1000)
+            encontrado = re.search(r'MENSAJE ACTUAL DEL USUARIO: "(.*)"', mensajes[0]["content"], re.S)
+            entrada = cfg.escenario.get(encontrado.group(1) if encontrado else "")
+            categoria = entrada["intencion"] if entrada else "GENERAL"
+            return _respuesta_chat({"role": "assistant", "content": categoria}, modelo)
+
+        # 2. Respuesta final tras ejecutar la herramienta
+        if any(m.get("role") == "tool" for m in mensajes):
+            cfg.contar("final")
+            time.sleep(cfg.latencia_final_ms / 1000)
+            return _respuesta_chat({"role": "assistant",
+                                    "content": "<p>Respuesta simulada basada en la herramienta.</p>"}, modelo)
+
+        # 3. Llamada con tools: devolvemos el tool_call enlatado del escenario
+        cfg.contar("tools")
+        time.sleep(cfg.latencia_tools_ms / 1000)
+        tools = peticion.get("tools") or []
+        entrada = cfg.escenario.get(ultimo_usuario, {})
+        if not tools:
+            return _respuesta_chat({"role": "assistant", "content": "<p>Hola, ¿en qué puedo ayudarte?</p>"}, modelo)
+        nombre = tools[0]["function"]["name"]
+        argumentos = entrada.get("argumentos") or {}
+        if nombre == "buscar_info_general" and "pregunta" not in argumentos:
+            argumentos = {"pregunta": ultimo_usuario}
+        return _respuesta_chat({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{"id": "call_fake", "type": "function",
+                            "function": {"name": nombre, "arguments": json.dumps(argumentos)}}],
+        }, modelo)
+
+    def _embeddings(self, peticion):
+        cfg = self.config
+        cfg.contar("embeddings")
+        time.sleep(cfg.latencia_embeddings_ms / 1000)
+        entradas = peticion.get("input", [])
+        if isinstance(entradas, (str, int)) or (entradas and isinstance(entradas[0], int)):
+            entradas = [entradas]
+        dims = peticion.get("dimensions") or DIMENSIONES_EMBEDDING
+        datos = []
+        for i, texto in enumerate(entradas):
+            vector = _vector_determinista(texto, dims)
+            if peticion.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+            datos.append({"object": "embedding", "index": i, "embedding": vector})
+        return {"object": "list", "data": datos, "model": peticion.get("model", ""),
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+
+def arrancar_servidor(config, host="127.0.0.1", puerto=0):
+    """Arranca el servidor en un hilo y devuelve (servidor, url_base)."""
+    manejador = type("Manejador", (ManejadorFalso,), {"config": config})
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="fake-openai", daemon=True).start()
+    return servidor, f"http://{host}:{servidor.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor OpenAI falso para pruebas de carga")
+    parser.add_argument("--puerto", type=int, default=8901)
+    parser.add_argument("--latencia-ms", type=float, default=300.0, help="Latencia de las llamadas de chat")
+    parser.add_argument("--productos-feed", type=int, default=2000)
+    a = parser.parse_args()
+    cfg = ConfigFalsa(latencia_router_ms=a.latencia_ms / 2, latencia_tools_ms=a.latencia_ms,
+                      latencia_final_ms=a.latencia_ms * 2, productos_feed=a.productos_feed)
+    srv, url = arrancar_servidor(cfg, puerto=a.puerto)
+    print(f"🧪 OpenAI falso escuchando en {url}/v1 (feed en {url}/feed.xml)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
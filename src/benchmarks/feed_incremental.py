@@ -0,0 +1,166 @@
+"""
+Recarga del feed: reconstrucción completa vs. aplicar solo las diferencias.
+
+Sobre un feed sintético grande (fixtures.generar_feed_xml) y una versión
+con una fracción de precios cambiados, productos quitados y añadidos
+(fichas_producto.cambiar_feed):
+1. coste de los índices derivados al recargar: FeedIndexado.construir con
+   el feed nuevo vs. FeedIndexado.actualizar desde la foto anterior
+   (el parseo del XML es igual en los dos y se mide aparte);
+2. la foto actualizada debe ser idéntica a la reconstruida (productos y
+   su orden, textos normalizados, atributos, segmentos y buscar_clave);
+   si no, sale con código 1;
+3. coste por petición de lo que usan el buscador (normalizar todos los
+   textos vs. FeedIndexado.textos) y el recomendador (regex sobre todas
+   las claves vs. buscar_clave).
+
+Uso (desde src/):
+    python -m benchmarks.feed_incremental
+    python -m benchmarks.feed_incremental --productos 100000 --cambios 0.001
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.fichas_producto import cambiar_feed
+from benchmarks.fixtures import generar_feed_xml
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado, percentil
+
+SUITE = "feed_incremental"
+
+
+def cronometrar(funcion, repeticiones):
+    tiempos, resultado = [], None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return resultado, tiempos
+
+
+def diferencias(a, b, muestra):
+    """Descripción de la primera diferencia entre dos FeedIndexado (None si son equivalentes)."""
+    if list(a.productos) != list(b.productos) or a.productos != b.productos:
+        return "productos"
+    if a.textos != b.textos:
+        return "textos"
+    if a.atributos != b.atributos:
+        return "atributos"
+    if {s: set(c) for s, c in a.segmentos.items()} != {s: set(c) for s, c in b.segmentos.items()}:
+        return "segmentos"
+    for id_csv in muestra:
+        if a.buscar_clave(id_csv) != b.buscar_clave(id_csv):
+            return f"buscar_clave({id_csv!r})"
+    return None
+
+
+def clave_con_regex(feed, claves_xml, id_csv):
+    """Lo que hacía el recomendador para cada artículo del catálogo."""
+    if id_csv in feed:
+        return id_csv
+    patron = r"(^|-)" + re.escape(id_csv) + r"(-|$)"
+    for xml_key in claves_xml:
+        if re.search(patron, xml_key):
+            return xml_key
+    return None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Recarga del feed completa vs. incremental")
+    parser.add_argument("--productos", type=int, default=50000)
+    parser.add_argument("--cambios", type=float, default=0.01, help="Fracción del feed con precio cambiado")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--consultas", type=int, default=20, help="Peticiones simuladas del buscador/recomendador")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    from feed_incremental import FeedIndexado, normalizar_texto
+    from feed_xml import parsear_feed
+
+    contenido = generar_feed_xml(args.productos, args.semilla)
+    t0 = time.perf_counter()
+    feed = parsear_feed(contenido)
+    parseo_ms = (time.perf_counter() - t0) * 1000
+    feed_nuevo = cambiar_feed(feed, args.cambios, args.semilla)
+    anterior = FeedIndexado.construir(feed, "v1")
+    print(f"📄 Feed de {len(feed)} productos (parseo {parseo_ms:.0f} ms), {args.cambios:.1%} con cambios\n")
+
+    completo, t_completo = cronometrar(lambda: FeedIndexado.construir(feed_nuevo, "v2"), args.repeticiones)
+    (incremental, cambios), t_incremental = cronometrar(lambda: anterior.actualizar(feed_nuevo, "v2"),
+                                                        args.repeticiones)
+    print(f"Cambios detectados: {len(cambios['altas'])} altas, {len(cambios['bajas'])} bajas, "
+          f"{len(cambios['cambios'])} cambios")
+
+    rnd = random.Random(args.semilla)
+    ids_csv = sorted({s for g_id in feed_nuevo for s in g_id.split("-") if s.isdigit()})
+    muestra = rnd.sample(ids_csv, min(2000, len(ids_csv))) + ["no-existe"]
+    error = diferencias(completo, incremental, muestra)
+    if error:
+        print(f"❌ La foto incremental no coincide con la reconstruida: {error}")
+        sys.exit(1)
+    claves_xml = list(feed_nuevo)
+    consultados = rnd.sample(ids_csv, min(50, len(ids_csv)))
+    for id_csv in consultados:
+        if clave_con_regex(feed_nuevo, claves_xml, id_csv) != incremental.buscar_clave(id_csv):
+            print(f"❌ buscar_clave({id_csv!r}) no coincide con la regex del recomendador")
+            sys.exit(1)
+    print("✅ Foto incremental idéntica a la reconstruida\n")
+
+    # Coste por petición de lo que antes se recalculaba sobre todo el feed
+    def textos_antes():
+        return [(normalizar_texto(i["titulo"]), normalizar_texto(i.get("descripcion", "")))
+                for i in feed_nuevo.values()]
+
+    def textos_despues():
+        return [incremental.textos[i["id"]] for i in feed_nuevo.values()]
+
+    _, buscador_antes = cronometrar(textos_antes, args.consultas)
+    _, buscador_despues = cronometrar(textos_despues, args.consultas)
+    _, recomendador_antes = cronometrar(
+        lambda: [clave_con_regex(feed_nuevo, claves_xml, i) for i in consultados[:10]], args.consultas)
+    _, recomendador_despues = cronometrar(
+        lambda: [incremental.buscar_clave(i) for i in consultados[:10]], args.consultas)
+
+    resumen = {
+        "recarga": {"parseo_ms": parseo_ms, "completa_p50_ms": percentil(t_completo, 50),
+                    "incremental_p50_ms": percentil(t_incremental, 50),
+                    "cambios_aplicados": sum(len(v) for v in cambios.values())},
+        "peticion": {"buscador_antes_p50_ms": percentil(buscador_antes, 50),
+                     "buscador_despues_p50_ms": percentil(buscador_despues, 50),
+                     "recomendador_antes_p50_ms": percentil(recomendador_antes, 50),
+                     "recomendador_despues_p50_ms": percentil(recomendador_despues, 50)},
+    }
+    r = resumen["recarga"]
+    print(f"{'índices del feed':<30}{'p50 ms':>10}")
+    print(f"{'reconstrucción completa':<30}{r['completa_p50_ms']:>10.1f}")
+    print(f"{'incremental':<30}{r['incremental_p50_ms']:>10.1f}")
+    p = resumen["peticion"]
+    print(f"\n{'por petición':<30}{'antes ms':>10}{'ahora ms':>10}")
+    print(f"{'buscador (textos)':<30}{p['buscador_antes_p50_ms']:>10.1f}{p['buscador_despues_p50_ms']:>10.1f}")
+    print(f"{'recomendador (10 artículos)':<30}{p['recomendador_antes_p50_ms']:>10.1f}"
+          f"{p['recomendador_despues_p50_ms']:>10.3f}")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"incremental_p50_ms": False, "completa_p50_ms": False,
+                                                         "buscador_despues_p50_ms": False,
+                                                         "recomendador_despues_p50_ms": False})
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,103 @@
+"""
+Herramienta FICHA_PRODUCTO: ficha entera vs. solo las secciones de la pregunta.
+
+Sobre la ficha sintética de fixtures.generar_html_ficha (pasada por
+parser_markdown, como en logica_consultar_producto_actual) y un juego de
+preguntas típicas de página de producto, mide para cada pregunta:
+- tokens que recibe el modelo (ficha entera / secciones seleccionadas);
+- acierto: el texto enviado contiene el dato que responde la pregunta;
+- tiempo de la selección (sin el parseo del HTML, que es el mismo).
+
+Uso (desde src/):
+    python -m benchmarks.ficha_secciones
+    python -m benchmarks.ficha_secciones --opiniones 100 --presupuesto 300
+"""
+import argparse
+import os
+import sys
+import time
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.fixtures import generar_html_ficha
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado, percentil
+
+SUITE = "ficha_secciones"
+
+# (pregunta, fragmentos que debe contener lo enviado para poder responderla)
+PREGUNTAS_FICHA = [
+    ("¿Qué plazo de entrega tiene?", ["24/48h"]),
+    ("¿Cuánto tarda en llegar?", ["24/48h"]),
+    ("¿Cuánto cuesta en 150x190?", ["| 150x190 |"]),
+    ("¿Qué precio tiene la medida 90x190?", ["| 90x190 |"]),
+    ("¿Tenéis la medida 160x200?", ["| 160x200 |"]),
+    ("¿De qué es el núcleo?", ["Muelles ensacados"]),
+    ("¿Qué grosor tiene?", ["24 cm"]),
+    ("¿Es firme o blando?", ["| Firmeza | Media |"]),
+    ("¿Tiene una cara o dos?", ["Una cara"]),
+    ("¿Qué opinan los clientes?", ["Cliente 0"]),
+    ("¿Tiene buenas valoraciones?", ["Cliente 0"]),
+    ("¿Lleva viscoelástica?", ["viscoelástica"]),
+    ("¿El envío es gratis?", ["Entrega gratuita"]),
+    ("¿Me lo recomiendas?", ["Colchón Juvenil First Sac"]),
+    ("¿Cómo es por el lateral?", ["[FOTO:"]),
+]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Ficha de producto entera vs. secciones de la pregunta")
+    parser.add_argument("--medidas", type=int, default=24)
+    parser.add_argument("--opiniones", type=int, default=60)
+    parser.add_argument("--presupuesto", type=int, default=None, help="Tokens (por defecto FICHA_PRESUPUESTO_TOKENS)")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    import ficha_secciones
+    from parser_markdown import parsear_html_a_markdown
+    from rag.src.contexto import contar_tokens
+
+    presupuesto = args.presupuesto or ficha_secciones.PRESUPUESTO_TOKENS
+    markdown = parsear_html_a_markdown(generar_html_ficha(args.medidas, args.opiniones))
+    ficha_secciones.seleccionar_secciones(markdown, "calentar")
+    tokens_ficha = contar_tokens(markdown)
+    print(f"📄 Ficha de {tokens_ficha} tokens ({args.medidas} medidas, {args.opiniones} opiniones), "
+          f"presupuesto {presupuesto}, {len(PREGUNTAS_FICHA)} preguntas\n")
+
+    tokens, aciertos, tiempos = [], 0, []
+    print(f"{'pregunta':<40}{'tokens':>8}{'acierto':>9}  secciones")
+    for pregunta, fragmentos in PREGUNTAS_FICHA:
+        t0 = time.perf_counter()
+        texto, informe = ficha_secciones.seleccionar_secciones(markdown, pregunta, presupuesto)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+        acierto = all(f in texto for f in fragmentos)
+        tokens.append(informe["tokens_enviados"])
+        aciertos += acierto
+        print(f"{pregunta:<40}{informe['tokens_enviados']:>8}{'sí' if acierto else 'NO':>9}  "
+              f"{', '.join(informe['etiquetas'])}")
+
+    n = len(PREGUNTAS_FICHA)
+    resumen = {
+        "ficha_entera": {"tokens_medios": tokens_ficha, "acierto": 1.0, "seleccion_p50_ms": 0.0},
+        "secciones": {"tokens_medios": sum(tokens) / n, "acierto": aciertos / n,
+                      "seleccion_p50_ms": percentil(tiempos, 50)},
+    }
+    print(f"\n{'modo':<14}{'tokens medios':>15}{'acierto':>10}{'selección p50 ms':>18}")
+    for modo, r in resumen.items():
+        print(f"{modo:<14}{r['tokens_medios']:>15.0f}{r['acierto']:>10.0%}{r['seleccion_p50_ms']:>18.2f}")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"tokens_medios": False, "acierto": True})
+
+
+if __name__ == "__main__":
+    main_cli()
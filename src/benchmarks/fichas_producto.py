@@ -0,0 +1,152 @@
+"""
+FICHA_PRODUCTO sin HTML del cliente: descarga en la petición vs. almacén de fichas.
+
+Sobre un feed sintético (fixtures.generar_feed_xml) cuyas páginas se sirven
+con fixtures.generar_html_ficha tras una latencia simulada (sin red):
+1. rastreo completo con fichas_producto.rastrear a un SQLite temporal;
+2. rastreo incremental tras cambiar precios, quitar y añadir productos:
+   solo deben descargarse los artículos cambiados o nuevos;
+3. pasada sin cambios: ninguna descarga;
+4. coste en la petición: descarga + parser_markdown (lo que hacía la
+   ruta de URL_FALLBACK_TEST) vs. AlmacenFichas.obtener en solo lectura.
+
+Uso (desde src/):
+    python -m benchmarks.fichas_producto
+    python -m benchmarks.fichas_producto --productos 2000 --latencia-ms 80 --hilos 8
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.fixtures import generar_feed_xml, generar_html_ficha
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado, percentil
+
+SUITE = "fichas_producto"
+VARIANTES_HTML = 8
+
+
+def descargador(latencia_s, paginas):
+    """Descarga simulada: espera la latencia y devuelve una de las fichas sintéticas según el link."""
+    contador = {"descargas": 0}
+
+    def descargar(url):
+        contador["descargas"] += 1
+        time.sleep(latencia_s)
+        return paginas[zlib.crc32(url.encode()) % len(paginas)]
+
+    return descargar, contador
+
+
+def cambiar_feed(feed, fraccion, semilla):
+    """Copia del feed con precios cambiados, productos quitados y productos nuevos."""
+    rnd = random.Random(semilla)
+    nuevo = {g_id: dict(item) for g_id, item in feed.items()}
+    ids = list(nuevo)
+    n = max(1, int(len(ids) * fraccion))
+    for g_id in rnd.sample(ids, n):
+        nuevo[g_id]["precio"] = f"{rnd.uniform(30, 1500):.2f} EUR"
+    for g_id in rnd.sample(ids, n // 2):
+        del nuevo[g_id]
+    for i in range(n // 2):
+        g_id = str(90000 + i)
+        nuevo[g_id] = {"id": g_id, "titulo": f"Colchón nuevo {i}", "descripcion": "", "precio": "399.00 EUR",
+                       "link": f"https://www.colchones.es/colchones/nuevo-{i}/", "imagen": ""}
+    return nuevo
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Ficha de producto descargada en la petición vs. almacén de fichas")
+    parser.add_argument("--productos", type=int, default=1000)
+    parser.add_argument("--latencia-ms", type=float, default=50, help="Latencia simulada de cada descarga")
+    parser.add_argument("--hilos", type=int, default=8)
+    parser.add_argument("--cambios", type=float, default=0.05, help="Fracción del feed con precio cambiado")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    from feed_xml import parsear_feed
+    from fichas_producto import AlmacenFichas, articulo_de, productos_por_articulo, rastrear
+    from parser_markdown import parsear_html_a_markdown
+
+    feed = parsear_feed(generar_feed_xml(args.productos, args.semilla))
+    paginas = [generar_html_ficha(24, 60, semilla) for semilla in range(VARIANTES_HTML)]
+    latencia_s = args.latencia_ms / 1000
+    articulos = list(productos_por_articulo(feed))
+    print(f"📄 Feed de {len(feed)} productos ({len(articulos)} artículos), descarga simulada de "
+          f"{args.latencia_ms:.0f} ms, {args.hilos} hilos\n")
+
+    directorio = tempfile.mkdtemp(prefix="fichas_")
+    try:
+        ruta_bd = os.path.join(directorio, "fichas_producto.sqlite")
+        almacen = AlmacenFichas(ruta_bd)
+        feed_cambiado = cambiar_feed(feed, args.cambios, args.semilla)
+        pasadas = {}
+        for nombre, feed_pasada in (("completo", feed), ("incremental", feed_cambiado),
+                                    ("sin_cambios", feed_cambiado)):
+            descargar, contador = descargador(latencia_s, paginas)
+            t0 = time.perf_counter()
+            resumen_pasada = rastrear(feed_pasada, almacen, hilos=args.hilos, descargar=descargar)
+            pasadas[nombre] = {"segundos": time.perf_counter() - t0, "descargas": contador["descargas"],
+                               "borradas": resumen_pasada["borradas"], "errores": resumen_pasada["errores"]}
+
+        print(f"{'rastreo':<14}{'segundos':>10}{'descargas':>11}{'borradas':>10}{'errores':>9}")
+        for nombre, p in pasadas.items():
+            print(f"{nombre:<14}{p['segundos']:>10.2f}{p['descargas']:>11}{p['borradas']:>10}{p['errores']:>9}")
+        if pasadas["sin_cambios"]["descargas"]:
+            print("❌ La pasada sin cambios en el feed ha vuelto a descargar fichas")
+            sys.exit(1)
+
+        # Coste en la petición
+        rnd = random.Random(args.semilla)
+        en_almacen = [articulo_de(g_id) for g_id in feed_cambiado]
+        descargar, _ = descargador(latencia_s, paginas)
+        antes, despues, encontradas = [], [], 0
+        lector = AlmacenFichas(ruta_bd, solo_lectura=True)
+        for _ in range(args.consultas):
+            articulo = rnd.choice(en_almacen)
+            t0 = time.perf_counter()
+            parsear_html_a_markdown(descargar(f"https://www.colchones.es/producto-{articulo}/"))
+            antes.append((time.perf_counter() - t0) * 1000)
+            t0 = time.perf_counter()
+            encontradas += lector.obtener(int(articulo)) is not None
+            despues.append((time.perf_counter() - t0) * 1000)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    resumen = {
+        "descarga_en_peticion": {"consulta_p50_ms": percentil(antes, 50), "consulta_p95_ms": percentil(antes, 95),
+                                 "encontradas": 1.0},
+        "almacen": {"consulta_p50_ms": percentil(despues, 50), "consulta_p95_ms": percentil(despues, 95),
+                    "encontradas": encontradas / args.consultas},
+        "rastreo": {f"{nombre}_{k}": v for nombre, p in pasadas.items() for k, v in p.items()},
+    }
+    print(f"\n{'petición':<22}{'p50 ms':>10}{'p95 ms':>10}{'encontradas':>13}")
+    for modo in ("descarga_en_peticion", "almacen"):
+        r = resumen[modo]
+        print(f"{modo:<22}{r['consulta_p50_ms']:>10.3f}{r['consulta_p95_ms']:>10.3f}{r['encontradas']:>13.0%}")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"consulta_p50_ms": False, "consulta_p95_ms": False,
+                                                         "encontradas": True, "incremental_descargas": False})
+
+
+if __name__ == "__main__":
+    main_cli()
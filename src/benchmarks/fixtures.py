@@ -0,0 +1,253 @@
+"""
+Generadores de datos sintéticos para los benchmarks.
+
+Todo es determinista a partir de `semilla` para que dos ejecuciones en
+commits distintos midan exactamente la misma carga.
+"""
+import random
+from xml.sax.saxutils import escape
+
+CATEGORIAS = {
+    "Colchón": ["muelles ensacados", "viscoelástica", "látex", "espumación HR", "muelles"],
+    "Almohada": ["viscoelástica", "fibra", "látex", "plumón"],
+    "Canapé": ["abatible", "madera", "tapizado", "apertura lateral"],
+    "Somier": ["láminas", "articulado", "multiláminas"],
+    "Funda nórdica": ["algodón", "percal", "microfibra"],
+    "Protector de colchón": ["impermeable", "transpirable", "tencel"],
+}
+MARCAS = ["Colchones.es", "Pikolín", "Sonpura", "Flex", "Dormitienda", "Natural Spring"]
+MEDIDAS = ["80x180", "90x190", "105x190", "135x190", "150x190", "150x200", "160x200"]
+ADJETIVOS = ["Box", "Smart", "Premium", "Confort", "Fresh", "Nova", "Natural", "XXL", "Plus"]
+
+
+def generar_productos(n, semilla=0, ids_base=None):
+    """Lista de dicts con la misma forma que datos_sistema["feed_xml"] (valores del feed)."""
+    rnd = random.Random(semilla)
+    ids_base = list(ids_base or [])
+    productos = []
+    for i in range(n):
+        categoria = rnd.choice(list(CATEGORIAS))
+        material = rnd.choice(CATEGORIAS[categoria])
+        medida = rnd.choice(MEDIDAS)
+        base = ids_base[i] if i < len(ids_base) else 10000 + i
+        # Algunos ids del feed llevan la medida (ej: "1048-150x190"), como el real
+        g_id = f"{base}-{medida}" if rnd.random() < 0.5 else str(base)
+        grosor = rnd.choice([18, 22, 24, 26, 27, 28, 30, 32])
+        titulo = f"\n\t\t{categoria} {rnd.choice(MARCAS)} {rnd.choice(ADJETIVOS)} - {medida.upper()}, {material} \n\t"
+        descripcion = (
+            f"{categoria} de {material} de {grosor} cm de grosor. "
+            f"Firmeza {rnd.choice(['media', 'media-alta', 'alta', 'baja'])}, "
+            f"{rnd.choice(['transpirable', 'antiácaros', 'termorregulable', 'hipoalergénico'])} "
+            f"y {rnd.choice(['una cara útil', 'doble cara', 'desenfundable'])}."
+        )
+        productos.append({
+            "id": g_id,
+            "titulo": titulo,
+            "descripcion": descripcion,
+            "precio": f"{rnd.uniform(30, 1500):.2f} EUR",
+            "link": f"\n\t\t\t\thttps://www.colchones.es/{categoria.lower().replace(' ', '-')}/producto-{base}/\n\t\t",
+            "imagen": f"\n\t\t\thttps://www.colchones.es/fotos/feed/producto-{base}_5.jpg\n\t\t",
+        })
+    return productos
+
+
+def generar_feed_xml(n, semilla=0, ids_base=None):
+    """Feed de Google Merchant (bytes) con el formato de gmerchantcenter_chati.xml."""
+    partes = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss xmlns:g="http://base.google.com/ns/1.0" version="2.0"><channel>'
+        '<title>colchones.es</title>'
+    ]
+    for p in generar_productos(n, semilla, ids_base):
+        partes.append(
+            "<item>"
+            f"<g:id>{escape(p['id'])}</g:id>"
+            f"<title>{escape(p['titulo'])}</title>"
+            f"<description>{escape(p['descripcion'])}</description>"
+            f"<g:price>{escape(p['precio'])}</g:price>"
+            f"<link>{escape(p['link'])}</link>"
+            f"<g:image_link>{escape(p['imagen'])}</g:image_link>"
+            "</item>"
+        )
+    partes.append("</channel></rss>")
+    return "".join(partes).encode("utf-8")
+
+
+NUCLEOS = ["muelles Ensacados", "espumación HR", "muelles", "látex"]
+GROSORES = ["18 cm", "22 cm", "24 cm", "26 cm", "27 cm", "28 cm", "30 cm", "31 cm", "32,5 cm"]
+COLUMNAS_CATALOGO = ["cod_pedido", "cod_articulo", "nombre_articulo", "nucleo", "grosor", "firmeza", "sexo",
+                     "altura", "peso", "imc", "valoracion", "molestias_antes", "molestias_despues", "duerme_en_pareja"]
+
+
+def generar_filas_encuestas(n_articulos, filas_por_articulo=5, semilla=0):
+    """Filas con el formato de encuestas_limpio.csv (altura en metros, como el real)."""
+    rnd = random.Random(semilla)
+    filas = []
+    for a in range(n_articulos):
+        nucleo, grosor, firmeza = rnd.choice(NUCLEOS), rnd.choice(GROSORES), rnd.randint(1, 5)
+        for _ in range(filas_por_articulo):
+            altura = rnd.uniform(1.50, 2.00)
+            peso = rnd.uniform(45, 130)
+            antes = int(rnd.random() < 0.3)
+            filas.append([
+                rnd.randint(1000, 99999), 100 + a, f"Modelo {100 + a}", nucleo, grosor, firmeza,
+                rnd.choice(["mujer", "hombre"]), round(altura, 3), round(peso, 3), round(peso / altura ** 2, 3),
+                float(rnd.randint(1, 5)), antes, int(antes and rnd.random() < 0.4), int(rnd.random() < 0.6),
+            ])
+    return filas
+
+
+def generar_catalogo_csv(ruta, n_articulos, filas_por_articulo=5, semilla=0):
+    """Escribe un CSV con el formato de encuestas_limpio.csv y devuelve la ruta."""
+    import csv
+
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(COLUMNAS_CATALOGO)
+        w.writerows(generar_filas_encuestas(n_articulos, filas_por_articulo, semilla))
+    return ruta
+
+
+def generar_encuestas_brutas_csv(ruta, n_filas, n_articulos=300, semilla=0):
+    """CSV con el formato de modulos/encuestas_colchones.csv (una fila por pedido,
+    columnas MUJER1/HOMBRE1, decimales con coma, huecos y "-").
+
+    Vectorizado con NumPy para poder generar millones de filas en segundos.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(semilla)
+    n = n_filas
+    articulo = rng.integers(0, n_articulos, n)
+    nucleos = np.array(NUCLEOS, dtype=object)[rng.integers(0, len(NUCLEOS), n_articulos)]
+    grosores = np.array(GROSORES, dtype=object)[rng.integers(0, len(GROSORES), n_articulos)]
+    firmezas = rng.integers(1, 6, n_articulos)
+
+    df = pd.DataFrame({
+        "COD PEDIDO": rng.integers(1000, 99999, n),
+        "COD ARTICULO": 100 + articulo,
+        "NOMBRE ARTICULO": np.char.add("Modelo ", (100 + articulo).astype(str)),
+        "NUCLEO": nucleos[articulo],
+        "GROSOR": grosores[articulo],
+        "FIRMEZA": firmezas[articulo],
+    })
+    # Reparto de pedidos: 45% pareja, 30% solo mujer, 25% solo hombre
+    tipo = rng.random(n)
+    presentes = {"MUJER1": tipo < 0.75, "HOMBRE1": tipo >= 0.30}
+    respuestas = np.array(["si", "no", "-", "Sí", ""], dtype=object)
+    for prefijo, presente in presentes.items():
+        altura = rng.uniform(1.50, 2.00, n).round(2)
+        peso = rng.integers(45, 130, n)
+        valoracion = rng.integers(1, 6, n).astype(str).astype(object)
+        valoracion[rng.random(n) < 0.03] = ""
+        columnas = {
+            f"ID {prefijo}": rng.integers(1, 9999, n).astype(str).astype(object),
+            f"{prefijo} altura": np.char.replace(altura.astype(str), ".", ",").astype(object),
+            f"{prefijo} peso": peso.astype(str).astype(object),
+            f"{prefijo} imc": (peso / altura ** 2).round().astype(int).astype(str).astype(object),
+            f"{prefijo} VALORACION": valoracion,
+            f"{prefijo} MOLESTIAS ANTES": respuestas[rng.choice(5, n, p=[0.3, 0.5, 0.1, 0.05, 0.05])],
+            f"{prefijo} MOLESTIAS DESPUES": respuestas[rng.choice(5, n, p=[0.1, 0.7, 0.1, 0.05, 0.05])],
+        }
+        for nombre, valores in columnas.items():
+            valores[~presente] = ""
+            df[nombre] = valores
+    for nombre in ["ID NIÑO", "NIÑO/A altura", "NIÑO/A peso", "NIÑO/A imc", "NIÑO/A valoracion"]:
+        df[nombre] = ""
+    df.to_csv(ruta, index=False)
+    return ruta
+
+
+def generar_html_ficha(num_medidas=8, num_opiniones=20, semilla=0):
+    """HTML con la estructura de una ficha de producto real (#centro, tablas, listas, fotos)."""
+    rnd = random.Random(semilla)
+    filas_medidas = "".join(
+        f"<tr><td>{m}</td><td>{rnd.uniform(200, 900):.2f} €</td><td>{rnd.choice(['24/48h', '5-7 días', '10-15 días'])}</td></tr>"
+        for m in (MEDIDAS * (num_medidas // len(MEDIDAS) + 1))[:num_medidas]
+    )
+    opiniones = "".join(
+        f"<li><strong>Cliente {i}</strong> <img src='/img/star.png'> Muy buen colchón, "
+        f"{rnd.choice(['descanso mucho mejor', 'algo firme al principio', 'llegó rápido', 'buena relación calidad-precio'])}.</li>"
+        for i in range(num_opiniones)
+    )
+    return f"""<!DOCTYPE html><html><head><title>Colchón</title>
+<script>var tracking = {{"a": 1}};</script><style>.x{{color:red}}</style></head>
+<body><nav><a href="/">Inicio</a> &gt; <a href="/colchones/">Colchones</a></nav>
+<div id="centro">
+<h1>Colchón Juvenil First Sac</h1>
+<p>Colchón de <b>muelles ensacados</b> con acolchado de viscoelástica y fibras.</p>
+<img src="/fotos/colchon-first-sac_1.jpg" alt="Colchón First Sac vista lateral">
+<img src="/img/icon-envio.png" alt="icono">
+<h2>Características</h2>
+<table><tr><th>Característica</th><th>Valor</th></tr>
+<tr><td>Núcleo</td><td>Muelles ensacados</td></tr><tr><td>Grosor</td><td>24 cm</td></tr>
+<tr><td>Firmeza</td><td>Media</td></tr><tr><td>Cara útil</td><td>Una cara</td></tr></table>
+<h2>Precios por medida</h2>
+<table><tr><th>Medida</th><th>Precio</th><th>Plazo de entrega</th></tr>{filas_medidas}</table>
+<h2>Plazo de entrega</h2><p>Entrega gratuita en península en 24/48h laborables para medidas estándar.</p>
+<h3>Opiniones</h3><ul>{opiniones}</ul>
+<form><input type="text" name="email"><button>Enviar</button></form>
+</div><footer>colchones.es</footer></body></html>"""
+
+
+# Fragmentos raros que aparecen en el HTML del CMS (etiquetas sin cerrar, entidades dobles, comentarios...)
+RAREZAS_HTML = [
+    "<p>Párrafo sin cerrar<p>Otro párrafo",
+    "<ul><li>Uno<li>Dos<li>Tres</ul>",
+    "<p>Lista dentro de párrafo<ul><li>Uno</li></ul> y sigue</p>",
+    "Texto<br>con<br/>saltos</br> de línea<br><br>",
+    "<div>  <span>   </span>  </div><b> </b>\t<i>\n</i>",
+    "<table><tr><td>Medida</td><td>90x190</td><tr><td>Precio</td><td>199 €</td></table>",
+    "<!-- comentario <p>oculto</p> --><p>Visible</p>",
+    "<script>var x = '<p>no</p>';</script><style>p{color:red}</style><noscript>Sin JS</noscript>",
+    "<template><p>Plantilla</p></template><ruby>漢<rt>kan</rt></ruby>",
+    "<pre>  texto   preformateado  </pre><textarea>   </textarea>",
+    "&amp;amp; &amp;lt;b&amp;gt; &amp;#128; &amp;#x20AC; &amp;copy &amp;noexiste; &amp;#0; 5 &lt; 6",
+    "</div></p>cierres huérfanos</li>",
+    "<h2>Título</h2><h3>Subtítulo<h4>Anidado</h3>fuera</h4>",
+    "<![CDATA[dato cdata]]><?php echo 1; ?><!DOCTYPE html>",
+    "<img src='a.jpg' alt='Foto'></img><hr><input value='x'>",
+    "<p>Comillas “tipográficas”, guiones – y € con acentos: ñ á é í ó ú ü</p>",
+]
+
+
+def generar_html_cms(n_paginas, semilla=0):
+    """Páginas con la forma de textoPagina de obtener_embeddings: módulos concatenados por GROUP_CONCAT.
+
+    Una de cada tres va con doble codificación (UTF-8 leído como latin-1), como sale a veces de MySQL.
+    """
+    rnd = random.Random(semilla)
+    paginas = []
+    for i in range(n_paginas):
+        modulos = []
+        for m in range(rnd.randint(2, 6)):
+            producto = f"{rnd.choice(list(CATEGORIAS))} {rnd.choice(ADJETIVOS)}"
+            partes = [f"<h2>{producto} {rnd.choice(MARCAS)}</h2>"]
+            for _ in range(rnd.randint(1, 4)):
+                partes.append(f"<p>El {producto.lower()} de {rnd.choice(MEDIDAS)} tiene envío en "
+                              f"{rnd.choice(['24/48h', '5-7 días'])} y <strong>100 noches</strong> de prueba.</p>")
+            partes.append("<ul>" + "".join(f"<li>{rnd.choice(NUCLEOS)} de {rnd.choice(GROSORES)}</li>"
+                                          for _ in range(rnd.randint(0, 5))) + "</ul>")
+            if rnd.random() < 0.5:
+                partes.append(rnd.choice(RAREZAS_HTML))
+            modulos.append("".join(partes))
+        html = f"Página {i} " + ",".join(modulos) + " \n"
+        if i % 3 == 0:
+            html = html.encode("utf-8").decode("latin-1")
+        paginas.append(html)
+    return paginas
+
+
+def generar_historial(n_mensajes, semilla=0):
+    """Historial en el formato de recuperar_historial (lista de dicts role/content)."""
+    rnd = random.Random(semilla)
+    frases_usuario = ["Hola", "Peso 80 kg y mido 175", "¿Qué plazo de entrega tiene?",
+                      "Busco una almohada visco", "¿Tenéis canapés abatibles de 150x190?"]
+    historial = []
+    for i in range(n_mensajes):
+        if i % 2 == 0:
+            historial.append({"role": "user", "content": rnd.choice(frases_usuario)})
+        else:
+            historial.append({"role": "assistant", "content": "<p>Te recomiendo " + "el colchón Box XXL. " * rnd.randint(1, 20) + "</p>"})
+    return historial
@@ -0,0 +1,182 @@
+"""
+Memoria por worker de uvicorn con y sin datos compartidos (DATOS_COMPARTIDOS).
+
+Arranca N workers de main.py (un proceso de uvicorn por puerto, igual que
+los que lanza `uvicorn --workers N`) sobre un catálogo, un modelo y un
+feed XML sintéticos, les manda unas peticiones de /chat (buscador y
+recomendador, para que recorran el feed y el modelo) y lee de
+/proc/<pid>/smaps_rollup:
+- RSS: páginas residentes del proceso (las compartidas cuentan en todos).
+- PSS: cada página compartida se reparte entre los procesos que la usan;
+  la suma de PSS es la memoria real que ocupan los N workers.
+- USS: páginas privadas del proceso (lo que se libera al matarlo).
+
+Modo "off": cada worker descarga su feed y carga catálogo y modelo.
+Modo "on": se publica una generación con datos_compartidos.py y los
+workers se enganchan a ella en solo lectura.
+
+Uso (desde src/):
+    python -m benchmarks.memoria_workers --workers 4 --productos-feed 50000
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.arranque import entorno, preparar_trabajo
+from benchmarks.fake_openai import ESCENARIO_DEFECTO, ConfigFalsa, arrancar_servidor
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado
+
+SUITE = "memoria_workers"
+CLAVE_API = "clave-benchmark"
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def memoria(pid):
+    """{rss_mb, pss_mb, uss_mb} de /proc/<pid>/smaps_rollup."""
+    campos = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) == 3 and partes[2] == "kB":
+                campos[partes[0].rstrip(":")] = int(partes[1]) / 1024
+    return {
+        "rss_mb": campos["Rss"],
+        "pss_mb": campos["Pss"],
+        "uss_mb": campos["Private_Clean"] + campos["Private_Dirty"],
+    }
+
+
+def _peticion(puerto, ruta, cuerpo=None, timeout=60):
+    datos = json.dumps(cuerpo).encode() if cuerpo is not None else None
+    req = urllib.request.Request(f"http://127.0.0.1:{puerto}{ruta}", data=datos,
+                                 headers={"Content-Type": "application/json", "x-api-key": CLAVE_API})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+    except OSError:
+        return None, None
+
+
+def esperar_calentado(puerto, timeout_s=180):
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout_s:
+        _, datos = _peticion(puerto, "/ready")
+        if datos and all(c["estado"] in ("listo", "error") for c in datos["componentes"].values()):
+            return datos
+        time.sleep(0.1)
+    raise TimeoutError(f"El worker del puerto {puerto} no terminó de calentar")
+
+
+def medir_modo(trabajo, env, n_workers, peticiones):
+    procesos = []
+    try:
+        for _ in range(n_workers):
+            puerto = puerto_libre()
+            procesos.append((puerto, subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(puerto),
+                 "--log-level", "warning"],
+                cwd=trabajo, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)))
+        estados = [esperar_calentado(puerto) for puerto, _ in procesos]
+        escenario = [e for e in ESCENARIO_DEFECTO if e["intencion"] in ("BUSCADOR", "RECOMENDADOR")]
+        for (puerto, _), estado in zip(procesos, estados):
+            fallidos = {n: c["error"] for n, c in estado["componentes"].items() if c["estado"] == "error"}
+            if fallidos:
+                print(f"⚠️ Worker {puerto}: {fallidos}")
+            for i in range(peticiones):
+                _peticion(puerto, "/chat", {"user_id": f"bench-{i}", "message": escenario[i % len(escenario)]["mensaje"]})
+        return [memoria(proceso.pid) for _, proceso in procesos]
+    finally:
+        for _, proceso in procesos:
+            proceso.terminate()
+        for _, proceso in procesos:
+            proceso.wait()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="RSS/PSS por worker con y sin datos compartidos")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--productos-feed", type=int, default=50000)
+    parser.add_argument("--articulos", type=int, default=300)
+    parser.add_argument("--arboles", type=int, default=300)
+    parser.add_argument("--peticiones", type=int, default=8, help="Peticiones de /chat por worker antes de medir")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    trabajo = tempfile.mkdtemp(prefix="memoria_workers_")
+    try:
+        print(f"⏳ Preparando catálogo ({args.articulos} artículos, {args.arboles} árboles) "
+              f"y feed de {args.productos_feed} productos…")
+        ids = preparar_trabajo(trabajo, args.articulos, args.arboles)
+        cfg = ConfigFalsa(productos_feed=args.productos_feed, ids_feed=ids, latencia_router_ms=1,
+                          latencia_tools_ms=1, latencia_final_ms=1, latencia_embeddings_ms=1)
+        _, url = arrancar_servidor(cfg)
+        env = entorno(url)
+        env["MI_CLAVE_SECRETA"] = CLAVE_API
+
+        resultados = {}
+        print(f"⏳ Modo off: {args.workers} workers con sus propios datos…")
+        resultados["off"] = medir_modo(trabajo, env, args.workers, args.peticiones)
+
+        print("⏳ Publicando generación compartida…")
+        from datos_compartidos import publicar_generacion
+        from feed_xml import descargar_feed
+        raiz = os.path.join(trabajo, "compartido")
+        info = publicar_generacion(raiz, trabajo, descargar_feed(env["XML_URL"]))
+        print(f"   {info['nombre']} ({info['productos']} productos)")
+        print(f"⏳ Modo on: {args.workers} workers enganchados a la generación…")
+        resultados["on"] = medir_modo(trabajo, dict(env, DATOS_COMPARTIDOS=raiz), args.workers, args.peticiones)
+    finally:
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    resumen = {}
+    print(f"\n{'modo':<6}{'worker':>7}{'RSS MB':>10}{'PSS MB':>10}{'USS MB':>10}")
+    for modo, medidas in resultados.items():
+        for i, m in enumerate(medidas):
+            print(f"{modo:<6}{i:>7}{m['rss_mb']:>10.1f}{m['pss_mb']:>10.1f}{m['uss_mb']:>10.1f}")
+        n = len(medidas)
+        resumen[modo] = {
+            "rss_medio_mb": sum(m["rss_mb"] for m in medidas) / n,
+            "uss_medio_mb": sum(m["uss_mb"] for m in medidas) / n,
+            "pss_total_mb": sum(m["pss_mb"] for m in medidas),
+        }
+    print(f"\n{'modo':<6}{'RSS medio':>12}{'USS medio':>12}{'PSS total':>12}")
+    for modo, r in resumen.items():
+        print(f"{modo:<6}{r['rss_medio_mb']:>12.1f}{r['uss_medio_mb']:>12.1f}{r['pss_total_mb']:>12.1f}")
+    ahorro = resumen["off"]["pss_total_mb"] - resumen["on"]["pss_total_mb"]
+    print(f"\nAhorro con datos compartidos: {ahorro:.1f} MB en {args.workers} workers "
+          f"({ahorro / args.workers:.1f} MB por worker)")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen, "workers": resultados})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"],
+                 {"rss_medio_mb": False, "uss_medio_mb": False, "pss_total_mb": False})
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,220 @@
+"""
+Microbenchmarks de los caminos calientes en Python puro.
+
+Mide ops/s y memoria pico (tracemalloc) por función sobre datos sintéticos
+escalables (benchmarks/fixtures.py):
+- logica_buscar_accesorios      -> feed de N productos (sin la caché del buscador, y aparte con ella)
+- logica_recomendar_colchon     -> catálogo CSV de M artículos + forest
+- modelo.predict                -> forest de sklearn vs. predictor compacto NumPy
+- parsear_html_a_markdown       -> ficha de producto con forma real
+- preprocesar_html              -> misma ficha
+- formatear_historial_para_router -> historial largo
+- ConversationHistory           -> persistencia (add_user y carga)
+
+Uso (desde src/):
+    python -m benchmarks.micro --escala media
+    python -m benchmarks.micro --escala grande --solo buscar --baseline resultados/micro_....json
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for ruta in (DIR_SRC, os.path.join(DIR_SRC, "rag", "src")):
+    if ruta not in sys.path:
+        sys.path.insert(0, ruta)
+
+from benchmarks import fixtures
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado
+
+SUITE = "micro"
+
+ESCALAS = {
+    "pequena": {"productos": 500, "articulos": 50, "medidas": 8, "opiniones": 20, "mensajes": 20},
+    "media": {"productos": 5000, "articulos": 200, "medidas": 30, "opiniones": 100, "mensajes": 200},
+    "grande": {"productos": 50000, "articulos": 1000, "medidas": 120, "opiniones": 500, "mensajes": 2000},
+}
+
+CONSULTAS_BUSCADOR = ["almohada visco", "canapé abatible 150x190", "somier láminas", "colchón muelles ensacados",
+                      "funda nórdica algodón", "protector impermeable"]
+PERFILES = [
+    {"sexo": "hombre", "altura": 180, "peso": 90},
+    {"sexo": "mujer", "altura": 165, "peso": 60, "duerme_en_pareja": True, "molestias_antes": True},
+    {"sexo": "hombre", "altura": 190, "peso": 120, "material_preferido": "muelles"},
+]
+
+
+def importar_main():
+    """Importa main.py sin red: feed inaccesible y directorio de trabajo temporal."""
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ["XML_URL"] = "http://127.0.0.1:9/feed.xml"
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+    return main
+
+
+def entrenar_modelo(df, arboles):
+    """Mismo pipeline que modulos/entrenar_modelos.py (satisfacción)."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
+    features = ["sexo", "altura", "peso", "imc", "duerme_en_pareja", "nucleo", "grosor", "firmeza", "molestias_antes"]
+    pre = ColumnTransformer([
+        ("cat", OneHotEncoder(handle_unknown="ignore"), ["sexo", "nucleo", "grosor"]),
+        ("num", "passthrough", ["altura", "peso", "imc", "duerme_en_pareja", "firmeza", "molestias_antes"]),
+    ])
+    modelo = Pipeline([("preprocess", pre),
+                       ("model", RandomForestRegressor(n_estimators=arboles, max_depth=12, random_state=42, n_jobs=-1))])
+    modelo.fit(df[features], df["valoracion"])
+    return modelo
+
+
+def preparar(main, p, trabajo, arboles):
+    """Devuelve {nombre: callable} con los fixtures ya construidos."""
+    import pandas as pd
+    from cache_buscador import CacheResultados
+    from conversation_history import ConversationHistory, Message
+    from parser_markdown import parsear_html_a_markdown
+    from predictor_compacto import PredictorForest, exportar_pipeline
+    from rag.src.scrap_url import preprocesar_html
+
+    ruta_csv = fixtures.generar_catalogo_csv(os.path.join(trabajo, "encuestas_limpio.csv"), p["articulos"])
+    df = pd.read_csv(ruta_csv)
+    main.datos_sistema["catalogo_csv"] = df.drop_duplicates(subset=["cod_articulo"]).copy()
+    modelo_sklearn = entrenar_modelo(df, arboles)
+    ruta_npz = os.path.join(trabajo, "modelo_satisfaccion.npz")
+    exportar_pipeline(modelo_sklearn, ruta_npz)
+    modelo_compacto = PredictorForest.cargar(ruta_npz)
+    main.datos_sistema["modelo"] = modelo_compacto
+    ids = sorted(df["cod_articulo"].unique())
+    main.datos_sistema["feed_xml"] = {
+        item["id"]: item for item in fixtures.generar_productos(p["productos"], ids_base=ids)
+    }
+    # Datos inyectados: que los handlers no intenten cargar el CSV real ni descargar el feed
+    main.ciclo.marcar_listo("catalogo")
+    main.ciclo.marcar_listo("feed_xml")
+
+    html = fixtures.generar_html_ficha(p["medidas"], p["opiniones"])
+    historial = fixtures.generar_historial(p["mensajes"])
+
+    features = ["sexo", "altura", "peso", "imc", "duerme_en_pareja", "nucleo", "grosor", "firmeza", "molestias_antes"]
+    X_catalogo = main.datos_sistema["catalogo_csv"][features]
+
+    ruta_hist = os.path.join(trabajo, "historial.json")
+    ch = ConversationHistory(persist_path=ruta_hist)
+    ch.messages = [Message(**m) for m in historial]
+    ch._save()
+
+    estado = {"i": 0}
+
+    def siguiente(lista):
+        estado["i"] += 1
+        return lista[estado["i"] % len(lista)]
+
+    # Las 6 consultas se repiten: con la caché, desde la segunda pasada todo serían aciertos
+    sin_cache, con_cache = CacheResultados(0), CacheResultados(main.BUSCADOR_CACHE_ENTRADAS)
+
+    def buscar(cache):
+        main.cache_buscador = cache
+        return main.logica_buscar_accesorios({"keywords": siguiente(CONSULTAS_BUSCADOR)}, "bench")
+
+    def add_user():
+        ch.add_user("¿Tenéis este colchón en 135x190?")
+        ch.messages.pop()
+
+    return {
+        "logica_buscar_accesorios": lambda: buscar(sin_cache),
+        "logica_buscar_accesorios (caché)": lambda: buscar(con_cache),
+        "logica_recomendar_colchon": lambda: main.logica_recomendar_colchon(siguiente(PERFILES), "bench"),
+        "modelo.predict (sklearn)": lambda: modelo_sklearn.predict(X_catalogo),
+        "modelo.predict (compacto)": lambda: modelo_compacto.predict(X_catalogo),
+        "parsear_html_a_markdown": lambda: parsear_html_a_markdown(html),
+        "preprocesar_html": lambda: preprocesar_html(html),
+        "formatear_historial_para_router": lambda: main.formatear_historial_para_router(historial, ultimos_n=3),
+        "ConversationHistory.add_user": add_user,
+        "ConversationHistory.cargar": lambda: ConversationHistory(persist_path=ruta_hist),
+    }
+
+
+def medir(fn, tiempo_min=1.0, reps_min=5):
+    """ops/s (bucle hasta tiempo_min) y memoria pico de una llamada en KB."""
+    sumidero = io.StringIO()
+    with contextlib.redirect_stdout(sumidero):
+        fn()  # calentamiento
+        reps, t0 = 0, time.perf_counter()
+        while reps < reps_min or time.perf_counter() - t0 < tiempo_min:
+            fn()
+            reps += 1
+            sumidero.seek(0)
+            sumidero.truncate()
+        total = time.perf_counter() - t0
+
+        tracemalloc.start()
+        fn()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"ops_s": reps / total, "us_op": total / reps * 1e6, "mem_pico_kb": pico / 1024, "reps": reps}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de funciones CPU-bound")
+    parser.add_argument("--escala", choices=list(ESCALAS), default="media")
+    parser.add_argument("--productos", type=int, help="Productos del feed sintético")
+    parser.add_argument("--articulos", type=int, help="Artículos del catálogo CSV")
+    parser.add_argument("--medidas", type=int, help="Filas de la tabla de medidas en la ficha HTML")
+    parser.add_argument("--opiniones", type=int, help="Opiniones en la ficha HTML")
+    parser.add_argument("--mensajes", type=int, help="Mensajes del historial")
+    parser.add_argument("--arboles", type=int, default=300, help="Árboles del forest de prueba")
+    parser.add_argument("--tiempo", type=float, default=1.0, help="Segundos mínimos por función")
+    parser.add_argument("--solo", default=None, help="Filtra funciones por subcadena")
+    parser.add_argument("--baseline", default=None, help="JSON con el que comparar (por defecto, el último de la escala)")
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    p = dict(ESCALAS[args.escala])
+    for clave in p:
+        if getattr(args, clave) is not None:
+            p[clave] = getattr(args, clave)
+
+    directorio_original = os.getcwd()
+    trabajo = tempfile.mkdtemp(prefix="micro_")
+    os.chdir(trabajo)
+    try:
+        main = importar_main()
+        print(f"⏳ Preparando fixtures ({args.escala}): {p}")
+        benchs = preparar(main, p, trabajo, args.arboles)
+
+        resumen = {}
+        print(f"\n{'función':<34}{'ops/s':>12}{'µs/op':>12}{'mem pico KB':>14}")
+        for nombre, fn in benchs.items():
+            if args.solo and args.solo not in nombre:
+                continue
+            r = medir(fn, args.tiempo)
+            resumen[nombre] = r
+            print(f"{nombre:<34}{r['ops_s']:>12.1f}{r['us_op']:>12.1f}{r['mem_pico_kb']:>14.1f}")
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    suite = f"{SUITE}-{args.escala}"
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(suite, {"parametros": p, "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(suite, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"ops_s": True, "mem_pico_kb": False})
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,94 @@
+"""
+Preprocesado de HTML para reindexar: preprocesar_html (BeautifulSoup) vs. preprocesado.py.
+
+Sobre un corpus sintético con la forma de textoPagina del CMS
+(fixtures.generar_html_cms, con doble codificación, etiquetas sin cerrar,
+entidades, comentarios, scripts...) más rag/index.html:
+1. comprueba que preprocesar_html_rapido devuelve exactamente lo mismo
+   que preprocesar_html, sin etiquetas y con etiquetas + min_length
+   (como obtener_contenido_url con 50);
+2. mide páginas por segundo de preprocesar_html en serie,
+   preprocesar_html_rapido en serie y preprocesar_lote con el pool.
+
+Uso (desde src/):
+    python -m benchmarks.preprocesado_html --paginas 5000 --procesos 4
+"""
+import argparse
+import os
+import sys
+import time
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.fixtures import RAREZAS_HTML, generar_html_cms
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado
+
+SUITE = "preprocesado_html"
+TAGS_SCRAPING = ["p", "h1", "h2", "h3", "h4", "h5", "h6", "li"]
+
+
+def corpus(n_paginas, semilla):
+    paginas = generar_html_cms(n_paginas, semilla) + RAREZAS_HTML + ["".join(RAREZAS_HTML)]
+    with open(os.path.join(DIR_SRC, "rag", "index.html"), encoding="utf-8") as f:
+        paginas.append(f.read())
+    return paginas
+
+
+def medir(funcion, paginas):
+    t0 = time.perf_counter()
+    funcion(paginas)
+    return len(paginas) / (time.perf_counter() - t0)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Preprocesado de HTML en serie con BeautifulSoup vs. en bloque")
+    parser.add_argument("--paginas", type=int, default=3000)
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por defecto, las CPU)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    from rag.src.preprocesado import preprocesar_html_rapido, preprocesar_lote
+    from rag.src.scrap_url import preprocesar_html
+
+    paginas = corpus(args.paginas, args.semilla)
+    procesos = args.procesos or os.cpu_count() or 1
+    print(f"📄 {len(paginas)} páginas ({sum(len(p) for p in paginas) / 1e6:.1f} MB), {procesos} procesos")
+
+    distintas = 0
+    for tags, min_length in ((None, None), (TAGS_SCRAPING, 50)):
+        for pagina in paginas:
+            if preprocesar_html(pagina, tags, min_length) != preprocesar_html_rapido(pagina, tags, min_length):
+                distintas += 1
+    if distintas:
+        print(f"❌ {distintas} páginas con salida distinta de preprocesar_html")
+        sys.exit(1)
+    print("✅ Salida idéntica a preprocesar_html en todas las páginas")
+
+    resumen = {
+        "beautifulsoup": {"paginas_s": medir(lambda ps: [preprocesar_html(p) for p in ps], paginas)},
+        "rapido": {"paginas_s": medir(lambda ps: [preprocesar_html_rapido(p) for p in ps], paginas)},
+        "lote": {"paginas_s": medir(lambda ps: preprocesar_lote(ps, procesos=procesos), paginas)},
+    }
+    base = resumen["beautifulsoup"]["paginas_s"]
+    print(f"\n{'variante':<15}{'páginas/s':>12}{'aceleración':>13}")
+    for nombre, r in resumen.items():
+        r["aceleracion"] = r["paginas_s"] / base
+        print(f"{nombre:<15}{r['paginas_s']:>12.0f}{r['aceleracion']:>12.1f}x")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"paginas_s": True})
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,110 @@
+"""
+Contexto del RAG: unir los k primeros chunks tal cual vs. montaje con MMR.
+
+Sin red: usa el proveedor local de embeddings (ngramas) sobre una copia
+de la BD de Chroma del repo, reindexada con generar_embeddings
+--desde openai. Para cada pregunta de rag_embeddings.PREGUNTAS_FAQ
+compara los dos modos de get_context_embeddings:
+- tokens del contexto;
+- frases distintas por cada 100 tokens (información sin repetir);
+- acierto: el contexto contiene alguno de los fragmentos esperados.
+
+Uso (desde src/):
+    python -m benchmarks.rag_contexto
+    python -m benchmarks.rag_contexto --presupuesto 500 --lambda 0.5
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.rag_embeddings import PREGUNTAS_FAQ, _normalizar
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado
+
+SUITE = "rag_contexto"
+BD_CHROMA = os.path.join(DIR_SRC, "rag", "embeddings_db")
+
+
+def frases_distintas(texto):
+    return len({_normalizar(f) for f in re.split(r"(?<=[.!?\n])\s+", texto) if len(f.strip()) > 15})
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Contexto del RAG con y sin MMR + fusión + presupuesto")
+    parser.add_argument("--presupuesto", type=int, default=None, help="Tokens (por defecto el de configuration)")
+    parser.add_argument("--lambda", dest="lambda_", type=float, default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    os.environ["RAG_EMBEDDINGS"] = "ngramas"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    directorio_original = os.getcwd()
+    trabajo = tempfile.mkdtemp(prefix="rag_contexto_")
+    shutil.copytree(BD_CHROMA, os.path.join(trabajo, "embeddings_db"))
+    os.chdir(trabajo)
+    resumen = {}
+    try:
+        from rag.src import colchones_rag as rag
+        from rag.src.contexto import contar_tokens
+        from rag.src.generar_embeddings import reindexar_desde
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            reindexar_desde("openai")
+        rag.configuration["debug"] = False
+        if args.presupuesto:
+            rag.configuration["presupuesto_tokens"] = args.presupuesto
+        if args.lambda_ is not None:
+            rag.configuration["mmr_lambda"] = args.lambda_
+        print(f"📚 {rag.vectorstore._collection.count()} chunks (embeddings ngramas), {len(PREGUNTAS_FAQ)} preguntas, "
+              f"k={rag.configuration['k']}, {rag.configuration['mmr_candidatos']} candidatos, "
+              f"λ={rag.configuration['mmr_lambda']}, presupuesto {rag.configuration['presupuesto_tokens']} tokens")
+
+        for modo, mmr in (("sin_montar", False), ("mmr", True)):
+            rag.configuration["mmr"] = mmr
+            tokens = frases = aciertos = 0
+            for pregunta, fragmentos in PREGUNTAS_FAQ:
+                contexto, _ = rag.get_context_embeddings(pregunta)
+                tokens += contar_tokens(contexto)
+                frases += frases_distintas(contexto)
+                aciertos += any(_normalizar(f) in _normalizar(contexto) for f in fragmentos)
+            n = len(PREGUNTAS_FAQ)
+            resumen[modo] = {
+                "tokens_medios": tokens / n,
+                "frases_por_100_tokens": 100 * frases / tokens if tokens else 0.0,
+                "acierto": aciertos / n,
+            }
+        estadisticas = dict(rag.estadisticas_contexto)
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    print(f"\n{'modo':<12}{'tokens medios':>15}{'frases/100 tok':>16}{'acierto':>10}")
+    for modo, r in resumen.items():
+        print(f"{modo:<12}{r['tokens_medios']:>15.0f}{r['frases_por_100_tokens']:>16.2f}{r['acierto']:>10.0%}")
+    print(f"\nTokens ahorrados en {estadisticas['consultas']} consultas: {estadisticas['ahorrados_solape']} por solape, "
+          f"{estadisticas['recortados_presupuesto']} por presupuesto "
+          f"({estadisticas['tokens_sin_montar']} → {estadisticas['tokens_contexto']})")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen, "estadisticas": estadisticas})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"],
+                 {"tokens_medios": False, "frases_por_100_tokens": True, "acierto": True})
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,156 @@
+"""
+Dimensiones reducidas y cuantización de los embeddings del RAG.
+
+Sobre una copia de la BD de Chroma del repo (vectores de 1536 dimensiones
+de text-embedding-3-small) evalúa cada combinación de:
+- dimensiones: 1536, 1024, 512, 256 (truncar y renormalizar equivale a
+  pedir menos dimensiones a la API);
+- cuantización del índice en memoria: float32, float16, int8;
+- reordenar: 0 o 4 candidatos por resultado reordenados con los vectores
+  completos de Chroma (solo con cuantización).
+
+Métricas por combinación:
+- fidelidad@3: fracción del top-3 exacto (1536, float32) que se conserva,
+  con consultas sintéticas (vectores de chunks reales con ruido);
+- recall@3 FAQ: con las preguntas de rag_embeddings.PREGUNTAS_FAQ, si hay
+  acceso a la API de OpenAI (se embeben una vez a 1536 y se truncan);
+- memoria de la matriz del índice, disco de la copia exportada y disco
+  de la colección de Chroma con esas dimensiones;
+- p50 de la búsqueda (sin el embedding de la consulta).
+
+Uso (desde src/):
+    python -m benchmarks.rag_cuantizacion
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.rag_embeddings import PREGUNTAS_FAQ, relevantes
+from benchmarks.rag_indice import perturbar
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado, percentil
+
+SUITE = "rag_cuantizacion"
+BD_CHROMA = os.path.join(DIR_SRC, "rag", "embeddings_db")
+DIMENSIONES = (1536, 1024, 512, 256)
+CONFIGURACIONES = (("float32", 0), ("float16", 0), ("int8", 0), ("int8", 4))
+K = 3
+
+
+def tamano_directorio(ruta):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, ficheros in os.walk(ruta) for f in ficheros)
+
+
+def top_k(indice, consultas, reordenar, completos):
+    """Textos del top-K de cada consulta y tiempos en ms."""
+    resultados, tiempos = [], []
+    for consulta in consultas:
+        t0 = time.perf_counter()
+        encontrados = indice.buscar(consulta, K, reordenar, completos)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+        resultados.append([texto for texto, _, _ in encontrados])
+    return resultados, tiempos
+
+
+def embeddings_faq():
+    """Vectores de 1536 dimensiones de las preguntas FAQ o None si no hay acceso a la API."""
+    from rag.src.colchones_rag import embeddings_openai
+    try:
+        with contextlib.redirect_stderr(io.StringIO()):
+            return np.asarray(embeddings_openai().embed_documents([p for p, _ in PREGUNTAS_FAQ]), dtype=np.float32)
+    except Exception as e:
+        print(f"⚠️ Sin recall FAQ: no hay acceso a la API de embeddings ({type(e).__name__})")
+        return None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="recall@3 y tamaño del índice según dimensiones y cuantización")
+    parser.add_argument("--consultas", type=int, default=300)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+    rng = np.random.default_rng(0)
+    directorio_original = os.getcwd()
+    trabajo = tempfile.mkdtemp(prefix="rag_cuantizacion_")
+    shutil.copytree(BD_CHROMA, os.path.join(trabajo, "embeddings_db"))
+    os.chdir(trabajo)
+    resumen = {}
+    try:
+        from langchain_chroma import Chroma
+        from rag.src import colchones_rag as rag
+        from rag.src.indice_vectorial import IndiceVectorial, reducir_dimensiones, vectores_chroma
+
+        datos = rag.vectorstore.get(include=["embeddings", "documents", "metadatas"])
+        completos = np.asarray(datos["embeddings"], dtype=np.float32)
+        consultas = perturbar(completos[rng.integers(0, len(completos), args.consultas)], 0.03, rng)
+        faq = embeddings_faq()
+        juicios = [relevantes(f, datos["documents"], datos["documents"]) for _, f in PREGUNTAS_FAQ]
+        print(f"📚 {len(datos['ids'])} chunks, {args.consultas} consultas sintéticas"
+              f"{'' if faq is None else f', {len(PREGUNTAS_FAQ)} preguntas FAQ'}")
+
+        exacto = IndiceVectorial(datos["ids"], datos["documents"], datos["metadatas"], completos)
+        referencia, _ = top_k(exacto, consultas, 0, None)
+
+        for dimensiones in DIMENSIONES:
+            # Colección de Chroma con esas dimensiones (lo que ocupa en disco y de donde se reordena)
+            ruta = os.path.join(trabajo, f"d{dimensiones}")
+            coleccion = Chroma(collection_name="evaluacion", persist_directory=ruta)
+            coleccion._collection.add(ids=datos["ids"], embeddings=reducir_dimensiones(completos, dimensiones),
+                                      documents=datos["documents"])
+            disco_chroma = tamano_directorio(ruta)
+
+            for cuantizacion, reordenar in CONFIGURACIONES:
+                indice = IndiceVectorial.desde_chroma(coleccion, None, cuantizacion)
+                exportado = os.path.join(trabajo, f"exportado_{dimensiones}_{cuantizacion}")
+                indice.guardar(exportado)
+                resultados, tiempos = top_k(indice, consultas, reordenar, lambda ids: vectores_chroma(coleccion, ids))
+                fila = {
+                    "fidelidad@3": np.mean([len(set(a) & set(b)) / K for a, b in zip(resultados, referencia)]),
+                    "recall@3_faq": None,
+                    "memoria_kb": indice.bytes_vectores / 1024,
+                    "disco_kb": tamano_directorio(exportado) / 1024,
+                    "chroma_kb": disco_chroma / 1024,
+                    "p50_ms": percentil(tiempos, 50),
+                }
+                if faq is not None:
+                    textos_faq, _ = top_k(indice, faq, reordenar, lambda ids: vectores_chroma(coleccion, ids))
+                    fila["recall@3_faq"] = np.mean([bool(set(t) & j) for t, j in zip(textos_faq, juicios)])
+                resumen[f"{dimensiones}/{cuantizacion}" + (f"+r{reordenar}" if reordenar else "")] = fila
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    print(f"\n{'configuración':<18}{'fidelidad@3':>12}{'recall@3 FAQ':>14}{'memoria KB':>12}"
+          f"{'copia KB':>10}{'Chroma KB':>11}{'p50 ms':>9}")
+    for nombre, r in resumen.items():
+        faq_txt = f"{r['recall@3_faq']:.0%}" if r["recall@3_faq"] is not None else "-"
+        print(f"{nombre:<18}{r['fidelidad@3']:>12.1%}{faq_txt:>14}{r['memoria_kb']:>12.1f}"
+              f"{r['disco_kb']:>10.1f}{r['chroma_kb']:>11.0f}{r['p50_ms']:>9.3f}")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"fidelidad@3": True, "memoria_kb": False, "p50_ms": False})
+
+
+if __name__ == "__main__":
+    main_cli()
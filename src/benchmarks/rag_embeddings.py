@@ -0,0 +1,184 @@
+"""
+Recall de los proveedores de embeddings del RAG sobre preguntas frecuentes.
+
+Copia la BD de Chroma del repo (rag/embeddings_db, colección de OpenAI) a
+un directorio temporal, crea la colección de cada proveedor local con los
+mismos chunks y lanza las preguntas de PREGUNTAS_FAQ. Un chunk es
+relevante si contiene alguno de los fragmentos esperados de la pregunta.
+
+Por proveedor reporta recall@1, recall@3 (k de producción), MRR@10, la
+latencia de embeber una consulta y el tiempo de indexar todos los chunks.
+El índice BM25 de la recuperación híbrida se incluye como referencia.
+
+Las consultas a OpenAI necesitan red y OPENAI_API_KEY; sin ellas la fila
+de openai se marca como no disponible y el resto se mide igual.
+
+Uso (desde src/):
+    python -m benchmarks.rag_embeddings
+    python -m benchmarks.rag_embeddings --proveedores ngramas
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado, percentil
+
+SUITE = "rag_embeddings"
+BD_CHROMA = os.path.join(DIR_SRC, "rag", "embeddings_db")
+K_MAX = 10
+
+# (pregunta como la escribiría un cliente, fragmentos que identifican los chunks que la responden)
+PREGUNTAS_FAQ = [
+    ("¿Cuánto tiempo tengo para devolver un colchón si no me gusta?", ["100 días naturales"]),
+    ("¿Qué garantía tienen los productos?", ["garantía mínima de 3 años"]),
+    ("¿Puedo pagar con PayPal a plazos?", ["paypal en 3 plazos"]),
+    ("¿Ofrecéis financiación sin intereses?", ["SIN INTERESES", "financiar tu compra de forma gratuita"]),
+    ("¿Cuánto tarda en llegar el pedido?", ["En cuánto tiempo recibiré mi pedido", "se sirven en 48 horas"]),
+    ("¿Os lleváis el colchón viejo cuando traéis el nuevo?", ["Se llevarán mi colchón, somier"]),
+    ("¿Me suben el colchón hasta casa?", ["Me subirán el colchón"]),
+    ("¿Qué hago si el pedido llega roto o defectuoso?", ["está defectuoso"]),
+    ("¿Cuál es el número de cuenta para hacer una transferencia?", ["IBAN"]),
+    ("¿Es seguro pagar en vuestra web?", ["Es seguro el pago en www.colchones.es? www"]),
+    ("¿Los precios de la tienda física son los mismos que online?", ["Las tiendas físicas están autorizadas"]),
+    ("Si baja el precio después de comprar, ¿me devolvéis la diferencia?", ["durante el mes siguiente bajamos el precio"]),
+    ("¿Hay alguna tienda vuestra cerca de mi casa?", ["encuentra tu tienda más cercana"]),
+    ("¿Cuánto cuesta el envío de un canapé abatible?", ["coste adicional de 35 euros"]),
+    ("¿Qué pasa si se retrasa la entrega?", ["nos retrasemos en la fecha acordada"]),
+    ("¿Cómo hago un pedido en la web?", ["1º Escoge los productos"]),
+    ("¿Hacéis descuento si compro varios artículos?", ["gran compra"]),
+    ("¿Qué marcas de colchones vendéis?", ["Pikolín, Flex, Relax"]),
+    ("¿Cómo sé qué colchón me conviene?", ["qué colchón se adecua más", "Qué colchón debo elegir"]),
+    ("¿Qué hacéis con los colchones que retiráis?", ["vertedero ecológico"]),
+    ("¿Qué cuidados necesita el colchón para no perder la garantía?", ["invalidar la garantía"]),
+    ("¿Puedo consultar mis facturas por internet?", ["facturas online"]),
+    ("¿Cuándo confirmáis un pago por transferencia?", ["tardamos más en tener la información sobre tu pago"]),
+    ("Consejos para dormir mejor", ["consejos para dormir mejor"]),
+    ("¿A qué se compromete la tienda con sus clientes?", ["Compromisos de Colchones.es"]),
+    ("¿Puede recoger el pedido otra persona?", ["recibir la compra otra persona"]),
+]
+
+
+def _normalizar(texto):
+    return " ".join(texto.replace("\xa0", " ").lower().split())
+
+
+def relevantes(fragmentos, ids, textos):
+    fragmentos = [_normalizar(f) for f in fragmentos]
+    return {i for i, t in zip(ids, textos) if any(f in _normalizar(t) for f in fragmentos)}
+
+
+def metricas(rankings, juicios):
+    """recall@1, recall@3 y MRR@10 de [ids ordenados] frente a [ids relevantes]."""
+    r1 = r3 = mrr = 0.0
+    for ranking, buenos in zip(rankings, juicios):
+        posiciones = [p for p, id_ in enumerate(ranking[:K_MAX]) if id_ in buenos]
+        if posiciones:
+            r1 += posiciones[0] < 1
+            r3 += posiciones[0] < 3
+            mrr += 1 / (posiciones[0] + 1)
+    n = len(juicios)
+    return {"recall@1": r1 / n, "recall@3": r3 / n, "mrr@10": mrr / n}
+
+
+def evaluar_proveedor(rag, proveedor, datos, juicios):
+    from langchain_chroma import Chroma
+
+    embeddings = rag.get_embeddings_model(proveedor)
+    coleccion = Chroma(collection_name=rag.nombre_coleccion(proveedor),
+                       persist_directory=rag.configuration["persist_dir"], embedding_function=embeddings)
+    indexado_s = None
+    if proveedor != "openai":
+        t0 = time.perf_counter()
+        coleccion.add_texts(texts=datos["documents"], metadatas=datos["metadatas"], ids=datos["ids"])
+        indexado_s = time.perf_counter() - t0
+
+    rankings, tiempos = [], []
+    for pregunta, _ in PREGUNTAS_FAQ:
+        t0 = time.perf_counter()
+        vector = embeddings.embed_query(pregunta)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+        docs = coleccion.similarity_search_by_vector(vector, k=K_MAX)
+        rankings.append([d.id for d in docs])
+    return dict(metricas(rankings, juicios), consulta_p50_ms=percentil(tiempos, 50), indexado_s=indexado_s)
+
+
+def evaluar_bm25(rag, datos, juicios):
+    from rag.src.indice_bm25 import IndiceBM25
+
+    t0 = time.perf_counter()
+    indice = IndiceBM25()
+    indice.anadir(datos["ids"], datos["documents"], datos["metadatas"])
+    indexado_s = time.perf_counter() - t0
+    rankings, tiempos = [], []
+    for pregunta, _ in PREGUNTAS_FAQ:
+        t0 = time.perf_counter()
+        rankings.append([id_ for id_, _, _ in indice.buscar(pregunta, K_MAX)])
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return dict(metricas(rankings, juicios), consulta_p50_ms=percentil(tiempos, 50), indexado_s=indexado_s)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Recall@k de los proveedores de embeddings del RAG")
+    parser.add_argument("--proveedores", default="openai,ngramas", help="Lista separada por comas")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+    directorio_original = os.getcwd()
+    trabajo = tempfile.mkdtemp(prefix="rag_embeddings_")
+    shutil.copytree(BD_CHROMA, os.path.join(trabajo, "embeddings_db"))
+    os.chdir(trabajo)
+    resumen = {}
+    try:
+        from rag.src import colchones_rag as rag
+
+        datos = rag.vectorstore.get(include=["documents", "metadatas"])
+        juicios = [relevantes(fragmentos, datos["ids"], datos["documents"]) for _, fragmentos in PREGUNTAS_FAQ]
+        sin_juicio = [p for (p, _), j in zip(PREGUNTAS_FAQ, juicios) if not j]
+        if sin_juicio:
+            print(f"⚠️ Preguntas sin ningún chunk relevante en la BD: {sin_juicio}")
+        print(f"📚 {len(datos['ids'])} chunks, {len(PREGUNTAS_FAQ)} preguntas frecuentes")
+
+        for proveedor in args.proveedores.split(","):
+            try:
+                with contextlib.redirect_stderr(io.StringIO()):
+                    resumen[proveedor] = evaluar_proveedor(rag, proveedor, datos, juicios)
+            except Exception as e:
+                print(f"⚠️ {proveedor}: no disponible ({type(e).__name__}: {str(e)[:120]})")
+        resumen["bm25"] = evaluar_bm25(rag, datos, juicios)
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    print(f"\n{'proveedor':<12}{'recall@1':>10}{'recall@3':>10}{'MRR@10':>10}{'consulta p50':>15}{'indexado':>12}")
+    for proveedor, r in resumen.items():
+        indexado = f"{r['indexado_s']:.2f} s" if r["indexado_s"] is not None else "-"
+        print(f"{proveedor:<12}{r['recall@1']:>10.0%}{r['recall@3']:>10.0%}{r['mrr@10']:>10.3f}"
+              f"{r['consulta_p50_ms']:>12.3f} ms{indexado:>12}")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"],
+                 {"recall@1": True, "recall@3": True, "mrr@10": True, "consulta_p50_ms": False})
+
+
+if __name__ == "__main__":
+    main_cli()
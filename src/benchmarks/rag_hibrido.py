@@ -0,0 +1,154 @@
+"""
+Latencia de get_context_embeddings: solo vectores vs. híbrido BM25 + vectores.
+
+Trabaja sobre una copia de la BD de Chroma del repo (rag/embeddings_db) en
+un directorio temporal. La llamada a la API de embeddings se sustituye por
+una función que espera `--latencia-embeddings-ms` y devuelve un vector
+determinista: el ranking vectorial no es el real, pero el coste de cada
+consulta sí (la API es lo que domina).
+
+Para cada modo reporta p50/p95 por consulta, llamadas a la API de
+embeddings y qué fracción de consultas resuelve el atajo léxico.
+
+Uso (desde src/):
+    python -m benchmarks.rag_hibrido
+    python -m benchmarks.rag_hibrido --latencia-embeddings-ms 250 --repeticiones 20
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado, percentil
+
+SUITE = "rag_hibrido"
+BD_CHROMA = os.path.join(DIR_SRC, "rag", "embeddings_db")
+
+# Mezcla de consultas del chat: palabras clave cortas y preguntas completas
+CONSULTAS = [
+    "devoluciones", "garantía", "formas de pago", "plazo de entrega", "canapé abatible", "medidas de colchones",
+    "atención al cliente teléfono", "financiación", "envío gratis", "somier de láminas",
+    "¿cómo funcionan las devoluciones?", "¿puedo pagar a plazos?", "¿cuánto tarda en llegar mi pedido?",
+    "¿qué colchón es mejor para el dolor de espalda?", "¿cada cuánto hay que cambiar el colchón?",
+    "¿qué pasa si el colchón no me gusta?",
+]
+
+
+class EmbeddingsFalsos:
+    """Sustituto de OpenAIEmbeddings con la latencia de la API y vectores deterministas."""
+
+    def __init__(self, latencia_ms, dimensiones=1536):
+        self.latencia_s = latencia_ms / 1000
+        self.dimensiones = dimensiones
+        self.llamadas = 0
+
+    def _vector(self, texto):
+        # Unitario, como los de OpenAI (si no, Chroma da relevancias fuera de [0, 1])
+        semilla = hashlib.sha256(texto.encode()).digest()
+        vector = [(semilla[i % len(semilla)] - 127.5) / 128 for i in range(self.dimensiones)]
+        norma = sum(x * x for x in vector) ** 0.5
+        return [x / norma for x in vector]
+
+    def embed_query(self, texto):
+        self.llamadas += 1
+        time.sleep(self.latencia_s)
+        return self._vector(texto)
+
+    def embed_documents(self, textos):
+        self.llamadas += 1
+        time.sleep(self.latencia_s)
+        return [self._vector(t) for t in textos]
+
+
+def medir(rag, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        for consulta in CONSULTAS:
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                rag.get_context_embeddings(consulta)
+            tiempos.append((time.perf_counter() - t0) * 1000)
+    return tiempos
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="RAG solo vectorial vs. híbrido con atajo léxico")
+    parser.add_argument("--latencia-embeddings-ms", type=float, default=150.0)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    # Con vectores falsos la similitud puede ser negativa y langchain avisa en cada consulta
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+    directorio_original = os.getcwd()
+    trabajo = tempfile.mkdtemp(prefix="rag_hibrido_")
+    shutil.copytree(BD_CHROMA, os.path.join(trabajo, "embeddings_db"))
+    os.chdir(trabajo)
+    try:
+        from rag.src import colchones_rag as rag
+
+        embeddings = EmbeddingsFalsos(args.latencia_embeddings_ms)
+        rag.vectorstore._embedding_function = embeddings
+        print(f"📚 {rag.vectorstore._collection.count()} chunks en Chroma, {len(CONSULTAS)} consultas "
+              f"× {args.repeticiones}, API de embeddings simulada a {args.latencia_embeddings_ms:.0f} ms")
+
+        resumen = {}
+        for modo, hibrido in (("vectorial", False), ("hibrido", True)):
+            rag.configuration["hibrido"] = hibrido
+            for clave in rag.estadisticas_recuperacion:
+                rag.estadisticas_recuperacion[clave] = 0
+            embeddings.llamadas = 0
+            tiempos = medir(rag, args.repeticiones)
+            resumen[modo] = {
+                "p50_ms": percentil(tiempos, 50),
+                "p95_ms": percentil(tiempos, 95),
+                "media_ms": sum(tiempos) / len(tiempos),
+                "llamadas_embeddings": embeddings.llamadas,
+                "atajo_lexico": rag.estadisticas_recuperacion["lexico"] / len(tiempos),
+            }
+
+        # Qué consultas toman el atajo (para revisar a mano que el BM25 acierta)
+        rag.configuration["debug"] = False
+        atajos = []
+        for consulta in CONSULTAS:
+            antes = rag.estadisticas_recuperacion["lexico"]
+            contexto, _ = rag.get_context_embeddings(consulta)
+            if rag.estadisticas_recuperacion["lexico"] > antes:
+                atajos.append((consulta, contexto[:90].replace("\n", " ")))
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    print(f"\n{'modo':<12}{'p50 ms':>10}{'p95 ms':>10}{'media ms':>10}{'llamadas API':>14}{'atajo léxico':>14}")
+    for modo, r in resumen.items():
+        print(f"{modo:<12}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['media_ms']:>10.1f}"
+              f"{r['llamadas_embeddings']:>14}{r['atajo_lexico']:>14.0%}")
+    print("\nConsultas resueltas solo con BM25 (primer chunk):")
+    for consulta, contexto in atajos:
+        print(f"  {consulta:<32} {contexto}")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"p50_ms": False, "p95_ms": False, "media_ms": False})
+
+
+if __name__ == "__main__":
+    main_cli()
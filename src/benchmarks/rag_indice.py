@@ -0,0 +1,152 @@
+"""
+Latencia de la búsqueda vectorial del RAG: Chroma vs. índice en memoria.
+
+Sobre una copia de la BD de Chroma del repo (rag/embeddings_db) compara,
+sin contar el cálculo del embedding de la consulta:
+- chroma: vectorstore.similarity_search_with_relevance_scores (cliente
+  persistente, SQLite y HNSW), como hasta ahora;
+- memoria: busqueda_vectorial con indice_vectorial.py (producto
+  matriz-vector sobre los vectores en float32).
+
+Las consultas son vectores de chunks reales con ruido, que la función de
+embeddings falsa devuelve al instante. Con `--replicas N` se añaden N
+copias perturbadas de cada chunk para simular un corpus más grande.
+También mide la carga inicial del índice, la recarga tras publicar una
+versión nueva de la colección y cuántos de los k resultados coinciden
+entre los dos métodos (HNSW es aproximado).
+
+Uso (desde src/):
+    python -m benchmarks.rag_indice
+    python -m benchmarks.rag_indice --replicas 10 --consultas 500
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado, percentil
+
+SUITE = "rag_indice"
+BD_CHROMA = os.path.join(DIR_SRC, "rag", "embeddings_db")
+
+
+class EmbeddingsPrecalculados:
+    """Devuelve el vector ya calculado de cada consulta (coste cero de embedding)."""
+
+    def __init__(self, vectores):
+        self.vectores = vectores
+
+    def embed_query(self, texto):
+        return self.vectores[texto]
+
+    def embed_documents(self, textos):
+        return [self.vectores[t] for t in textos]
+
+
+def perturbar(matriz, ruido, rng):
+    ruidosa = matriz + rng.normal(0, ruido, matriz.shape).astype(np.float32)
+    return ruidosa / np.linalg.norm(ruidosa, axis=1, keepdims=True)
+
+
+def medir(funcion, consultas):
+    tiempos, resultados = [], []
+    for consulta in consultas:
+        t0 = time.perf_counter()
+        resultados.append(funcion(consulta))
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return tiempos, resultados
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Búsqueda vectorial: Chroma vs. matriz en memoria")
+    parser.add_argument("--consultas", type=int, default=300)
+    parser.add_argument("--replicas", type=int, default=0, help="Copias perturbadas de cada chunk que se añaden")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    warnings.filterwarnings("ignore", message="Relevance scores must be between 0 and 1")
+    rng = np.random.default_rng(0)
+    directorio_original = os.getcwd()
+    trabajo = tempfile.mkdtemp(prefix="rag_indice_")
+    shutil.copytree(BD_CHROMA, os.path.join(trabajo, "embeddings_db"))
+    os.chdir(trabajo)
+    try:
+        from rag.src import colchones_rag as rag
+        from rag.src.indice_vectorial import IndiceVectorial, publicar_version
+
+        datos = rag.vectorstore.get(include=["embeddings", "documents"])
+        base = np.asarray(datos["embeddings"], dtype=np.float32)
+        for r in range(args.replicas):
+            rag.vectorstore._collection.add(
+                ids=[f"{i}_r{r}" for i in datos["ids"]],
+                embeddings=perturbar(base, 0.02, rng),
+                documents=[f"{t} [{r}]" for t in datos["documents"]],
+            )
+        n_chunks = rag.vectorstore._collection.count()
+
+        consultas = [f"consulta {i}" for i in range(args.consultas)]
+        vectores = perturbar(base[rng.integers(0, len(base), args.consultas)], 0.03, rng)
+        rag.vectorstore._embedding_function = EmbeddingsPrecalculados(dict(zip(consultas, vectores.tolist())))
+        print(f"📚 {n_chunks} chunks de {base.shape[1]} dimensiones, {args.consultas} consultas, k={args.k}")
+
+        t0 = time.perf_counter()
+        IndiceVectorial.desde_chroma(rag.vectorstore)
+        carga_ms = (time.perf_counter() - t0) * 1000
+        publicar_version(rag.configuration["persist_dir"], rag.nombre_coleccion())
+
+        rag.configuration["indice_memoria"] = False
+        tiempos_chroma, res_chroma = medir(lambda c: rag.busqueda_vectorial(c, args.k), consultas)
+        rag.configuration["indice_memoria"] = True
+        rag.busqueda_vectorial(consultas[0], args.k)   # primera carga fuera de la medida
+        tiempos_memoria, res_memoria = medir(lambda c: rag.busqueda_vectorial(c, args.k), consultas)
+
+        # Recarga: una escritura publica versión nueva y la siguiente consulta reconstruye el índice
+        time.sleep(0.01)
+        publicar_version(rag.configuration["persist_dir"], rag.nombre_coleccion())
+        t0 = time.perf_counter()
+        rag.busqueda_vectorial(consultas[0], args.k)
+        recarga_ms = (time.perf_counter() - t0) * 1000
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    coincidencia = np.mean([len({t for t, _, _ in a} & {t for t, _, _ in b}) / args.k
+                            for a, b in zip(res_chroma, res_memoria)])
+    resumen = {
+        "chroma": {"p50_ms": percentil(tiempos_chroma, 50), "p95_ms": percentil(tiempos_chroma, 95)},
+        "memoria": {"p50_ms": percentil(tiempos_memoria, 50), "p95_ms": percentil(tiempos_memoria, 95),
+                    "carga_ms": carga_ms, "recarga_ms": recarga_ms},
+    }
+    print(f"\n{'método':<10}{'p50 ms':>10}{'p95 ms':>10}")
+    for metodo, r in resumen.items():
+        print(f"{metodo:<10}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}")
+    print(f"\nAceleración p50: x{resumen['chroma']['p50_ms'] / resumen['memoria']['p50_ms']:.0f}")
+    print(f"Carga inicial del índice: {carga_ms:.1f} ms, recarga tras versión nueva: {recarga_ms:.1f} ms")
+    print(f"Resultados top-{args.k} coincidentes con Chroma: {coincidencia:.1%}")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "chunks": n_chunks,
+                                         "coincidencia": coincidencia, "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"p50_ms": False, "p95_ms": False})
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,147 @@
+"""
+Troceado del índice del RAG: por caracteres (1000 con solape de 200) vs. por secciones.
+
+Sin red ni MySQL: las páginas se reconstruyen encadenando los chunks de la
+BD de Chroma del repo por su solape (el final de uno es el principio del
+siguiente) y cada página se trocea de las dos formas. Cada juego de chunks
+se indexa con el proveedor local de embeddings (ngramas) en un
+IndiceVectorial y se compara:
+- número de chunks, caracteres indexados y tamaño medio del chunk;
+- acierto@3: el top-3 contiene alguno de los fragmentos esperados de
+  rag_embeddings.PREGUNTAS_FAQ;
+- tokens del top-3 unido (lo que se mandaría al modelo sin montar).
+
+Uso (desde src/):
+    python -m benchmarks.rag_troceado
+    python -m benchmarks.rag_troceado --maximo 1000 --minimo 400
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+DIR_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIR_SRC not in sys.path:
+    sys.path.insert(0, DIR_SRC)
+
+from benchmarks.rag_embeddings import PREGUNTAS_FAQ, _normalizar
+from benchmarks.resultados import cargar_baseline, comparar, guardar_resultado
+
+SUITE = "rag_troceado"
+BD_CHROMA = os.path.join(DIR_SRC, "rag", "embeddings_db")
+K = 3
+
+
+def reconstruir_paginas(textos):
+    """Encadena los chunks por su solape; cada cadena es una página."""
+    from rag.src.contexto import solapamiento
+
+    chunks = list(dict.fromkeys(t.strip() for t in textos if t.strip()))
+    siguiente, tiene_anterior = {}, set()
+    for i, a in enumerate(chunks):
+        for j, b in enumerate(chunks):
+            if i != j and j not in tiene_anterior and solapamiento(a, b):
+                siguiente[i] = j
+                tiene_anterior.add(j)
+                break
+
+    paginas, vistos = [], set()
+    for inicio in [i for i in range(len(chunks)) if i not in tiene_anterior] + list(range(len(chunks))):
+        if inicio in vistos:
+            continue
+        pagina, i = chunks[inicio], inicio
+        vistos.add(i)
+        while i in siguiente and siguiente[i] not in vistos:
+            j = siguiente[i]
+            pagina += chunks[j][solapamiento(pagina, chunks[j]):]
+            vistos.add(j)
+            i = j
+        paginas.append(pagina)
+    return paginas
+
+
+def trocear_caracteres(paginas):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from rag.src.colchones_rag import separators
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, separators=separators)
+    return [t for p in paginas for t in splitter.split_text(p)]
+
+
+def evaluar(textos, embeddings):
+    from rag.src.contexto import contar_tokens
+    from rag.src.indice_vectorial import IndiceVectorial
+
+    ids = [str(i) for i in range(len(textos))]
+    indice = IndiceVectorial(ids, textos, [None] * len(textos),
+                             np.asarray(embeddings.embed_documents(textos), dtype=np.float32))
+    aciertos = tokens = 0
+    for pregunta, fragmentos in PREGUNTAS_FAQ:
+        top = [texto for texto, _, _ in indice.buscar(embeddings.embed_query(pregunta), K)]
+        unido = _normalizar(" ".join(top))
+        aciertos += any(_normalizar(f) in unido for f in fragmentos)
+        tokens += contar_tokens("\n\n".join(top))
+    n = len(PREGUNTAS_FAQ)
+    return {
+        "chunks": len(textos),
+        "caracteres": sum(len(t) for t in textos),
+        "chunk_medio": sum(len(t) for t in textos) / len(textos),
+        "acierto@3": aciertos / n,
+        "tokens_top3": tokens / n,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Troceado por caracteres vs. por secciones")
+    parser.add_argument("--maximo", type=int, default=None, help="Caracteres máximos por chunk (troceado.MAXIMO)")
+    parser.add_argument("--minimo", type=int, default=None, help="Caracteres mínimos por chunk (troceado.MINIMO)")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--no-guardar", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    directorio_original = os.getcwd()
+    trabajo = tempfile.mkdtemp(prefix="rag_troceado_")
+    shutil.copytree(BD_CHROMA, os.path.join(trabajo, "embeddings_db"))
+    os.chdir(trabajo)
+    try:
+        from rag.src import colchones_rag as rag
+        from rag.src import troceado
+        from rag.src.embeddings_locales import EmbeddingsNgramas
+
+        paginas = reconstruir_paginas(rag.vectorstore.get()["documents"])
+        maximo, minimo = args.maximo or troceado.MAXIMO, args.minimo or troceado.MINIMO
+        print(f"📚 {len(paginas)} páginas reconstruidas, {len(PREGUNTAS_FAQ)} preguntas, "
+              f"secciones de {minimo}-{maximo} caracteres")
+
+        embeddings = EmbeddingsNgramas()
+        resumen = {
+            "caracteres": evaluar(trocear_caracteres(paginas), embeddings),
+            "secciones": evaluar([t for p in paginas for t, _ in troceado.trocear_texto(p, None, maximo, minimo)],
+                                 embeddings),
+        }
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    print(f"\n{'troceado':<12}{'chunks':>8}{'caracteres':>12}{'chunk medio':>13}{'acierto@3':>11}{'tokens top-3':>14}")
+    for modo, r in resumen.items():
+        print(f"{modo:<12}{r['chunks']:>8}{r['caracteres']:>12}{r['chunk_medio']:>13.0f}"
+              f"{r['acierto@3']:>11.0%}{r['tokens_top3']:>14.0f}")
+
+    ruta = None
+    if not args.no_guardar:
+        ruta = guardar_resultado(SUITE, {"parametros": vars(args), "resumen": resumen})
+        print(f"💾 Resultado guardado en {ruta}")
+
+    baseline = cargar_baseline(SUITE, args.baseline, excluir=ruta)
+    if baseline:
+        print(f"\n🔁 Comparación con {baseline['commit']} ({baseline['fecha']}):")
+        comparar(resumen, baseline["datos"]["resumen"], {"caracteres": False, "acierto@3": True, "tokens_top3": False})
+
+
+if __name__ == "__main__":
+    main_cli()
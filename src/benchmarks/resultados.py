@@ -0,0 +1,90 @@
+"""
+Guardado y comparación de resultados de benchmarks.
+
+Cada ejecución se guarda como JSON en benchmarks/resultados/ con el commit
+actual en el nombre, para poder comparar una rama contra una ejecución
+anterior (baseline) y ver regresiones entre commits.
+"""
+import json
+import math
+import os
+import subprocess
+from datetime import datetime
+
+DIR_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (p entre 0 y 100)."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    k = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[k]
+
+
+def commit_actual():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return "sin-git"
+
+
+def guardar_resultado(suite, datos):
+    """Guarda `datos` como resultados/<suite>_<fecha>_<commit>.json y devuelve la ruta."""
+    os.makedirs(DIR_RESULTADOS, exist_ok=True)
+    commit = commit_actual()
+    fecha = datetime.now().strftime("%Y%m%d-%H%M%S")
+    ruta = os.path.join(DIR_RESULTADOS, f"{suite}_{fecha}_{commit}.json")
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({"suite": suite, "commit": commit, "fecha": fecha, "datos": datos},
+                  f, ensure_ascii=False, indent=2)
+    return ruta
+
+
+def cargar_baseline(suite, ruta=None, excluir=None):
+    """Devuelve el resultado indicado en `ruta` o, si no, el último guardado de la suite."""
+    if ruta:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    if not os.path.isdir(DIR_RESULTADOS):
+        return None
+    candidatos = sorted(
+        f for f in os.listdir(DIR_RESULTADOS)
+        if f.startswith(suite + "_") and f.endswith(".json")
+        and os.path.join(DIR_RESULTADOS, f) != excluir
+    )
+    if not candidatos:
+        return None
+    with open(os.path.join(DIR_RESULTADOS, candidatos[-1]), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def comparar(actual, baseline, metricas, umbral=0.10):
+    """Imprime la variación de cada métrica por clave.
+
+    `actual` y `baseline` son dicts {clave: {metrica: valor}}. `metricas` es
+    un dict {metrica: True si "más alto es mejor"}. Marca como regresión
+    cualquier empeoramiento mayor que `umbral` (10% por defecto).
+    Devuelve el número de regresiones.
+    """
+    regresiones = 0
+    for clave, valores in actual.items():
+        base = baseline.get(clave)
+        if not base:
+            continue
+        for metrica, mas_es_mejor in metricas.items():
+            a, b = valores.get(metrica), base.get(metrica)
+            if a is None or not b:
+                continue
+            cambio = (a - b) / b
+            empeora = -cambio if mas_es_mejor else cambio
+            marca = "⚠️ REGRESIÓN" if empeora > umbral else ""
+            if marca:
+                regresiones += 1
+            print(f"  {clave:<40} {metrica:<12} {b:>12.4g} -> {a:>12.4g} ({cambio:+.1%}) {marca}")
+    return regresiones
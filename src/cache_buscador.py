@@ -0,0 +1,68 @@
+"""
+Caché de resultados del BUSCADOR.
+
+"almohada visco", "canapé abatible" o "somier láminas" llegan cientos de
+veces al día y cada una recorría el catálogo y volvía a montar el HTML.
+CacheResultados guarda, por consulta, el ranking (g:id) y el HTML de las
+tarjetas, en un LRU de tamaño fijo. La clave lleva:
+- la versión del feed (hash del XML o generación compartida) y la del
+  índice de embeddings de productos: al recargar, las entradas de la
+  versión anterior se invalidan (main.cargar_feed_en) y, aunque quedara
+  alguna, ninguna consulta nueva la encontraría;
+- el dominio, el modo del buscador y los filtros;
+- las palabras clave normalizadas y ordenadas ("Visco almohada" y
+  "almohada visco" comparten entrada).
+La cabecera con las palabras del usuario y el formulario de contacto
+(lleva su user_id) se montan en cada petición, no se guardan.
+"""
+import threading
+from collections import OrderedDict
+
+estadisticas_cache = {"aciertos": 0, "fallos": 0, "desalojos": 0, "invalidadas": 0}
+
+
+class CacheResultados:
+    """LRU {clave: valor} con la versión del feed en la clave y contadores en estadisticas_cache."""
+
+    def __init__(self, max_entradas=512):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obtener(self, clave):
+        """Valor guardado o None (cuenta acierto o fallo)."""
+        with self._lock:
+            valor = self._entradas.get(clave)
+            if valor is None:
+                estadisticas_cache["fallos"] += 1
+                return None
+            self._entradas.move_to_end(clave)
+            estadisticas_cache["aciertos"] += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        if self.max_entradas <= 0:
+            return
+        with self._lock:
+            self._entradas[clave] = valor
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                estadisticas_cache["desalojos"] += 1
+
+    def invalidar(self, version):
+        """Quita las entradas de una versión del feed (la clave empieza por ella)."""
+        with self._lock:
+            viejas = [clave for clave in self._entradas if clave[0] == version]
+            for clave in viejas:
+                del self._entradas[clave]
+            estadisticas_cache["invalidadas"] += len(viejas)
+
+    def estado(self):
+        """Para /ready: contadores, tasa de aciertos y entradas ocupadas."""
+        consultas = estadisticas_cache["aciertos"] + estadisticas_cache["fallos"]
+        return dict(estadisticas_cache, entradas=len(self._entradas), max_entradas=self.max_entradas,
+                    tasa_aciertos=round(estadisticas_cache["aciertos"] / consultas, 3) if consultas else None)
@@ -0,0 +1,153 @@
+"""
+Ciclo de vida de los recursos pesados de main.py.
+
+Importar main.py cargaba todo de golpe (pandas, langchain/Chroma, openai,
+BeautifulSoup, el CSV, los modelos y la descarga del feed XML) y cualquier
+fallo solo se imprimía: el worker arrancaba a medias sin que nadie lo
+supiera. Ahora cada recurso es un componente con nombre que se carga:
+- la primera vez que se usa (`asegurar` / `obtener`), o
+- en un hilo de calentamiento al arrancar (`calentar`), primero los
+  críticos y después el resto.
+
+`/ready` solo responde 200 cuando todos los componentes críticos están
+cargados; `/health` solo indica que el proceso está vivo.
+"""
+import threading
+import time
+import traceback
+
+PENDIENTE = "pendiente"
+CARGANDO = "cargando"
+LISTO = "listo"
+ERROR = "error"
+
+
+class Componente:
+    def __init__(self, nombre, cargar, critico):
+        self.nombre = nombre
+        self.cargar = cargar
+        self.critico = critico
+        self.estado = PENDIENTE
+        self.valor = None
+        self.segundos = None
+        self.error = None
+        self.ultimo_intento = None
+        # Serializa la carga: quien llega mientras otro carga espera al resultado
+        self.lock = threading.Lock()
+
+
+class CicloVida:
+    """Registro de componentes con carga perezosa, reintentos y calentamiento.
+
+    - `cargar` es un callable sin argumentos; lo que devuelve queda como
+      valor del componente (ej: el cliente de OpenAI).
+    - Un componente que falla queda en estado "error" y no se reintenta
+      hasta pasados `reintento_s` segundos (una petición no debe esperar a
+      un timeout de red en cada llamada).
+    - `asegurar` nunca lanza excepciones: devuelve True si el componente
+      está listo.
+    """
+
+    def __init__(self, reintento_s=30.0):
+        self.reintento_s = reintento_s
+        self._componentes = {}
+        self._hilo = None
+        self._lock_hilo = threading.Lock()
+
+    def registrar(self, nombre, cargar, critico=False):
+        self._componentes[nombre] = Componente(nombre, cargar, critico)
+
+    def criticos(self, nombres):
+        """Marca como críticos solo los componentes de `nombres` (ej: desde una variable de entorno)."""
+        for componente in self._componentes.values():
+            componente.critico = componente.nombre in nombres
+
+    # ------------------------------------------
+    # Carga bajo demanda
+    # ------------------------------------------
+    def asegurar(self, nombre):
+        c = self._componentes[nombre]
+        if c.estado == LISTO:
+            return True
+        with c.lock:
+            if c.estado == LISTO:
+                return True
+            if c.estado == ERROR and time.monotonic() - c.ultimo_intento < self.reintento_s:
+                return False
+            c.estado = CARGANDO
+            c.ultimo_intento = time.monotonic()
+            t0 = time.perf_counter()
+            try:
+                c.valor = c.cargar()
+            except Exception as e:
+                c.segundos = time.perf_counter() - t0
+                c.error = f"{type(e).__name__}: {e}"
+                c.estado = ERROR
+                print(f"❌ Error cargando {nombre}: {c.error}")
+                traceback.print_exc()
+                return False
+            c.segundos = time.perf_counter() - t0
+            c.error = None
+            c.estado = LISTO
+            print(f"✅ {nombre} listo en {c.segundos:.2f}s.")
+            return True
+
+    def obtener(self, nombre):
+        """Valor del componente (cargándolo si hace falta). Lanza RuntimeError si no se pudo cargar."""
+        if not self.asegurar(nombre):
+            raise RuntimeError(f"Componente '{nombre}' no disponible: {self._componentes[nombre].error}")
+        return self._componentes[nombre].valor
+
+    def marcar_listo(self, nombre, valor=None):
+        """Da el componente por cargado sin ejecutar su carga (datos inyectados en benchmarks o scripts)."""
+        c = self._componentes[nombre]
+        with c.lock:
+            c.valor = valor
+            c.estado = LISTO
+            c.segundos = 0.0
+            c.error = None
+
+    # ------------------------------------------
+    # Calentamiento en segundo plano
+    # ------------------------------------------
+    def calentar(self, todos=True):
+        """Carga en un hilo los críticos y, si `todos`, después el resto.
+
+        Es idempotente: si ya hay un calentamiento en marcha no lanza otro.
+        """
+        with self._lock_hilo:
+            if self._hilo is not None and self._hilo.is_alive():
+                return self._hilo
+            orden = sorted(self._componentes.values(), key=lambda c: not c.critico)
+            nombres = [c.nombre for c in orden if c.critico or todos]
+            self._hilo = threading.Thread(target=self._calentar, args=(nombres,), name="calentamiento", daemon=True)
+            self._hilo.start()
+            return self._hilo
+
+    def _calentar(self, nombres):
+        t0 = time.perf_counter()
+        for nombre in nombres:
+            self.asegurar(nombre)
+        print(f"🔥 Calentamiento terminado en {time.perf_counter() - t0:.2f}s "
+              f"({'listo' if self.listo() else 'faltan componentes críticos'}).")
+
+    # ------------------------------------------
+    # Estado (para /ready)
+    # ------------------------------------------
+    def listo(self):
+        return all(c.estado == LISTO for c in self._componentes.values() if c.critico)
+
+    def valores(self):
+        """{nombre: valor} de los componentes cargados (para estimar su memoria)."""
+        return {c.nombre: c.valor for c in self._componentes.values() if c.estado == LISTO}
+
+    def estado(self):
+        return {
+            c.nombre: {
+                "estado": c.estado,
+                "critico": c.critico,
+                "segundos": round(c.segundos, 4) if c.segundos is not None else None,
+                "error": c.error,
+            }
+            for c in self._componentes.values()
+        }
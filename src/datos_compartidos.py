@@ -0,0 +1,394 @@
+"""
+Datos compartidos entre workers de uvicorn.
+
+Con varios workers cada proceso tenía su copia de `datos_sistema`: el feed
+XML como dict de dicts, el catálogo y los modelos (y cualquier índice que
+se añada). Con este modo un único proceso cargador construye
+"generaciones" en disco y los workers se enganchan a ellas en solo
+lectura con mmap, así que las páginas son de la caché del sistema y se
+comparten entre todos:
+
+    compartido/
+        ACTUAL                      nombre de la generación vigente (JSON)
+        gen-<fecha>-<hash>/
+            paquete/                paquete de arranque (paquete_arranque.py)
+            feed/<campo>.bin        textos del feed en UTF-8, concatenados
+            feed/<campo>_offsets.npy  inicio de cada producto en el .bin
+            feed/ids_ordenados.npy  g:id ordenados + posiciones (búsqueda binaria)
+            cambios.json            diferencias del feed con la generación anterior
+            indices/<nombre>/*.npy  índices registrados con registrar_indice
+            indices/feed/*.npy      segmentos del g:id y textos normalizados
+                                    (los de feed_incremental.FeedIndexado)
+
+Si las fuentes del paquete no han cambiado, la generación nueva reutiliza
+el paquete de la anterior con enlaces duros en vez de reconstruirlo, y las
+altas, bajas y cambios del feed respecto a la anterior quedan en su
+cambios.json y en <raiz>/cambios.jsonl (feed_incremental.registrar_cambios).
+
+El cargador publica una generación nueva escribiendo primero el
+directorio completo y después ACTUAL (os.replace, atómico). Los workers
+comprueban ACTUAL cada pocos segundos y cambian de generación entre
+peticiones. Las generaciones viejas se borran: los workers que aún las
+tengan mapeadas siguen leyéndolas hasta soltarlas (semántica de unlink).
+
+Cargador (desde src/, junto a los ficheros del paquete de arranque):
+    python datos_compartidos.py --raiz compartido --cada 900
+Workers:
+    DATOS_COMPARTIDOS=compartido uvicorn main:app --workers 4
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from collections.abc import Mapping
+from datetime import datetime
+
+import numpy as np
+
+from facetas import indice_facetas
+from feed_incremental import _segmentos, _textos, diferenciar, registrar_cambios
+from feed_xml import CAMPOS, descargar_feed, parsear_feed
+from paquete_arranque import cargar_arrays, cargar_paquete, construir_paquete, fuentes_cambiadas, guardar_arrays
+
+ACTUAL = "ACTUAL"
+
+# nombre: construir(feed, catalogo) -> {nombre_array: np.ndarray}
+CONSTRUCTORES_INDICES = {}
+
+
+def registrar_indice(nombre, construir):
+    """Añade un índice que el cargador construye en cada generación (los workers lo reciben mapeado)."""
+    CONSTRUCTORES_INDICES[nombre] = construir
+
+
+def _blob(textos):
+    """(bytes UTF-8 concatenados como uint8, offsets de inicio de cada texto)."""
+    codificados = [t.encode("utf-8") for t in textos]
+    offsets = np.concatenate([[0], np.cumsum([len(c) for c in codificados])]).astype(np.int64)
+    return np.frombuffer(b"".join(codificados), dtype=np.uint8), offsets
+
+
+def indice_feed(feed, catalogo):
+    """Constructor para registrar_indice: lo que FeedIndexado calcula en cada worker, en arrays.
+
+    - titulos/descripciones (+ _offsets): textos normalizados del buscador, en el orden del feed;
+    - segmentos, segmentos_inicio, segmentos_posiciones: trozos del g:id ordenados y, para cada
+      uno, las posiciones del feed que lo llevan (crecientes: la primera es la que va antes).
+    """
+    items = list(feed.values())
+    textos = [_textos(item) for item in items]
+    arrays = {}
+    for j, nombre in enumerate(("titulos", "descripciones")):
+        arrays[nombre], arrays[f"{nombre}_offsets"] = _blob(t[j] for t in textos)
+    posiciones = {}
+    for i, item in enumerate(items):
+        for segmento in _segmentos(item["id"]):
+            posiciones.setdefault(segmento, []).append(i)
+    segmentos = sorted(posiciones)
+    arrays["segmentos"] = np.array(segmentos, dtype="U") if segmentos else np.array([], dtype="U1")
+    arrays["segmentos_inicio"] = np.concatenate(
+        [[0], np.cumsum([len(posiciones[s]) for s in segmentos])]).astype(np.int64)
+    arrays["segmentos_posiciones"] = np.array([i for s in segmentos for i in posiciones[s]], dtype=np.int64)
+    return arrays
+
+
+# Índices de serie: bitmaps y arrays ordenados de los filtros del buscador
+# y los segmentos y textos normalizados del feed (FeedIndexadoCompartido)
+registrar_indice("facetas", indice_facetas)
+registrar_indice("feed", indice_feed)
+
+
+# ==========================================
+# FEED EN MEMORIA COMPARTIDA
+# ==========================================
+
+def guardar_feed(directorio, feed):
+    os.makedirs(directorio, exist_ok=True)
+    items = list(feed.values())
+    arrays = {}
+    for campo in CAMPOS:
+        codificados = [(item.get(campo) or "").encode("utf-8") for item in items]
+        with open(os.path.join(directorio, f"{campo}.bin"), "wb") as f:
+            f.write(b"".join(codificados))
+        arrays[f"{campo}_offsets"] = np.concatenate([[0], np.cumsum([len(c) for c in codificados])]).astype(np.int64)
+    ids = np.array([item["id"] for item in items], dtype="U")
+    orden = np.argsort(ids, kind="stable")
+    arrays["ids_ordenados"] = ids[orden]
+    arrays["posiciones"] = orden.astype(np.int64)
+    guardar_arrays(directorio, arrays)
+
+
+def _mapear(ruta):
+    with open(ruta, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ProductoCompartido(Mapping):
+    """Un producto del feed: cada campo se decodifica del mapeo al leerlo."""
+    __slots__ = ("_feed", "_i")
+
+    def __init__(self, feed, i):
+        self._feed = feed
+        self._i = i
+
+    def __getitem__(self, campo):
+        if campo not in self._feed._offsets:
+            raise KeyError(campo)
+        return self._feed._valor(campo, self._i)
+
+    def __iter__(self):
+        return iter(CAMPOS)
+
+    def __len__(self):
+        return len(CAMPOS)
+
+
+class FeedCompartido(Mapping):
+    """Vista de solo lectura con la interfaz de datos_sistema["feed_xml"] (dict g:id -> producto)."""
+
+    def __init__(self, directorio):
+        # Nombre de la generación (<raiz>/<generación>/feed): identifica el contenido
+        self.version = os.path.basename(os.path.dirname(os.path.abspath(directorio)))
+        arrays = cargar_arrays(directorio)
+        self._offsets = {c: arrays[f"{c}_offsets"] for c in CAMPOS}
+        self._blobs = {c: _mapear(os.path.join(directorio, f"{c}.bin")) for c in CAMPOS}
+        self._ids_ordenados = arrays["ids_ordenados"]
+        self._posiciones = arrays["posiciones"]
+        self._n = len(self._posiciones)
+
+    def _valor(self, campo, i):
+        offsets = self._offsets[campo]
+        return self._blobs[campo][offsets[i]:offsets[i + 1]].decode("utf-8")
+
+    def _posicion(self, clave):
+        if not isinstance(clave, str):
+            return None
+        j = int(np.searchsorted(self._ids_ordenados, clave))
+        if j < self._n and self._ids_ordenados[j] == clave:
+            return int(self._posiciones[j])
+        return None
+
+    def __getitem__(self, clave):
+        i = self._posicion(clave)
+        if i is None:
+            raise KeyError(clave)
+        return ProductoCompartido(self, i)
+
+    def __contains__(self, clave):
+        return self._posicion(clave) is not None
+
+    def __iter__(self):
+        return (self._valor("id", i) for i in range(self._n))
+
+    def __len__(self):
+        return self._n
+
+    def values(self):
+        # Orden del feed, sin buscar cada clave
+        return (ProductoCompartido(self, i) for i in range(self._n))
+
+
+class TextosCompartidos(Mapping):
+    """g:id -> (título, descripción) normalizados, decodificados del mapeo al leerlos."""
+
+    def __init__(self, feed, arrays):
+        self._feed = feed
+        self._arrays = arrays
+
+    def _texto(self, nombre, i):
+        offsets = self._arrays[f"{nombre}_offsets"]
+        return self._arrays[nombre][offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __getitem__(self, clave):
+        i = self._feed._posicion(clave)
+        if i is None:
+            raise KeyError(clave)
+        return self._texto("titulos", i), self._texto("descripciones", i)
+
+    def __iter__(self):
+        return iter(self._feed)
+
+    def __len__(self):
+        return len(self._feed)
+
+
+class FeedIndexadoCompartido:
+    """datos_sistema["feed_indices"] de una generación: la interfaz de FeedIndexado sobre los arrays mapeados."""
+
+    def __init__(self, feed, indices):
+        arrays = indices["feed"]
+        self.productos = feed
+        self.version = feed.version
+        self.textos = TextosCompartidos(feed, arrays)
+        self._segmentos = arrays["segmentos"]
+        self._inicio = arrays["segmentos_inicio"]
+        self._posiciones = arrays["segmentos_posiciones"]
+        self._arrays_facetas = indices.get("facetas")
+        self._facetas = None
+        self._lock = threading.Lock()
+
+    def buscar_clave(self, id_csv):
+        """Igual que FeedIndexado.buscar_clave, con búsqueda binaria en los segmentos."""
+        if id_csv in self.productos:
+            return id_csv
+        j = int(np.searchsorted(self._segmentos, id_csv))
+        if j == len(self._segmentos) or self._segmentos[j] != id_csv:
+            return None
+        return self.productos._valor("id", int(self._posiciones[self._inicio[j]]))
+
+    def facetas(self):
+        if self._facetas is None:
+            with self._lock:
+                if self._facetas is None:
+                    from facetas import Facetas
+
+                    if self._arrays_facetas is not None:
+                        self._facetas = Facetas(self._arrays_facetas)
+                    else:
+                        self._facetas = Facetas.desde_feed(self.productos)
+        return self._facetas
+
+
+# ==========================================
+# GENERACIONES
+# ==========================================
+
+def generacion_actual(raiz):
+    """Nombre de la generación vigente o None si aún no se ha publicado ninguna."""
+    try:
+        with open(os.path.join(raiz, ACTUAL), encoding="utf-8") as f:
+            return json.load(f)["nombre"]
+    except FileNotFoundError:
+        return None
+
+
+def necesita_publicar(raiz, origen, contenido_feed):
+    """True si no hay generación o si el feed o alguna fuente del paquete han cambiado."""
+    nombre = generacion_actual(raiz)
+    if nombre is None:
+        return True
+    with open(os.path.join(raiz, nombre, "generacion.json"), encoding="utf-8") as f:
+        info = json.load(f)
+    if info["feed_sha"] != hashlib.sha256(contenido_feed).hexdigest():
+        return True
+    with open(os.path.join(raiz, nombre, "paquete", "manifiesto.json"), encoding="utf-8") as f:
+        return bool(fuentes_cambiadas(json.load(f), origen))
+
+
+def publicar_generacion(raiz, origen, contenido_feed, conservar=2):
+    """Construye una generación completa y la marca como vigente. Devuelve su información."""
+    import pandas as pd
+
+    os.makedirs(raiz, exist_ok=True)
+    temporal = os.path.join(raiz, f".tmp-{os.getpid()}")
+    shutil.rmtree(temporal, ignore_errors=True)
+
+    anterior = generacion_actual(raiz)
+    dir_anterior = os.path.join(raiz, anterior) if anterior else None
+    manifiesto = None
+    if dir_anterior:
+        with open(os.path.join(dir_anterior, "paquete", "manifiesto.json"), encoding="utf-8") as f:
+            manifiesto_anterior = json.load(f)
+        if not fuentes_cambiadas(manifiesto_anterior, origen):
+            # Solo ha cambiado el feed: el paquete de la anterior sirve tal cual (enlaces, sin copiar datos)
+            shutil.copytree(os.path.join(dir_anterior, "paquete"), os.path.join(temporal, "paquete"),
+                            copy_function=os.link)
+            manifiesto = manifiesto_anterior
+    if manifiesto is None:
+        manifiesto = construir_paquete(os.path.join(temporal, "paquete"), origen)
+    feed = parsear_feed(contenido_feed)
+    guardar_feed(os.path.join(temporal, "feed"), feed)
+
+    cambios = None
+    if dir_anterior:
+        feed_anterior = {p["id"]: dict(p) for p in FeedCompartido(os.path.join(dir_anterior, "feed")).values()}
+        cambios = diferenciar(feed_anterior, feed)
+        with open(os.path.join(temporal, "cambios.json"), "w", encoding="utf-8") as f:
+            json.dump(dict(cambios, generacion_anterior=anterior), f, ensure_ascii=False)
+    if CONSTRUCTORES_INDICES:
+        catalogo = pd.read_csv(os.path.join(origen, "encuestas_limpio.csv")).drop_duplicates(subset=["cod_articulo"])
+        for nombre, construir in CONSTRUCTORES_INDICES.items():
+            guardar_arrays(os.path.join(temporal, "indices", nombre), construir(feed, catalogo))
+
+    feed_sha = hashlib.sha256(contenido_feed).hexdigest()
+    info = {
+        "nombre": f"gen-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{manifiesto['hash'][:6]}{feed_sha[:6]}",
+        "creado": datetime.now().isoformat(timespec="seconds"),
+        "paquete": manifiesto["hash"],
+        "feed_sha": feed_sha,
+        "productos": len(feed),
+        "indices": sorted(CONSTRUCTORES_INDICES),
+        "cambios": {tipo: len(claves) for tipo, claves in cambios.items()} if cambios else None,
+    }
+    with open(os.path.join(temporal, "generacion.json"), "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, os.path.join(raiz, info["nombre"]))
+
+    # Publicación atómica: los workers leen ACTUAL y solo ven generaciones completas
+    with open(os.path.join(raiz, ACTUAL + ".tmp"), "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    os.replace(os.path.join(raiz, ACTUAL + ".tmp"), os.path.join(raiz, ACTUAL))
+    if cambios is not None:
+        registrar_cambios(cambios, feed, anterior, info["nombre"], os.path.join(raiz, "cambios.jsonl"))
+
+    generaciones = sorted(d for d in os.listdir(raiz) if d.startswith("gen-"))
+    for viejo in generaciones[:-conservar]:
+        shutil.rmtree(os.path.join(raiz, viejo), ignore_errors=True)
+    return info
+
+
+def cargar_generacion(raiz, nombre, peso_mejora=0.3):
+    """{catalogo, modelo, tabla, feed, feed_indices, indices, manifiesto} de la generación `nombre`, mapeados en memoria.
+
+    `feed_indices` es None en generaciones publicadas sin el índice "feed".
+    """
+    directorio = os.path.join(raiz, nombre)
+    catalogo, modelo, tabla, manifiesto = cargar_paquete(os.path.join(directorio, "paquete"), peso_mejora)
+    dir_indices = os.path.join(directorio, "indices")
+    indices = {}
+    if os.path.isdir(dir_indices):
+        indices = {n: cargar_arrays(os.path.join(dir_indices, n)) for n in sorted(os.listdir(dir_indices))}
+    feed = FeedCompartido(os.path.join(directorio, "feed"))
+    return {
+        "catalogo": catalogo,
+        "modelo": modelo,
+        "tabla": tabla,
+        "feed": feed,
+        "feed_indices": FeedIndexadoCompartido(feed, indices) if "feed" in indices else None,
+        "indices": indices,
+        "manifiesto": manifiesto,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cargador de datos compartidos para los workers de main.py")
+    parser.add_argument("--raiz", default="compartido")
+    parser.add_argument("--origen", default=".", help="Directorio con el CSV, los .npz y la tabla")
+    parser.add_argument("--xml-url", default=os.getenv("XML_URL", "https://www.colchones.es/gmerchantcenter_chati.xml"))
+    parser.add_argument("--cada", type=float, default=900, help="Segundos entre comprobaciones del feed y las fuentes")
+    parser.add_argument("--una-vez", action="store_true", help="Publica (si hace falta) y termina")
+    parser.add_argument("--conservar", type=int, default=2, help="Generaciones que se dejan en disco")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            t0 = time.perf_counter()
+            contenido = descargar_feed(args.xml_url)
+            if necesita_publicar(args.raiz, args.origen, contenido):
+                info = publicar_generacion(args.raiz, args.origen, contenido, args.conservar)
+                print(f"✅ Generación {info['nombre']} publicada: {info['productos']} productos, "
+                      f"paquete {info['paquete']} ({time.perf_counter() - t0:.1f}s)")
+            else:
+                print(f"♻️ Sin cambios, sigue vigente {generacion_actual(args.raiz)}")
+        except Exception as e:
+            print(f"❌ Error publicando generación: {e}")
+        if args.una_vez:
+            break
+        time.sleep(args.cada)
@@ -0,0 +1,198 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+# Longitud máxima del campo resultado_preview (igual que las entradas históricas)
+LONGITUD_PREVIEW = 300
+
+
+class DecisionLogger:
+    """Registro asíncrono de decisiones del agente (router y herramientas).
+
+    - Cada decisión es una línea JSON (JSONL) con el mismo formato que las
+      entradas históricas de agent_decisions.log:
+      timestamp, user_id, pregunta, agente, argumentos, resultado_preview.
+    - El endpoint solo encola (nunca escribe en disco ni espera).
+    - Un hilo de fondo agrupa las entradas y las escribe en lotes.
+    - Rota el fichero por tamaño y/o por tiempo.
+    - Si la cola está llena, la entrada se descarta y se suma al contador
+      `descartadas` en lugar de bloquear la petición.
+    """
+
+    def __init__(self, ruta, max_bytes=10 * 1024 * 1024, rotar_cada_s=24 * 3600,
+                 backups=5, tam_cola=10000, tam_lote=200, intervalo_flush_s=1.0):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self.rotar_cada_s = rotar_cada_s
+        self.backups = backups
+        self.tam_lote = tam_lote
+        self.intervalo_flush_s = intervalo_flush_s
+
+        self._cola = queue.Queue(maxsize=tam_cola)
+        self._parar = threading.Event()
+        self._hilo = None
+        self._lock_arranque = threading.Lock()
+        self._inicio_segmento = None
+
+        # Métricas
+        self.encoladas = 0
+        self.escritas = 0
+        self.descartadas = 0
+        self.errores_escritura = 0
+
+    # ------------------------------------------
+    # API pública (camino de la petición)
+    # ------------------------------------------
+    def registrar(self, user_id, pregunta, agente, argumentos=None, resultado=None, **extra):
+        """Encola una decisión. No bloquea nunca."""
+        if isinstance(resultado, str):
+            preview = resultado[:LONGITUD_PREVIEW]
+        elif resultado is None:
+            preview = ""
+        else:
+            preview = json.dumps(resultado, default=str)[:LONGITUD_PREVIEW]
+
+        entrada = {
+            "timestamp": datetime.now().isoformat(),
+            "user_id": user_id,
+            "pregunta": pregunta,
+            "agente": agente,
+            "argumentos": argumentos or {},
+            "resultado_preview": preview,
+        }
+        # Campos opcionales (ej: tipo="router") se añaden al final para no
+        # romper a quien lea solo las claves históricas
+        entrada.update(extra)
+
+        self._asegurar_hilo()
+        try:
+            self._cola.put_nowait(entrada)
+            self.encoladas += 1
+        except queue.Full:
+            self.descartadas += 1
+
+    def metricas(self):
+        return {
+            "encoladas": self.encoladas,
+            "escritas": self.escritas,
+            "descartadas": self.descartadas,
+            "errores_escritura": self.errores_escritura,
+            "pendientes": self._cola.qsize(),
+        }
+
+    def cerrar(self, timeout=5.0):
+        """Vacía la cola en disco y detiene el hilo de fondo."""
+        self._parar.set()
+        if self._hilo and self._hilo.is_alive():
+            self._hilo.join(timeout)
+
+    # ------------------------------------------
+    # Hilo escritor
+    # ------------------------------------------
+    def _asegurar_hilo(self):
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._lock_arranque:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._parar.clear()
+                self._hilo = threading.Thread(target=self._bucle, name="decision-log", daemon=True)
+                self._hilo.start()
+
+    def _bucle(self):
+        while not self._parar.is_set():
+            lote = self._sacar_lote(timeout=self.intervalo_flush_s)
+            if lote:
+                self._escribir(lote)
+        # Al cerrar, escribimos lo que quede en la cola
+        while True:
+            lote = self._sacar_lote(timeout=0)
+            if not lote:
+                break
+            self._escribir(lote)
+
+    def _sacar_lote(self, timeout):
+        lote = []
+        try:
+            if timeout:
+                lote.append(self._cola.get(timeout=timeout))
+            else:
+                lote.append(self._cola.get_nowait())
+        except queue.Empty:
+            return lote
+        while len(lote) < self.tam_lote:
+            try:
+                lote.append(self._cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _escribir(self, lote):
+        try:
+            self._rotar_si_toca()
+            lineas = "".join(json.dumps(e, default=str) + "\n" for e in lote)
+            carpeta = os.path.dirname(self.ruta)
+            if carpeta:
+                os.makedirs(carpeta, exist_ok=True)
+            with open(self.ruta, "a", encoding="utf-8") as f:
+                f.write(lineas)
+            self.escritas += len(lote)
+        except Exception as e:
+            # Un fallo de disco nunca debe tumbar el servicio
+            self.errores_escritura += len(lote)
+            print(f"❌ Error escribiendo {self.ruta}: {e}")
+
+    # ------------------------------------------
+    # Rotación (agent_decisions.log -> .1 -> .2 ...)
+    # ------------------------------------------
+    def _rotar_si_toca(self):
+        if not os.path.exists(self.ruta):
+            self._inicio_segmento = time.time()
+            return
+        if self._inicio_segmento is None:
+            self._inicio_segmento = self._leer_inicio_segmento()
+
+        por_tamano = self.max_bytes and os.path.getsize(self.ruta) >= self.max_bytes
+        por_tiempo = self.rotar_cada_s and (time.time() - self._inicio_segmento) >= self.rotar_cada_s
+        if por_tamano or por_tiempo:
+            self._rotar()
+
+    def _leer_inicio_segmento(self):
+        """Cuándo empezó el fichero actual: el timestamp de su primera línea.
+
+        El mtime es la última escritura, no el inicio: tras cada reinicio la
+        edad volvería a cero y la rotación por tiempo no llegaría nunca.
+        """
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                primera = f.readline()
+            return datetime.fromisoformat(json.loads(primera)["timestamp"]).timestamp()
+        except (OSError, ValueError, KeyError, TypeError):
+            # Vacío o primera línea ilegible: se cuenta desde ahora
+            return time.time()
+
+    def _rotar(self):
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                origen = f"{self.ruta}.{i}"
+                if os.path.exists(origen):
+                    os.replace(origen, f"{self.ruta}.{i + 1}")
+            os.replace(self.ruta, f"{self.ruta}.1")
+        else:
+            os.remove(self.ruta)
+        self._inicio_segmento = time.time()
+
+
+_logger_global = None
+
+
+def get_decision_logger(ruta="agent_decisions.log", **kwargs):
+    """Devuelve el logger compartido del proceso (se crea en el primer uso)."""
+    global _logger_global
+    if _logger_global is None:
+        _logger_global = DecisionLogger(ruta, **kwargs)
+        atexit.register(_logger_global.cerrar)
+    return _logger_global
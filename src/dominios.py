@@ -0,0 +1,271 @@
+"""
+Dominios (tiendas hermanas) servidos desde el mismo despliegue.
+
+ChatInput.dominio ya filtraba el historial, pero feed, catálogo, modelo,
+colección de Chroma y prompts eran los de colchones.es para todos. Cada
+dominio de DOMINIOS_CONFIG es un inquilino con sus propios datos (mismo
+formato que datos_sistema en main.py) y su propio CicloVida:
+- no se carga nada al arrancar: cada componente (catalogo, feed_xml,
+  rag, fichas, embeddings_productos) se carga en la primera petición que lo usa;
+- se estima la memoria de cada inquilino (arrays, DataFrames, feed,
+  índices del RAG). El que pasa de su presupuesto_mb se avisa al cargarlo
+  y es el primero en descargarse cuando falta memoria;
+- con más de DOMINIOS_MAX_ACTIVOS inquilinos o más de DOMINIOS_MEMORIA_MB
+  entre todos, se descargan los menos usados recientemente (LRU);
+- los que llevan DOMINIOS_INACTIVO_S sin peticiones los descarga el hilo
+  de refresco de main.py (descargar_inactivos), no las peticiones.
+Descargar solo quita las referencias del registro y de las cachés de
+índices: una petición en curso conserva las suyas hasta que termina.
+
+El dominio principal (DOMINIO_PRINCIPAL) y los que no están en la
+configuración siguen usando los componentes globales de main.py.
+
+dominios.json:
+    {
+      "somieres.es": {
+        "directorio": "dominios/somieres.es",
+        "xml_url": "https://www.somieres.es/gmerchantcenter_chati.xml",
+        "rag_dir": "dominios/somieres.es/embeddings_db",
+        "fichas_producto": "dominios/somieres.es/fichas_producto.sqlite",
+        "feed_cambios": "dominios/somieres.es/feed_cambios.jsonl",
+        "embeddings_productos": "dominios/somieres.es/embeddings_productos",
+        "tienda": "Somieres.es",
+        "presupuesto_mb": 300
+      }
+    }
+`directorio` tiene lo mismo que src/ para el recomendador (paquete_arranque/
+o encuestas_limpio.csv + modelos). Sin `rag_dir` se usa el conocimiento del
+dominio principal.
+"""
+import gc
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from ciclo_vida import CicloVida
+
+DOMINIO_PRINCIPAL = os.getenv("DOMINIO_PRINCIPAL", "colchones.es")
+DOMINIOS_CONFIG = os.getenv("DOMINIOS_CONFIG", "dominios.json")
+MAX_ACTIVOS = int(os.getenv("DOMINIOS_MAX_ACTIVOS", "4"))
+# Memoria estimada entre todos los dominios secundarios
+MEMORIA_MB = float(os.getenv("DOMINIOS_MEMORIA_MB", "1024"))
+# Presupuesto de cada dominio que no fija presupuesto_mb en su configuración
+PRESUPUESTO_MB = float(os.getenv("DOMINIOS_PRESUPUESTO_MB", "400"))
+INACTIVO_S = float(os.getenv("DOMINIOS_INACTIVO_S", "1800"))
+
+estadisticas_dominios = {"cargas": 0, "descargas_lru": 0, "descargas_memoria": 0, "descargas_inactivo": 0}
+
+
+def normalizar_dominio(dominio):
+    """ "https://www.Somieres.es:443/x" -> "somieres.es"."""
+    texto = (dominio or "").strip().lower()
+    texto = texto.split("://", 1)[-1].split("/", 1)[0].split(":", 1)[0]
+    return texto[4:] if texto.startswith("www.") else texto
+
+
+def leer_configuracion(ruta=DOMINIOS_CONFIG):
+    """{dominio: config} del JSON (vacío si no existe: solo el dominio principal)."""
+    if not ruta or not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        configuracion = json.load(f)
+    return {normalizar_dominio(d): c for d, c in configuracion.items() if normalizar_dominio(d) != DOMINIO_PRINCIPAL}
+
+
+def tamano_bytes(obj, profundidad=4, _vistos=None):
+    """Estimación de la memoria de `obj`: arrays y DataFrames por su tamaño, contenedores y objetos recorridos."""
+    import sys
+
+    vistos = set() if _vistos is None else _vistos
+    if id(obj) in vistos:
+        return 0
+    vistos.add(id(obj))
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if hasattr(obj, "memory_usage") and hasattr(obj, "columns"):
+        return int(obj.memory_usage(deep=True).sum())
+    total = sys.getsizeof(obj)
+    if profundidad <= 0:
+        return total
+    if isinstance(obj, dict):
+        for clave, valor in obj.items():
+            total += tamano_bytes(clave, profundidad - 1, vistos) + tamano_bytes(valor, profundidad - 1, vistos)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for valor in obj:
+            total += tamano_bytes(valor, profundidad - 1, vistos)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        total += tamano_bytes(vars(obj), profundidad - 1, vistos)
+    return total
+
+
+class Inquilino:
+    """Datos y componentes de un dominio secundario."""
+
+    def __init__(self, dominio, config, componentes, reintento_s=30.0):
+        self.dominio = dominio
+        self.config = config
+        self.presupuesto_mb = float(config.get("presupuesto_mb", PRESUPUESTO_MB))
+        self.datos = {"modelo": None, "catalogo_csv": None, "tabla_recomendaciones": None, "feed_xml": {}, "feed_indices": None,
+                      "indices": {}}
+        self.ciclo = CicloVida(reintento_s=reintento_s)
+        for nombre, cargar in componentes.items():
+            self.ciclo.registrar(nombre, partial(cargar, self))
+        self.ultimo_uso = time.monotonic()
+        self._memoria = (None, 0)
+        self.avisado_presupuesto = False
+
+    def ruta(self, nombre):
+        return os.path.join(self.config.get("directorio", "."), nombre)
+
+    def _indices_rag(self):
+        rag_dir = self.config.get("rag_dir")
+        if not rag_dir:
+            return []
+        from rag.src import indice_bm25, indice_vectorial
+
+        return indice_bm25.indices_de(rag_dir) + indice_vectorial.indices_de(rag_dir)
+
+    def memoria_mb(self):
+        """Memoria estimada; solo se recalcula cuando cambian los componentes o los índices del RAG cargados."""
+        indices = self._indices_rag()
+        firma = (tuple(sorted(self.ciclo.valores())), tuple(id(i) for i in indices))
+        if self._memoria[0] != firma:
+            total = tamano_bytes(self.datos) + sum(tamano_bytes(i) for i in indices)
+            self._memoria = (firma, total / 1e6)
+        return self._memoria[1]
+
+    def liberar(self):
+        rag_dir = self.config.get("rag_dir")
+        if rag_dir:
+            from rag.src import indice_bm25, indice_vectorial
+
+            indice_bm25.olvidar_indices(rag_dir)
+            indice_vectorial.olvidar_indices(rag_dir)
+        self.datos = {}
+        self.ciclo = None
+
+
+class RegistroDominios:
+    """Inquilinos cargados bajo demanda con descarga LRU por número, memoria e inactividad.
+
+    `componentes` es {nombre: cargar(inquilino)}: cada inquilino los registra en su CicloVida.
+    """
+
+    def __init__(self, configuracion, componentes, max_activos=MAX_ACTIVOS, memoria_mb=MEMORIA_MB,
+                 inactivo_s=INACTIVO_S, reintento_s=30.0):
+        self.configuracion = configuracion
+        self.componentes = componentes
+        self.max_activos = max_activos
+        self.memoria_mb = memoria_mb
+        self.inactivo_s = inactivo_s
+        self.reintento_s = reintento_s
+        self._activos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, dominio):
+        """Inquilino del dominio, o None si es el principal o no está configurado."""
+        clave = normalizar_dominio(dominio)
+        config = self.configuracion.get(clave)
+        if config is None:
+            return None
+        with self._lock:
+            inquilino = self._activos.get(clave)
+            if inquilino is None:
+                inquilino = Inquilino(clave, config, self.componentes, self.reintento_s)
+                self._activos[clave] = inquilino
+                estadisticas_dominios["cargas"] += 1
+                print(f"🏬 Dominio {clave} activado ({len(self._activos)} activos).")
+            self._activos.move_to_end(clave)
+            inquilino.ultimo_uso = time.monotonic()
+            descargados = self._ajustar(clave)
+        # Fuera del lock: no hace esperar a las peticiones de los demás dominios
+        if descargados:
+            gc.collect()
+        return inquilino
+
+    def usar(self, dominio, *componentes):
+        """(datos, ciclo) del inquilino con `componentes` asegurados; (None, None) para el dominio principal."""
+        inquilino = self.obtener(dominio)
+        if inquilino is None:
+            return None, None
+        datos, ciclo = inquilino.datos, inquilino.ciclo
+        if ciclo is None:
+            # Descargado entre obtener() y aquí: se vuelve a activar
+            return self.usar(dominio, *componentes)
+        for nombre in componentes:
+            ciclo.asegurar(nombre)
+        # Con los componentes ya cargados se conoce su memoria: quizá haya que descargar otros
+        with self._lock:
+            descargados = self._ajustar(inquilino.dominio)
+            # Descargado mientras tanto por inactivo (hilo de refresco): ya no ocupa nada
+            memoria = inquilino.memoria_mb() if inquilino.ciclo is not None else 0
+        if descargados:
+            gc.collect()
+        if memoria > inquilino.presupuesto_mb and not inquilino.avisado_presupuesto:
+            # Descargarlo ahora solo haría que la próxima petición lo volviera a cargar (feed incluido)
+            inquilino.avisado_presupuesto = True
+            print(f"⚠️ Dominio {inquilino.dominio}: ~{memoria:.0f} MB, por encima de su presupuesto "
+                  f"({inquilino.presupuesto_mb:.0f} MB). Será el primero en descargarse si falta memoria.")
+        return datos, ciclo
+
+    def activos(self):
+        """Inquilinos cargados ahora mismo (copia: se puede recorrer sin el lock)."""
+        with self._lock:
+            return list(self._activos.values())
+
+    def _descargar(self, clave, motivo):
+        inquilino = self._activos.pop(clave)
+        memoria = inquilino.memoria_mb()
+        inquilino.liberar()
+        estadisticas_dominios[f"descargas_{motivo}"] += 1
+        print(f"♻️ Dominio {clave} descargado ({motivo}, ~{memoria:.0f} MB).")
+
+    def _ajustar(self, actual):
+        """Descarga (con el lock tomado) los LRU sobrantes y, si falta memoria, primero los que pasan
+        de su presupuesto. Devuelve si ha descargado alguno (el gc.collect() lo hace quien llama, sin el lock).
+        """
+        descargados = False
+        # _activos va de menos a más reciente: se descarga por el principio
+        while len(self._activos) > self.max_activos and next(iter(self._activos)) != actual:
+            self._descargar(next(iter(self._activos)), "lru")
+            descargados = True
+        while sum(i.memoria_mb() for i in self._activos.values()) > self.memoria_mb:
+            clave = next((c for c, i in self._activos.items()
+                          if c != actual and i.memoria_mb() > i.presupuesto_mb), None)
+            motivo = "memoria"
+            if clave is None:
+                clave, motivo = next(iter(self._activos)), "lru"
+                if clave == actual:
+                    break
+            self._descargar(clave, motivo)
+            descargados = True
+        return descargados
+
+    def descargar_inactivos(self):
+        """Descarga los que llevan inactivo_s sin peticiones (lo llama el hilo de refresco de main.py)."""
+        ahora = time.monotonic()
+        with self._lock:
+            inactivos = [c for c, i in self._activos.items() if ahora - i.ultimo_uso > self.inactivo_s]
+            for clave in inactivos:
+                self._descargar(clave, "inactivo")
+        if inactivos:
+            gc.collect()
+        return len(inactivos)
+
+    def estado(self):
+        """Para /ready: inquilinos activos (del menos al más reciente) con su memoria y componentes."""
+        ahora = time.monotonic()
+        with self._lock:
+            return {
+                clave: {
+                    "memoria_mb": round(inquilino.memoria_mb(), 1),
+                    "presupuesto_mb": inquilino.presupuesto_mb,
+                    "inactivo_s": round(ahora - inquilino.ultimo_uso, 1),
+                    "componentes": {n: c["estado"] for n, c in inquilino.ciclo.estado().items()},
+                }
+                for clave, inquilino in self._activos.items()
+            }
@@ -0,0 +1,201 @@
+"""
+Embeddings de los productos del feed para la búsqueda semántica del BUSCADOR.
+
+logica_buscar_accesorios solo busca las palabras tal cual en título y
+descripción: "algo fresquito para el verano" o "almohada para cervicales"
+no encuentran nada y acaban en el formulario de contacto. Con este módulo
+un proceso aparte embebe cada producto (título + descripción) con el
+proveedor de embeddings del RAG y guarda una matriz compacta
+(indice_vectorial.IndiceVectorial: float16 en disco y, con OpenAI, las
+primeras --dimensiones componentes renormalizadas):
+
+    embeddings_productos/
+        vectores.npy      una fila por producto, normalizada
+        chunks.json       g:id, texto embebido, huella y (proveedor, dimensiones)
+
+- solo se embeben los productos nuevos y los que cambian de huella
+  (feed_incremental.huella); el resto reutiliza su fila y los que salen
+  del feed desaparecen;
+- los workers cargan la matriz y la recargan cuando el indexador
+  publica otra (se sustituye el directorio de una vez). Cada búsqueda
+  embebe la consulta una vez y puntúa todo el catálogo con un producto
+  matriz-vector (combinar()).
+
+Indexador (desde src/):
+    python embeddings_productos.py --cada 3600
+Workers:
+    EMBEDDINGS_PRODUCTOS=embeddings_productos uvicorn main:app
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from feed_incremental import huella
+from feed_xml import descargar_feed, parsear_feed
+from rag.src.indice_vectorial import IndiceVectorial, reducir_dimensiones
+
+# Productos por llamada a la API de embeddings
+LOTE = 256
+
+
+def texto_producto(item):
+    """Título y descripción del producto sin los saltos y tabuladores del feed."""
+    titulo = " ".join((item.get("titulo") or "").split())
+    descripcion = " ".join((item.get("descripcion") or "").split())
+    return f"{titulo}. {descripcion}" if descripcion else titulo
+
+
+def modelo_embeddings(proveedor=None):
+    """(modelo de langchain, nombre del proveedor): el mismo que usa el RAG si no se indica otro."""
+    from rag.src.colchones_rag import configuration, get_embeddings_model
+
+    proveedor = proveedor or configuration["embeddings"]
+    return get_embeddings_model(proveedor), proveedor
+
+
+def indexar(feed, anterior=None, modelo=None, proveedor=None, dimensiones=None, cuantizacion="float16", lote=LOTE):
+    """(IndiceVectorial de los productos de `feed`, resumen). Reutiliza las filas de `anterior` sin cambios."""
+    firma = (proveedor, dimensiones)
+    previas = {}
+    if anterior is not None and anterior.version == firma:
+        previas = {g_id: (fila, m.get("huella")) for fila, (g_id, m) in enumerate(zip(anterior.ids, anterior.metadatas))}
+
+    ids = list(feed)
+    huellas = [huella(feed[g_id]) for g_id in ids]
+    textos = [texto_producto(feed[g_id]) for g_id in ids]
+    pendientes = [i for i, g_id in enumerate(ids) if previas.get(g_id, (None, None))[1] != huellas[i]]
+    reutilizados = [(i, previas[g_id][0]) for i, g_id in enumerate(ids)
+                    if g_id in previas and previas[g_id][1] == huellas[i]]
+
+    vectores = None
+    for inicio in range(0, len(pendientes), lote):
+        bloque = pendientes[inicio:inicio + lote]
+        nuevos = reducir_dimensiones(np.asarray(modelo.embed_documents([textos[i] for i in bloque]), dtype=np.float32),
+                                     dimensiones)
+        if vectores is None:
+            vectores = np.zeros((len(ids), nuevos.shape[1]), dtype=np.float32)
+        vectores[bloque] = nuevos
+    if reutilizados:
+        if vectores is None:
+            vectores = np.zeros((len(ids), anterior.matriz.shape[1]), dtype=np.float32)
+        destino, origen = map(list, zip(*reutilizados))
+        filas = np.asarray(anterior.matriz[origen], dtype=np.float32)
+        if anterior.escala is not None:
+            # int8: se deshace la escala por dimensión (IndiceVectorial vuelve a normalizar)
+            filas = filas * anterior.escala
+        vectores[destino] = filas
+    if vectores is None:
+        vectores = np.zeros((0, dimensiones or 1), dtype=np.float32)
+
+    indice = IndiceVectorial(ids, textos, [{"huella": h} for h in huellas], vectores, firma, cuantizacion)
+    resumen = {"embebidos": len(pendientes), "reutilizados": len(reutilizados),
+               "borrados": len(set(previas) - set(ids))}
+    return indice, resumen
+
+
+class EmbeddingsProductos:
+    """Matriz de productos publicada por el indexador, recargada cuando cambia en disco."""
+
+    def __init__(self, ruta, modelo=None):
+        self.ruta = ruta
+        self._modelo = modelo
+        self._lock = threading.Lock()
+        self._version = None
+        # (IndiceVectorial, {g:id: fila}) juntos: una recarga nunca mezcla la matriz de uno con las filas de otro
+        self._actual = (None, {})
+        indice, _ = self.actual()
+        if self._modelo is None:
+            self._modelo, _ = modelo_embeddings(indice.version[0])
+
+    def _version_en_disco(self):
+        estado = os.stat(os.path.join(self.ruta, "chunks.json"))
+        return (estado.st_mtime_ns, estado.st_ino)
+
+    def actual(self):
+        """(IndiceVectorial, filas) vigentes: un stat por llamada y recarga si el indexador ha publicado otro."""
+        version = self._version_en_disco()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    indice = IndiceVectorial.cargar(self.ruta)
+                    self._actual = (indice, {g_id: i for i, g_id in enumerate(indice.ids)})
+                    self._version = version
+        return self._actual
+
+    def __len__(self):
+        return len(self._actual[0])
+
+    @property
+    def version(self):
+        """Versión en disco del índice vigente (para la caché del buscador)."""
+        self.actual()
+        return self._version
+
+    def similitudes(self, consulta):
+        """(índice, filas, similitud coseno de cada fila con `consulta`): una llamada de embeddings y un producto."""
+        indice, filas = self.actual()
+        vector = reducir_dimensiones(np.asarray(self._modelo.embed_query(consulta), dtype=np.float32),
+                                     indice.matriz.shape[1])
+        norma = np.linalg.norm(vector)
+        return indice, filas, indice.similitudes(vector / norma if norma else vector)
+
+    def combinar(self, consulta, lexicos, feed, maximo_lexico, peso=0.5, umbral=0.3, k=20):
+        """[(puntuación, producto)] mezclando la puntuación léxica (normalizada a 0-1) con la semántica.
+
+        `lexicos` son los (puntuación, producto) del buscador léxico. Además entran los `k` productos
+        más parecidos por embeddings con similitud >= `umbral`, aunque no contengan ninguna palabra.
+        """
+        indice, filas, similitudes = self.similitudes(consulta)
+        puntuados = {}
+        for score, item in lexicos:
+            # Los productos aún sin embeber solo tienen la puntuación léxica
+            i = filas.get(item["id"])
+            semantica = float(similitudes[i]) if i is not None else 0.0
+            puntuados[item["id"]] = ((1 - peso) * score / maximo_lexico + peso * max(semantica, 0.0), item)
+        if len(similitudes):
+            n = min(k, len(similitudes))
+            for i in np.argpartition(-similitudes, n - 1)[:n]:
+                g_id = indice.ids[i]
+                if similitudes[i] >= umbral and g_id not in puntuados and g_id in feed:
+                    puntuados[g_id] = (peso * float(similitudes[i]), feed[g_id])
+        return list(puntuados.values())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Embeddings de los productos del feed para el BUSCADOR semántico")
+    parser.add_argument("--salida", default=os.getenv("EMBEDDINGS_PRODUCTOS") or "embeddings_productos")
+    parser.add_argument("--xml-url", default=os.getenv("XML_URL", "https://www.colchones.es/gmerchantcenter_chati.xml"))
+    parser.add_argument("--proveedor", default=None, help="Proveedor de embeddings (por defecto el del RAG)")
+    parser.add_argument("--dimensiones", type=int, default=256,
+                        help="Dimensiones guardadas con OpenAI (text-embedding-3 admite truncar); 0 = todas")
+    parser.add_argument("--cuantizacion", default="float16", choices=["float32", "float16", "int8"])
+    parser.add_argument("--cada", type=float, default=3600, help="Segundos entre pasadas")
+    parser.add_argument("--una-vez", action="store_true", help="Una pasada y termina")
+    args = parser.parse_args()
+
+    modelo, proveedor = modelo_embeddings(args.proveedor)
+    # Truncar solo tiene sentido con text-embedding-3; los n-gramas reparten los rasgos por todo el vector
+    dimensiones = (args.dimensiones or None) if proveedor == "openai" else None
+    anterior = None
+    if os.path.exists(os.path.join(args.salida, "chunks.json")):
+        anterior = IndiceVectorial.cargar(args.salida)
+    while True:
+        try:
+            t0 = time.perf_counter()
+            feed = parsear_feed(descargar_feed(args.xml_url))
+            indice, resumen = indexar(feed, anterior, modelo, proveedor, dimensiones, args.cuantizacion)
+            if resumen["embebidos"] or resumen["borrados"] or anterior is None:
+                indice.guardar(args.salida)
+            anterior = indice
+            print(f"✅ Embeddings de productos: {resumen['embebidos']} embebidos, {resumen['reutilizados']} "
+                  f"reutilizados, {resumen['borrados']} borrados ({len(indice)} en {args.salida}, "
+                  f"{indice.bytes_vectores / 1e6:.1f} MB, {time.perf_counter() - t0:.1f}s)")
+        except Exception as e:
+            print(f"❌ Error indexando productos: {e}")
+        if args.una_vez:
+            break
+        time.sleep(args.cada)
@@ -0,0 +1,176 @@
+"""
+Facetas del feed: atributos con tipo para filtrar el BUSCADOR.
+
+"canapé 150x190 por menos de 400€" o "colchón de 30 cm de grosor" no se
+podían filtrar: el precio del feed es un texto ("401.11 EUR") y la medida
+y el grosor solo aparecen dentro del título o la descripción. Al cargar
+el feed se extraen de cada producto (extraer_atributos):
+- precio (float), ancho y largo de la medida ("150X190"), grosor en cm;
+- categoría (la primera palabra de CATEGORIAS que aparece en el título);
+- materiales (varios por producto; del título o, si no hay, de la
+  descripción).
+
+Con ellos se construye un índice por foto del feed (Facetas): para cada
+valor de categoría y material, un bitmap (array bool de una posición por
+producto); para cada atributo numérico, sus valores ordenados con la
+posición de cada uno, de modo que un rango es un searchsorted. Filtrar es
+intersecar bitmaps, sin recorrer el feed. Los atributos se extraen solo de
+los productos nuevos o cambiados (feed_incremental.FeedIndexado) y en
+modo DATOS_COMPARTIDOS el cargador publica los arrays con cada generación.
+"""
+import re
+
+import numpy as np
+
+from feed_incremental import normalizar_texto
+
+# Raíz en el título normalizado -> categoría (la que aparece antes manda: "Protector de colchón" es protector)
+CATEGORIAS = {
+    "colchon": "colchon", "almohad": "almohada", "canape": "canape", "somier": "somier", "base": "base",
+    "cabecero": "cabecero", "topper": "topper", "sobrecolchon": "topper", "protector": "protector",
+    "funda": "funda", "nordico": "nordico", "edredon": "nordico", "sabana": "sabanas", "cojin": "cojin",
+    "cama": "cama",
+}
+MATERIALES = {
+    "viscoelastica": r"visco",
+    "muelles_ensacados": r"muelles? ensacados?",
+    "muelles": r"muelles?\b",
+    "latex": r"latex",
+    "espuma": r"espum|\bhr\b",
+    "fibra": r"\bfibras?\b",
+    "plumon": r"\bplum(?:a|on)",
+    "algodon": r"algodon",
+    "microfibra": r"microfibra",
+    "madera": r"madera",
+    "tapizado": r"tapizad",
+    "laminas": r"laminas",
+}
+NUMERICOS = ("precio", "ancho", "largo", "grosor")
+
+_CATEGORIA = re.compile(r"\b(" + "|".join(CATEGORIAS) + ")")
+_MATERIALES = {nombre: re.compile(patron) for nombre, patron in MATERIALES.items()}
+_MEDIDA = re.compile(r"(\d{2,3})\s*[x×]\s*(\d{2,3})")
+_PRECIO = re.compile(r"\d+(?:[.,]\d+)?")
+_GROSOR = re.compile(r"(\d{1,2}(?:[.,]\d+)?)\s*cm\s+de\s+(?:grosor|altura)"
+                     r"|(?:grosor|altura)(?:\s+de|:)?\s+(\d{1,2}(?:[.,]\d+)?)\s*cm")
+
+
+def _numero(texto):
+    return float(texto.replace(",", "."))
+
+
+def leer_medida(texto):
+    """(ancho, largo) de "150x190" / "150 X 190" o (None, None)."""
+    encontrada = _MEDIDA.search((texto or "").lower())
+    return (int(encontrada.group(1)), int(encontrada.group(2))) if encontrada else (None, None)
+
+
+def extraer_atributos(item):
+    """(precio, ancho, largo, grosor, categoría, materiales) de un producto del feed; None donde no hay dato."""
+    titulo = normalizar_texto(item.get("titulo"))
+    descripcion = normalizar_texto(item.get("descripcion"))
+
+    precio = _PRECIO.search(item.get("precio") or "")
+    ancho, largo = leer_medida(titulo)
+    if ancho is None:
+        # "1048-150x190": la medida va en el g:id
+        ancho, largo = leer_medida(item.get("id"))
+    grosor = _GROSOR.search(titulo) or _GROSOR.search(descripcion)
+    categoria = _CATEGORIA.search(titulo)
+    materiales = frozenset(n for n, patron in _MATERIALES.items() if patron.search(titulo))
+    if not materiales:
+        materiales = frozenset(n for n, patron in _MATERIALES.items() if patron.search(descripcion))
+    return (
+        _numero(precio.group()) if precio else None,
+        ancho,
+        largo,
+        _numero(grosor.group(1) or grosor.group(2)) if grosor else None,
+        CATEGORIAS[categoria.group(1)] if categoria else "otros",
+        materiales,
+    )
+
+
+class Facetas:
+    """Bitmaps por categoría y material y arrays ordenados por atributo numérico de una foto del feed."""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.ids = arrays["ids"]
+        self._categorias = {str(v): i for i, v in enumerate(arrays["categorias"])}
+        self._materiales = {str(v): i for i, v in enumerate(arrays["materiales"])}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def construir(cls, ids, atributos):
+        """`atributos` en el mismo orden que `ids` (tuplas de extraer_atributos)."""
+        n = len(ids)
+        arrays = {"ids": np.array(list(ids), dtype="U") if n else np.array([], dtype="U1")}
+        for j, nombre in enumerate(NUMERICOS):
+            valores = np.array([np.nan if a[j] is None else a[j] for a in atributos], dtype=np.float64)
+            # Los NaN (sin dato) quedan al final del orden y fuera de cualquier rango
+            orden = np.argsort(valores, kind="stable")
+            arrays[nombre] = valores
+            arrays[f"{nombre}_orden"] = orden.astype(np.int64)
+            arrays[f"{nombre}_ordenados"] = valores[orden]
+        categorias = sorted({a[4] for a in atributos})
+        codigos = {c: i for i, c in enumerate(categorias)}
+        bitmaps = np.zeros((len(categorias), n), dtype=bool)
+        for i, a in enumerate(atributos):
+            bitmaps[codigos[a[4]], i] = True
+        arrays["categorias"] = np.array(categorias, dtype="U")
+        arrays["categoria_bitmaps"] = bitmaps
+        materiales = sorted(MATERIALES)
+        bitmaps = np.zeros((len(materiales), n), dtype=bool)
+        for k, material in enumerate(materiales):
+            bitmaps[k] = [material in a[5] for a in atributos]
+        arrays["materiales"] = np.array(materiales, dtype="U")
+        arrays["material_bitmaps"] = bitmaps
+        return cls(arrays)
+
+    @classmethod
+    def desde_feed(cls, feed):
+        """Extrae los atributos de todo el feed (sin FeedIndexado; p. ej. en el cargador compartido)."""
+        return cls.construir(list(feed), [extraer_atributos(item) for item in feed.values()])
+
+    def _rango(self, nombre, minimo, maximo):
+        ordenados = self.arrays[f"{nombre}_ordenados"]
+        desde = 0 if minimo is None else np.searchsorted(ordenados, minimo, side="left")
+        # Los NaN van al final: el rango abierto por arriba termina en el último valor conocido
+        hasta = np.searchsorted(ordenados, np.inf if maximo is None else maximo, side="right")
+        mascara = np.zeros(len(self.ids), dtype=bool)
+        mascara[self.arrays[f"{nombre}_orden"][desde:hasta]] = True
+        return mascara
+
+    def filtrar(self, categoria=None, material=None, medida=None, precio_min=None, precio_max=None,
+                grosor_min=None, grosor_max=None):
+        """g:ids que cumplen todos los filtros (en el orden del feed), o None si no hay ningún filtro."""
+        mascaras = []
+        if categoria:
+            i = self._categorias.get(normalizar_texto(categoria))
+            mascaras.append(self.arrays["categoria_bitmaps"][i] if i is not None else np.zeros(len(self), dtype=bool))
+        if material:
+            i = self._materiales.get(normalizar_texto(material).replace(" ", "_"))
+            mascaras.append(self.arrays["material_bitmaps"][i] if i is not None else np.zeros(len(self), dtype=bool))
+        if medida:
+            ancho, largo = leer_medida(medida)
+            if ancho is None:
+                mascaras.append(np.zeros(len(self), dtype=bool))
+            else:
+                mascaras.append(self._rango("ancho", ancho, ancho) & self._rango("largo", largo, largo))
+        if precio_min is not None or precio_max is not None:
+            mascaras.append(self._rango("precio", precio_min, precio_max))
+        if grosor_min is not None or grosor_max is not None:
+            mascaras.append(self._rango("grosor", grosor_min, grosor_max))
+        if not mascaras:
+            return None
+        mascara = mascaras[0].copy()
+        for otra in mascaras[1:]:
+            mascara &= otra
+        return [str(g_id) for g_id in self.ids[np.flatnonzero(mascara)]]
+
+
+def indice_facetas(feed, catalogo):
+    """Constructor para datos_compartidos.registrar_indice: los arrays de Facetas de la generación."""
+    return Facetas.desde_feed(feed).arrays
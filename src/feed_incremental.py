@@ -0,0 +1,172 @@
+"""
+Recarga incremental del feed y de sus índices derivados.
+
+Cada recarga del feed reconstruía todo (y el buscador y el recomendador
+recalculaban en cada petición lo que necesitaban: textos normalizados de
+todos los productos, búsqueda con regex del id del catálogo entre todas
+las claves). Ahora el feed vive en un FeedIndexado:
+- productos:  {g:id: producto}, lo de siempre (datos_sistema["feed_xml"]);
+- segmentos:  {trozo del g:id entre guiones: [g:id...]}, para encontrar
+              el producto de un cod_articulo ("1048" -> "1048-150x190")
+              sin recorrer el feed;
+- textos:     {g:id: (título, descripción) normalizados} para el buscador;
+- atributos:  {g:id: (precio, ancho, largo, grosor, categoría, materiales)}
+              (facetas.extraer_atributos), con los que se construyen los
+              bitmaps de los filtros del buscador (facetas()).
+
+Al recargar se compara con la foto anterior (mismo g:id con otro
+contenido = cambio) y solo se recalculan las entradas de las altas, bajas
+y cambios. La foto nueva es otra (copia superficial + parches): las
+peticiones en curso siguen con la anterior. Los cambios se añaden a
+FEED_CAMBIOS (JSON por línea) para quien los quiera seguir.
+"""
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from datetime import datetime
+
+from feed_xml import CAMPOS
+
+# Registro de cambios del feed de cada worker (vacío: no se escribe). Con varios workers
+# mejor el del cargador compartido (<raiz>/cambios.jsonl), que lo escribe una sola vez
+FEED_CAMBIOS = os.getenv("FEED_CAMBIOS", "")
+
+estadisticas_feed = {"recargas": 0, "sin_cambios": 0, "altas": 0, "bajas": 0, "cambios": 0}
+
+
+def normalizar_texto(texto):
+    """ "Colchón Viscoelástico" -> "colchon viscoelastico" (minúsculas y sin tildes)."""
+    if not texto:
+        return ""
+    return ''.join(c for c in unicodedata.normalize('NFD', texto.lower())
+                   if unicodedata.category(c) != 'Mn')
+
+
+def huella(item):
+    """Hash del contenido de un producto del feed (para el registro de cambios)."""
+    return hashlib.sha1("\x1f".join((item.get(c) or "") for c in CAMPOS).encode("utf-8")).hexdigest()[:16]
+
+
+def diferenciar(anterior, nuevo):
+    """{"altas", "bajas", "cambios"}: g:ids nuevos, desaparecidos y con otro contenido."""
+    altas = [k for k in nuevo if k not in anterior]
+    bajas = [k for k in anterior if k not in nuevo]
+    # Comparar los dicts es C puro; solo se calcula la huella de lo que cambia
+    cambios = [k for k, item in nuevo.items() if k in anterior and anterior[k] != item]
+    return {"altas": altas, "bajas": bajas, "cambios": cambios}
+
+
+def _segmentos(g_id):
+    # Mismo criterio que la regex (^|-)id(-|$) del recomendador
+    return set(g_id.split("-"))
+
+
+def _textos(item):
+    return normalizar_texto(item.get("titulo")), normalizar_texto(item.get("descripcion", ""))
+
+
+def _atributos(item):
+    from facetas import extraer_atributos
+
+    return extraer_atributos(item)
+
+
+class FeedIndexado:
+    """Foto inmutable del feed con sus índices derivados."""
+
+    def __init__(self, productos, segmentos, textos, atributos, version=None):
+        self.productos = productos
+        self.segmentos = segmentos
+        self.textos = textos
+        self.atributos = atributos
+        self.version = version
+        self.orden = dict(zip(productos, range(len(productos))))
+        self._facetas = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def construir(cls, feed, version=None):
+        segmentos = {}
+        for g_id in feed:
+            for segmento in _segmentos(g_id):
+                segmentos.setdefault(segmento, []).append(g_id)
+        return cls(dict(feed), segmentos, {g_id: _textos(item) for g_id, item in feed.items()},
+                   {g_id: _atributos(item) for g_id, item in feed.items()}, version)
+
+    def actualizar(self, feed, version=None):
+        """(foto nueva, cambios) aplicando solo las diferencias con `feed` recién parseado."""
+        cambios = diferenciar(self.productos, feed)
+        tocados = cambios["altas"] + cambios["cambios"]
+
+        # Orden del feed nuevo; los productos sin cambios conservan su objeto
+        productos = {g_id: self.productos.get(g_id, item) for g_id, item in feed.items()}
+        for g_id in cambios["cambios"]:
+            productos[g_id] = feed[g_id]
+
+        textos = dict(self.textos)
+        atributos = dict(self.atributos)
+        for g_id in cambios["bajas"]:
+            del textos[g_id]
+            del atributos[g_id]
+        for g_id in tocados:
+            textos[g_id] = _textos(feed[g_id])
+            atributos[g_id] = _atributos(feed[g_id])
+
+        segmentos = dict(self.segmentos)
+        nuevos, afectados = {}, set()
+        for g_id in cambios["altas"]:
+            for segmento in _segmentos(g_id):
+                nuevos.setdefault(segmento, []).append(g_id)
+        for g_id in cambios["bajas"]:
+            afectados |= _segmentos(g_id)
+        for segmento in afectados | set(nuevos):
+            claves = [g for g in segmentos.get(segmento, []) if g in productos] + nuevos.get(segmento, [])
+            if claves:
+                segmentos[segmento] = claves
+            else:
+                segmentos.pop(segmento, None)
+        return FeedIndexado(productos, segmentos, textos, atributos, version), cambios
+
+    def facetas(self):
+        """facetas.Facetas de esta foto, construidas en el primer filtro (los atributos ya están extraídos)."""
+        if self._facetas is None:
+            with self._lock:
+                if self._facetas is None:
+                    from facetas import Facetas
+
+                    self._facetas = Facetas.construir(list(self.productos), [self.atributos[g] for g in self.productos])
+        return self._facetas
+
+    def buscar_clave(self, id_csv):
+        """g:id del producto de un cod_articulo: el mismo id o el primero del feed que lo lleva entre guiones."""
+        if id_csv in self.productos:
+            return id_csv
+        claves = self.segmentos.get(id_csv)
+        if not claves:
+            return None
+        return min(claves, key=self.orden.__getitem__)
+
+
+def registrar_cambios(cambios, productos, version_anterior, version, ruta=FEED_CAMBIOS):
+    """Cuenta los cambios y los añade al registro (una línea JSON por recarga con cambios)."""
+    estadisticas_feed["recargas"] += 1
+    total = sum(len(v) for v in cambios.values())
+    if not total:
+        estadisticas_feed["sin_cambios"] += 1
+        return
+    for tipo, claves in cambios.items():
+        estadisticas_feed[tipo] += len(claves)
+    if not ruta:
+        return
+    linea = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "version_anterior": version_anterior,
+        "version": version,
+        "altas": {g_id: huella(productos[g_id]) for g_id in cambios["altas"]},
+        "cambios": {g_id: huella(productos[g_id]) for g_id in cambios["cambios"]},
+        "bajas": cambios["bajas"],
+    }
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write(json.dumps(linea, ensure_ascii=False) + "\n")
@@ -0,0 +1,38 @@
+"""
+Descarga y parseo del feed de Google Merchant (gmerchantcenter_chati.xml).
+
+Lo usan main.py (cada worker descarga su feed) y datos_compartidos.py (el
+cargador lo descarga una vez y lo publica para todos los workers).
+"""
+import xml.etree.ElementTree as ET
+
+NS = {'g': 'http://base.google.com/ns/1.0'}
+CAMPOS = ["id", "titulo", "descripcion", "precio", "link", "imagen"]
+
+
+def descargar_feed(url, timeout=10):
+    """Contenido (bytes) del feed. Lanza excepción si la descarga falla."""
+    import requests
+
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content
+
+
+def parsear_feed(contenido):
+    """{g:id: {id, titulo, descripcion, precio, link, imagen}} en el orden del feed."""
+    root = ET.fromstring(contenido)
+    feed = {}
+    for item in root.findall('./channel/item'):
+        try:
+            g_id_full = item.find('g:id', NS).text.strip()
+            feed[g_id_full] = {
+                "id": g_id_full,
+                "titulo": item.find('title').text,
+                "descripcion": item.find('description').text or "",
+                "precio": item.find('g:price', NS).text,
+                "link": item.find('link').text,
+                "imagen": item.find('g:image_link', NS).text
+            }
+        except: continue
+    return feed
@@ -0,0 +1,203 @@
+"""
+Recuperación por secciones sobre la ficha de producto (herramienta FICHA_PRODUCTO).
+
+logica_consultar_producto_actual mandaba a gpt-4o la ficha entera en
+Markdown (características, tabla de precios por medida, opiniones,
+[FOTO: ...]...) para cualquier pregunta, aunque fuera "¿qué plazo de
+entrega tiene?". Aquí:
+1. la ficha se parte por sus títulos (# del Markdown de parser_markdown)
+   y cada sección se etiqueta: caracteristicas, precios, entrega,
+   opiniones, descripcion u otros; las líneas [FOTO: ...] van a "fotos";
+2. cada sección se puntúa contra la pregunta con los términos del
+   índice BM25 del RAG (mismas tildes, plurales y stopwords), dando más
+   peso al vocabulario de su etiqueta y a su título, más el parecido de
+   embeddings locales (ngramas, sin llamar a la API) para desempatar;
+3. se manda la cabecera (nombre del producto) y las secciones
+   relevantes, en el orden de la ficha, hasta FICHA_PRESUPUESTO_TOKENS.
+   Si ninguna lo es ("¿me lo recomiendas?"), las de PRIORIDAD.
+"""
+import os
+import re
+import threading
+
+from rag.src.contexto import contar_tokens
+from rag.src.indice_bm25 import tokenizar
+
+PRESUPUESTO_TOKENS = int(os.getenv("FICHA_PRESUPUESTO_TOKENS", "400"))
+# Mínimo de puntos para que una sección cuente como relevante
+PUNTUACION_MINIMA = 2.0
+# Fracción de los puntos de la mejor sección que necesita otra para acompañarla
+FRACCION_MEJOR = 0.5
+# Puntos por el coseno de embeddings ngramas (no llega solo a PUNTUACION_MINIMA)
+PESO_EMBEDDINGS = 1.5
+# Con menos tokens que esto no se recorta: se manda la ficha entera
+FICHA_PEQUENA = 150
+
+# Vocabulario de cada etiqueta: sirve para etiquetar la sección por su título
+# y para que la pregunta la encuentre aunque no repita sus palabras
+VOCABULARIO = {
+    "precios": "precio precios cuesta cuestan vale valen coste euros € medida medidas tamaño oferta descuento "
+               "rebaja barato caro pagar",
+    "entrega": "entrega plazo envío envíos enviar llega llegar tarda tardar recibir recibo transporte portes "
+               "montaje recogida devolución días 24/48h",
+    "caracteristicas": "características característica ficha técnica especificaciones núcleo grosor altura "
+                       "firmeza firme blando duro material materiales composición acolchado tejido funda "
+                       "muelles viscoelástica látex cara capas fabricación fabricado garantía transpirable",
+    "opiniones": "opiniones opinión valoraciones valoración comentarios clientes reseñas estrellas "
+                 "recomendable merece experiencia",
+    "fotos": "foto fotos imagen imágenes aspecto color colores",
+    "descripcion": "descripción qué cómo sirve ideal recomendado",
+}
+TERMINOS_ETIQUETA = {etiqueta: set(tokenizar(texto)) for etiqueta, texto in VOCABULARIO.items()}
+# Sin pistas en la pregunta, lo que más ayuda a contestar sobre el producto
+PRIORIDAD = ["descripcion", "caracteristicas", "precios", "entrega", "opiniones", "otros", "fotos"]
+
+_TITULO = re.compile(r"^(#{1,6})\s+(.*)")
+_MEDIDA = re.compile(r"\b\d{2,3}\s*x\s*\d{2,3}\b", re.I)
+
+estadisticas_ficha = {"consultas": 0, "tokens_ficha": 0, "tokens_enviados": 0, "recortadas": 0}
+# registrar() se llama desde los hilos de los endpoints
+lock_estadisticas = threading.Lock()
+
+
+# ==========================================
+# SECCIONES
+# ==========================================
+
+def _etiquetar(titulo, texto, primera):
+    terminos_titulo = set(tokenizar(titulo))
+    for etiqueta in ("precios", "entrega", "opiniones", "caracteristicas", "descripcion"):
+        if terminos_titulo & TERMINOS_ETIQUETA[etiqueta]:
+            return etiqueta
+    # Sin título reconocible: por el contenido
+    lineas_tabla = [l for l in texto.splitlines() if l.startswith("|")]
+    if lineas_tabla and sum("€" in l or _MEDIDA.search(l) is not None for l in lineas_tabla) > len(lineas_tabla) / 2:
+        return "precios"
+    if lineas_tabla:
+        return "caracteristicas"
+    return "descripcion" if primera else "otros"
+
+
+def secciones_ficha(markdown):
+    """[{"etiqueta", "titulo", "texto"}] de la ficha en Markdown, en su orden; las fotos en una sección aparte."""
+    bloques, fotos = [], []
+    titulo, lineas = "", []
+    for linea in markdown.splitlines():
+        encontrado = _TITULO.match(linea)
+        if encontrado:
+            if titulo or lineas:
+                bloques.append((titulo, lineas))
+            titulo, lineas = linea, []
+        elif linea.startswith("[FOTO:"):
+            fotos.append(linea)
+        else:
+            lineas.append(linea)
+    if titulo or lineas:
+        bloques.append((titulo, lineas))
+
+    secciones = []
+    for i, (titulo, lineas) in enumerate(bloques):
+        texto = "\n".join(lineas)
+        nombre = _TITULO.sub(r"\2", titulo)
+        secciones.append({
+            "etiqueta": _etiquetar(nombre, texto, i == 0),
+            "titulo": titulo,
+            "texto": "\n".join(l for l in [titulo] + lineas if l),
+        })
+    if fotos:
+        secciones.append({"etiqueta": "fotos", "titulo": "", "texto": "\n".join(fotos)})
+    return secciones
+
+
+# ==========================================
+# PUNTUACIÓN
+# ==========================================
+
+def puntuar(pregunta, secciones):
+    """Puntos de cada sección: 3 por término de la pregunta en el vocabulario de su etiqueta,
+    2 en su título o en su texto. Las medidas ("150x190") cuentan en la sección que las tenga."""
+    terminos = set(tokenizar(pregunta))
+    medidas = {m.replace(" ", "").lower() for m in _MEDIDA.findall(pregunta)}
+    puntos = []
+    for seccion in secciones:
+        texto = seccion["texto"]
+        p = 3.0 * len(terminos & TERMINOS_ETIQUETA.get(seccion["etiqueta"], set()))
+        p += 2.0 * len(terminos & set(tokenizar(seccion["titulo"])))
+        p += 2.0 * len(terminos & set(tokenizar(texto)))
+        p += 3.0 * sum(m in texto.replace(" ", "").lower() for m in medidas)
+        puntos.append(p)
+    return puntos
+
+
+def _parecido_embeddings(pregunta, secciones):
+    import numpy as np
+
+    try:
+        from rag.src.embeddings_locales import EmbeddingsNgramas
+    except ImportError:
+        return [0.0] * len(secciones)
+    modelo = EmbeddingsNgramas()
+    consulta = np.asarray(modelo.embed_query(pregunta), dtype=np.float32)
+    vectores = np.asarray(modelo.embed_documents(
+        [f"{VOCABULARIO.get(s['etiqueta'], '')} {s['texto']}" for s in secciones]), dtype=np.float32)
+    return list(vectores @ consulta)
+
+
+def _recortar_lineas(texto, tokens_disponibles):
+    partes = []
+    for linea in texto.splitlines():
+        if contar_tokens("\n".join(partes + [linea])) > tokens_disponibles:
+            break
+        partes.append(linea)
+    return "\n".join(partes)
+
+
+def seleccionar_secciones(markdown, pregunta, presupuesto=PRESUPUESTO_TOKENS):
+    """(texto para el modelo, informe) con solo las secciones de la ficha relacionadas con la pregunta."""
+    tokens_ficha = contar_tokens(markdown)
+    secciones = secciones_ficha(markdown)
+    informe = {"tokens_ficha": tokens_ficha, "tokens_enviados": tokens_ficha, "etiquetas": [], "recortada": False}
+    if not pregunta or tokens_ficha <= FICHA_PEQUENA or len(secciones) < 2:
+        informe["etiquetas"] = [s["etiqueta"] for s in secciones]
+        return markdown, informe
+
+    # La cabecera (nombre del producto) va siempre, para que el modelo sepa de qué ficha se trata
+    cabecera = secciones[0]["titulo"] or secciones[0]["texto"].split("\n", 1)[0]
+    puntos = [p + PESO_EMBEDDINGS * max(0.0, float(c))
+              for p, c in zip(puntuar(pregunta, secciones), _parecido_embeddings(pregunta, secciones))]
+    if max(puntos) >= PUNTUACION_MINIMA:
+        # Relevantes: las que se acercan a la mejor (una palabra suelta en las opiniones no basta)
+        umbral = max(PUNTUACION_MINIMA, FRACCION_MEJOR * max(puntos))
+        orden = sorted((i for i, p in enumerate(puntos) if p >= umbral), key=lambda i: -puntos[i])
+    else:
+        orden = sorted(range(len(secciones)), key=lambda i: PRIORIDAD.index(secciones[i]["etiqueta"]))
+
+    elegidas, usados = {}, contar_tokens(cabecera)
+    for i in orden:
+        texto = secciones[i]["texto"]
+        if i == 0 and texto.startswith(cabecera):
+            texto = texto[len(cabecera):].strip()
+        coste = contar_tokens(texto) + 1
+        if usados + coste <= presupuesto:
+            elegidas[i] = texto
+            usados += coste
+            continue
+        # La primera que no cabe entra recortada por líneas (filas de tabla, opiniones...)
+        parcial = _recortar_lineas(texto, presupuesto - usados - 1)
+        if parcial:
+            elegidas[i] = parcial
+            informe["recortada"] = True
+        break
+
+    texto = "\n".join([cabecera] + [elegidas[i] for i in sorted(elegidas) if elegidas[i]])
+    informe["etiquetas"] = [secciones[i]["etiqueta"] for i in sorted(elegidas)]
+    informe["tokens_enviados"] = contar_tokens(texto)
+    return texto, informe
+
+
+def registrar(informe):
+    with lock_estadisticas:
+        estadisticas_ficha["consultas"] += 1
+        estadisticas_ficha["tokens_ficha"] += informe["tokens_ficha"]
+        estadisticas_ficha["tokens_enviados"] += informe["tokens_enviados"]
+        estadisticas_ficha["recortadas"] += informe["recortada"]
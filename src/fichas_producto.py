@@ -0,0 +1,215 @@
+"""
+Almacén local de fichas de producto, construido a partir del feed.
+
+FICHA_PRODUCTO dependía de que el navegador subiera `html_contenido` con
+cada mensaje; si no llegaba, se descargaba URL_FALLBACK_TEST con un
+requests.get síncrono dentro de la petición. Con este módulo un proceso
+aparte recorre el `link` de cada producto del feed, lo pasa por
+parser_markdown y guarda el Markdown por articulo_id en SQLite:
+
+    fichas_producto.sqlite
+        fichas(articulo_id, link, huella, markdown, actualizado)
+
+- articulo_id es el id del feed sin la medida ("1048-150x190" -> "1048"),
+  que es lo que manda la web en ChatInput.articulo_id;
+- la huella resume link, título, precio y descripción de los productos
+  del feed con ese articulo_id: solo se vuelven a descargar las fichas
+  cuya huella cambia, las que no están y las de más de --max-edad-h
+  (opiniones, plazos); las que desaparecen del feed se borran;
+- los workers abren la BD en solo lectura (una conexión por hilo) y
+  logica_consultar_producto_actual la consulta antes que la URL de prueba.
+
+Rastreador (desde src/):
+    python fichas_producto.py --cada 3600
+Workers:
+    FICHAS_PRODUCTO=fichas_producto.sqlite uvicorn main:app
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from feed_xml import descargar_feed, parsear_feed
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS fichas (
+    articulo_id TEXT PRIMARY KEY,
+    link TEXT NOT NULL,
+    huella TEXT NOT NULL,
+    markdown TEXT NOT NULL,
+    actualizado REAL NOT NULL
+)
+"""
+CABECERAS = {"User-Agent": "Mozilla/5.0 (compatible; ChatiFichas/1.0)"}
+
+
+def articulo_de(g_id):
+    """articulo_id de un id del feed: sin la medida ("1048-150x190" -> "1048")."""
+    return str(g_id).strip().split("-", 1)[0]
+
+
+def normalizar_articulo(articulo_id):
+    """Lo que llega en ChatInput.articulo_id (int, "1048", "1048.0"...) como clave del almacén."""
+    if articulo_id is None or articulo_id == "":
+        return None
+    texto = str(articulo_id).strip()
+    try:
+        return str(int(float(texto)))
+    except ValueError:
+        return articulo_de(texto)
+
+
+def productos_por_articulo(feed):
+    """{articulo_id: (link, huella)} con el link del primer producto y la huella de todos los suyos."""
+    grupos = {}
+    for item in feed.values():
+        grupos.setdefault(articulo_de(item["id"]), []).append(item)
+    resultado = {}
+    for articulo, items in grupos.items():
+        partes = sorted("\x1f".join((item.get(c) or "").strip() for c in ("id", "link", "titulo", "precio", "descripcion"))
+                        for item in items)
+        huella = hashlib.sha1("\x1e".join(partes).encode("utf-8")).hexdigest()
+        resultado[articulo] = ((items[0].get("link") or "").strip(), huella)
+    return resultado
+
+
+# ==========================================
+# ALMACÉN
+# ==========================================
+
+class AlmacenFichas:
+    """Lectura (workers) y escritura (rastreador) de las fichas en SQLite."""
+
+    def __init__(self, ruta, solo_lectura=False):
+        self.ruta = ruta
+        self.solo_lectura = solo_lectura
+        self._local = threading.local()
+        if not solo_lectura:
+            with self._conexion() as conexion:
+                conexion.execute("PRAGMA journal_mode=WAL")
+                conexion.execute(ESQUEMA)
+
+    def _conexion(self):
+        # sqlite3 no comparte conexiones entre hilos: una por hilo (hilos de FastAPI, pool del rastreador)
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            if self.solo_lectura:
+                conexion = sqlite3.connect(f"file:{self.ruta}?mode=ro", uri=True)
+            else:
+                conexion = sqlite3.connect(self.ruta, timeout=30)
+            self._local.conexion = conexion
+        return conexion
+
+    def obtener(self, articulo_id):
+        """Markdown de la ficha o None."""
+        clave = normalizar_articulo(articulo_id)
+        if clave is None:
+            return None
+        fila = self._conexion().execute("SELECT markdown FROM fichas WHERE articulo_id = ?", (clave,)).fetchone()
+        return fila[0] if fila else None
+
+    def estado(self):
+        """{articulo_id: (huella, actualizado)} de lo guardado."""
+        filas = self._conexion().execute("SELECT articulo_id, huella, actualizado FROM fichas")
+        return {a: (h, t) for a, h, t in filas}
+
+    def guardar(self, articulo_id, link, huella, markdown):
+        with self._conexion() as conexion:
+            conexion.execute("INSERT OR REPLACE INTO fichas VALUES (?, ?, ?, ?, ?)",
+                             (articulo_id, link, huella, markdown, time.time()))
+
+    def borrar(self, articulos):
+        with self._conexion() as conexion:
+            conexion.executemany("DELETE FROM fichas WHERE articulo_id = ?", [(a,) for a in articulos])
+
+    def __len__(self):
+        return self._conexion().execute("SELECT COUNT(*) FROM fichas").fetchone()[0]
+
+
+# ==========================================
+# RASTREADOR
+# ==========================================
+
+def descargar_pagina(url, timeout=15):
+    import requests
+
+    respuesta = requests.get(url, headers=CABECERAS, timeout=timeout)
+    respuesta.raise_for_status()
+    return respuesta.text
+
+
+def pendientes(feed, almacen, max_edad_h=None):
+    """(a descargar {articulo_id: (link, huella)}, a borrar [articulo_id], sin cambios) según el feed."""
+    en_feed = productos_por_articulo(feed)
+    guardadas = almacen.estado()
+    limite = time.time() - max_edad_h * 3600 if max_edad_h else None
+    descargar = {}
+    for articulo, (link, huella) in en_feed.items():
+        if not link:
+            continue
+        guardada = guardadas.get(articulo)
+        if guardada is None or guardada[0] != huella or (limite is not None and guardada[1] < limite):
+            descargar[articulo] = (link, huella)
+    borrar = [a for a in guardadas if a not in en_feed]
+    return descargar, borrar, len(en_feed) - len(descargar)
+
+
+def rastrear(feed, almacen, max_edad_h=None, hilos=4, pausa_s=0.0, descargar=descargar_pagina):
+    """Actualiza el almacén con las fichas nuevas o cambiadas del feed. Devuelve el resumen."""
+    from parser_markdown import parsear_html_a_markdown
+
+    a_descargar, a_borrar, sin_cambios = pendientes(feed, almacen, max_edad_h)
+    resumen = {"descargadas": 0, "errores": 0, "sin_cambios": sin_cambios, "borradas": len(a_borrar)}
+    almacen.borrar(a_borrar)
+
+    def procesar(articulo):
+        link, huella = a_descargar[articulo]
+        try:
+            markdown = parsear_html_a_markdown(descargar(link))
+            if markdown.startswith("Error"):
+                raise ValueError(markdown)
+            almacen.guardar(articulo, link, huella, markdown)
+            return True
+        except Exception as e:
+            print(f"❌ Ficha {articulo} ({link}): {e}")
+            return False
+        finally:
+            if pausa_s:
+                # No saturar la web: cada hilo espera entre descargas
+                time.sleep(pausa_s)
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        for ok in pool.map(procesar, list(a_descargar)):
+            resumen["descargadas" if ok else "errores"] += 1
+    return resumen
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rastreador de fichas de producto del feed para FICHA_PRODUCTO")
+    parser.add_argument("--bd", default=os.getenv("FICHAS_PRODUCTO", "fichas_producto.sqlite"))
+    parser.add_argument("--xml-url", default=os.getenv("XML_URL", "https://www.colchones.es/gmerchantcenter_chati.xml"))
+    parser.add_argument("--cada", type=float, default=3600, help="Segundos entre pasadas")
+    parser.add_argument("--max-edad-h", type=float, default=24, help="Horas tras las que se vuelve a descargar una ficha sin cambios en el feed")
+    parser.add_argument("--hilos", type=int, default=4)
+    parser.add_argument("--pausa", type=float, default=0.2, help="Segundos de espera de cada hilo entre descargas")
+    parser.add_argument("--una-vez", action="store_true", help="Una pasada y termina")
+    args = parser.parse_args()
+
+    almacen = AlmacenFichas(args.bd)
+    while True:
+        try:
+            t0 = time.perf_counter()
+            feed = parsear_feed(descargar_feed(args.xml_url))
+            resumen = rastrear(feed, almacen, args.max_edad_h, args.hilos, args.pausa)
+            print(f"✅ Fichas: {resumen['descargadas']} descargadas, {resumen['sin_cambios']} sin cambios, "
+                  f"{resumen['borradas']} borradas, {resumen['errores']} errores "
+                  f"({len(almacen)} en {args.bd}, {time.perf_counter() - t0:.1f}s)")
+        except Exception as e:
+            print(f"❌ Error rastreando fichas: {e}")
+        if args.una_vez:
+            break
+        time.sleep(args.cada)
@@ -1,31 +1,79 @@
 from fastapi import FastAPI, HTTPException, Security, Request
+from fastapi.responses import JSONResponse
 from fastapi.security import APIKeyHeader
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-import mysql.connector
-from openai import OpenAI
+from contextlib import asynccontextmanager
 import json
 import os
-import pandas as pd
-import joblib
-import requests
-import xml.etree.ElementTree as ET
+import threading
+import time
 import traceback
+import itertools
+import random
 import re
-import unicodedata
+import sys
 from dotenv import load_dotenv
-from parser_markdown import parsear_html_a_markdown
-from rag.src.colchones_rag import get_context_embeddings
-from rag.src.generar_embeddings import obtener_embeddings
+from ciclo_vida import CicloVida
+from decision_log import get_decision_logger
+from cache_buscador import CacheResultados
+from dominios import RegistroDominios, leer_configuracion, normalizar_dominio
+from tabla_recomendaciones import perfil_desde_args, puntuar_catalogo
 import tools as tool
 
+# pandas, joblib, openai, requests, mysql.connector, BeautifulSoup y langchain/Chroma
+# se importan dentro de la carga de cada componente (ver sección 1): importar
+# main.py ya no paga esos imports ni descarga nada.
+
 load_dotenv()
 
 API_KEY_NAME = "x-api-key"
 MI_CLAVE_SECRETA = os.getenv("MI_CLAVE_SECRETA")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-XML_URL = "https://www.colchones.es/gmerchantcenter_chati.xml"
+XML_URL = os.getenv("XML_URL", "https://www.colchones.es/gmerchantcenter_chati.xml")
 LOG_FILE = "agent_decisions.log"
+MODELO_COMPACTO = "modelo_satisfaccion.npz"
+MODELO_MEJORAS_COMPACTO = "modelo_mejoras.npz"
+# Peso de la probabilidad de mejora de molestias en el ranking (solo usuarios con molestias)
+PESO_MEJORA = float(os.getenv("PESO_MEJORA_MOLESTIAS", "0.3"))
+TABLA_RECOMENDACIONES = "tabla_recomendaciones.npz"
+# Fracción de respuestas de la tabla que se comparan en sombra con la puntuación en vivo
+MUESTREO_TABLA = float(os.getenv("MUESTREO_TABLA_RECOMENDACIONES", "0.01"))
+# Catálogo + modelos + tabla preparados para mmap (python paquete_arranque.py)
+PAQUETE_ARRANQUE = os.getenv("PAQUETE_ARRANQUE", "paquete_arranque")
+# Componentes sin los que /ready no responde 200 (el resto se cargan en segundo plano o al usarse)
+COMPONENTES_CRITICOS = [c.strip() for c in os.getenv("COMPONENTES_CRITICOS", "openai,catalogo").split(",") if c.strip()]
+# 1: al arrancar se calientan también los no críticos; 0: se cargan en su primer uso
+CALENTAR_TODO = os.getenv("CALENTAR_COMPONENTES", "1") == "1"
+
+# Generaciones publicadas por el cargador (python datos_compartidos.py). Vacío: cada worker
+# carga su catálogo, modelos y feed; con un directorio, todos comparten los mismos mapeos
+DATOS_COMPARTIDOS = os.getenv("DATOS_COMPARTIDOS", "")
+# Cada cuánto se mira si el cargador ha publicado una generación nueva
+INTERVALO_GENERACION_S = float(os.getenv("INTERVALO_GENERACION_S", "5"))
+# Cada cuánto se vuelve a descargar el feed y se aplican solo sus cambios (0: solo al arrancar).
+# Con DATOS_COMPARTIDOS lo recarga el cargador
+REFRESCO_FEED_S = float(os.getenv("REFRESCO_FEED_S", "900"))
+
+# 1: a FICHA_PRODUCTO solo le llegan las secciones de la ficha relacionadas con la pregunta
+# (hasta FICHA_PRESUPUESTO_TOKENS); 0: la ficha entera
+FICHA_POR_SECCIONES = os.getenv("FICHA_POR_SECCIONES", "1") == "1"
+
+# SQLite con las fichas de producto del feed ya en Markdown (python fichas_producto.py).
+# Vacío: sin almacén, solo el HTML del cliente y la URL de prueba
+FICHAS_PRODUCTO = os.getenv("FICHAS_PRODUCTO", "")
+
+# Embeddings de los productos del feed (python embeddings_productos.py). Vacío: el BUSCADOR solo es léxico
+EMBEDDINGS_PRODUCTOS = os.getenv("EMBEDDINGS_PRODUCTOS", "")
+# "hibrido": puntuación léxica + similitud de embeddings (si hay EMBEDDINGS_PRODUCTOS); "lexico": solo palabras
+BUSCADOR_MODO = os.getenv("BUSCADOR_MODO", "hibrido")
+BUSCADOR_PESO_SEMANTICO = float(os.getenv("BUSCADOR_PESO_SEMANTICO", "0.5"))
+# Similitud mínima para que entre un producto sin ninguna de las palabras buscadas
+BUSCADOR_UMBRAL_SEMANTICO = float(os.getenv("BUSCADOR_UMBRAL_SEMANTICO", "0.3"))
+# Consultas del BUSCADOR cuyo ranking y HTML se guardan (LRU, ver cache_buscador.py; 0: sin caché)
+BUSCADOR_CACHE_ENTRADAS = int(os.getenv("BUSCADOR_CACHE_ENTRADAS", "512"))
+# Posiciones del ranking que se guardan en la caché con las tarjetas
+BUSCADOR_RANKING_CACHE = 20
 
 # URL para cuando probamos el bot fuera de la web (Postman, consola, etc.)
 URL_FALLBACK_TEST = "https://www.colchones.es/colchones/juvenil-First-Sac-muelles-ensacados-viscoelastica-fibras/"
@@ -38,9 +86,21 @@ DB_CONFIG = {
     'raise_on_warnings': True
 }
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+ciclo = CicloVida(reintento_s=float(os.getenv("REINTENTO_COMPONENTES_S", "30")))
+
+
+@asynccontextmanager
+async def ciclo_app(app):
+    # No bloquea el arranque: uvicorn acepta conexiones (/health) mientras se calienta
+    ciclo.calentar(todos=CALENTAR_TODO)
+    if (REFRESCO_FEED_S > 0 and not DATOS_COMPARTIDOS) or registro_dominios is not None:
+        threading.Thread(target=refrescar_feed_periodicamente, name="refresco-feed", daemon=True).start()
+    yield
+
+
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
-app = FastAPI(title="Chatbot IA - Router System")
+app = FastAPI(title="Chatbot IA - Router System", lifespan=ciclo_app)
+decision_log = get_decision_logger(LOG_FILE)
 
 # ==========================================
 # 1. CARGA DE DATOS (SISTEMA)
@@ -49,48 +109,319 @@ app = FastAPI(title="Chatbot IA - Router System")
 datos_sistema = {
     "modelo": None,
     "catalogo_csv": None,
-    "feed_xml": {} 
+    "tabla_recomendaciones": None,
+    "feed_xml": {},
+    # El feed con sus índices derivados (feed_incremental.FeedIndexado); None con el feed compartido
+    "feed_indices": None,
+    # Índices construidos por el cargador compartido (datos_compartidos.registrar_indice)
+    "indices": {}
 }
 
-def cargar_datos_al_inicio():
-    print("⏳ Iniciando carga de sistema...")
-    
-    # A. Cargar CSV y Modelo (Solo para colchones)
+# Ranking y tarjetas de las consultas repetidas del BUSCADOR, por versión del feed
+cache_buscador = CacheResultados(BUSCADOR_CACHE_ENTRADAS)
+
+# Uso de la tabla precalculada del recomendador (ver tabla_recomendaciones.py); se ven en /ready
+estadisticas_tabla = {"aciertos": 0, "en_vivo": 0, "comparadas": 0, "distintas": 0}
+# Los endpoints corren en el pool de hilos: sin lock se perderían incrementos
+lock_estadisticas_tabla = threading.Lock()
+
+def contar_tabla(clave):
+    with lock_estadisticas_tabla:
+        estadisticas_tabla[clave] += 1
+
+def cargar_cliente_openai():
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_API_KEY)
+
+def cliente_openai():
+    return ciclo.obtener("openai")
+
+def instalar_tabla(tabla, datos=datos_sistema, modelo=None):
+    """Activa la tabla precalculada solo si corresponde al catálogo, al modelo (`modelo`, su huella) y a la puntuación cargados."""
+    from predictor_compacto import PuntuadorConjunto
+
+    combina_mejora = isinstance(datos["modelo"], PuntuadorConjunto)
+    if combina_mejora:
+        print(f"✅ Ranking combinado con mejora de molestias (peso {PESO_MEJORA}).")
+
+    if tabla is not None:
+        if tabla.compatible_con(datos["catalogo_csv"], PESO_MEJORA if combina_mejora else None, modelo):
+            datos["tabla_recomendaciones"] = tabla
+            print("✅ Tabla de recomendaciones precalculada cargada.")
+        else:
+            datos["tabla_recomendaciones"] = None
+            print("⚠️ La tabla de recomendaciones no corresponde al catálogo o al modelo actuales "
+                  "(python modulos/construir_tabla_recomendaciones.py). Se puntuará en vivo.")
+
+# Generación compartida a la que está enganchado este worker
+generacion = {"nombre": None, "comprobada": 0.0}
+lock_generacion = threading.Lock()
+
+def adjuntar_generacion():
+    """Modo compartido: engancha el worker (solo lectura) a la generación vigente del cargador."""
+    from datos_compartidos import cargar_generacion, generacion_actual
+    from paquete_arranque import huella_modelo_paquete
+
+    with lock_generacion:
+        nombre = generacion_actual(DATOS_COMPARTIDOS)
+        if nombre is None:
+            raise FileNotFoundError(f"{DATOS_COMPARTIDOS} no tiene ninguna generación publicada (python datos_compartidos.py)")
+        if nombre == generacion["nombre"]:
+            return
+        gen = cargar_generacion(DATOS_COMPARTIDOS, nombre, PESO_MEJORA)
+        datos_sistema["catalogo_csv"] = gen["catalogo"]
+        datos_sistema["modelo"] = gen["modelo"]
+        datos_sistema["feed_xml"] = gen["feed"]
+        datos_sistema["feed_indices"] = gen["feed_indices"]
+        datos_sistema["indices"] = gen["indices"]
+        instalar_tabla(gen["tabla"], modelo=huella_modelo_paquete(gen["manifiesto"]))
+        anterior, generacion["nombre"] = generacion["nombre"], nombre
+        cache_buscador.invalidar(anterior)
+        print(f"✅ Generación compartida {nombre} adjuntada ({len(gen['feed'])} productos).")
+
+def comprobar_generacion():
+    """Cambia a la última generación publicada (como mucho una comprobación cada INTERVALO_GENERACION_S)."""
+    if not DATOS_COMPARTIDOS or generacion["nombre"] is None:
+        return
+    ahora = time.monotonic()
+    if ahora - generacion["comprobada"] < INTERVALO_GENERACION_S:
+        return
+    generacion["comprobada"] = ahora
     try:
-        if os.path.exists("encuestas_limpio.csv") and os.path.exists("modelo_satisfaccion.pkl"):
-            df = pd.read_csv("encuestas_limpio.csv")
-            datos_sistema["catalogo_csv"] = df.drop_duplicates(subset=["cod_articulo"]).copy()
-            datos_sistema["modelo"] = joblib.load("modelo_satisfaccion.pkl")
-            print("✅ Modelo IA y CSV cargados.")
+        adjuntar_generacion()
     except Exception as e:
-        print(f"❌ Error cargando CSV/PKL: {e}")
+        # Seguimos con la generación anterior (sus mapeos siguen siendo válidos)
+        print(f"❌ Error cambiando de generación: {e}")
 
+def cargar_catalogo():
+    # A. Cargar CSV y Modelo (Solo para colchones)
+    if DATOS_COMPARTIDOS:
+        adjuntar_generacion()
+        return
+    cargar_catalogo_en(datos_sistema)
+
+def cargar_catalogo_en(datos, directorio=".", paquete=PAQUETE_ARRANQUE):
+    """Catálogo, modelo y tabla de `directorio` en `datos` (datos_sistema o los de un dominio secundario)."""
+    from paquete_arranque import cargar_paquete, fuentes_cambiadas, huella_modelo_paquete, leer_manifiesto
+    from predictor_compacto import PuntuadorConjunto, cargar_puntuador
+    from tabla_recomendaciones import TablaRecomendaciones, huella_ficheros_modelo
+
+    def ruta(nombre):
+        return os.path.join(directorio, nombre)
+
+    tabla = huella = None
+    manifiesto = leer_manifiesto(ruta(paquete))
+    cambiadas = fuentes_cambiadas(manifiesto, directorio) if manifiesto else []
+    if cambiadas:
+        print(f"⚠️ Paquete de arranque obsoleto ({', '.join(cambiadas)} ha cambiado). Se cargan las fuentes.")
+    hay_modelo = os.path.exists(ruta(MODELO_COMPACTO)) or os.path.exists(ruta("modelo_satisfaccion.pkl"))
+    if manifiesto and not cambiadas:
+        # Catálogo, modelos y tabla ya preparados: arrays mapeados en memoria, sin parseo
+        catalogo, modelo, tabla, manifiesto = cargar_paquete(ruta(paquete), PESO_MEJORA)
+        datos["catalogo_csv"] = catalogo
+        datos["modelo"] = modelo
+        huella = huella_modelo_paquete(manifiesto)
+        print(f"✅ Paquete de arranque {manifiesto['hash']} cargado (mmap).")
+    elif os.path.exists(ruta("encuestas_limpio.csv")) and hay_modelo:
+        import pandas as pd
+
+        df = pd.read_csv(ruta("encuestas_limpio.csv"))
+        datos["catalogo_csv"] = df.drop_duplicates(subset=["cod_articulo"]).copy()
+        # Preferimos el forest aplanado (NumPy, carga en ms); el .pkl queda como respaldo.
+        # Si existe el modelo de mejora de molestias, se combina con el de satisfacción.
+        if os.path.exists(ruta(MODELO_COMPACTO)):
+            datos["modelo"] = cargar_puntuador(ruta(MODELO_COMPACTO), ruta(MODELO_MEJORAS_COMPACTO), PESO_MEJORA)
+            print("✅ Modelo IA compacto y CSV cargados.")
+        else:
+            import joblib
+
+            modelo = joblib.load(ruta("modelo_satisfaccion.pkl"))
+            if os.path.exists(ruta("modelo_mejoras.pkl")):
+                modelo = PuntuadorConjunto(modelo, joblib.load(ruta("modelo_mejoras.pkl")), PESO_MEJORA)
+            datos["modelo"] = modelo
+            print("✅ Modelo IA y CSV cargados.")
+        if os.path.exists(ruta(TABLA_RECOMENDACIONES)):
+            tabla = TablaRecomendaciones.cargar(ruta(TABLA_RECOMENDACIONES))
+            huella = huella_ficheros_modelo(directorio)
+    else:
+        # Antes solo se imprimía y el worker aceptaba tráfico sin recomendador
+        raise FileNotFoundError(f"No hay paquete de arranque ({ruta(paquete)}) ni encuestas_limpio.csv + modelo en {directorio}")
+
+    instalar_tabla(tabla, datos, huella)
+
+def cargar_feed_xml():
     # B. Cargar XML (Para todo)
-    try:
-        print(f"⏳ Descargando XML de: {XML_URL} ...")
-        response = requests.get(XML_URL, timeout=10)
-        if response.status_code == 200:
-            root = ET.fromstring(response.content)
-            ns = {'g': 'http://base.google.com/ns/1.0'}
-            count = 0
-            for item in root.findall('./channel/item'):
-                try:
-                    g_id_full = item.find('g:id', ns).text.strip()
-                    datos_sistema["feed_xml"][g_id_full] = {
-                        "id": g_id_full,
-                        "titulo": item.find('title').text,
-                        "descripcion": item.find('description').text or "",
-                        "precio": item.find('g:price', ns).text,
-                        "link": item.find('link').text,
-                        "imagen": item.find('g:image_link', ns).text
-                    }
-                    count += 1
-                except: continue
-            print(f"✅ XML Cargado: {count} productos indexados.")
-    except Exception as e:
-        print(f"❌ Error procesando XML: {e}")
+    if DATOS_COMPARTIDOS:
+        # El feed viene en la generación compartida, junto al catálogo
+        if not ciclo.asegurar("catalogo"):
+            raise RuntimeError("No hay generación compartida adjuntada")
+        return
+
+    cargar_feed_en(datos_sistema, XML_URL)
+
+def cargar_feed_en(datos, xml_url, registro_cambios=None):
+    """Descarga el feed; si ya había uno, aplica solo sus altas, bajas y cambios (ver feed_incremental.py)."""
+    import hashlib
+    from feed_incremental import FEED_CAMBIOS, FeedIndexado, registrar_cambios
+    from feed_xml import descargar_feed, parsear_feed
+
+    print(f"⏳ Descargando XML de: {xml_url} ...")
+    contenido = descargar_feed(xml_url)
+    version = hashlib.sha256(contenido).hexdigest()[:16]
+    anterior = datos.get("feed_indices")
+    registro_cambios = FEED_CAMBIOS if registro_cambios is None else registro_cambios
+    if anterior is not None and anterior.version == version:
+        registrar_cambios({"altas": [], "bajas": [], "cambios": []}, {}, version, version, registro_cambios)
+        print("♻️ XML sin cambios.")
+        return
+
+    feed = parsear_feed(contenido)
+    if anterior is None:
+        indexado = FeedIndexado.construir(feed, version)
+        print(f"✅ XML Cargado: {len(feed)} productos indexados.")
+    else:
+        indexado, cambios = anterior.actualizar(feed, version)
+        registrar_cambios(cambios, indexado.productos, anterior.version, version, registro_cambios)
+        print(f"✅ XML actualizado: {len(cambios['altas'])} altas, {len(cambios['bajas'])} bajas, "
+              f"{len(cambios['cambios'])} cambios ({len(feed)} productos).")
+    # Sustitución de una vez: las peticiones en curso nunca ven un feed a medias
+    datos["feed_indices"] = indexado
+    datos["feed_xml"] = indexado.productos
+    if anterior is not None:
+        cache_buscador.invalidar(anterior.version)
+
+def refrescar_feed_periodicamente():
+    """Hilo de fondo: recarga los feeds cada REFRESCO_FEED_S y descarga los dominios secundarios inactivos."""
+    # Los inactivos se buscan varias veces por DOMINIOS_INACTIVO_S: no dependen de que lleguen peticiones
+    pasos = [REFRESCO_FEED_S, registro_dominios.inactivo_s / 4 if registro_dominios is not None else 0]
+    pasos = [paso for paso in pasos if paso > 0]
+    if not pasos:
+        return
+    proximo_refresco = time.monotonic() + REFRESCO_FEED_S
+    while True:
+        time.sleep(min(pasos))
+        if registro_dominios is not None:
+            registro_dominios.descargar_inactivos()
+        if REFRESCO_FEED_S > 0 and time.monotonic() >= proximo_refresco:
+            proximo_refresco = time.monotonic() + REFRESCO_FEED_S
+            refrescar_feeds()
+
+def refrescar_feeds():
+    # Hasta que no esté cargado lo reintenta el ciclo de vida (con DATOS_COMPARTIDOS lo trae la generación)
+    if not DATOS_COMPARTIDOS and ciclo.estado()["feed_xml"]["estado"] == "listo":
+        try:
+            cargar_feed_en(datos_sistema, XML_URL)
+        except Exception as e:
+            # Seguimos con el feed anterior
+            print(f"❌ Error refrescando el feed: {e}")
+    # Dominios secundarios activos: un dominio con tráfico continuo nunca se descarga por inactividad
+    # y, sin esto, se quedaría con el feed de su primera petición
+    for inquilino in registro_dominios.activos() if registro_dominios is not None else []:
+        ciclo_dominio = inquilino.ciclo
+        if ciclo_dominio is None or ciclo_dominio.estado()["feed_xml"]["estado"] != "listo":
+            continue
+        try:
+            cargar_feed_dominio(inquilino)
+        except Exception as e:
+            print(f"❌ Error refrescando el feed de {inquilino.dominio}: {e}")
+
+def cargar_rag():
+    # Construye el vectorstore de Chroma (langchain + embeddings de OpenAI) al importarse
+    from rag.src.colchones_rag import get_context_embeddings
+    return get_context_embeddings
+
+def cargar_parser_html():
+    from parser_markdown import parsear_html_a_markdown
+    import ficha_secciones  # noqa: F401  (su primera importación carga los embeddings locales)
+    return parsear_html_a_markdown
+
+def cargar_fichas(ruta=FICHAS_PRODUCTO):
+    # Solo lectura: escribe el rastreador (python fichas_producto.py). Sin ruta, no hay almacén
+    if not ruta:
+        return None
+    from fichas_producto import AlmacenFichas
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(ruta)
+    almacen = AlmacenFichas(ruta, solo_lectura=True)
+    print(f"✅ Fichas de producto: {len(almacen)} en {ruta}")
+    return almacen
+
+def cargar_embeddings_productos(ruta=EMBEDDINGS_PRODUCTOS):
+    # Solo lectura: escribe el indexador (python embeddings_productos.py). Sin ruta, búsqueda solo léxica
+    if not ruta:
+        return None
+    from embeddings_productos import EmbeddingsProductos
+    productos = EmbeddingsProductos(ruta)
+    print(f"✅ Embeddings de productos: {len(productos)} en {ruta}")
+    return productos
+
+ciclo.registrar("openai", cargar_cliente_openai)
+ciclo.registrar("catalogo", cargar_catalogo)
+ciclo.registrar("feed_xml", cargar_feed_xml)
+ciclo.registrar("rag", cargar_rag)
+ciclo.registrar("parser_html", cargar_parser_html)
+ciclo.registrar("fichas", cargar_fichas)
+ciclo.registrar("embeddings_productos", cargar_embeddings_productos)
+ciclo.criticos(COMPONENTES_CRITICOS)
+
+# ------------------------------------------
+# Dominios secundarios (dominios.json): mismos componentes, cargados en su primera petición
+# ------------------------------------------
+
+def cargar_catalogo_dominio(inquilino):
+    cargar_catalogo_en(inquilino.datos, inquilino.config.get("directorio", "."))
+
+def cargar_feed_dominio(inquilino):
+    cargar_feed_en(inquilino.datos, inquilino.config["xml_url"], inquilino.config.get("feed_cambios", ""))
+
+def cargar_rag_dominio(inquilino):
+    rag_dir = inquilino.config.get("rag_dir")
+    if not rag_dir:
+        # Sin colección propia: el conocimiento del dominio principal
+        return ciclo.obtener("rag")
+    from functools import partial
+    from rag.src.colchones_rag import abrir_coleccion, get_context_embeddings
+    return partial(get_context_embeddings, coleccion=abrir_coleccion(rag_dir), persist_dir=rag_dir)
+
+def cargar_fichas_dominio(inquilino):
+    return cargar_fichas(inquilino.config.get("fichas_producto", ""))
+
+def cargar_embeddings_productos_dominio(inquilino):
+    return cargar_embeddings_productos(inquilino.config.get("embeddings_productos", ""))
+
+configuracion_dominios = leer_configuracion()
+registro_dominios = RegistroDominios(configuracion_dominios, {
+    "catalogo": cargar_catalogo_dominio,
+    "feed_xml": cargar_feed_dominio,
+    "rag": cargar_rag_dominio,
+    "fichas": cargar_fichas_dominio,
+    "embeddings_productos": cargar_embeddings_productos_dominio,
+}, reintento_s=ciclo.reintento_s) if configuracion_dominios else None
+
+def datos_dominio(dominio, *componentes):
+    """(datos, ciclo) del dominio con `componentes` asegurados: los de su inquilino o los globales."""
+    if registro_dominios is not None:
+        datos, ciclo_dominio = registro_dominios.usar(dominio, *componentes)
+        if datos is not None:
+            return datos, ciclo_dominio
+    for nombre in componentes:
+        ciclo.asegurar(nombre)
+    comprobar_generacion()
+    return datos_sistema, ciclo
+
+def adaptar_a_dominio(texto, dominio):
+    """Textos escritos para colchones.es (prompts, enlaces) con la tienda y la web del dominio secundario."""
+    config = configuracion_dominios.get(normalizar_dominio(dominio)) if configuracion_dominios else None
+    if not config:
+        return texto
+    web = normalizar_dominio(dominio)
+    return texto.replace("Colchones.es", config.get("tienda", web)).replace("colchones.es", web)
 
-cargar_datos_al_inicio()
+def cargar_datos_al_inicio():
+    """Carga síncrona de todos los componentes (scripts y consola; la app calienta en segundo plano)."""
+    print("⏳ Iniciando carga de sistema...")
+    for nombre in ciclo.estado():
+        ciclo.asegurar(nombre)
 
 
 # ==========================================
@@ -128,56 +459,62 @@ def generar_html_tarjeta_buscador(item):
     </p>
     """
 
-def logica_recomendar_colchon(args, user_id):
+def logica_recomendar_colchon(args, user_id, dominio=None):
     """CEREBRO MATEMÁTICO (Solo Colchones)"""
-    df = datos_sistema["catalogo_csv"]
-    modelo = datos_sistema["modelo"]
-    feed = datos_sistema["feed_xml"]
+    datos, _ = datos_dominio(dominio, "catalogo", "feed_xml")
+    df = datos["catalogo_csv"]
+    modelo = datos["modelo"]
+    indexado = datos.get("feed_indices")
+    feed = indexado.productos if indexado is not None else datos["feed_xml"]
+    tabla = datos["tabla_recomendaciones"]
 
     if df is None: return "Error técnico: Modelo no cargado."
 
     try:
         # Preparación de datos (Igual que antes)
-        fila_base = df.iloc[0].copy()
-        fila_base["sexo"] = args.get('sexo', 'mujer')
-        fila_base["altura"] = float(args.get('altura', 170))
-        fila_base["peso"] = float(args.get('peso', 70))
-        altura_m = fila_base["altura"] / 100
-        fila_base["imc"] = fila_base["peso"] / (altura_m ** 2)
-        fila_base["duerme_en_pareja"] = 1 if args.get('duerme_en_pareja', False) else 0
-        fila_base["molestias_antes"] = 1 if args.get('molestias_antes', False) else 0
+        perfil = perfil_desde_args(args)
+        material = args.get('material_preferido', '').lower()
+
+        # Predicción: primero la tabla precalculada (O(1)), si el perfil cae
+        # fuera de la rejilla puntuamos el catálogo en vivo
+        candidatos = tabla.buscar(perfil, material) if tabla is not None else None
+        desde_tabla = candidatos is not None
+        if candidatos is None:
+            contar_tabla("en_vivo")
+            candidatos = puntuar_catalogo(df, modelo, perfil, material)
+        else:
+            contar_tabla("aciertos")
+            if random.random() < MUESTREO_TABLA:
+                # Muestreo en sombra: ¿cuánto difiere la celda de la respuesta exacta?
+                en_vivo = puntuar_catalogo(df, modelo, perfil, material)
+                contar_tabla("comparadas")
+                if [c for c, _ in candidatos[:3]] != [c for c, _ in en_vivo[:3]]:
+                    contar_tabla("distintas")
 
         # Filtro Material
-        X_pred = df.copy()
-        material = args.get('material_preferido', '').lower()
-        if material:
-            if "latex" in material or "látex" in material:
-                X_pred = X_pred[X_pred['nucleo'].str.contains("latex|látex", case=False, na=False)]
-            elif "muelle" in material:
-                X_pred = X_pred[X_pred['nucleo'].str.contains("muelle", case=False, na=False)]
-            elif "visco" in material:
-                X_pred = X_pred[X_pred['nucleo'].str.contains("visco", case=False, na=False)]
-            if X_pred.empty: return f"No tenemos colchones de {material} en el catálogo de recomendaciones."
-
-        # Predicción
-        cols = ["sexo", "altura", "peso", "imc", "duerme_en_pareja", "molestias_antes"]
-        for col in cols: X_pred[col] = fila_base[col]
-        features = cols + ["nucleo", "grosor", "firmeza"]
-        X_pred["score"] = modelo.predict(X_pred[features])
-        candidatos = X_pred.sort_values("score", ascending=False)
+        if not candidatos: return f"No tenemos colchones de {material} en el catálogo de recomendaciones."
 
         # Matching XML Estricto
         html_output = "He analizado tu perfil y estos son los mejores colchones para ti:<br><br>"
         encontrados = 0
         ids_usados = set()
-        claves_xml = list(feed.keys())
+        claves_xml = list(feed.keys()) if indexado is None else None
 
-        for _, row in candidatos.iterrows():
+        def resto_en_vivo():
+            # La celda solo guarda el top-k: si no hay 3 de ellos en el feed, seguimos con la lista completa
+            if desde_tabla:
+                vistos = {c for c, _ in candidatos}
+                yield from ((c, sc) for c, sc in puntuar_catalogo(df, modelo, perfil, material) if c not in vistos)
+
+        for cod_articulo, score in itertools.chain(candidatos, resto_en_vivo()):
             if encontrados >= 3: break
-            id_csv = str(int(row['cod_articulo']))
+            id_csv = str(int(cod_articulo))
             match_key = None
             
-            if id_csv in feed: match_key = id_csv
+            if indexado is not None:
+                # Índice de los trozos del g:id: sin recorrer las claves del feed
+                match_key = indexado.buscar_clave(id_csv)
+            elif id_csv in feed: match_key = id_csv
             else:
                 patron = r"(^|-)" + re.escape(id_csv) + r"(-|$)"
                 for xml_key in claves_xml:
@@ -187,7 +524,7 @@ def logica_recomendar_colchon(args, user_id):
             
             if match_key and match_key not in ids_usados:
                 item = feed[match_key]
-                afinidad = round((row["score"]/5)*100)
+                afinidad = round((score/5)*100)
                 html_output += generar_html_tarjeta(item, f"Afinidad: {afinidad}%.)")
                 encontrados += 1
                 ids_usados.add(match_key)
@@ -201,11 +538,13 @@ def logica_recomendar_colchon(args, user_id):
         traceback.print_exc()
         return f"Lo siento, <b>no he encontrado modelos</b> ideales para ti, puedes dejarnos un correo o teléfono para poder contactar contigo: <div class='bloqueLeadChati'><input type='text' placeholder='Correo o teléfono' style='width:85%; padding:8px;' name='telefonoCorreoCliente' id='telefonoCorreoCliente'/><input type='hidden' name='cookieUsuario' id='cookieUsuario' value='{user_id}'/><input type='hidden' name='articuloVisitado' id='articuloVisitado' value=''/><button type='button' style='padding: 10px 9px;    cursor: pointer;    background: #4c9b9d;    float: right;    border: solid 1px #4c9b9d;' onclick='enviarContactoChati()' id='botonEnviarContactoChati'><img src='https://cdn-icons-png.flaticon.com/512/60/60525.png' alt='Enviar' style='width:16px; height:16px; vertical-align:middle;filter: brightness(0) invert(1);'></button></div>"
 
-def logica_buscar_accesorios(args, user_id):
+def logica_buscar_accesorios(args, user_id, dominio=None):
     """
     CEREBRO BUSCADOR MEJORADO (Búsqueda por Puntuación/Weighted Search)
     """
-    feed = datos_sistema["feed_xml"]
+    datos, _ = datos_dominio(dominio, "feed_xml")
+    indexado = datos.get("feed_indices")
+    feed = indexado.productos if indexado is not None else datos["feed_xml"]
     raw_keywords = args.get('keywords', '').lower().split()
 
     # 1. DEFINIR STOP WORDS (Palabras a ignorar para reducir ruido)
@@ -216,24 +555,42 @@ def logica_buscar_accesorios(args, user_id):
          # Si después de limpiar no quedan keywords (ej: el usuario solo puso "de la"), usar las originales
          keywords = raw_keywords
 
-    # --- FUNCIÓN AUXILIAR PARA QUITAR ACENTOS ---
-    def normalizar_texto(texto):
-        if not texto: return ""
-        # Esto transforma "Colchón Viscoelástico" en "colchon viscoelastico"
-        return ''.join(c for c in unicodedata.normalize('NFD', texto.lower())
-                       if unicodedata.category(c) != 'Mn')
-    # -------------------------------------------
+    # Quita acentos: "Colchón Viscoelástico" -> "colchon viscoelastico"
+    from feed_incremental import normalizar_texto
+
+    # 1a. CACHÉ: misma consulta (palabras normalizadas, filtros) sobre la misma versión del feed
+    filtros = leer_filtros(args)
+    productos_semanticos = embeddings_productos_de(dominio) if BUSCADOR_MODO == "hibrido" else None
+    clave_cache = (
+        version_feed(indexado, feed),
+        normalizar_dominio(dominio),
+        productos_semanticos.version if productos_semanticos is not None else None,
+        tuple(sorted(normalizar_texto(kw) for kw in keywords)),
+        tuple(sorted(filtros.items())),
+    )
+    en_cache = cache_buscador.obtener(clave_cache)
+    if en_cache is not None:
+        ranking, tarjetas = en_cache
+        print(f"♻️ Búsqueda en caché ({len(ranking)} resultados).")
+        return responder_busqueda(raw_keywords, tarjetas, user_id)
+
+    # 1b. FILTROS (categoría, medida, precio, grosor, material): intersección de bitmaps, sin recorrer el feed
+    filtrados = filtrar_productos(filtros, datos, feed)
+    candidatos = feed.values() if filtrados is None else [feed[g_id] for g_id in filtrados]
 
     resultados_con_puntuacion = []
 
     # 2. BÚSQUEDA CON PUNTUACIÓN
-    for item in feed.values():
+    for item in candidatos:
         score = 0
         coincidencias_palabras = 0
         
-        # Normalizamos textos del XML una vez
-        titulo_norm = normalizar_texto(item['titulo'])
-        descripcion_norm = normalizar_texto(item.get('descripcion', '')) # Usamos get por si no hay descripción
+        # Textos del XML ya normalizados en el índice (se recalculan solo al cambiar el producto)
+        if indexado is not None:
+            titulo_norm, descripcion_norm = indexado.textos[item['id']]
+        else:
+            titulo_norm = normalizar_texto(item['titulo'])
+            descripcion_norm = normalizar_texto(item.get('descripcion', '')) # Usamos get por si no hay descripción
 
         for kw in keywords:
             kw_norm = normalizar_texto(kw)
@@ -258,11 +615,19 @@ def logica_buscar_accesorios(args, user_id):
         if coincidencias_palabras == len(keywords) and len(keywords) > 0:
             score += 30
 
-        # Si el producto tiene alguna relevancia, lo guardamos
-        if score > 0:
+        # Si el producto tiene alguna relevancia, lo guardamos. Con filtros y sin palabras, todo lo que
+        # los cumple; con palabras, los que no tienen ninguna solo entran por la parte semántica (2b)
+        if score > 0 or (filtrados is not None and not keywords):
             # Guardamos una tupla: (puntuación, objeto_item)
             resultados_con_puntuacion.append((score, item))
 
+    # 2b. BÚSQUEDA SEMÁNTICA: "algo fresquito para el verano" no contiene ninguna palabra del catálogo
+    cacheable = True
+    if productos_semanticos is not None:
+        resultados_con_puntuacion, cacheable = combinar_semantica(
+            productos_semanticos, args.get('keywords', ''), resultados_con_puntuacion,
+            feed if filtrados is None else {g_id: feed[g_id] for g_id in filtrados}, 10 * len(keywords) + 30)
+
     # 3. ORDENAR RESULTADOS POR PUNTUACIÓN DESCENDENTE (Mayor puntuación primero)
     # x[0] es el score
     resultados_con_puntuacion.sort(key=lambda x: x[0], reverse=True)
@@ -271,37 +636,118 @@ def logica_buscar_accesorios(args, user_id):
     resultados_finales = [item for score, item in resultados_con_puntuacion]
 
     # 4. GENERACIÓN DE RESPUESTA (Igual que antes)
-    if not resultados_finales:
+    # Mostramos el top 3
+    tarjetas = "".join(generar_html_tarjeta_buscador(item) for item in resultados_finales[:3])
+    # Sin la parte semántica (error puntual de la API) no se guarda: la próxima vez se vuelve a intentar
+    if cacheable:
+        cache_buscador.guardar(clave_cache, ([item['id'] for item in resultados_finales[:BUSCADOR_RANKING_CACHE]],
+                                             tarjetas))
+    return responder_busqueda(raw_keywords, tarjetas, user_id)
+
+def responder_busqueda(raw_keywords, tarjetas, user_id):
+    """HTML de la respuesta: cabecera con las palabras del usuario y tarjetas, o el formulario de contacto."""
+    if not tarjetas:
         # Usamos f-string aquí también por si acaso
         return f"He buscado en el catálogo y <b>no he encontrado productos</b> con esa descripción. Puedes dejarnos un correo o teléfono para poder contactar contigo: <div class='bloqueLeadChati'><input type='text' placeholder='Correo o teléfono' style='width:85%; padding:8px;' name='telefonoCorreoCliente' id='telefonoCorreoCliente'/><input type='hidden' name='cookieUsuario' id='cookieUsuario' value='{user_id}'/><input type='hidden' name='articuloVisitado' id='articuloVisitado' value=''/><button type='button' style='padding: 10px 9px; cursor: pointer; background: #4c9b9d; float: right; border: solid 1px #4c9b9d;' onclick='enviarContactoChati()' id='botonEnviarContactoChati'><img src='https://cdn-icons-png.flaticon.com/512/60/60525.png' alt='Enviar' style='width:16px; height:16px; vertical-align:middle;filter: brightness(0) invert(1);'></button></div>"
 
     html_output = f"Aquí tienes los resultados más relevantes para '{' '.join(raw_keywords)}':<br><br>"
-    
-    # Mostramos el top 3
-    for item in resultados_finales[:3]:
-        # Opcional: Puedes mostrar la puntuación para depurar:
-        # html_output += generar_html_tarjeta(item, f"Relevancia: Alta") 
-        html_output += generar_html_tarjeta_buscador(item)
-        
-    return html_output
+    return html_output + tarjetas
+
+def version_feed(indexado, feed):
+    """Identifica el feed de la petición: hash del XML, generación compartida o el propio objeto."""
+    if indexado is not None:
+        return indexado.version or id(indexado)
+    return getattr(feed, "version", None) or id(feed)
+
+FILTROS_BUSCADOR = ("categoria", "material", "medida", "precio_min", "precio_max", "grosor_min", "grosor_max")
+
+def leer_filtros(args):
+    """{filtro: valor} de los argumentos de la tool (numéricos como float; los inválidos se ignoran)."""
+    filtros = {}
+    for nombre in FILTROS_BUSCADOR:
+        valor = args.get(nombre)
+        if valor in (None, ""):
+            continue
+        if nombre.endswith(("_min", "_max")):
+            try:
+                valor = float(valor)
+            except (TypeError, ValueError):
+                print(f"⚠️ Filtro {nombre} ignorado: {valor!r}")
+                continue
+        filtros[nombre] = valor
+    return filtros
+
+def filtrar_productos(filtros, datos, feed):
+    """g:ids que cumplen los filtros (facetas.py), o None si no se ha pedido ninguno."""
+    from facetas import Facetas
+
+    if not filtros:
+        return None
+    indexado = datos.get("feed_indices")
+    if indexado is not None:
+        facetas = indexado.facetas()
+    elif "facetas" in datos.get("indices", {}):
+        # Arrays publicados por el cargador compartido
+        facetas = Facetas(datos["indices"]["facetas"])
+    else:
+        facetas = Facetas.desde_feed(feed)
+    return facetas.filtrar(**filtros)
+
+def embeddings_productos_de(dominio=None):
+    """EmbeddingsProductos del dominio, o None si no hay índice (o no se ha podido cargar)."""
+    _, ciclo_dominio = datos_dominio(dominio)
+    if not ciclo_dominio.asegurar("embeddings_productos"):
+        return None
+    return ciclo_dominio.obtener("embeddings_productos")
+
+def combinar_semantica(productos, consulta, resultados_lexicos, feed, maximo_lexico):
+    """(resultados con la similitud de embeddings mezclada, completos); si falla, (léxicos tal cual, False)."""
+    if not consulta.strip():
+        return resultados_lexicos, True
+    try:
+        return productos.combinar(consulta, resultados_lexicos, feed, maximo_lexico,
+                                  BUSCADOR_PESO_SEMANTICO, BUSCADOR_UMBRAL_SEMANTICO), True
+    except Exception as e:
+        print(f"⚠️ Búsqueda semántica no disponible, solo léxica: {e}")
+        return resultados_lexicos, False
+
+def ficha_guardada(articulo_id, dominio=None):
+    """Markdown de la ficha del articulo_id en el almacén de fichas, o None (sin almacén, sin id o sin ficha)."""
+    if articulo_id in (None, ""):
+        return None
+    _, ciclo_dominio = datos_dominio(dominio)
+    if not ciclo_dominio.asegurar("fichas") or ciclo_dominio.obtener("fichas") is None:
+        return None
+    try:
+        return ciclo_dominio.obtener("fichas").obtener(articulo_id)
+    except Exception as e:
+        print(f"⚠️ Error leyendo la ficha {articulo_id}: {e}")
+        return None
 
-def logica_consultar_producto_actual(html_input, user_id):
+def logica_consultar_producto_actual(html_input, user_id, pregunta=None, articulo_id=None, dominio=None):
     """
     CEREBRO LECTOR (Parser de Ficha)
-    Recibe HTML -> Limpia -> Markdown -> OpenAI
+    Recibe HTML -> Limpia -> Markdown -> Secciones de la pregunta -> OpenAI
+    Sin HTML del cliente, la ficha ya en Markdown del almacén (por articulo_id)
     """
 
   
     html_a_procesar = ""
+    tiene_html_cliente = bool(html_input and len(html_input) > 100)
+    info_limpia = None if tiene_html_cliente else ficha_guardada(articulo_id, dominio)
 
     # A. Usar input del usuario
-    if html_input and len(html_input) > 100:
+    if tiene_html_cliente:
         print("✅ Tool: Usando HTML del cliente.")
         html_a_procesar = html_input
-    # B. Fallback URL test
+    # B. Almacén de fichas (rastreado del feed, sin descarga en la petición)
+    elif info_limpia is not None:
+        print(f"✅ Tool: Usando ficha guardada del artículo {articulo_id}.")
+    # C. Fallback URL test
     else:
         print(f"⚠️ Tool: Sin HTML. Usando URL fallback.")
         try:
+            import requests
             headers = {'User-Agent': 'Mozilla/5.0 ...'}
             resp = requests.get(URL_FALLBACK_TEST, headers=headers, timeout=10)
             if resp.status_code == 200:
@@ -312,7 +758,21 @@ def logica_consultar_producto_actual(html_input, user_id):
             return "Error: Fallo de conexión."
 
     # Parsear a Markdown
-    info_limpia = parsear_html_a_markdown(html_a_procesar)
+    if info_limpia is None:
+        parsear_html_a_markdown = ciclo.obtener("parser_html")
+        info_limpia = parsear_html_a_markdown(html_a_procesar)
+
+    # Solo las secciones de la ficha que tienen que ver con la pregunta (ver ficha_secciones.py)
+    if FICHA_POR_SECCIONES and pregunta:
+        from ficha_secciones import registrar, seleccionar_secciones
+
+        info_limpia, informe = seleccionar_secciones(info_limpia, pregunta)
+        registrar(informe)
+        print(f"📄 Ficha: {', '.join(informe['etiquetas'])} "
+              f"({informe['tokens_enviados']} de {informe['tokens_ficha']} tokens)")
+        if informe["tokens_enviados"] < informe["tokens_ficha"]:
+            return (f"--- FICHA TÉCNICA LEÍDA (secciones relacionadas con la pregunta: "
+                    f"{', '.join(informe['etiquetas'])}) ---\n\n{info_limpia}")
 
     return f"--- FICHA TÉCNICA LEÍDA ---\n\n{info_limpia}"
 
@@ -320,7 +780,7 @@ def logica_consultar_producto_actual(html_input, user_id):
 # 4. ROUTER (CLASIFICADOR)
 # ==========================================
 
-def enrutador_intenciones(mensaje, tiene_html, esta_en_ficha, historial):
+def enrutador_intenciones(mensaje, tiene_html, esta_en_ficha, historial, dominio=None):
     print(f"Enrutador: {tiene_html}")
     contexto_para_router = formatear_historial_para_router(historial, ultimos_n=3)
     if tiene_html:
@@ -360,9 +820,9 @@ def enrutador_intenciones(mensaje, tiene_html, esta_en_ficha, historial):
         Responde SOLO con la categoría (ej: OFF_TOPIC):"""
 
     try:
-        resp = client.chat.completions.create(
+        resp = cliente_openai().chat.completions.create(
             model="gpt-4o", 
-            messages=[{"role": "system", "content": prompt}],
+            messages=[{"role": "system", "content": adaptar_a_dominio(prompt, dominio)}],
             temperature=0, max_tokens=15
         )
         cat = resp.choices[0].message.content.strip()
@@ -376,6 +836,7 @@ def enrutador_intenciones(mensaje, tiene_html, esta_en_ficha, historial):
 # ==========================================
 
 def get_db_connection():
+    import mysql.connector
     return mysql.connector.connect(**DB_CONFIG)
 
 def recuperar_historial(user_id, dominio):
@@ -432,14 +893,56 @@ def guardar_interaccion(datos):
     finally:
         if conn and conn.is_connected(): conn.close()
 
+@app.get("/health")
+async def health_endpoint():
+    """Liveness: el proceso responde (no comprueba dependencias)."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready_endpoint():
+    """Readiness: 200 solo con todos los componentes críticos cargados; 503 con el detalle si no."""
+    listo = ciclo.listo()
+    if not listo:
+        # Reintenta en segundo plano los críticos que fallaron (respetando el plazo de reintento)
+        ciclo.calentar(todos=False)
+    contenido = {"listo": listo, "componentes": ciclo.estado()}
+    if DATOS_COMPARTIDOS:
+        contenido["generacion"] = generacion["nombre"]
+    else:
+        from feed_incremental import estadisticas_feed
+        contenido["feed"] = estadisticas_feed
+    contenido["cache_buscador"] = cache_buscador.estado()
+    with lock_estadisticas_tabla:
+        contenido["tabla_recomendaciones"] = dict(estadisticas_tabla)
+    contenido["decision_log"] = decision_log.metricas()
+    # Solo si ya se han importado: importarlos aquí cargaría los embeddings o el vectorstore
+    ficha = sys.modules.get("ficha_secciones")
+    if ficha is not None:
+        with ficha.lock_estadisticas:
+            contenido["ficha"] = dict(ficha.estadisticas_ficha)
+    rag = sys.modules.get("rag.src.colchones_rag")
+    if rag is not None:
+        with rag.lock_estadisticas:
+            contenido["rag_contexto"] = dict(rag.estadisticas_contexto)
+            contenido["rag_recuperacion"] = dict(rag.estadisticas_recuperacion)
+    if registro_dominios is not None:
+        contenido["dominios"] = registro_dominios.estado()
+    return JSONResponse(status_code=200 if listo else 503, content=contenido)
+
 class GetContextInput(BaseModel):
     message: str
+    dominio: Optional[str] = None
 
+# Los endpoints que cargan componentes o llaman a OpenAI/MySQL son `def`: FastAPI los ejecuta en su pool
+# de hilos. Como `async def`, una carga perezosa (o la espera del lock de un componente que se está
+# calentando) bloquearía el bucle de eventos del worker, /health y /ready incluidos.
 @app.post("/get_context_rag")
-async def get_context_rag_endpoint(input_data: GetContextInput, api_key: str = Security(api_key_header)):
+def get_context_rag_endpoint(input_data: GetContextInput, api_key: str = Security(api_key_header)):
     if api_key != MI_CLAVE_SECRETA:
         raise HTTPException(status_code=403, detail="Acceso denegado")
 
+    _, ciclo_dominio = datos_dominio(input_data.dominio)
+    get_context_embeddings = ciclo_dominio.obtener("rag")
     contexto_rag, sources = get_context_embeddings(input_data.message)
     return {"context": contexto_rag, "sources": sources}
 
@@ -447,7 +950,7 @@ class EmbeddingGenerationInput(BaseModel):
     url: Optional[str]
 
 @app.post('/generar_embeddings')
-async def generar_embedding_paginas(
+def generar_embedding_paginas(
     req: Optional[EmbeddingGenerationInput] = None, # Permitimos que req sea None
     api_key: str = Security(api_key_header)
 ):
@@ -457,6 +960,7 @@ async def generar_embedding_paginas(
     # Extraemos la url si req existe, si no, pasamos None
     url_a_procesar = req.url if req else None
     
+    from rag.src.generar_embeddings import obtener_embeddings
     obtener_embeddings(urls=url_a_procesar)
     
     return {
@@ -474,20 +978,25 @@ class ChatInput(BaseModel):
     html_contenido: Optional[str] = None # HTML enviado por frontend
 
 @app.post("/chat")
-async def chat_endpoint(input_data: ChatInput, api_key: str = Security(api_key_header)):
+def chat_endpoint(input_data: ChatInput, api_key: str = Security(api_key_header)):
     if api_key != MI_CLAVE_SECRETA:
         raise HTTPException(status_code=403, detail="Acceso denegado")
 
     # 1. ENRUTAMIENTO
     tiene_html = bool(input_data.html_contenido and len(input_data.html_contenido) > 50)
+    # Sin HTML, la ficha del almacén también cuenta: el router puede mandar a FICHA_PRODUCTO
+    tiene_html = tiene_html or ficha_guardada(input_data.articulo_id, input_data.dominio) is not None
     esta_en_ficha = input_data.nombre_producto
     historial = recuperar_historial(input_data.user_id, input_data.dominio)
-    intencion = enrutador_intenciones(input_data.message, tiene_html, esta_en_ficha, historial)
+    intencion = enrutador_intenciones(input_data.message, tiene_html, esta_en_ficha, historial, input_data.dominio)
+    decision_log.registrar(input_data.user_id, input_data.message, intencion,
+                           {"tiene_html": tiene_html, "nombre_producto": esta_en_ficha}, tipo="router")
     
     # --- NUEVO: BLOQUEO DE TEMAS ---
     if intencion == "OFF_TOPIC":
         respuesta_off = f"Soy un asistente virtual especializado exclusivamente en descanso y productos de Colchones.es. No puedo opinar sobre otros temas, reformula tu pregunta o puedes dejarnos un correo o teléfono para poder contactar contigo: <div class='bloqueLeadChati'>        <input type='text' placeholder='Correo o teléfono' style='width:85%; padding:8px;' name='telefonoCorreoCliente' id='telefonoCorreoCliente'/>        <input type='hidden' name='cookieUsuario' id='cookieUsuario' value='{input_data.user_id}'/>     <input type='hidden' name='articuloVisitado' id='articuloVisitado' value='{input_data.articulo_id}'/> <button type='button' style='padding: 10px 9px;    cursor: pointer;    background: #4c9b9d;    float: right;    border: solid 1px #4c9b9d;' onclick='enviarContactoChati()' id='botonEnviarContactoChati'>Enviar</button></div>"
         
+        respuesta_off = adaptar_a_dominio(respuesta_off, input_data.dominio)
         # Guardamos la interacción para que conste, pero no gastamos tokens de GPT-4
         guardar_interaccion({
             'user_id': input_data.user_id, 'pregunta': input_data.message, 'respuesta': respuesta_off,
@@ -545,7 +1054,7 @@ async def chat_endpoint(input_data: ChatInput, api_key: str = Security(api_key_h
         sys_prompt += "Ayuda a encontrar productos, urls de productos o marcas. Usa 'buscar_accesorios_xml'."
     elif intencion == "FICHA_PRODUCTO":
         tools_activas = [tool.consultar_ficha]
-        sys_prompt += "Responde dudas sobre el producto que el usuario esta viendo en la web (precio, datos del producto, donde probarlo o donde comprarlo) (te pasamos el contenido integro de la ficha de producto). Usa 'consultar_producto_actual' para leer sus datos ."
+        sys_prompt += "Responde dudas sobre el producto que el usuario esta viendo en la web (precio, datos del producto, donde probarlo o donde comprarlo) (te pasamos las secciones de la ficha de producto relacionadas con la pregunta; si falta algún dato, no lo inventes). Usa 'consultar_producto_actual' para leer sus datos ."
     elif intencion == "GENERAL_MARCA":
         tools_activas = [tool.rag_datos_generales_tienda]
         sys_prompt += "Responde dudas usando la información de la tienda. Si no está en tu conocimiento, di que no lo sabes."
@@ -573,6 +1082,7 @@ async def chat_endpoint(input_data: ChatInput, api_key: str = Security(api_key_h
     sys_prompt += "\nNO lo conviertas a Markdown."
 
     # 2. CHAT CON OPENAI
+    sys_prompt = adaptar_a_dominio(sys_prompt, input_data.dominio)
     
     messages = [{"role": "system", "content": sys_prompt}] + historial + [{"role": "user", "content": input_data.message}]
 
@@ -589,6 +1099,7 @@ async def chat_endpoint(input_data: ChatInput, api_key: str = Security(api_key_h
             kwargs["tools"] = tools_activas
             kwargs["tool_choice"] = "auto"
 
+        client = cliente_openai()
         response = client.chat.completions.create(**kwargs)
         msg_ia = response.choices[0].message
         
@@ -602,15 +1113,21 @@ async def chat_endpoint(input_data: ChatInput, api_key: str = Security(api_key_h
             res_tool = ""
 
             if name == "recomendar_colchon":
-                res_tool = logica_recomendar_colchon(args, input_data.user_id)
+                res_tool = logica_recomendar_colchon(args, input_data.user_id, input_data.dominio)
             elif name == "buscar_accesorios_xml":
-                res_tool = logica_buscar_accesorios(args, input_data.user_id)
+                res_tool = logica_buscar_accesorios(args, input_data.user_id, input_data.dominio)
             elif name == "consultar_producto_actual":
-                res_tool = logica_consultar_producto_actual(input_data.html_contenido, input_data.user_id)
+                res_tool = logica_consultar_producto_actual(input_data.html_contenido, input_data.user_id,
+                                                            input_data.message, input_data.articulo_id,
+                                                            input_data.dominio)
             elif name == "buscar_info_general":
-                res_tool, _sources = get_context_embeddings(input_data.message)
+                _, ciclo_dominio = datos_dominio(input_data.dominio)
+                res_tool, _sources = ciclo_dominio.obtener("rag")(input_data.message)
                 if _sources:
-                    res_tool = f"{res_tool} \n\n(Indica al usuario que puede consultar la siguiente fuente para obtener más información: https://www.colchones.es{_sources[0]})"
+                    web = adaptar_a_dominio("https://www.colchones.es", input_data.dominio)
+                    res_tool = f"{res_tool} \n\n(Indica al usuario que puede consultar la siguiente fuente para obtener más información: {web}{_sources[0]})"
+
+            decision_log.registrar(input_data.user_id, input_data.message, name, args, res_tool)
             
             messages.append(msg_ia)
             messages.append({"role": "tool", "tool_call_id": tool_call.id, "content": res_tool})
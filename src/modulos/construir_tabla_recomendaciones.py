@@ -0,0 +1,82 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import sys
+import time
+
+# tabla_recomendaciones.py y predictor_compacto.py viven en src/ (junto a main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tabla_recomendaciones import (TablaRecomendaciones, construir_tabla, huella_ficheros_modelo,
+                                   perfil_desde_args, puntuar_catalogo, MATERIALES)
+
+# ==========================
+# 1. Parámetros
+# ==========================
+parser = argparse.ArgumentParser(description="Precalcula el top-k de colchones por celda de perfil")
+parser.add_argument("--altura", type=float, nargs=3, default=[140, 210, 2], metavar=("MIN", "MAX", "PASO"))
+parser.add_argument("--peso", type=float, nargs=3, default=[40, 160, 2], metavar=("MIN", "MAX", "PASO"))
+parser.add_argument("--k", type=int, default=15, help="Artículos guardados por celda")
+parser.add_argument("--muestras", type=int, default=2000, help="Perfiles aleatorios para comparar tabla vs. vivo")
+parser.add_argument("--salida", default="tabla_recomendaciones.npz")
+parser.add_argument("--peso-mejora", type=float, default=0.3,
+                    help="Peso de la mejora de molestias (debe coincidir con PESO_MEJORA_MOLESTIAS de main.py)")
+args = parser.parse_args()
+
+# ==========================
+# 2. Catálogo y modelo (los mismos que carga main.py)
+# ==========================
+catalogo = pd.read_csv("encuestas_limpio.csv").drop_duplicates(subset=["cod_articulo"]).copy()
+peso_mejora = None
+if os.path.exists("modelo_satisfaccion.npz"):
+    from predictor_compacto import PuntuadorConjunto, cargar_puntuador
+    modelo = cargar_puntuador("modelo_satisfaccion.npz", "modelo_mejoras.npz", args.peso_mejora)
+    if isinstance(modelo, PuntuadorConjunto):
+        peso_mejora = args.peso_mejora
+        print(f"Modelo: modelo_satisfaccion.npz + modelo_mejoras.npz (peso mejora {peso_mejora})")
+    else:
+        print("Modelo: modelo_satisfaccion.npz")
+else:
+    import joblib
+    modelo = joblib.load("modelo_satisfaccion.pkl")
+    print("Modelo: modelo_satisfaccion.pkl")
+
+# ==========================
+# 3. Construcción de la tabla
+# ==========================
+print(f"Evaluando rejilla altura={args.altura} peso={args.peso} sobre {len(catalogo)} artículos…")
+t0 = time.time()
+meta = construir_tabla(catalogo, modelo, args.salida, tuple(args.altura), tuple(args.peso), args.k,
+                       meta_extra={"peso_mejora": peso_mejora, "modelo": huella_ficheros_modelo(".")})
+celdas = len(meta["sexos"]) * meta["n_altura"] * meta["n_peso"] * 4
+print(f"Guardado {args.salida}: {celdas} celdas × {len(meta['materiales'])} materiales, "
+      f"{os.path.getsize(args.salida) / 1e6:.1f} MB en {time.time() - t0:.0f}s")
+
+# ==========================================
+# 4. Comparación tabla vs. puntuación en vivo
+# ==========================================
+# Perfiles con altura/peso continuos dentro de la rejilla: medimos cuántas
+# veces la cuantización cambia la respuesta (top-1 y top-3 de artículos).
+tabla = TablaRecomendaciones.cargar(args.salida)
+rnd = np.random.default_rng(0)
+top1_iguales = top3_iguales = top3_mismo_conjunto = 0
+for _ in range(args.muestras):
+    perfil = perfil_desde_args({
+        "sexo": rnd.choice(["hombre", "mujer"]),
+        "altura": round(rnd.uniform(args.altura[0], args.altura[1])),
+        "peso": round(rnd.uniform(args.peso[0], args.peso[1]), 1),
+        "duerme_en_pareja": bool(rnd.integers(2)),
+        "molestias_antes": bool(rnd.integers(2)),
+    })
+    material = rnd.choice(list(MATERIALES))
+    de_tabla = [c for c, _ in tabla.buscar(perfil, material)[:3]]
+    en_vivo = [c for c, _ in puntuar_catalogo(catalogo, modelo, perfil, material)[:3]]
+    top1_iguales += de_tabla[:1] == en_vivo[:1]
+    top3_iguales += de_tabla == en_vivo
+    top3_mismo_conjunto += set(de_tabla) == set(en_vivo)
+
+n = args.muestras
+print(f"\n=== TABLA vs. VIVO ({n} perfiles aleatorios) ===")
+print(f"Top-1 igual:            {top1_iguales / n:.1%}")
+print(f"Top-3 igual (y orden):  {top3_iguales / n:.1%}")
+print(f"Top-3 mismo conjunto:   {top3_mismo_conjunto / n:.1%}")
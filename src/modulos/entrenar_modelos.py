@@ -1,11 +1,33 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+import argparse
 import joblib
+import os
+import sys
+import time
+
+# predictor_compacto.py y seleccion_modelos.py viven en src/ (junto a main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from predictor_compacto import PredictorForest, exportar_pipeline, verificar_fidelidad
+from seleccion_modelos import (CANDIDATOS, FEATURES, codificar_con_cache, crear_estimador, elegir,
+                               lotes_peticion, resumir, tabla_markdown, validacion_cruzada)
+
+# ==========================
+# 0. Parámetros
+# ==========================
+parser = argparse.ArgumentParser(description="Entrena los modelos de satisfacción y mejora de molestias")
+parser.add_argument("--pliegues", type=int, default=5, help="Pliegues de la validación cruzada")
+parser.add_argument("--tolerancia", type=float, default=0.02,
+                    help="Error relativo que se acepta frente al mejor a cambio de menos latencia")
+parser.add_argument("--presupuesto-ms", type=float, default=None,
+                    help="Latencia máxima por petición (catálogo completo) del modelo elegido")
+parser.add_argument("--n-jobs", type=int, default=-1, help="Procesos de la búsqueda (-1 = todos los núcleos)")
+parser.add_argument("--sin-busqueda", action="store_true",
+                    help="Entrena directamente la configuración histórica (rf_300_d12)")
+parser.add_argument("--cache", default=".cache_entrenamiento", help="Directorio de la codificación cacheada")
+parser.add_argument("--informe", default="informe_modelos.md")
+args = parser.parse_args()
 
 # ==========================
 # 1. Cargar CSV limpio
@@ -23,75 +45,94 @@ df["mejora_molestias"] = np.where(
 )
 
 # ==========================
-# 3. Variables de entrada
+# 3. Variables de entrada (codificadas una sola vez)
 # ==========================
-feature_cols = [
-    "sexo",
-    "altura",
-    "peso",
-    "imc",
-    "duerme_en_pareja",
-    "nucleo",
-    "grosor",
-    "firmeza",
-    "molestias_antes"
-]
-
-X = df[feature_cols]
-
-# Objetivos
-y_satisf = df["valoracion"]
-y_mejoras = df["mejora_molestias"]
+X = df[FEATURES]
+preprocessor, M = codificar_con_cache(df, args.cache)
+
+# Filas de un mismo pedido siempre en el mismo pliegue
+grupos = df["cod_pedido"].to_numpy()
+lotes = lotes_peticion(df)
+
+# Uso real para comprobar la exportación: cada artículo del catálogo × perfiles de usuario
+catalogo = df.drop_duplicates(subset=["cod_articulo"])
+perfiles = []
+for sexo in ["hombre", "mujer"]:
+    for altura in range(150, 206, 5):
+        for peso in range(45, 141, 5):
+            for pareja in [0, 1]:
+                for molestias in [0, 1]:
+                    perfiles.append((sexo, altura, peso, pareja, molestias))
+X_uso = catalogo.loc[catalogo.index.repeat(len(perfiles)), FEATURES].reset_index(drop=True)
+perfiles_rep = pd.DataFrame(perfiles * len(catalogo), columns=["sexo", "altura", "peso", "duerme_en_pareja", "molestias_antes"])
+for col in perfiles_rep.columns:
+    X_uso[col] = perfiles_rep[col].values
+X_uso["imc"] = X_uso["peso"] / ((X_uso["altura"] / 100) ** 2)
+X_uso = X_uso.sample(n=min(len(X_uso), 50000), random_state=0)
+
+informe = ["# Selección de modelos", "",
+           f"{len(df)} filas, {args.pliegues} pliegues agrupados por pedido, tolerancia {args.tolerancia:.0%}"
+           + (f", presupuesto {args.presupuesto_ms} ms/petición" if args.presupuesto_ms else "")
+           + f". Latencia medida con PredictorForest sobre el catálogo completo ({len(lotes[0])} artículos) × 20 perfiles.",
+           ""]
+
 
 # ==========================================
-# 4. Preprocesamiento (OneHotEncoder)
+# 4. Búsqueda, elección y entrenamiento final
 # ==========================================
-cat_cols = ["sexo", "nucleo", "grosor"]
-num_cols = ["altura", "peso", "imc", "duerme_en_pareja", "firmeza", "molestias_antes"]
-
-preprocessor = ColumnTransformer(
-    transformers=[
-        ("cat", OneHotEncoder(handle_unknown="ignore"), cat_cols),
-        ("num", "passthrough", num_cols)
-    ]
-)
+def entrenar(titulo, tarea, y, nombre):
+    if args.sin_busqueda:
+        familia, params = CANDIDATOS["rf_300_d12"]
+    else:
+        print(f"\n🔎 {titulo}: {len(CANDIDATOS)} configuraciones × {args.pliegues} pliegues…")
+        t0 = time.time()
+        resultados = validacion_cruzada(M, y, grupos, tarea, CANDIDATOS, args.pliegues, args.n_jobs)
+        filas = resumir(resultados, preprocessor, lotes)
+        elegida = elegir(filas, args.tolerancia, args.presupuesto_ms)
+        tabla = tabla_markdown(titulo, tarea, filas, elegida)
+        print(tabla)
+        print(f"Búsqueda completada en {time.time() - t0:.0f}s → {elegida['modelo']}")
+        informe.append(tabla)
+        familia, params = CANDIDATOS[elegida["modelo"]]
+
+    # Modelo final con todos los datos, sobre la matriz ya codificada
+    print(f"Entrenando {titulo.lower()} ({familia}, {params})…")
+    modelo = crear_estimador(familia, params, tarea, n_jobs=-1).fit(M, y)
+    pipeline = Pipeline(steps=[("preprocess", preprocessor), ("model", modelo)])
+
+    joblib.dump(pipeline, f"{nombre}.pkl")
+    print(f"Guardado {nombre}.pkl")
+
+    # ==========================================
+    # EXPORTACIÓN COMPACTA → .npz
+    # ==========================================
+    # Árboles aplanados en arrays NumPy: main.py lo carga en milisegundos y
+    # predice sin sklearn. Comprobamos fidelidad con los datos de entrenamiento
+    # y con el uso real (cada artículo del catálogo × perfiles de usuario).
+    meta = exportar_pipeline(pipeline, f"{nombre}.npz")
+    compacto = PredictorForest.cargar(f"{nombre}.npz")
+    error_entrenamiento = verificar_fidelidad(pipeline, compacto, X)
+    error_uso = verificar_fidelidad(pipeline, compacto, X_uso)
+    print(f"Guardado {nombre}.npz ({meta['n_arboles']} árboles, "
+          f"{os.path.getsize(f'{nombre}.npz') / 1e6:.1f} MB, "
+          f"error máx. entrenamiento {error_entrenamiento:.1e}, uso {error_uso:.1e})")
+
 
 # ==========================
 # 5. MODELO 1 → Satisfacción
 # ==========================
-modelo_satisf = Pipeline(steps=[
-    ("preprocess", preprocessor),
-    ("model", RandomForestRegressor(
-        n_estimators=300,
-        max_depth=12,
-        random_state=42,
-        n_jobs=-1
-    ))
-])
-
-print("Entrenando modelo de satisfacción…")
-modelo_satisf.fit(X, y_satisf)
-
-joblib.dump(modelo_satisf, "modelo_satisfaccion.pkl")
-print("Guardado modelo_satisfaccion.pkl")
+entrenar("Modelo de satisfacción", "regresion", df["valoracion"].to_numpy(), "modelo_satisfaccion")
 
 # ==========================
 # 6. MODELO 2 → Mejora molestias
 # ==========================
-modelo_mejoras = Pipeline(steps=[
-    ("preprocess", preprocessor),
-    ("model", RandomForestClassifier(
-        n_estimators=300,
-        max_depth=12,
-        random_state=42,
-        n_jobs=-1
-    ))
-])
-
-print("Entrenando modelo de mejora de molestias…")
-modelo_mejoras.fit(X, y_mejoras)
-
-joblib.dump(modelo_mejoras, "modelo_mejoras.pkl")
-print("Guardado modelo_mejoras.pkl")
-
-print("\n=== ENTRENAMIENTO COMPLETADO CON RANDOM FOREST ===")
+# main.py combina su versión compacta con la de satisfacción en una sola
+# pasada (misma codificación de entrada, ver PuntuadorConjunto)
+entrenar("Modelo de mejora de molestias", "clasificacion", df["mejora_molestias"].to_numpy(), "modelo_mejoras")
+
+if not args.sin_busqueda:
+    with open(args.informe, "w", encoding="utf-8") as f:
+        f.write("\n".join(informe))
+    print(f"\n📄 Informe guardado en {args.informe}")
+
+print("\n=== ENTRENAMIENTO COMPLETADO ===")
@@ -1,115 +1,233 @@
 import pandas as pd
 import numpy as np
+import argparse
+import csv
+import io
+import os
 
-# =========================
-# 1. Cargar CSV original
-# =========================
-df = pd.read_csv("encuestas_colchones.csv", sep=None, engine="python")
-
-# NORMALIZAR nombres de columnas (por si tienen espacios delante/detrás)
-df.columns = [c.strip() for c in df.columns]
+# ======================================================
+# Transformación columnar (ancho → largo)
+# ======================================================
+# Cada fila del CSV original es un pedido con hasta dos encuestados
+# (MUJER1 / HOMBRE1). Se separa en una fila por persona con operaciones
+# sobre columnas enteras en lugar de recorrer fila a fila, y el fichero se
+# lee por lotes para poder procesar históricos que no caben en memoria.
+
+COLUMNAS_PEDIDO = {
+    "COD PEDIDO": "cod_pedido",
+    "COD ARTICULO": "cod_articulo",
+    "NOMBRE ARTICULO": "nombre_articulo",
+    "NUCLEO": "nucleo",
+    "GROSOR": "grosor",
+    "FIRMEZA": "firmeza",
+}
+
+# Prefijo de columnas de cada persona, en el orden en que se emiten las filas
+PERSONAS = [("mujer", "MUJER1"), ("hombre", "HOMBRE1")]
+
+COLUMNAS_SALIDA = ["cod_pedido", "cod_articulo", "nombre_articulo", "nucleo", "grosor", "firmeza", "sexo",
+                   "altura", "peso", "imc", "valoracion", "molestias_antes", "molestias_despues",
+                   "duerme_en_pareja"]
+
+# Esquema explícito de la salida Parquet (mismo orden que COLUMNAS_SALIDA)
+ESQUEMA_PARQUET = [
+    ("cod_pedido", "int64"),
+    ("cod_articulo", "int64"),
+    ("nombre_articulo", "string"),
+    ("nucleo", "string"),
+    ("grosor", "string"),
+    ("firmeza", "float64"),
+    ("sexo", "string"),
+    ("altura", "float64"),
+    ("peso", "float64"),
+    ("imc", "float64"),
+    ("valoracion", "float64"),
+    ("molestias_antes", "int8"),
+    ("molestias_despues", "int8"),
+    ("duerme_en_pareja", "int8"),
+]
+
+VALORES_SI = ["si", "sí", "1", "true"]
+
+
+def columnas_entrada():
+    columnas = list(COLUMNAS_PEDIDO)
+    for _, prefijo in PERSONAS:
+        columnas += [f"ID {prefijo}", f"{prefijo} altura", f"{prefijo} peso", f"{prefijo} imc",
+                     f"{prefijo} VALORACION", f"{prefijo} MOLESTIAS ANTES", f"{prefijo} MOLESTIAS DESPUES"]
+    return columnas
 
-print("Columnas detectadas por pandas:")
-print(df.columns.tolist())
 
 # ==========================================
-# Helpers
+# Helpers (vectorizados)
 # ==========================================
-def normalize_bool(x):
-    if pd.isna(x):
-        return 0
-    x = str(x).strip().lower()
-    if x in ["si", "sí", "1", "true"]:
-        return 1
-    return 0
-
-def to_float(x):
-    if pd.isna(x):
-        return np.nan
-    x = str(x).strip().replace(",", ".")
+# Se lee todo como texto, así que los tipos no dependen de lo que contenga
+# cada lote. Mismas reglas que las antiguas normalize_bool / to_float, pero
+# aplicadas solo a los valores distintos de la columna (alturas, pesos,
+# "si"/"no"… se repiten muchísimo) y repartidas después con sus códigos.
+def por_valores_unicos(serie, conversion, valor_nulo):
+    codigos, unicos = pd.factorize(serie)
+    convertidos = np.asarray(conversion(pd.Series(unicos, dtype=object)))
+    # El código -1 (NaN) apunta al último elemento: valor_nulo
+    convertidos = np.append(convertidos, np.array([valor_nulo], dtype=convertidos.dtype))
+    return pd.Series(convertidos[codigos], index=serie.index)
+
+def normalize_bool(serie):
+    return por_valores_unicos(serie, lambda u: u.str.strip().str.lower().isin(VALORES_SI).astype(np.int8), 0)
+
+def to_float(serie):
+    return por_valores_unicos(
+        serie, lambda u: pd.to_numeric(u.str.strip().str.replace(",", ".", regex=False), errors="coerce").astype(np.float64),
+        np.nan)
+
+def to_int(serie):
+    return por_valores_unicos(serie, lambda u: pd.to_numeric(u.str.strip(), errors="coerce").astype(np.float64),
+                              np.nan).astype("Int64")
+
+
+def detectar_separador(ruta):
+    """Equivalente a sep=None, pero se detecta una vez y se lee con el motor C."""
+    with open(ruta, encoding="utf-8", newline="") as f:
+        muestra = f.read(64 * 1024)
     try:
-        return float(x)
-    except:
-        return np.nan
-
-# ======================================================
-# Crear un dataframe vacío para almacenar las nuevas filas
-# ======================================================
-rows = []
+        return csv.Sniffer().sniff(muestra, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
 
-for _, row in df.iterrows():
 
-    # MUJER PRESENTE SI ID MUJER1 NO ES NaN
-    id_mujer = row.get("ID MUJER1", np.nan)
-    mujer_presente = not pd.isna(id_mujer)
-
-    # HOMBRE PRESENTE SI ID HOMBRE1 NO ES NaN
-    id_hombre = row.get("ID HOMBRE1", np.nan)
-    hombre_presente = not pd.isna(id_hombre)
+def transformar(df):
+    """DataFrame con las columnas originales (texto) → filas limpias, una por persona."""
+    df.columns = [c.strip() for c in df.columns]
+    df = df.reindex(columns=columnas_entrada())
 
+    presentes = {prefijo: df[f"ID {prefijo}"].notna().to_numpy() for _, prefijo in PERSONAS}
     # SI HAY HOMBRE Y MUJER → DUERME EN PAREJA
-    duerme_en_pareja = 1 if (mujer_presente and hombre_presente) else 0
-
-    # ------------------------------------------
-    # PROCESAR MUJER
-    # ------------------------------------------
-    altura_mujer = row.get("MUJER1 altura", np.nan)
-    if mujer_presente and not pd.isna(altura_mujer):
-        rows.append({
-            "cod_pedido": row.get("COD PEDIDO"),
-            "cod_articulo": row.get("COD ARTICULO"),
-            "nombre_articulo": row.get("NOMBRE ARTICULO"),
-            "nucleo": row.get("NUCLEO"),
-            "grosor": row.get("GROSOR"),
-            "firmeza": row.get("FIRMEZA"),
-            "sexo": "mujer",
-            "altura": to_float(row.get("MUJER1 altura")),
-            "peso": to_float(row.get("MUJER1 peso")),
-            "imc": to_float(row.get("MUJER1 imc")),
-            "valoracion": row.get("MUJER1 VALORACION"),
-            "molestias_antes": normalize_bool(row.get("MUJER1 MOLESTIAS ANTES")),
-            "molestias_despues": normalize_bool(row.get("MUJER1 MOLESTIAS DESPUES")),
-            "duerme_en_pareja": duerme_en_pareja
-        })
-
-    # ------------------------------------------
-    # PROCESAR HOMBRE
-    # ------------------------------------------
-    altura_hombre = row.get("HOMBRE1 altura", np.nan)
-    if hombre_presente and not pd.isna(altura_hombre):
-        rows.append({
-            "cod_pedido": row.get("COD PEDIDO"),
-            "cod_articulo": row.get("COD ARTICULO"),
-            "nombre_articulo": row.get("NOMBRE ARTICULO"),
-            "nucleo": row.get("NUCLEO"),
-            "grosor": row.get("GROSOR"),
-            "firmeza": row.get("FIRMEZA"),
-            "sexo": "hombre",
-            "altura": to_float(row.get("HOMBRE1 altura")),
-            "peso": to_float(row.get("HOMBRE1 peso")),
-            "imc": to_float(row.get("HOMBRE1 imc")),
-            "valoracion": row.get("HOMBRE1 VALORACION"),
-            "molestias_antes": normalize_bool(row.get("HOMBRE1 MOLESTIAS ANTES")),
-            "molestias_despues": normalize_bool(row.get("HOMBRE1 MOLESTIAS DESPUES")),
-            "duerme_en_pareja": duerme_en_pareja
-        })
-
-    # ------------------------------------------
-    # NIÑOS: por ahora NO los incluimos (opción recomendada)
-    # ------------------------------------------
+    duerme_en_pareja = np.logical_and.reduce(list(presentes.values())).astype(np.int8)
+
+    pedido = pd.DataFrame({destino: df[origen] for origen, destino in COLUMNAS_PEDIDO.items()})
+    pedido["cod_pedido"] = to_int(pedido["cod_pedido"])
+    pedido["cod_articulo"] = to_int(pedido["cod_articulo"])
+    firmeza = to_float(pedido["firmeza"])
+    # La firmeza es una escala entera: se mantiene entera si lo es
+    pedido["firmeza"] = firmeza.astype("Int64") if (firmeza.dropna() % 1 == 0).all() else firmeza
+
+    partes = []
+    for orden, (sexo, prefijo) in enumerate(PERSONAS):
+        # Persona presente si tiene ID y altura
+        mascara = presentes[prefijo] & df[f"{prefijo} altura"].notna().to_numpy()
+        p = df.loc[mascara]
+        parte = pedido.loc[mascara].copy()
+        parte["sexo"] = sexo
+        parte["altura"] = to_float(p[f"{prefijo} altura"])
+        parte["peso"] = to_float(p[f"{prefijo} peso"])
+        parte["imc"] = to_float(p[f"{prefijo} imc"])
+        parte["valoracion"] = por_valores_unicos(
+            p[f"{prefijo} VALORACION"], lambda u: pd.to_numeric(u, errors="coerce").astype(np.float64), np.nan)
+        parte["molestias_antes"] = normalize_bool(p[f"{prefijo} MOLESTIAS ANTES"])
+        parte["molestias_despues"] = normalize_bool(p[f"{prefijo} MOLESTIAS DESPUES"])
+        parte["duerme_en_pareja"] = duerme_en_pareja[mascara]
+        # Clave de orden: fila original y, dentro de ella, mujer antes que hombre
+        parte["_orden"] = np.flatnonzero(mascara) * len(PERSONAS) + orden
+        partes.append(parte)
 
-# ===============================
-# Crear dataframe final
-# ===============================
-df_final = pd.DataFrame(rows)
+    # NIÑOS: por ahora NO los incluimos (opción recomendada)
 
-# Quitar filas sin valoración
-df_final = df_final[~df_final["valoracion"].isna()]
-df_final["valoracion"] = pd.to_numeric(df_final["valoracion"], errors="coerce")
-df_final = df_final[~df_final["valoracion"].isna()]
+    resultado = pd.concat(partes, ignore_index=True).sort_values("_orden", kind="stable")
+    # Quitar filas sin valoración
+    resultado = resultado[resultado["valoracion"].notna()]
+    return resultado[COLUMNAS_SALIDA].reset_index(drop=True)
 
-df_final.to_csv("encuestas_limpio.csv", index=False, float_format="%.3f")
 
-print("\nCSV limpio generado correctamente → encuestas_limpio.csv")
-print("Total filas:", len(df_final))
-print(df_final.head())
+# ==========================================
+# Escritura CSV
+# ==========================================
+# Igual que df.to_csv(index=False, float_format="%.3f"), pero cada valor
+# distinto se formatea una sola vez: to_csv formatea celda a celda y era
+# más lento que toda la transformación.
+def celda_csv(valor):
+    if isinstance(valor, (float, np.floating)):
+        return "%.3f" % valor
+    if isinstance(valor, (int, np.integer)):
+        return str(int(valor))
+    texto = io.StringIO()
+    csv.writer(texto, lineterminator="").writerow([valor])
+    return texto.getvalue()
+
+def columna_csv(serie):
+    codigos, unicos = pd.factorize(serie)
+    textos = np.array([celda_csv(v) for v in unicos] + [""], dtype=object)
+    return textos[codigos]
+
+def escribir_csv(df, ruta, cabecera):
+    columnas = [columna_csv(df[c]) for c in df.columns]
+    with open(ruta, "w" if cabecera else "a", encoding="utf-8", newline="") as f:
+        if cabecera:
+            f.write(",".join(celda_csv(c) for c in df.columns) + os.linesep)
+        if len(df):
+            f.write(os.linesep.join(map(",".join, zip(*columnas))) + os.linesep)
+
+
+def esquema_parquet():
+    import pyarrow as pa
+    return pa.schema([(nombre, getattr(pa, tipo)()) for nombre, tipo in ESQUEMA_PARQUET])
+
+
+def procesar(entrada, salida, salida_parquet=None, filas_lote=200_000, verbose=True):
+    """Lee `entrada` por lotes y escribe el CSV limpio (y opcionalmente Parquet). Devuelve (filas, muestra)."""
+    sep = detectar_separador(entrada)
+    # Solo las columnas que se usan (las de niños se descartan al leer)
+    usadas = set(columnas_entrada())
+    lector = pd.read_csv(entrada, sep=sep, dtype=str, chunksize=filas_lote, usecols=lambda c: c.strip() in usadas)
+
+    escritor_parquet = None
+    if salida_parquet:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ La salida Parquet necesita pyarrow (pip install pyarrow)")
+        esquema = esquema_parquet()
+        escritor_parquet = pq.ParquetWriter(salida_parquet, esquema)
+
+    total, muestra = 0, None
+    try:
+        for i, lote in enumerate(lector):
+            if i == 0 and verbose:
+                print("Columnas detectadas por pandas:")
+                print([c.strip() for c in lote.columns])
+            limpio = transformar(lote)
+            escribir_csv(limpio, salida, cabecera=(i == 0))
+            if escritor_parquet is not None:
+                escritor_parquet.write_table(pa.Table.from_pandas(limpio, schema=esquema, preserve_index=False))
+            total += len(limpio)
+            if muestra is None:
+                muestra = limpio.head()
+    finally:
+        if escritor_parquet is not None:
+            escritor_parquet.close()
+    return total, muestra
+
+
+if __name__ == "__main__":
+    # =========================
+    # 1. Parámetros
+    # =========================
+    parser = argparse.ArgumentParser(description="Limpia encuestas_colchones.csv → encuestas_limpio.csv")
+    parser.add_argument("--entrada", default="encuestas_colchones.csv")
+    parser.add_argument("--salida", default="encuestas_limpio.csv")
+    parser.add_argument("--parquet", default=None, metavar="RUTA",
+                        help="Escribe también la salida en Parquet con esquema fijo (requiere pyarrow)")
+    parser.add_argument("--filas-lote", type=int, default=200_000,
+                        help="Filas del CSV original leídas por lote")
+    args = parser.parse_args()
+
+    # =========================
+    # 2. Procesar por lotes
+    # =========================
+    total, muestra = procesar(args.entrada, args.salida, args.parquet, args.filas_lote)
+
+    print(f"\nCSV limpio generado correctamente → {args.salida}")
+    if args.parquet:
+        print(f"Parquet generado → {args.parquet}")
+    print("Total filas:", total)
+    print(muestra)
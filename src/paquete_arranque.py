@@ -0,0 +1,242 @@
+"""
+Paquete de arranque: catálogo, modelos y tabla de recomendaciones listos
+para mapear en memoria.
+
+Cada worker de uvicorn leía encuestas_limpio.csv con pandas, deduplicaba
+el catálogo y cargaba los modelos en cada reinicio. El paquete se
+construye una vez por despliegue y deja todo como .npy sin comprimir:
+
+    paquete_arranque/
+        manifiesto.json              versión, hashes de fuentes y ficheros
+        catalogo/<columna>.npy       catálogo deduplicado, una columna por fichero
+        modelo_satisfaccion/*.npy    arrays de PredictorForest (incluidos los derivados)
+        modelo_mejoras/*.npy         (si existe)
+        tabla_recomendaciones/*.npy  (si existe)
+
+Al arrancar los arrays se abren con np.load(mmap_mode="r"): no hay que
+parsear nada, las páginas se leen bajo demanda y, como el mapeo es de
+solo lectura, todos los workers comparten las mismas páginas de la caché
+del sistema.
+
+Construcción (desde src/, después de entrenar y de la tabla):
+    python paquete_arranque.py
+    python paquete_arranque.py --verificar
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from predictor_compacto import PredictorForest, PuntuadorConjunto
+from tabla_recomendaciones import MODELOS_COMPACTOS, TablaRecomendaciones, huella_modelo
+
+VERSION_FORMATO = 1
+MANIFIESTO = "manifiesto.json"
+
+FUENTES = {
+    "catalogo": "encuestas_limpio.csv",
+    "modelo_satisfaccion": "modelo_satisfaccion.npz",
+    "modelo_mejoras": "modelo_mejoras.npz",
+    "tabla_recomendaciones": "tabla_recomendaciones.npz",
+}
+
+
+def _sha256(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _firma(ruta):
+    """(tamaño, mtime) de un fichero: si no han cambiado, no hace falta volver a calcular su hash."""
+    info = os.stat(ruta)
+    return [info.st_size, info.st_mtime_ns]
+
+
+def guardar_arrays(directorio, arrays):
+    os.makedirs(directorio, exist_ok=True)
+    for nombre, array in arrays.items():
+        np.save(os.path.join(directorio, f"{nombre}.npy"), np.asarray(array), allow_pickle=False)
+
+
+def cargar_arrays(directorio):
+    """{nombre: array} mapeados en memoria (solo lectura). Los 0-d (metadatos JSON) se leen enteros."""
+    arrays = {}
+    for fichero in sorted(os.listdir(directorio)):
+        if not fichero.endswith(".npy"):
+            continue
+        ruta = os.path.join(directorio, fichero)
+        array = np.load(ruta, mmap_mode="r", allow_pickle=False)
+        # np.asarray: vista ndarray normal sobre el mapeo (sin la sobrecarga de np.memmap)
+        arrays[fichero[:-4]] = np.load(ruta, allow_pickle=False) if array.ndim == 0 else np.asarray(array)
+    return arrays
+
+
+# ==========================================
+# CONSTRUCCIÓN
+# ==========================================
+
+def construir_paquete(directorio="paquete_arranque", origen="."):
+    """Escribe el paquete a partir de los ficheros de `origen`. Devuelve el manifiesto."""
+    fuentes = {clave: os.path.join(origen, fichero) for clave, fichero in FUENTES.items()}
+    for clave in ("catalogo", "modelo_satisfaccion"):
+        if not os.path.exists(fuentes[clave]):
+            raise FileNotFoundError(f"Falta {fuentes[clave]} (el paquete necesita el CSV y el modelo compacto)")
+
+    temporal = directorio + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+
+    catalogo = pd.read_csv(fuentes["catalogo"]).drop_duplicates(subset=["cod_articulo"])
+    columnas = {}
+    for col in catalogo.columns:
+        valores = catalogo[col].to_numpy()
+        if valores.dtype.kind not in "biuf":
+            # Texto como unicode de ancho fijo: se puede mapear sin pickle
+            valores = catalogo[col].astype(str).to_numpy().astype("U")
+        columnas[col] = valores
+    guardar_arrays(os.path.join(temporal, "catalogo"), columnas)
+
+    componentes = {"catalogo": {"filas": len(catalogo), "columnas": list(catalogo.columns)}}
+    for clave in ("modelo_satisfaccion", "modelo_mejoras"):
+        if os.path.exists(fuentes[clave]):
+            guardar_arrays(os.path.join(temporal, clave), PredictorForest.cargar(fuentes[clave]).arrays())
+            componentes[clave] = {}
+    if os.path.exists(fuentes["tabla_recomendaciones"]):
+        tabla = TablaRecomendaciones.cargar(fuentes["tabla_recomendaciones"])
+        modelo = huella_modelo({FUENTES[c]: _sha256(fuentes[c]) for c in ("modelo_satisfaccion", "modelo_mejoras")
+                                if c in componentes})
+        if tabla.compatible_con(catalogo, tabla.meta.get("peso_mejora"), modelo):
+            guardar_arrays(os.path.join(temporal, "tabla_recomendaciones"), tabla.arrays())
+            componentes["tabla_recomendaciones"] = {}
+        else:
+            print("⚠️ La tabla de recomendaciones no corresponde al catálogo o al modelo: no se incluye en el paquete.")
+
+    ficheros = {}
+    for raiz, _, nombres in os.walk(temporal):
+        for nombre in sorted(nombres):
+            ruta = os.path.join(raiz, nombre)
+            ficheros[os.path.relpath(ruta, temporal).replace(os.sep, "/")] = _sha256(ruta)
+    manifiesto = {
+        "version": VERSION_FORMATO,
+        "creado": datetime.now().isoformat(timespec="seconds"),
+        # Hash de todo el contenido: identifica la versión del paquete
+        "hash": hashlib.sha256(json.dumps(ficheros, sort_keys=True).encode()).hexdigest()[:16],
+        "fuentes": {FUENTES[c]: _sha256(r) for c, r in fuentes.items() if c in componentes},
+        "firmas_fuentes": {FUENTES[c]: _firma(r) for c, r in fuentes.items() if c in componentes},
+        "componentes": componentes,
+        "ficheros": ficheros,
+    }
+    with open(os.path.join(temporal, MANIFIESTO), "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+
+    # Sustitución del paquete anterior de una vez (los workers en marcha siguen con sus mapeos)
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.replace(temporal, directorio)
+    return manifiesto
+
+
+# ==========================================
+# CARGA
+# ==========================================
+
+def leer_manifiesto(directorio):
+    ruta = os.path.join(directorio, MANIFIESTO)
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def fuentes_cambiadas(manifiesto, origen="."):
+    """Fuentes presentes en `origen` cuyo contenido ya no es el empaquetado.
+
+    Si las fuentes no se despliegan junto al paquete no hay nada que comparar.
+    Solo se calcula el hash de las que no conservan el tamaño y el mtime con que se empaquetaron.
+    """
+    cambiadas = []
+    firmas = manifiesto.get("firmas_fuentes", {})
+    for fichero, sha in manifiesto["fuentes"].items():
+        ruta = os.path.join(origen, fichero)
+        if not os.path.exists(ruta) or _firma(ruta) == firmas.get(fichero):
+            continue
+        if _sha256(ruta) != sha:
+            cambiadas.append(fichero)
+    # Un modelo de mejora nuevo que no está en el paquete también lo deja obsoleto
+    for clave in ("modelo_mejoras", "tabla_recomendaciones"):
+        if clave not in manifiesto["componentes"] and os.path.exists(os.path.join(origen, FUENTES[clave])):
+            cambiadas.append(FUENTES[clave])
+    return cambiadas
+
+
+def huella_modelo_paquete(manifiesto):
+    """huella_modelo de los ficheros del modelo empaquetado (la de tabla_recomendaciones.huella_ficheros_modelo)."""
+    return huella_modelo({f: sha for f, sha in manifiesto["fuentes"].items() if f in MODELOS_COMPACTOS})
+
+
+def cargar_paquete(directorio="paquete_arranque", peso_mejora=0.3):
+    """(catálogo, modelo, tabla o None, manifiesto) con los arrays mapeados en memoria."""
+    manifiesto = leer_manifiesto(directorio)
+    componentes = manifiesto["componentes"]
+
+    columnas = cargar_arrays(os.path.join(directorio, "catalogo"))
+    # Numéricas: vistas sin copia del mapeo (las páginas siguen compartidas entre workers). Texto:
+    # categorías (pocos valores distintos y códigos de 1 byte) en vez de un str de Python por fila
+    catalogo = pd.DataFrame({
+        col: columnas[col] if columnas[col].dtype.kind in "biuf" else pd.Categorical(columnas[col])
+        for col in componentes["catalogo"]["columnas"]
+    }, copy=False)
+
+    modelo = PredictorForest(cargar_arrays(os.path.join(directorio, "modelo_satisfaccion")))
+    if "modelo_mejoras" in componentes:
+        mejora = PredictorForest(cargar_arrays(os.path.join(directorio, "modelo_mejoras")))
+        modelo = PuntuadorConjunto(modelo, mejora, peso_mejora)
+
+    tabla = None
+    if "tabla_recomendaciones" in componentes:
+        tabla = TablaRecomendaciones(cargar_arrays(os.path.join(directorio, "tabla_recomendaciones")))
+    return catalogo, modelo, tabla, manifiesto
+
+
+def verificar_paquete(directorio="paquete_arranque"):
+    """Ficheros del paquete cuyo hash no coincide con el manifiesto (lee todo: solo para la CLI)."""
+    manifiesto = leer_manifiesto(directorio)
+    return [fichero for fichero, sha in manifiesto["ficheros"].items()
+            if not os.path.exists(os.path.join(directorio, fichero))
+            or _sha256(os.path.join(directorio, fichero)) != sha]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Construye el paquete de arranque de main.py")
+    parser.add_argument("--directorio", default="paquete_arranque")
+    parser.add_argument("--origen", default=".", help="Directorio con el CSV, los .npz y la tabla")
+    parser.add_argument("--verificar", action="store_true", help="Solo comprueba los hashes del paquete existente")
+    args = parser.parse_args()
+
+    if args.verificar:
+        erroneos = verificar_paquete(args.directorio)
+        print("✅ Paquete íntegro." if not erroneos else f"❌ Ficheros alterados: {erroneos}")
+        raise SystemExit(1 if erroneos else 0)
+
+    manifiesto = construir_paquete(args.directorio, args.origen)
+    total = sum(os.path.getsize(os.path.join(args.directorio, f)) for f in manifiesto["ficheros"])
+    print(f"✅ Paquete {manifiesto['hash']} en {args.directorio}/: "
+          f"{', '.join(manifiesto['componentes'])} ({total / 1e6:.1f} MB)")
+
+    # Coste de arranque: fuentes originales vs. paquete
+    t0 = time.perf_counter()
+    pd.read_csv(os.path.join(args.origen, FUENTES["catalogo"])).drop_duplicates(subset=["cod_articulo"])
+    PredictorForest.cargar(os.path.join(args.origen, FUENTES["modelo_satisfaccion"]))
+    t_fuentes = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    cargar_paquete(args.directorio)
+    t_paquete = time.perf_counter() - t0
+    print(f"⏱️ Carga desde fuentes {t_fuentes * 1000:.1f} ms · desde el paquete {t_paquete * 1000:.1f} ms")
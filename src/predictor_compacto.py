@@ -0,0 +1,324 @@
+"""
+Predictor compacto (solo NumPy) para los modelos de árboles de modulos/entrenar_modelos.py.
+
+El pipeline de sklearn (ColumnTransformer + RandomForest o
+HistGradientBoosting) se exporta a un .npz con todos los árboles aplanados
+en arrays contiguos:
+- feature / umbral / hijo_izq / hijo_der / valor por nodo
+- raíz de cada árbol
+- metadatos JSON con la codificación (one-hot + passthrough)
+
+Cargar el .npz cuesta milisegundos (sin unpickle ni sklearn) y la
+predicción recorre todos los árboles a la vez con operaciones vectorizadas.
+
+Random Forest: los umbrales se guardan en float32 redondeados hacia abajo:
+sklearn compara float32(x) <= umbral_float64, que es exactamente
+equivalente a float32(x) <= mayor_float32_menor_o_igual(umbral). La
+predicción es la media de las hojas y coincide con el original salvo el
+redondeo float32 de las hojas.
+
+HistGradientBoosting: sklearn compara en float64, así que umbrales, hojas y
+matriz de entrada se guardan en float64. La predicción es base + suma de
+las hojas (con sigmoide en el clasificador binario).
+"""
+import json
+import os
+
+import numpy as np
+
+VERSION_FORMATO = 2
+
+
+class PredictorForest:
+    def __init__(self, arrays):
+        self.meta = json.loads(str(arrays["meta"]))
+        self.umbral = arrays["umbral"]
+        self.valor = arrays["valor"]
+        # Índices en int64 (evita conversiones en cada iteración) e hijos
+        # intercalados: hijos[2*i] = izquierdo, hijos[2*i + 1] = derecho.
+        # El paquete de arranque ya los trae calculados (mmap, sin copias).
+        if "hijos" in arrays:
+            self._feature64, self._hijos, self._raices64 = arrays["feature64"], arrays["hijos"], arrays["raices64"]
+            self.feature, self.raices = self._feature64, self._raices64
+            self.hijo_izq, self.hijo_der = self._hijos[0::2], self._hijos[1::2]
+        else:
+            self.feature = arrays["feature"]
+            self.hijo_izq = arrays["hijo_izq"]
+            self.hijo_der = arrays["hijo_der"]
+            self.raices = arrays["raices"]
+            self._feature64 = self.feature.astype(np.int64)
+            self._hijos = np.stack([self.hijo_izq, self.hijo_der], axis=1).ravel().astype(np.int64)
+            self._raices64 = self.raices.astype(np.int64)
+        self.profundidad = int(self.meta["profundidad"])
+        self.columnas = self.meta["columnas"]
+        self._bloques = self.meta["bloques"]
+        # Ficheros de la versión 1 (solo Random Forest) no traen estos campos
+        self.dtype = np.float64 if self.meta.get("precision") == "float64" else np.float32
+        self._agregacion = self.meta.get("agregacion", "media")
+        self._base = float(self.meta.get("base", 0.0))
+        self._enlace = self.meta.get("enlace", "identidad")
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta, allow_pickle=False) as datos:
+            return cls({k: datos[k] for k in datos.files})
+
+    def arrays(self):
+        """Arrays para el paquete de arranque, incluidos los derivados que necesita predecir."""
+        return {
+            "meta": np.array(json.dumps(self.meta, ensure_ascii=False)),
+            "umbral": self.umbral,
+            "valor": self.valor,
+            "feature64": self._feature64,
+            "hijos": self._hijos,
+            "raices64": self._raices64,
+        }
+
+    # ------------------------------------------
+    # Codificación (equivalente al ColumnTransformer)
+    # ------------------------------------------
+    def codificar(self, X, dtype=None):
+        """X: DataFrame o dict {columna: secuencia}. Devuelve matriz float32 (float64 en boosting)."""
+        dtype = dtype or self.dtype
+        n = len(X[self.columnas[0]])
+        M = np.zeros((n, self.meta["n_features"]), dtype=dtype)
+        j = 0
+        for bloque in self._bloques:
+            valores = np.asarray(X[bloque["columna"]])
+            if bloque["tipo"] == "onehot":
+                texto = valores.astype(str)
+                for categoria in bloque["categorias"]:
+                    M[:, j] = texto == categoria
+                    j += 1
+            else:
+                M[:, j] = valores.astype(dtype)
+                j += 1
+        return M
+
+    # ------------------------------------------
+    # Evaluación de todos los árboles a la vez
+    # ------------------------------------------
+    def predecir_codificado(self, M):
+        hojas = _recorrer(M, self._feature64, self.umbral, self._hijos, self._raices64, self.profundidad)
+        valores = self.valor[hojas].astype(np.float64)
+        if self._agregacion == "suma":
+            bruto = self._base + valores.sum(axis=1)
+        else:
+            bruto = valores.mean(axis=1)
+        if self._enlace == "logistica":
+            return 1 / (1 + np.exp(-bruto))
+        return bruto
+
+    def predict(self, X):
+        """Misma firma que Pipeline.predict para poder sustituirlo en main.py."""
+        unicas, inversa = _filas_unicas(self.codificar(X))
+        return self.predecir_codificado(unicas)[inversa]
+
+
+def _recorrer(M, feature64, umbral, hijos, raices64, profundidad):
+    """Índice de la hoja alcanzada por cada (fila, árbol). Devuelve matriz (n_filas, n_arboles)."""
+    n, n_features = M.shape
+    n_arboles = len(raices64)
+    # Un índice de nodo por cada par (fila, árbol), en un único array plano
+    idx = np.tile(raices64, n)
+    base = np.repeat(np.arange(n, dtype=np.int64) * n_features, n_arboles)
+    plano = np.ascontiguousarray(M).ravel()
+    for _ in range(profundidad):
+        va_der = plano[base + feature64[idx]] > umbral[idx]
+        idx = hijos[2 * idx + va_der]
+    return idx.reshape(n, n_arboles)
+
+
+def _filas_unicas(M):
+    """En una petición todas las filas comparten perfil y muchos artículos comparten
+    núcleo/grosor/firmeza: evaluamos cada fila distinta una sola vez."""
+    M = np.ascontiguousarray(M)
+    # Cada fila como un único valor binario: mucho más rápido que np.unique(axis=0)
+    filas = M.view(np.dtype((np.void, M.dtype.itemsize * M.shape[1]))).ravel()
+    _, primeras, inversa = np.unique(filas, return_index=True, return_inverse=True)
+    return M[primeras], inversa.reshape(-1)
+
+
+class PuntuadorConjunto:
+    """Satisfacción + probabilidad de mejora de molestias en una sola pasada.
+
+    Ambos modelos comparten el mismo ColumnTransformer, así que la matriz se
+    codifica (y se deduplica) una vez por petición y alimenta a los dos
+    forests.
+
+    Para las filas con molestias_antes = 1 la puntuación es
+        (1 - peso_mejora) * satisfacción + peso_mejora * (1 + 4 * p_mejora)
+    (la probabilidad se lleva a la escala 1-5 de la valoración); para el
+    resto es la satisfacción tal cual.
+    """
+
+    def __init__(self, satisfaccion, mejora, peso_mejora=0.3):
+        self.satisfaccion = satisfaccion
+        self.mejora = mejora
+        self.peso_mejora = float(peso_mejora)
+        self._sklearn = hasattr(satisfaccion, "named_steps")
+        if not self._sklearn and satisfaccion.meta["bloques"] != mejora.meta["bloques"]:
+            raise ValueError("Los modelos no comparten la misma codificación de entrada")
+
+    def predecir_ambos(self, X):
+        """(satisfacción, p_mejora) con una sola codificación de X."""
+        if self._sklearn:
+            M = self.satisfaccion.named_steps["preprocess"].transform(X)
+            return (self.satisfaccion.named_steps["model"].predict(M),
+                    self.mejora.named_steps["model"].predict_proba(M)[:, -1])
+        # Forest (float32) + boosting (float64): se codifica con la precisión mayor
+        # y cada modelo recibe su copia (float32(x) es lo mismo que codificar en float32)
+        dtype = np.result_type(self.satisfaccion.dtype, self.mejora.dtype)
+        unicas, inversa = _filas_unicas(self.satisfaccion.codificar(X, dtype))
+        return (self.satisfaccion.predecir_codificado(unicas.astype(self.satisfaccion.dtype, copy=False))[inversa],
+                self.mejora.predecir_codificado(unicas.astype(self.mejora.dtype, copy=False))[inversa])
+
+    def predict(self, X):
+        """Puntuación combinada, misma firma que Pipeline.predict."""
+        molestias = np.asarray(X["molestias_antes"]) == 1
+        if not molestias.any():
+            # Sin molestias el segundo modelo no aporta: solo el forest de satisfacción
+            return self.satisfaccion.predict(X)
+        satisf, p_mejora = self.predecir_ambos(X)
+        combinada = (1 - self.peso_mejora) * satisf + self.peso_mejora * (1 + 4 * p_mejora)
+        return np.where(molestias, combinada, satisf)
+
+
+def cargar_puntuador(ruta_satisfaccion, ruta_mejora=None, peso_mejora=0.3):
+    """PredictorForest de satisfacción o, si existe el de mejora, PuntuadorConjunto."""
+    satisfaccion = PredictorForest.cargar(ruta_satisfaccion)
+    if ruta_mejora and os.path.exists(ruta_mejora):
+        return PuntuadorConjunto(satisfaccion, PredictorForest.cargar(ruta_mejora), peso_mejora)
+    return satisfaccion
+
+
+# ==========================================
+# EXPORTACIÓN (requiere el pipeline de sklearn ya entrenado)
+# ==========================================
+
+def _umbral_float32(umbral):
+    u32 = umbral.astype(np.float32)
+    demasiado_alto = u32.astype(np.float64) > umbral
+    u32[demasiado_alto] = np.nextafter(u32[demasiado_alto], np.float32(-np.inf))
+    return u32
+
+
+def _valor_nodos(tree, es_clasificador):
+    valor = tree.value[:, 0, :]
+    if es_clasificador:
+        # Probabilidad de la clase positiva (última columna), como predict_proba
+        return (valor[:, -1] / valor.sum(axis=1)).astype(np.float32)
+    return valor[:, 0].astype(np.float32)
+
+
+def _bloques_entrada(preprocess):
+    bloques, columnas = [], []
+    for nombre, transformador, cols in preprocess.transformers_:
+        if nombre == "remainder" or transformador == "drop":
+            continue
+        # sklearn reciente convierte "passthrough" en un FunctionTransformer identidad
+        es_identidad = transformador == "passthrough" or getattr(transformador, "func", False) is None
+        if not es_identidad and not hasattr(transformador, "categories_"):
+            raise ValueError(f"Transformador no soportado en la exportación: {nombre}")
+        for i, col in enumerate(cols):
+            columnas.append(col)
+            if es_identidad:
+                bloques.append({"tipo": "num", "columna": col})
+            else:
+                categorias = [str(c) for c in transformador.categories_[i]]
+                bloques.append({"tipo": "onehot", "columna": col, "categorias": categorias})
+    return bloques, columnas
+
+
+def _nodos_forest(forest, es_clasificador):
+    """(feature, umbral, hijo_izq, hijo_der, valor, profundidad) de cada árbol del Random Forest."""
+    for estimador in forest.estimators_:
+        t = estimador.tree_
+        hoja = t.children_left == -1
+        yield (np.where(hoja, 0, t.feature), np.where(hoja, np.inf, _umbral_float32(t.threshold)),
+               t.children_left, t.children_right, _valor_nodos(t, es_clasificador), hoja, t.max_depth)
+
+
+def _nodos_boosting(modelo):
+    """Lo mismo para HistGradientBoosting (un árbol por iteración)."""
+    for iteracion in modelo._predictors:
+        if len(iteracion) != 1:
+            raise ValueError("Solo se exportan regresores y clasificadores binarios")
+        nodos = iteracion[0].nodes
+        if nodos["is_categorical"].any():
+            raise ValueError("Los splits categoriales nativos no se exportan (usa OneHotEncoder)")
+        hoja = nodos["is_leaf"].astype(bool)
+        yield (np.where(hoja, 0, nodos["feature_idx"]), np.where(hoja, np.inf, nodos["num_threshold"]),
+               nodos["left"].astype(np.int64), nodos["right"].astype(np.int64), nodos["value"], hoja,
+               int(nodos["depth"].max()))
+
+
+def exportar_pipeline(pipeline, ruta):
+    """Aplana Pipeline(preprocess=ColumnTransformer, model=RandomForest* o HistGradientBoosting*) en un .npz."""
+    preprocess = pipeline.named_steps["preprocess"]
+    modelo = pipeline.named_steps["model"]
+    es_clasificador = hasattr(modelo, "classes_")
+    es_boosting = hasattr(modelo, "_predictors")
+    bloques, columnas = _bloques_entrada(preprocess)
+
+    if es_boosting:
+        if es_clasificador and len(modelo.classes_) != 2:
+            raise ValueError("Solo se exportan clasificadores binarios")
+        if not es_clasificador and modelo.loss not in ("squared_error", "absolute_error", "quantile"):
+            raise ValueError(f"Función de pérdida no soportada en la exportación: {modelo.loss}")
+        arboles, tipo_real = _nodos_boosting(modelo), np.float64
+    else:
+        arboles, tipo_real = _nodos_forest(modelo, es_clasificador), np.float32
+
+    features, umbrales, izqs, ders, valores, raices = [], [], [], [], [], []
+    desplazamiento, profundidad = 0, 0
+    for feature, umbral, izq, der, valor, hoja, prof in arboles:
+        propios = np.arange(len(hoja)) + desplazamiento
+        features.append(feature.astype(np.int32))
+        umbrales.append(umbral.astype(tipo_real))
+        # En las hojas el nodo apunta a sí mismo: se puede iterar siempre `profundidad` veces
+        izqs.append(np.where(hoja, propios, izq + desplazamiento).astype(np.int32))
+        ders.append(np.where(hoja, propios, der + desplazamiento).astype(np.int32))
+        valores.append(valor.astype(tipo_real))
+        raices.append(desplazamiento)
+        desplazamiento += len(hoja)
+        profundidad = max(profundidad, prof)
+
+    meta = {
+        "version": VERSION_FORMATO,
+        "tipo": "clasificador" if es_clasificador else "regresor",
+        "familia": "boosting" if es_boosting else "forest",
+        "columnas": columnas,
+        "bloques": bloques,
+        "n_features": int(modelo.n_features_in_),
+        "profundidad": int(profundidad),
+        "n_arboles": len(raices),
+        "precision": "float64" if es_boosting else "float32",
+        "agregacion": "suma" if es_boosting else "media",
+        "base": float(np.ravel(modelo._baseline_prediction)[0]) if es_boosting else 0.0,
+        "enlace": "logistica" if es_boosting and es_clasificador else "identidad",
+    }
+    np.savez(
+        ruta,
+        meta=np.array(json.dumps(meta, ensure_ascii=False)),
+        feature=np.concatenate(features),
+        umbral=np.concatenate(umbrales),
+        hijo_izq=np.concatenate(izqs),
+        hijo_der=np.concatenate(ders),
+        valor=np.concatenate(valores),
+        raices=np.array(raices, dtype=np.int32),
+    )
+    return meta
+
+
+def verificar_fidelidad(pipeline, predictor, X, tolerancia=1e-4):
+    """Compara el predictor compacto con el pipeline original. Lanza ValueError si difieren."""
+    if predictor.meta["tipo"] == "clasificador":
+        original = pipeline.predict_proba(X)[:, -1]
+    else:
+        original = pipeline.predict(X)
+    compacto = predictor.predict(X)
+    error_max = float(np.max(np.abs(original - compacto))) if len(X) else 0.0
+    if error_max > tolerancia:
+        raise ValueError(f"El predictor compacto difiere del original: error máximo {error_max:.2e} > {tolerancia:.0e}")
+    return error_max
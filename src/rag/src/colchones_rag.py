@@ -2,14 +2,53 @@ from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 from dotenv import load_dotenv
 import os
+import threading
+
+try:
+    # Cuando se llama desde main.py
+    from rag.src.contexto import montar_contexto
+    from rag.src.embeddings_locales import EmbeddingsNgramas
+    from rag.src.indice_bm25 import obtener_indice, tokenizar
+    from rag.src.indice_vectorial import obtener_indice_vectorial, vectores_chroma
+except (ImportError, ModuleNotFoundError):
+    # Cuando se ejecuta desde rag/src
+    from contexto import montar_contexto
+    from embeddings_locales import EmbeddingsNgramas
+    from indice_bm25 import obtener_indice, tokenizar
+    from indice_vectorial import obtener_indice_vectorial, vectores_chroma
 
 load_dotenv()
 
 configuration = {
     "persist_dir": "./embeddings_db",
     "collection_name": "colchones_rag",
+    # Proveedor de embeddings (ver PROVEEDORES_EMBEDDINGS). Cada uno tiene su
+    # colección: los vectores de proveedores distintos no son comparables
+    "embeddings": os.getenv("RAG_EMBEDDINGS", "openai"),
+    # Dimensiones reducidas de text-embedding-3 (None = las 1536 completas); colección <nombre>_d<N>
+    "dimensiones": int(os.getenv("RAG_DIMENSIONES", "0")) or None,
+    # Troceado de las páginas al indexar: "caracteres" (1000 con solape de 200) o "secciones" (troceado.py)
+    "troceado": os.getenv("RAG_TROCEADO", "caracteres"),
     "histories_dir": "./histories",
-    "debug": True
+    "debug": True,
+    # Recuperación híbrida: BM25 local + vectores de Chroma fusionados con RRF
+    "hibrido": True,
+    # Búsqueda vectorial con la matriz en memoria (indice_vectorial.py) en vez de consultar Chroma
+    "indice_memoria": True,
+    "cuantizacion": os.getenv("RAG_CUANTIZACION", "float32"),   # float32, float16 o int8
+    "reordenar": 0,             # con cuantización: candidatos por resultado que se reordenan con los vectores de Chroma
+    "k": 3,                     # chunks que se devuelven
+    "k_candidatos": 10,         # candidatos de cada recuperador antes de fusionar
+    "rrf_k": 60,                # constante de reciprocal rank fusion
+    # Atajo léxico: consultas cortas cuyos k mejores chunks contienen todos
+    # los términos y con score BM25 suficiente no llaman a la API de embeddings
+    "lexico_max_terminos": 3,
+    "lexico_min_score": 2.5,
+    # Montaje del contexto (contexto.py): MMR sobre más candidatos, fusión de chunks solapados y presupuesto de tokens
+    "mmr": True,
+    "mmr_candidatos": 10,
+    "mmr_lambda": 0.7,          # 1 = solo relevancia, 0 = solo diversidad
+    "presupuesto_tokens": 550,
 }
 
 separators = [
@@ -18,35 +57,171 @@ separators = [
     "."
 ]
 
-def get_embeddings_model():
+# Cómo se ha resuelto cada consulta (para medir el atajo léxico)
+estadisticas_recuperacion = {"lexico": 0, "hibrido": 0, "vectorial": 0}
+# Tokens del contexto frente a unir los k primeros chunks tal cual
+estadisticas_contexto = {"consultas": 0, "tokens_sin_montar": 0, "tokens_contexto": 0,
+                         "ahorrados_solape": 0, "recortados_presupuesto": 0}
+# Las consultas llegan desde los hilos de los endpoints
+lock_estadisticas = threading.Lock()
+
+def contar_recuperacion(camino):
+    with lock_estadisticas:
+        estadisticas_recuperacion[camino] += 1
+
+def embeddings_openai():
     os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
     embeddings_model = OpenAIEmbeddings(
-        model="text-embedding-3-small"
+        model="text-embedding-3-small",
         #model="text-embedding-3-large" 
+        dimensions=configuration["dimensiones"],
     )
 
     return embeddings_model
 
+# nombre -> función sin argumentos que devuelve un Embeddings de langchain
+PROVEEDORES_EMBEDDINGS = {
+    "openai": embeddings_openai,
+    "ngramas": EmbeddingsNgramas,   # local, sin red (embeddings_locales.py)
+}
+
+def get_embeddings_model(proveedor=None):
+    proveedor = proveedor or configuration["embeddings"]
+    if proveedor not in PROVEEDORES_EMBEDDINGS:
+        raise ValueError(f"Proveedor de embeddings desconocido: {proveedor} (disponibles: {', '.join(PROVEEDORES_EMBEDDINGS)})")
+    return PROVEEDORES_EMBEDDINGS[proveedor]()
+
+def nombre_coleccion(proveedor=None):
+    """La colección de OpenAI conserva el nombre original; el resto llevan el proveedor como sufijo.
+
+    Sin `proveedor` es la colección en uso, que con dimensiones reducidas lleva además _d<N>.
+    """
+    if proveedor is not None:
+        return configuration["collection_name"] if proveedor == "openai" else f"{configuration['collection_name']}_{proveedor}"
+    nombre = nombre_coleccion(configuration["embeddings"])
+    if configuration["embeddings"] == "openai" and configuration["dimensiones"]:
+        nombre += f"_d{configuration['dimensiones']}"
+    return nombre
+
 vectorstore = Chroma(
-    collection_name = configuration["collection_name"],
+    collection_name = nombre_coleccion(),
     persist_directory = configuration["persist_dir"],
     embedding_function = get_embeddings_model(),
 )
 
-def get_context_embeddings(pregunta: str):
-    docs = vectorstore.similarity_search_with_relevance_scores(pregunta, k=3)
+def abrir_coleccion(persist_dir):
+    """Vectorstore de la colección en uso guardada en otro directorio (el conocimiento de otro dominio)."""
+    return Chroma(
+        collection_name = nombre_coleccion(),
+        persist_directory = persist_dir,
+        embedding_function = get_embeddings_model(),
+    )
+
+def ruta_indice_bm25(persist_dir=None):
+    return os.path.join(persist_dir or configuration["persist_dir"], f"bm25_{nombre_coleccion()}.json")
+
+def lexico_decisivo(pregunta, resultados):
+    """True si el BM25 basta: consulta corta, score alto y los k primeros contienen todos los términos."""
+    k = configuration["k"]
+    return (
+        len(set(tokenizar(pregunta))) <= configuration["lexico_max_terminos"]
+        and len(resultados) >= k
+        and resultados[0][1] >= configuration["lexico_min_score"]
+        and all(cobertura == 1.0 for _, _, cobertura in resultados[:k])
+    )
+
+def fusionar_rrf(*rankings):
+    """Reciprocal rank fusion de listas de (clave, documento) ya ordenadas. Devuelve [(documento, score)]."""
+    scores, docs = {}, {}
+    for ranking in rankings:
+        for posicion, (clave, doc) in enumerate(ranking):
+            scores[clave] = scores.get(clave, 0.0) + 1.0 / (configuration["rrf_k"] + posicion + 1)
+            docs.setdefault(clave, doc)
+    return [(docs[clave], score) for clave, score in sorted(scores.items(), key=lambda x: -x[1])]
 
+def busqueda_vectorial(pregunta: str, k: int, coleccion=None, persist_dir=None):
+    """[(texto, metadata, score)] de los k chunks más parecidos según los embeddings.
+
+    `coleccion` y `persist_dir` (abrir_coleccion) sustituyen a la colección global para otro dominio.
+    """
+    coleccion = coleccion or vectorstore
+    if configuration["indice_memoria"]:
+        indice = obtener_indice_vectorial(persist_dir or configuration["persist_dir"], nombre_coleccion(), coleccion,
+                                          configuration["cuantizacion"])
+        reordenar = configuration["reordenar"] if configuration["cuantizacion"] != "float32" else 0
+        return indice.buscar(coleccion.embeddings.embed_query(pregunta), k, reordenar,
+                             lambda ids: vectores_chroma(coleccion, ids))
+
+    vectoriales = coleccion.similarity_search_with_relevance_scores(pregunta, k=k)
     try:
-        docs = sorted(docs, key=lambda pair: pair[1], reverse=True)
+        vectoriales = sorted(vectoriales, key=lambda pair: pair[1], reverse=True)
     except Exception:
         pass
+    return [(d.page_content, d.metadata, similarity) for d, similarity in vectoriales]
+
+def recuperar(pregunta: str, n: int = None, coleccion=None, persist_dir=None):
+    """[(texto, metadata, score)] de los n chunks más relevantes (por defecto k)."""
+    k = configuration["k"]
+    n = n or k
+    lexicos = []
+    if configuration["hibrido"]:
+        indice = obtener_indice(ruta_indice_bm25(persist_dir), coleccion or vectorstore)
+        lexicos = indice.buscar(pregunta, configuration["k_candidatos"])
+        if lexico_decisivo(pregunta, lexicos):
+            contar_recuperacion("lexico")
+            return [(indice.docs[id_]["texto"], indice.docs[id_]["metadata"], score) for id_, score, _ in lexicos[:n]]
+
+    vectoriales = busqueda_vectorial(pregunta, max(configuration["k_candidatos"], n) if lexicos else n,
+                                     coleccion, persist_dir)
+    if not lexicos:
+        contar_recuperacion("vectorial")
+        return vectoriales[:n]
+
+    # Mismo chunk en los dos recuperadores = mismo texto
+    contar_recuperacion("hibrido")
+    fusion = fusionar_rrf(
+        [(texto, (texto, metadata)) for texto, metadata, _ in vectoriales],
+        [(indice.docs[id_]["texto"], (indice.docs[id_]["texto"], indice.docs[id_]["metadata"])) for id_, _, _ in lexicos],
+    )
+    return [(texto, metadata, score) for (texto, metadata), score in fusion[:n]]
+
+def vectores_candidatos(textos, coleccion=None, persist_dir=None):
+    """Vectores de los chunks desde el índice en memoria (None si no se usa o no están todos)."""
+    if not configuration["indice_memoria"]:
+        return None
+    indice = obtener_indice_vectorial(persist_dir or configuration["persist_dir"], nombre_coleccion(),
+                                      coleccion or vectorstore, configuration["cuantizacion"])
+    return indice.vectores(textos)
+
+def contexto_mmr(pregunta: str, coleccion=None, persist_dir=None):
+    """(contexto, [(texto, metadata)]) con MMR, fusión de solapes y presupuesto de tokens."""
+    candidatos = recuperar(pregunta, configuration["mmr_candidatos"], coleccion, persist_dir)
+    contexto, usados, informe = montar_contexto(
+        candidatos, vectores_candidatos([t for t, _, _ in candidatos], coleccion, persist_dir), configuration["k"],
+        configuration["mmr_lambda"], configuration["presupuesto_tokens"],
+    )
+    with lock_estadisticas:
+        estadisticas_contexto["consultas"] += 1
+        for clave in ("tokens_sin_montar", "tokens_contexto", "ahorrados_solape", "recortados_presupuesto"):
+            estadisticas_contexto[clave] += informe[clave]
+    if configuration["debug"]:
+        print(f"🧩 Contexto: {informe['tokens_contexto']} tokens en {informe['bloques']} bloques "
+              f"(sin montar {informe['tokens_sin_montar']}; {informe['ahorrados_solape']} ahorrados por solape, "
+              f"{informe['recortados_presupuesto']} recortados por presupuesto)")
+    return contexto, usados
+
+def get_context_embeddings(pregunta: str, coleccion=None, persist_dir=None):
+    if configuration["mmr"]:
+        context, docs = contexto_mmr(pregunta, coleccion, persist_dir)
+    else:
+        docs = [(texto, metadata) for texto, metadata, _ in recuperar(pregunta, None, coleccion, persist_dir)]
+        context = "\n\n".join(texto for (texto, _) in docs).strip()
 
     if configuration["debug"]:
-        print(f"Para la pregunta '{pregunta}' se han recuperado los siguientes documentos:")
-        for i, (d, similarity) in enumerate(docs):
-            print(f"Documento {i+1} (similaridad {similarity}): {d.page_content}...")
-    
-    context = "\n\n".join(d.page_content for (d, _) in docs).strip()
-    sources = [doc.metadata.get("source") for (doc, _) in docs]
-    sources = [("/" + s) if not s.startswith("http") else s for s in sources]
+        print(f"Para la pregunta '{pregunta}' se han usado los siguientes documentos:")
+        for i, (texto, _) in enumerate(docs):
+            print(f"Documento {i+1}: {texto}...")
+
+    sources = [(metadata or {}).get("source") for (_, metadata) in docs]
+    sources = [("/" + s) if not s.startswith("http") else s for s in sources if s]
     return (context, sources)
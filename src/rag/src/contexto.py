@@ -0,0 +1,176 @@
+"""
+Montaje del contexto del RAG a partir de los chunks recuperados.
+
+Los chunks se generan con chunk_size=1000 y chunk_overlap=200, así que los
+k primeros resultados suelen repetir texto (el solape entre chunks
+vecinos, o la misma página indexada dos veces). En vez de unirlos tal
+cual:
+1. se piden más candidatos de los que se van a usar;
+2. se eligen k con maximal marginal relevance (MMR): relevancia para la
+   pregunta menos el parecido con lo ya elegido, usando los vectores de
+   los chunks que ya tiene el índice en memoria (sin llamar a la API);
+3. los chunks que se solapan (el final de uno es el principio de otro)
+   se fusionan en un solo bloque y los contenidos en otro se descartan;
+4. se recorta al presupuesto de tokens, cortando el último bloque en un
+   final de frase.
+"""
+import re
+
+import numpy as np
+
+try:
+    # Cuando se llama desde main.py
+    from rag.src.indice_bm25 import tokenizar
+except (ImportError, ModuleNotFoundError):
+    # Cuando se ejecuta desde rag/src
+    from indice_bm25 import tokenizar
+
+SEPARADOR = "\n\n"
+_codificador = None
+
+
+def contar_tokens(texto):
+    """Tokens de OpenAI con tiktoken si está disponible; si no, la aproximación de 4 caracteres por token."""
+    global _codificador
+    if _codificador is None:
+        try:
+            import tiktoken
+            _codificador = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _codificador = False
+    if _codificador:
+        return len(_codificador.encode(texto))
+    return (len(texto) + 3) // 4
+
+
+# ==========================================
+# MMR
+# ==========================================
+
+def _similitudes_jaccard(textos):
+    conjuntos = [set(tokenizar(t)) for t in textos]
+    n = len(textos)
+    similitudes = np.eye(n, dtype=np.float32)
+    for i in range(n):
+        for j in range(i + 1, n):
+            union = conjuntos[i] | conjuntos[j]
+            similitudes[i, j] = similitudes[j, i] = len(conjuntos[i] & conjuntos[j]) / len(union) if union else 0.0
+    return similitudes
+
+
+def mmr(scores, similitudes, k, lambda_=0.7):
+    """Posiciones de los k candidatos elegidos por MMR, en orden de elección.
+
+    `scores`: relevancia de cada candidato (cualquier escala, se normaliza a [0, 1]).
+    `similitudes`: matriz (n, n) de parecido entre candidatos.
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    if len(scores) == 0:
+        return []
+    rango = scores.max() - scores.min()
+    relevancia = (scores - scores.min()) / rango if rango > 0 else np.ones_like(scores)
+    elegidos = [int(np.argmax(relevancia))]
+    while len(elegidos) < min(k, len(scores)):
+        redundancia = similitudes[:, elegidos].max(axis=1)
+        valor = lambda_ * relevancia - (1 - lambda_) * redundancia
+        valor[elegidos] = -np.inf
+        elegidos.append(int(np.argmax(valor)))
+    return elegidos
+
+
+# ==========================================
+# FUSIÓN DE CHUNKS SOLAPADOS
+# ==========================================
+
+def solapamiento(a, b, minimo=30, maximo=400):
+    """Caracteres del final de `a` que son el principio de `b` (0 si menos de `minimo`)."""
+    for largo in range(min(len(a), len(b), maximo), minimo - 1, -1):
+        if a.endswith(b[:largo]):
+            return largo
+    return 0
+
+
+def _misma_fuente(m1, m2):
+    f1, f2 = (m1 or {}).get("source"), (m2 or {}).get("source")
+    return f1 is None or f2 is None or f1 == f2
+
+
+def fusionar_solapados(chunks):
+    """[(texto, metadata)] -> [(texto, metadata)] sin duplicados ni solapes entre vecinos de la misma fuente."""
+    bloques = []
+    for texto, metadata in chunks:
+        texto = texto.strip()
+        if any(texto in b for b, _ in bloques):
+            continue
+        bloques = [(b, m) for b, m in bloques if b not in texto]
+        for i, (bloque, m) in enumerate(bloques):
+            if not _misma_fuente(m, metadata):
+                continue
+            if solapamiento(bloque, texto):
+                bloques[i] = (bloque + texto[solapamiento(bloque, texto):], m)
+                break
+            if solapamiento(texto, bloque):
+                bloques[i] = (texto + bloque[solapamiento(texto, bloque):], m)
+                break
+        else:
+            bloques.append((texto, metadata))
+    return bloques
+
+
+# ==========================================
+# PRESUPUESTO DE TOKENS
+# ==========================================
+
+def recortar_a_presupuesto(bloques, presupuesto, minimo_parcial=40):
+    """Bloques enteros mientras quepan; el siguiente se corta en un final de frase si quedan al menos `minimo_parcial` tokens."""
+    resultado, usados = [], 0
+    for texto, metadata in bloques:
+        coste = contar_tokens(texto) + (contar_tokens(SEPARADOR) if resultado else 0)
+        if usados + coste <= presupuesto:
+            resultado.append((texto, metadata))
+            usados += coste
+            continue
+        restante = presupuesto - usados
+        if restante >= minimo_parcial:
+            frases = re.split(r"(?<=[.!?])\s+", texto)
+            parcial = ""
+            for frase in frases:
+                candidato = f"{parcial} {frase}".strip()
+                if contar_tokens(candidato) + contar_tokens(SEPARADOR) > restante:
+                    break
+                parcial = candidato
+            if parcial:
+                resultado.append((parcial, metadata))
+        break
+    return resultado
+
+
+def montar_contexto(candidatos, vectores=None, k=3, lambda_=0.7, presupuesto=550):
+    """(contexto, [(texto, metadata)] usados, informe de tokens) a partir de [(texto, metadata, score)] ordenados.
+
+    `vectores`: matriz (n, d) normalizada de los candidatos; sin ella el parecido es el Jaccard de sus términos.
+    El informe compara con unir los k primeros candidatos tal cual (lo que se hacía antes).
+    """
+    textos = [t for t, _, _ in candidatos]
+    if vectores is not None:
+        similitudes = np.clip(vectores @ vectores.T, 0.0, 1.0)
+    else:
+        similitudes = _similitudes_jaccard(textos)
+    elegidos = mmr([s for _, _, s in candidatos], similitudes, k, lambda_)
+    seleccion = [(candidatos[i][0], candidatos[i][1]) for i in elegidos]
+
+    bloques = fusionar_solapados(seleccion)
+    usados = recortar_a_presupuesto(bloques, presupuesto)
+    contexto = SEPARADOR.join(t for t, _ in usados).strip()
+
+    tokens_seleccion = contar_tokens(SEPARADOR.join(t for t, _ in seleccion))
+    tokens_bloques = contar_tokens(SEPARADOR.join(t for t, _ in bloques))
+    informe = {
+        "tokens_sin_montar": contar_tokens(SEPARADOR.join(textos[:k]).strip()),
+        "tokens_contexto": contar_tokens(contexto),
+        "ahorrados_solape": tokens_seleccion - tokens_bloques,
+        "recortados_presupuesto": max(0, tokens_bloques - contar_tokens(contexto)),
+        "candidatos": len(candidatos),
+        "bloques": len(usados),
+    }
+    return contexto, usados, informe
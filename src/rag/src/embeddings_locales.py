@@ -0,0 +1,69 @@
+"""
+Embeddings locales, sin red: n-gramas de caracteres con hashing.
+
+Cada palabra (normalizada como en el índice BM25: minúsculas, sin tildes
+ni stopwords) aporta su raíz y sus n-gramas de caracteres ("<colch",
+"olcho", "chon>"...). Cada rasgo se proyecta con crc32 a una de
+`dimensiones` posiciones con signo (+1/-1 según otro bit del hash) y el
+vector se normaliza a norma 1, así que la similitud coseno de Chroma
+funciona igual que con los de OpenAI.
+
+No entiende sinónimos como un modelo entrenado, pero los n-gramas cubren
+plurales, conjugaciones y erratas, y embeber una consulta cuesta
+microsegundos en el propio proceso.
+"""
+import re
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    # Cuando se llama desde main.py
+    from rag.src.indice_bm25 import STOPWORDS, normalizar, raiz
+except (ImportError, ModuleNotFoundError):
+    # Cuando se ejecuta desde rag/src
+    from indice_bm25 import STOPWORDS, normalizar, raiz
+
+
+class EmbeddingsNgramas(Embeddings):
+    """Embeddings deterministas de n-gramas de caracteres (hashing trick)."""
+
+    def __init__(self, dimensiones=2048, n_min=3, n_max=5, peso_palabra=2.0):
+        self.dimensiones = dimensiones
+        self.n_min = n_min
+        self.n_max = n_max
+        self.peso_palabra = peso_palabra
+
+    def _rasgos(self, texto):
+        for palabra in re.findall(r"[a-z0-9]+", normalizar(texto)):
+            if palabra in STOPWORDS or len(palabra) < 2:
+                continue
+            yield "w:" + raiz(palabra), self.peso_palabra
+            marcada = f"<{palabra}>"
+            for n in range(self.n_min, self.n_max + 1):
+                for i in range(len(marcada) - n + 1):
+                    yield marcada[i:i + n], 1.0
+
+    def vector(self, texto):
+        conteos = {}
+        for rasgo, peso in self._rasgos(texto):
+            h = zlib.crc32(rasgo.encode())
+            posicion = h % self.dimensiones
+            conteos[posicion] = conteos.get(posicion, 0.0) + (peso if h & 0x80000000 else -peso)
+        vector = np.zeros(self.dimensiones, dtype=np.float32)
+        if conteos:
+            posiciones = np.fromiter(conteos.keys(), dtype=np.int64, count=len(conteos))
+            valores = np.fromiter(conteos.values(), dtype=np.float32, count=len(conteos))
+            # Amortigua las palabras muy repetidas en chunks largos (como el tf logarítmico)
+            vector[posiciones] = np.sign(valores) * np.log1p(np.abs(valores))
+            norma = np.linalg.norm(vector)
+            if norma > 0:
+                vector /= norma
+        return vector
+
+    def embed_documents(self, texts):
+        return [self.vector(t).tolist() for t in texts]
+
+    def embed_query(self, text):
+        return self.vector(text).tolist()
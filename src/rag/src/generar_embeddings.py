@@ -11,13 +11,23 @@ import os
 try:
     # Intento 1: Cuando se llama desde main.py
     from rag.src.colchones_rag import get_embeddings_model, configuration, separators as chunksSeparators
-    from rag.src.scrap_url import obtener_contenido_url
+    from rag.src.colchones_rag import nombre_coleccion, ruta_indice_bm25
+    from rag.src.indice_bm25 import guardar_indice, obtener_indice
+    from rag.src.indice_vectorial import exportar_indice, publicar_version, reducir_dimensiones
+    from rag.src.scrap_url import obtener_contenido_url, obtener_pagina_scrapping
     from rag.src.scrap_url import preprocesar_html
+    from rag.src.troceado import trocear_html
+    from rag.src.preprocesado import preprocesar_lote
 except (ImportError, ModuleNotFoundError):
     # Intento 2: Cuando ejecutas este archivo directamente
-    from scrap_url import obtener_contenido_url
+    from scrap_url import obtener_contenido_url, obtener_pagina_scrapping
     from scrap_url import preprocesar_html
+    from troceado import trocear_html
+    from preprocesado import preprocesar_lote
     from colchones_rag import get_embeddings_model, configuration, separators as chunksSeparators
+    from colchones_rag import nombre_coleccion, ruta_indice_bm25
+    from indice_bm25 import guardar_indice, obtener_indice
+    from indice_vectorial import exportar_indice, publicar_version, reducir_dimensiones
 
 load_dotenv()
 
@@ -49,20 +59,28 @@ default_urls = [
 #        persist_directory=configuration["persist_dir"],
 #        )
 
-# url_pagina es la key para identificar los chunks en la base de datos
-def generar_embedding(document, url_pagina):
+def trocear_documento(document, url_pagina, html=None):
+    """(textos, metadatas) de una página según configuration["troceado"]."""
+    if configuration["troceado"] == "secciones" and html:
+        trozos = trocear_html(html)
+        return [t for t, _ in trozos], [{"source": url_pagina, **m} for _, m in trozos]
+
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, separators=chunksSeparators)
     texts = text_splitter.split_text(document)
-    
+    return texts, [{"source": url_pagina} for _ in range(len(texts))]
+
+# url_pagina es la key para identificar los chunks en la base de datos
+# html: la página sin aplanar, para el troceado por secciones
+def generar_embedding(document, url_pagina, html=None):
     # Creamos metadatos para cada chunk para poder identificarlos después
-    metadatas = [{"source": url_pagina} for _ in range(len(texts))]
+    texts, metadatas = trocear_documento(document, url_pagina, html)
     
     # Generamos IDs únicos para cada chunk (ej: "sobre-como-comprar.php_0", "sobre-como-comprar.php_1"...)
     ids = [f"{url_pagina}_{i}" for i in range(len(texts))]
 
     # Inicializamos el vectorstore
     vectorstore = Chroma(
-        collection_name=configuration.get("collection_name"),
+        collection_name=nombre_coleccion(),
         embedding_function=get_embeddings_model(),
         persist_directory=configuration.get("persist_dir")
     )
@@ -71,7 +89,8 @@ def generar_embedding(document, url_pagina):
     # Esto simula un "upsert" y evita duplicados si el contenido cambió o se movió de chunk
     try:
         vectorstore.delete(ids=ids) # Intenta borrar IDs específicos si ya existían
-        # Opcional: vectorstore._collection.delete(where={"source": url_pagina}) 
+        # También los chunks sobrantes si la página tiene ahora menos chunks que antes
+        vectorstore._collection.delete(where={"source": url_pagina})
     except Exception:
         pass 
 
@@ -83,6 +102,47 @@ def generar_embedding(document, url_pagina):
     )
     print(f"Se han generado {len(texts)} chunks de texto para la URL {url_pagina}.")
 
+    # Índice BM25 de la recuperación híbrida: mismos ids y textos que Chroma
+    indice = obtener_indice(ruta_indice_bm25(), vectorstore)
+    indice.eliminar_fuente(url_pagina)
+    indice.anadir(ids, texts, metadatas)
+    guardar_indice(indice)
+    publicar_coleccion(vectorstore)
+
+
+def publicar_coleccion(vectorstore):
+    """Avisa a los procesos de consulta de que recarguen su índice vectorial y exporta la copia cuantizada."""
+    publicar_version(configuration["persist_dir"], nombre_coleccion())
+    if configuration["cuantizacion"] != "float32":
+        exportar_indice(configuration["persist_dir"], nombre_coleccion(), vectorstore, configuration["cuantizacion"])
+
+
+# Una fila por contenido con el título y el texto de su módulo (el GROUP BY de obtener_embeddings
+# repite el título del módulo por cada contenido y lo separa de ellos)
+CONSULTA_MODULOS = """
+    SELECT url, m.id as id_modulo, if(titulo1 <> "", titulo1, h1) as titulo, m.texto as texto_modulo, cont.texto as contenido
+    FROM my_colchoneses_paginas_modulos m
+    JOIN my_colchoneses_paginas_modulos_grupo gr on m.id = gr.id_pagina_marca
+    JOIN my_colchoneses_paginas_modulos_contenido cont on gr.id = cont.id_marca_grupo_aj
+    WHERE url in ({})
+    ORDER BY url, m.id, gr.id ;
+"""
+
+def html_por_modulos(filas):
+    """{url: html} con el título de cada módulo como <h1>, su texto una vez y después sus contenidos."""
+    paginas, modulos_vistos = {}, set()
+    for fila in filas:
+        partes = paginas.setdefault(fila["url"], [])
+        if (fila["url"], fila["id_modulo"]) not in modulos_vistos:
+            modulos_vistos.add((fila["url"], fila["id_modulo"]))
+            if fila["titulo"]:
+                partes.append(f"<h1>{fila['titulo']}</h1>")
+            if fila["texto_modulo"]:
+                partes.append(f"<div>{fila['texto_modulo']}</div>")
+        if fila["contenido"]:
+            partes.append(f"<div>{fila['contenido']}</div>")
+    return {url: "\n".join(partes) for url, partes in paginas.items()}
+
 
 def obtener_embeddings(urls=None):
     try:
@@ -118,18 +178,30 @@ def obtener_embeddings(urls=None):
             cursor.execute(query, urls)
             resultados = cursor.fetchall()
 
+            # Por secciones: cada módulo con su título y sus contenidos, sin aplanar ni repetir
+            html_paginas = {}
+            if configuration["troceado"] == "secciones" and resultados:
+                cursor.execute(CONSULTA_MODULOS.format(','.join(['%s'] * len(urls))), urls)
+                html_paginas = html_por_modulos(cursor.fetchall())
+
             # Si la página no está en la base de datos, intentar obtener su contenido vía scrapping
             try:
                 if len(resultados) == 0 and len(urls) == 1:
                     print(f"La URL {urls[0]} no se encontró en la base de datos. Intentando vía scrapping...")
-                    contenido_pagina = obtener_contenido_url(urls[0])
-                    generar_embedding(contenido_pagina, urls[0])
+                    if configuration["troceado"] == "secciones":
+                        html_pagina = obtener_pagina_scrapping(urls[0])
+                        contenido_pagina = preprocesar_html(html_pagina, ["p", "h1", "h2", "h3", "h4", "h5", "h6", "li"])
+                        generar_embedding(contenido_pagina, urls[0], html_pagina)
+                    else:
+                        contenido_pagina = obtener_contenido_url(urls[0])
+                        generar_embedding(contenido_pagina, urls[0])
                 else:
                     print(f"Se encontraron {len(resultados)} registros:\n")
-                    for fila in resultados:
+                    # Todas las páginas de una vez (en paralelo si son muchas), mismo texto que preprocesar_html
+                    textos_limpios = preprocesar_lote([fila["textoPagina"] for fila in resultados])
+                    for fila, texto_limpio in zip(resultados, textos_limpios):
                         url_actual = fila["url"]
-                        texto_limpio = preprocesar_html(fila["textoPagina"])
-                        generar_embedding(texto_limpio, url_actual)
+                        generar_embedding(texto_limpio, url_actual, html_paginas.get(url_actual))
 
             except Exception as e:
                 print(f"Error al obtener embeddings : {e}")
@@ -149,5 +221,50 @@ def obtener_embeddings(urls=None):
         ruta_absoluta = os.path.abspath(ruta_config)
         print(f"Embeddings guardados en {ruta_absoluta}")
 
+def reindexar_desde(proveedor_origen):
+    """Rellena la colección del proveedor actual con los chunks (textos, ids y metadatos) de la de otro proveedor.
+
+    Sirve para pasar a otro backend de embeddings sin volver a leer MySQL ni
+    hacer scraping: solo se recalculan los vectores. De OpenAI completo a
+    OpenAI con menos dimensiones ni siquiera eso: se truncan los vectores.
+    """
+    origen = Chroma(
+        collection_name=nombre_coleccion(proveedor_origen),
+        persist_directory=configuration.get("persist_dir")
+    )
+    truncar = proveedor_origen == "openai" and configuration["embeddings"] == "openai" and configuration["dimensiones"]
+    datos = origen.get(include=["documents", "metadatas"] + (["embeddings"] if truncar else []))
+    destino = Chroma(
+        collection_name=nombre_coleccion(),
+        embedding_function=get_embeddings_model(),
+        persist_directory=configuration.get("persist_dir")
+    )
+    if datos["ids"]:
+        destino.delete(ids=datos["ids"])
+        if truncar:
+            destino._collection.add(
+                ids=datos["ids"],
+                embeddings=reducir_dimensiones(datos["embeddings"], configuration["dimensiones"]),
+                documents=datos["documents"],
+                metadatas=datos["metadatas"] if any(datos["metadatas"]) else None,
+            )
+        else:
+            destino.add_texts(texts=datos["documents"], metadatas=datos["metadatas"], ids=datos["ids"])
+        indice = obtener_indice(ruta_indice_bm25(), destino)
+        indice.anadir(datos["ids"], datos["documents"], datos["metadatas"])
+        guardar_indice(indice)
+        publicar_coleccion(destino)
+    print(f"Se han copiado {len(datos['ids'])} chunks de {nombre_coleccion(proveedor_origen)} a {nombre_coleccion()}.")
+
+
 if __name__ == "__main__":
-    obtener_embeddings()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Genera los embeddings del RAG (proveedor: RAG_EMBEDDINGS)")
+    parser.add_argument("--desde", default=None, help="Proveedor cuya colección se reindexa en vez de leer MySQL (p. ej. openai)")
+    args = parser.parse_args()
+
+    if args.desde:
+        reindexar_desde(args.desde)
+    else:
+        obtener_embeddings()
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+Índice léxico BM25 sobre los mismos chunks que hay en Chroma.
+
+Las consultas cortas de palabras clave ("canapé abatible", "garantía",
+"devoluciones") se recuperan mal solo con embeddings y además obligan a
+llamar a la API de embeddings. Este índice:
+- normaliza como el buscador del feed (minúsculas, sin tildes) y quita
+  stopwords, plurales, infinitivos y vocal final ("devoluciones" ~ "devolución");
+- se guarda en JSON junto a la BD de Chroma (persist_dir) y se actualiza
+  en generar_embedding a la vez que Chroma;
+- si no existe, se construye una vez con los textos que ya tiene Chroma
+  (sin llamar a la API de embeddings).
+"""
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+
+STOPWORDS = {
+    "a", "al", "algo", "como", "con", "cual", "cuales", "cuando", "cuanto", "de", "del", "donde", "el", "ella",
+    "en", "entre", "era", "es", "esa", "ese", "eso", "esta", "este", "esto", "estos", "fue", "ha", "hay", "la",
+    "las", "le", "les", "lo", "los", "mas", "me", "mi", "mis", "muy", "no", "nos", "o", "os", "para", "pero",
+    "por", "puedo", "puede", "que", "quiero", "se", "si", "sin", "sobre", "son", "su", "sus", "te", "teneis",
+    "tengo", "ti", "tu", "tus", "un", "una", "unas", "uno", "unos", "vosotros", "y", "ya", "yo",
+}
+
+
+def normalizar(texto):
+    return "".join(c for c in unicodedata.normalize("NFD", (texto or "").lower())
+                   if unicodedata.category(c) != "Mn")
+
+
+def raiz(token):
+    """Stemming ligero: plural, infinitivo y vocal final ("canapés" y "canapé" -> "canap", "pagar" -> "pag")."""
+    if len(token) > 4 and token.endswith("es"):
+        token = token[:-2]
+    elif len(token) > 3 and token.endswith("s"):
+        token = token[:-1]
+    elif len(token) > 4 and token[-2:] in ("ar", "er", "ir"):
+        token = token[:-2]
+    if len(token) > 3 and token[-1] in "aeo":
+        token = token[:-1]
+    return token
+
+
+def tokenizar(texto):
+    return [raiz(t) for t in re.findall(r"[a-z0-9]+", normalizar(texto)) if t not in STOPWORDS and len(t) > 1]
+
+
+class IndiceBM25:
+    """Okapi BM25 con índice invertido en memoria. Los ids son los de Chroma."""
+
+    def __init__(self, ruta=None, k1=1.5, b=0.75):
+        self.ruta = ruta
+        self.k1 = k1
+        self.b = b
+        self.docs = {}        # id -> {"texto", "metadata"}
+        self._postings = {}   # término -> {id: frecuencia}
+        self._longitudes = {}
+        self._total_longitud = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    # ------------------------------------------
+    # Altas y bajas (sincronizadas con Chroma)
+    # ------------------------------------------
+    def anadir(self, ids, textos, metadatas=None):
+        metadatas = metadatas or [{} for _ in ids]
+        for id_, texto, metadata in zip(ids, textos, metadatas):
+            self.eliminar([id_])
+            tokens = tokenizar(texto)
+            self.docs[id_] = {"texto": texto, "metadata": metadata or {}}
+            self._longitudes[id_] = len(tokens)
+            self._total_longitud += len(tokens)
+            for termino, frecuencia in Counter(tokens).items():
+                self._postings.setdefault(termino, {})[id_] = frecuencia
+
+    def eliminar(self, ids):
+        for id_ in ids:
+            if id_ not in self.docs:
+                continue
+            for termino in set(tokenizar(self.docs[id_]["texto"])):
+                posting = self._postings.get(termino, {})
+                posting.pop(id_, None)
+                if not posting:
+                    self._postings.pop(termino, None)
+            self._total_longitud -= self._longitudes.pop(id_)
+            del self.docs[id_]
+
+    def eliminar_fuente(self, source):
+        self.eliminar([i for i, d in self.docs.items() if d["metadata"].get("source") == source])
+
+    # ------------------------------------------
+    # Búsqueda
+    # ------------------------------------------
+    def buscar(self, consulta, k=10):
+        """[(id, score, cobertura)] de mayor a menor score.
+
+        cobertura = fracción de los términos de la consulta que aparecen en el chunk.
+        """
+        terminos = list(dict.fromkeys(tokenizar(consulta)))
+        if not terminos or not self.docs:
+            return []
+        n = len(self.docs)
+        media = self._total_longitud / n or 1.0
+        scores = Counter()
+        encontrados = Counter()
+        for termino in terminos:
+            posting = self._postings.get(termino)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for id_, frecuencia in posting.items():
+                norma = self.k1 * (1 - self.b + self.b * self._longitudes[id_] / media)
+                scores[id_] += idf * frecuencia * (self.k1 + 1) / (frecuencia + norma)
+                encontrados[id_] += 1
+        return [(id_, score, encontrados[id_] / len(terminos)) for id_, score in scores.most_common(k)]
+
+    # ------------------------------------------
+    # Persistencia
+    # ------------------------------------------
+    def guardar(self):
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "docs": self.docs}, f, ensure_ascii=False)
+        os.replace(temporal, self.ruta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+        indice = cls(ruta, datos["k1"], datos["b"])
+        ids = list(datos["docs"])
+        indice.anadir(ids, [datos["docs"][i]["texto"] for i in ids], [datos["docs"][i]["metadata"] for i in ids])
+        return indice
+
+    @classmethod
+    def desde_chroma(cls, ruta, vectorstore):
+        """Construye el índice con los chunks que ya hay en Chroma (sin calcular embeddings)."""
+        datos = vectorstore.get(include=["documents", "metadatas"])
+        indice = cls(ruta)
+        indice.anadir(datos["ids"], datos["documents"], datos["metadatas"])
+        return indice
+
+
+# Un índice por fichero y proceso; se recarga si otro proceso lo reescribe
+_indices = {}
+
+
+def obtener_indice(ruta, vectorstore=None):
+    """Índice de `ruta` (cargado o, si no existe, construido desde `vectorstore` y guardado)."""
+    mtime = os.path.getmtime(ruta) if os.path.exists(ruta) else None
+    cacheado = _indices.get(ruta)
+    if cacheado is not None and cacheado[1] == mtime:
+        return cacheado[0]
+    if mtime is not None:
+        indice = IndiceBM25.cargar(ruta)
+    elif vectorstore is not None:
+        indice = IndiceBM25.desde_chroma(ruta, vectorstore)
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        indice.guardar()
+        mtime = os.path.getmtime(ruta)
+    else:
+        indice = IndiceBM25(ruta)
+    _indices[ruta] = (indice, mtime)
+    return indice
+
+
+def _rutas_de(directorio):
+    prefijo = os.path.join(os.path.abspath(directorio), "")
+    return [ruta for ruta in list(_indices) if os.path.abspath(ruta).startswith(prefijo)]
+
+
+def indices_de(directorio):
+    """Índices cacheados de los ficheros de `directorio` (para estimar la memoria de un dominio)."""
+    return [_indices[ruta][0] for ruta in _rutas_de(directorio) if ruta in _indices]
+
+
+def olvidar_indices(directorio):
+    """Suelta los índices cacheados de `directorio` (al descargar un dominio)."""
+    for ruta in _rutas_de(directorio):
+        _indices.pop(ruta, None)
+
+
+def guardar_indice(indice):
+    """Guarda y actualiza la caché del proceso (para no recargar lo que acabamos de escribir)."""
+    indice.guardar()
+    _indices[indice.ruta] = (indice, os.path.getmtime(indice.ruta))
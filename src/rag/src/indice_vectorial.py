@@ -0,0 +1,263 @@
+"""
+Índice vectorial en memoria para las consultas del RAG.
+
+El corpus son unos cientos de chunks, así que en vez de pasar en cada
+consulta por el cliente persistente de Chroma (SQLite + HNSW en disco) se
+cargan todos los vectores en una matriz float32 contigua y normalizada
+junto a sus textos y metadatos. El top-k es un único producto
+matriz-vector (similitud coseno exacta) y un argpartition.
+
+Chroma sigue siendo el almacenamiento: generar_embeddings escribe en él y
+después publica una versión nueva de la colección (fichero
+version_<colección>.json en persist_dir, reemplazado con os.replace). Cada
+consulta compara la versión con la del índice cargado y, si ha cambiado,
+construye uno nuevo y lo sustituye de una vez; las consultas en curso
+terminan con el anterior.
+
+Almacenamiento reducido (configuración en colchones_rag.py):
+- dimensiones: text-embedding-3 permite pedir menos dimensiones; truncar
+  un vector completo y renormalizarlo es equivalente, así que se puede
+  pasar a menos dimensiones sin volver a llamar a la API.
+- cuantización float16: la copia en disco ocupa la mitad; en memoria se
+  expande a float32 (numpy no tiene producto matricial rápido en float16).
+- cuantización int8: escala por dimensión; la matriz se queda en int8 en
+  memoria (4 veces menos) y el producto es algo más lento que en float32.
+- reordenar: con cuantización, se toman k * reordenar candidatos y se
+  reordenan con los vectores completos guardados en Chroma.
+El generador de embeddings exporta una copia cuantizada de la colección
+(exportar_indice); los procesos de consulta la mapean si está al día y si
+no construyen el índice desde Chroma.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+CUANTIZACIONES = ("float32", "float16", "int8")
+
+
+def reducir_dimensiones(matriz, dimensiones):
+    """Primeras `dimensiones` componentes de cada fila, renormalizadas."""
+    matriz = np.asarray(matriz, dtype=np.float32)
+    if not dimensiones or dimensiones >= matriz.shape[-1]:
+        return matriz
+    reducida = matriz[..., :dimensiones]
+    normas = np.linalg.norm(reducida, axis=-1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return reducida / normas
+
+
+def cuantizar(matriz, tipo):
+    """(datos, escala) de una matriz float32 normalizada. `escala` solo existe para int8 (una por dimensión)."""
+    if tipo not in CUANTIZACIONES:
+        raise ValueError(f"Cuantización desconocida: {tipo} (disponibles: {', '.join(CUANTIZACIONES)})")
+    if tipo == "float16":
+        return matriz.astype(np.float16), None
+    if tipo == "int8":
+        escala = np.abs(matriz).max(axis=0) / 127 if len(matriz) else np.ones(matriz.shape[1], dtype=np.float32)
+        escala[escala == 0] = 1.0
+        return np.round(matriz / escala).astype(np.int8), escala.astype(np.float32)
+    return matriz, None
+
+
+def vectores_chroma(vectorstore, ids):
+    """Vectores completos (float32) de `ids` en ese orden, leídos de Chroma."""
+    datos = vectorstore.get(ids=list(ids), include=["embeddings"])
+    posicion = {id_: i for i, id_ in enumerate(datos["ids"])}
+    vectores = np.asarray(datos["embeddings"], dtype=np.float32)
+    return vectores[[posicion[id_] for id_ in ids]]
+
+
+class IndiceVectorial:
+    """Vectores normalizados de una colección de Chroma en una matriz (n, d) float32 o int8."""
+
+    def __init__(self, ids, textos, metadatas, vectores, version=None, cuantizacion="float32", escala=None):
+        self.ids = list(ids)
+        self.textos = list(textos)
+        self.metadatas = [m or {} for m in metadatas]
+        self.version = version
+        self.cuantizacion = cuantizacion
+        if escala is not None or (cuantizacion == "float16" and isinstance(vectores, np.ndarray)
+                                  and vectores.dtype == np.float16):
+            # Ya cuantizados (copia exportada)
+            datos = vectores
+        else:
+            matriz = np.asarray(vectores, dtype=np.float32).reshape(len(self.ids), -1)
+            normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+            normas[normas == 0] = 1.0
+            datos, escala = cuantizar(matriz / normas, cuantizacion)
+        self.escala = escala
+        self._filas = None
+        # float16 solo ahorra en disco: el producto en float16 es mucho más lento en numpy
+        self.matriz = np.ascontiguousarray(datos.astype(np.float32) if cuantizacion == "float16" else datos)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def bytes_vectores(self):
+        return self.matriz.nbytes + (self.escala.nbytes if self.escala is not None else 0)
+
+    @classmethod
+    def desde_chroma(cls, vectorstore, version=None, cuantizacion="float32", dimensiones=None):
+        datos = vectorstore.get(include=["embeddings", "documents", "metadatas"])
+        vectores = reducir_dimensiones(np.asarray(datos["embeddings"], dtype=np.float32).reshape(len(datos["ids"]), -1),
+                                       dimensiones)
+        return cls(datos["ids"], datos["documents"], datos["metadatas"], vectores, version, cuantizacion)
+
+    def vectores(self, textos):
+        """Vectores normalizados (float32) de los chunks con esos textos, o None si alguno no está en el índice."""
+        if self._filas is None:
+            self._filas = {t: i for i, t in enumerate(self.textos)}
+        filas = [self._filas.get(t) for t in textos]
+        if not filas or any(f is None for f in filas):
+            return None
+        vectores = np.asarray(self.matriz[filas], dtype=np.float32)
+        if self.escala is not None:
+            vectores = vectores * self.escala
+            vectores /= np.linalg.norm(vectores, axis=1, keepdims=True)
+        return vectores
+
+    def similitudes(self, consulta):
+        if self.escala is not None:
+            return self.matriz @ (consulta * self.escala)
+        return self.matriz @ consulta
+
+    def buscar(self, vector, k=3, reordenar=0, completos=None):
+        """[(texto, metadata, similitud coseno)] de los k chunks más parecidos a `vector`.
+
+        Con `reordenar` y `completos(ids) -> matriz float32`, se toman k * reordenar
+        candidatos con la matriz cuantizada y se ordenan con los vectores completos.
+        """
+        if not self.ids:
+            return []
+        # Un vector completo contra una colección reducida se trunca igual que los de la colección
+        consulta = reducir_dimensiones(vector, self.matriz.shape[1])
+        norma = np.linalg.norm(consulta)
+        consulta = consulta / norma if norma else consulta
+        similitudes = self.similitudes(consulta)
+        n = min(k * reordenar if reordenar and completos else k, len(self.ids))
+        mejores = np.argpartition(-similitudes, n - 1)[:n]
+        if n > k:
+            exactos = reducir_dimensiones(completos([self.ids[i] for i in mejores]), len(consulta))
+            similitudes = np.zeros(len(self.ids), dtype=np.float32)
+            similitudes[mejores] = exactos @ consulta
+        mejores = mejores[np.argsort(-similitudes[mejores])][:k]
+        return [(self.textos[i], self.metadatas[i], float(similitudes[i])) for i in mejores]
+
+    # ------------------------------------------
+    # Copia cuantizada en disco
+    # ------------------------------------------
+    def guardar(self, directorio):
+        """Escribe la copia en un temporal y la sustituye de una vez."""
+        temporal = directorio + f".tmp-{os.getpid()}"
+        shutil.rmtree(temporal, ignore_errors=True)
+        os.makedirs(temporal)
+        datos = self.matriz.astype(np.float16) if self.cuantizacion == "float16" else self.matriz
+        np.save(os.path.join(temporal, "vectores.npy"), datos)
+        if self.escala is not None:
+            np.save(os.path.join(temporal, "escala.npy"), self.escala)
+        with open(os.path.join(temporal, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "cuantizacion": self.cuantizacion, "ids": self.ids,
+                       "textos": self.textos, "metadatas": self.metadatas}, f, ensure_ascii=False)
+        viejo = directorio + f".old-{os.getpid()}"
+        if os.path.exists(directorio):
+            os.replace(directorio, viejo)
+        os.replace(temporal, directorio)
+        shutil.rmtree(viejo, ignore_errors=True)
+
+    @classmethod
+    def cargar(cls, directorio):
+        with open(os.path.join(directorio, "chunks.json"), encoding="utf-8") as f:
+            info = json.load(f)
+        ruta_escala = os.path.join(directorio, "escala.npy")
+        escala = np.load(ruta_escala) if os.path.exists(ruta_escala) else None
+        vectores = np.load(os.path.join(directorio, "vectores.npy"), mmap_mode="r")
+        version = tuple(info["version"]) if info["version"] is not None else None
+        return cls(info["ids"], info["textos"], info["metadatas"], vectores, version, info["cuantizacion"], escala)
+
+
+# ==========================================
+# VERSIÓN DE LA COLECCIÓN Y RECARGA
+# ==========================================
+
+def ruta_version(persist_dir, coleccion):
+    return os.path.join(persist_dir, f"version_{coleccion}.json")
+
+
+def publicar_version(persist_dir, coleccion):
+    """Marca la colección como modificada (llamar después de escribir en Chroma)."""
+    ruta = ruta_version(persist_dir, coleccion)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"coleccion": coleccion, "publicada": time.time()}, f)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def version_coleccion(persist_dir, coleccion):
+    """Identificador de la última versión publicada (None si nunca se ha publicado ninguna)."""
+    try:
+        estado = os.stat(ruta_version(persist_dir, coleccion))
+    except FileNotFoundError:
+        return None
+    return (estado.st_mtime_ns, estado.st_ino)
+
+
+def ruta_exportado(persist_dir, coleccion, cuantizacion):
+    return os.path.join(persist_dir, f"indice_{coleccion}_{cuantizacion}")
+
+
+def exportar_indice(persist_dir, coleccion, vectorstore, cuantizacion):
+    """Copia cuantizada de la versión publicada de la colección (llamar después de publicar_version)."""
+    indice = IndiceVectorial.desde_chroma(vectorstore, version_coleccion(persist_dir, coleccion), cuantizacion)
+    indice.guardar(ruta_exportado(persist_dir, coleccion, cuantizacion))
+    return indice
+
+
+# (persist_dir, colección, cuantización) -> IndiceVectorial vigente en este proceso
+_indices = {}
+_lock_carga = threading.Lock()
+
+
+def _cargar_indice(persist_dir, coleccion, vectorstore, version, cuantizacion):
+    ruta = ruta_exportado(persist_dir, coleccion, cuantizacion)
+    if cuantizacion != "float32" and version is not None:
+        try:
+            indice = IndiceVectorial.cargar(ruta)
+            if indice.version == version:
+                return indice
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+    return IndiceVectorial.desde_chroma(vectorstore, version, cuantizacion)
+
+
+def indices_de(persist_dir):
+    """Índices en memoria de las colecciones de `persist_dir` (para estimar la memoria de un dominio)."""
+    return [indice for clave, indice in list(_indices.items()) if clave[0] == persist_dir]
+
+
+def olvidar_indices(persist_dir):
+    """Suelta los índices en memoria de `persist_dir` (al descargar un dominio)."""
+    with _lock_carga:
+        for clave in [clave for clave in _indices if clave[0] == persist_dir]:
+            del _indices[clave]
+
+
+def obtener_indice_vectorial(persist_dir, coleccion, vectorstore, cuantizacion="float32"):
+    """Índice en memoria de la colección, recargado si se ha publicado una versión nueva.
+
+    Con cuantización usa la copia exportada si corresponde a la versión vigente; si no, cuantiza al cargar desde Chroma.
+    """
+    clave = (persist_dir, coleccion, cuantizacion)
+    version = version_coleccion(persist_dir, coleccion)
+    indice = _indices.get(clave)
+    if indice is not None and indice.version == version:
+        return indice
+    with _lock_carga:
+        indice = _indices.get(clave)
+        if indice is None or indice.version != version:
+            indice = _cargar_indice(persist_dir, coleccion, vectorstore, version, cuantizacion)
+            _indices[clave] = indice
+    return indice
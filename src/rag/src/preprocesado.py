@@ -0,0 +1,247 @@
+"""
+Preprocesado de HTML en bloque para reindexar todo el CMS.
+
+preprocesar_html (scrap_url.py) construye un árbol de BeautifulSoup por
+página, le añade un "\\n" a cada etiqueta de bloque y lo recorre con
+get_text. Al indexar el CMS completo eso es casi todo el tiempo de CPU.
+Aquí se obtiene el mismo texto sin construir el árbol:
+- se recorre el HTML con el mismo tokenizador (html.parser) que usa
+  BeautifulSoup y se reproducen las reglas con las que monta el árbol
+  (cierre hasta la última etiqueta abierta con ese nombre, etiquetas
+  vacías, espacios en blanco, texto de script/style/template excluido);
+- el "\\n" de cada etiqueta de bloque se emite cuando la etiqueta se
+  cierra, que es donde acabaría al añadirlo al final de su contenido;
+- preprocesar_lote reparte las páginas en un pool de procesos por lotes.
+
+No se usa lxml aunque esté instalado: con HTML mal formado (<p> sin
+cerrar, listas dentro de párrafos...) arma otro árbol y el texto cambia.
+benchmarks/preprocesado_html.py comprueba que la salida es idéntica a la
+de preprocesar_html.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.entities import html5
+from html.parser import HTMLParser
+
+try:
+    # Cuando se llama desde main.py
+    from rag.src.scrap_url import TAGS_BLOQUE, limpiar_lineas, preprocesar_html, reparar_texto
+except (ImportError, ModuleNotFoundError):
+    # Cuando se ejecuta desde rag/src
+    from scrap_url import TAGS_BLOQUE, limpiar_lineas, preprocesar_html, reparar_texto
+
+# Reglas del árbol de BeautifulSoup con html.parser
+ETIQUETAS_VACIAS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta",
+    "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex",
+    "nextid", "spacer",
+}
+# Su texto no es NavigableString (Script, Stylesheet...) y get_text lo ignora
+CONTENEDORES_EXCLUIDOS = {"rt", "rp", "style", "script", "template"}
+PRESERVAR_ESPACIOS = {"pre", "textarea"}
+ESPACIOS_ASCII = set("\x20\x0a\x09\x0c\x0d")
+
+# Por debajo de estas páginas no compensa arrancar el pool
+MINIMO_PARALELO = 64
+_REFERENCIA_NUMERICA = re.compile(r"^([0-9]+)(.*)")
+_REFERENCIA_HEX = re.compile(r"^([0-9a-f]+)(.*)")
+
+
+class _ExtractorTexto(HTMLParser):
+    """get_text() del árbol que montaría BeautifulSoup, sin montarlo.
+
+    `tags`: si se indica, además del texto completo guarda el de cada
+    elemento con esos nombres (el el.get_text() de soup.find_all(tag)).
+    """
+
+    def __init__(self, tags=None):
+        super().__init__(convert_charrefs=False)
+        self.tags = set(tags or ())
+        self.pila = []              # [nombre, buffer del elemento o None]
+        self.abiertas = {}          # nombre -> etiquetas abiertas con ese nombre
+        self.excluidas = 0          # contenedores de script/style/... abiertos
+        self.preservan = 0          # pre/textarea abiertos
+        self.datos = []
+        self.ya_cerradas = []       # vacías cerradas al abrirse (su </x> se ignora)
+        self.salida = []
+        self.buffers_abiertos = []
+        self.elementos = {tag: [] for tag in self.tags}
+
+    # ---------- texto ----------
+    def _emitir(self, texto):
+        self.salida.append(texto)
+        for buffer in self.buffers_abiertos:
+            buffer.append(texto)
+
+    def _volcar(self, incluir=None):
+        """endData de BeautifulSoup; `incluir` fuerza si el texto cuenta (comentarios, CDATA...)."""
+        if not self.datos:
+            return
+        texto = "".join(self.datos)
+        self.datos = []
+        if not self.preservan and all(c in ESPACIOS_ASCII for c in texto):
+            texto = "\n" if "\n" in texto else " "
+        if incluir is None:
+            incluir = not self.excluidas
+        if incluir:
+            self._emitir(texto)
+
+    # ---------- árbol ----------
+    def _abrir(self, nombre):
+        buffer = None
+        if nombre in self.tags:
+            buffer = []
+            self.elementos[nombre].append(buffer)
+            self.buffers_abiertos.append(buffer)
+        self.pila.append([nombre, buffer])
+        self.abiertas[nombre] = self.abiertas.get(nombre, 0) + 1
+        self.excluidas += nombre in CONTENEDORES_EXCLUIDOS
+        self.preservan += nombre in PRESERVAR_ESPACIOS
+
+    def _cerrar_ultima(self):
+        nombre, buffer = self.pila.pop()
+        self.abiertas[nombre] -= 1
+        self.excluidas -= nombre in CONTENEDORES_EXCLUIDOS
+        self.preservan -= nombre in PRESERVAR_ESPACIOS
+        # El "\n" que preprocesar_html añade al final de cada etiqueta de bloque
+        if nombre in TAGS_BLOQUE:
+            self._emitir("\n")
+        if buffer is not None:
+            # Siempre es el más interno de los abiertos
+            self.buffers_abiertos.pop()
+
+    def _cerrar_hasta(self, nombre):
+        while self.abiertas.get(nombre):
+            cerrada = self.pila[-1][0]
+            self._cerrar_ultima()
+            if cerrada == nombre:
+                break
+
+    # ---------- eventos de html.parser ----------
+    def handle_starttag(self, tag, attrs):
+        self._volcar()
+        self._abrir(tag)
+        if tag in ETIQUETAS_VACIAS:
+            self._volcar()
+            self._cerrar_hasta(tag)
+            self.ya_cerradas.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._volcar()
+        self._abrir(tag)
+        self._volcar()
+        self._cerrar_hasta(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.ya_cerradas:
+            self.ya_cerradas.remove(tag)
+            return
+        self._volcar()
+        self._cerrar_hasta(tag)
+
+    def handle_data(self, data):
+        self.datos.append(data)
+
+    def handle_charref(self, name):
+        base, patron = (16, _REFERENCIA_HEX) if name[:1] in ("x", "X") else (10, _REFERENCIA_NUMERICA)
+        numero = name[1:] if base == 16 else name
+        extra = ""
+        try:
+            codigo = int(numero, base)
+        except ValueError:
+            encontrado = patron.search(numero)
+            if encontrado is None:
+                self.datos.append(numero)
+                return
+            codigo, extra = int(encontrado.group(1), base), encontrado.group(2)
+        self.datos.append(_caracter_numerico(codigo))
+        self.datos.append(extra)
+
+    def handle_entityref(self, name):
+        self.datos.append(html5.get(name + ";", html5.get(name, "&" + name)))
+
+    def handle_comment(self, data):
+        self._volcar()
+        self.datos.append(data)
+        self._volcar(incluir=False)
+
+    def handle_decl(self, decl):
+        self._volcar()
+        self.datos.append(decl)
+        self._volcar(incluir=False)
+
+    def unknown_decl(self, data):
+        self._volcar()
+        es_cdata = data.upper().startswith("CDATA[")
+        self.datos.append(data[len("CDATA["):] if es_cdata else data)
+        self._volcar(incluir=es_cdata)
+
+    def handle_pi(self, data):
+        self._volcar()
+        self.datos.append(data)
+        self._volcar(incluir=False)
+
+    def terminar(self):
+        self.close()
+        self._volcar()
+        while self.pila:
+            self._cerrar_ultima()
+
+
+def _caracter_numerico(codigo):
+    """Como UnicodeDammit.numeric_character_reference: windows-1252 en 128-159 y U+FFFD si no es válido."""
+    if codigo == 0 or codigo > 0x10FFFF or 0xD800 <= codigo <= 0xDFFF:
+        return "\ufffd"
+    if 128 <= codigo <= 159:
+        try:
+            return bytes([codigo]).decode("windows-1252")
+        except UnicodeDecodeError:
+            pass
+    return chr(codigo)
+
+
+def preprocesar_html_rapido(html_sin_procesar, tags=None, min_length=None) -> str:
+    """Mismo resultado que scrap_url.preprocesar_html sin construir el árbol de BeautifulSoup."""
+    if not html_sin_procesar:
+        return ""
+    if tags and not min_length:
+        # preprocesar_html solo se queda con los elementos de al menos min_length caracteres
+        return ""
+    if tags and CONTENEDORES_EXCLUIDOS.intersection(tags):
+        return preprocesar_html(html_sin_procesar, tags, min_length)
+
+    extractor = _ExtractorTexto(tags)
+    extractor.feed(reparar_texto(html_sin_procesar))
+    extractor.terminar()
+
+    if tags:
+        partes = []
+        for etiqueta in tags:
+            for buffer in extractor.elementos[etiqueta]:
+                texto = "".join(buffer)
+                if len(texto) >= min_length:
+                    partes.append(texto)
+        texto_plano = "\n".join(partes)
+    else:
+        texto_plano = "".join(extractor.salida)
+
+    return limpiar_lineas(texto_plano)
+
+
+def _procesar(argumentos):
+    html_sin_procesar, tags, min_length = argumentos
+    return preprocesar_html_rapido(html_sin_procesar, tags, min_length)
+
+
+def preprocesar_lote(htmls, tags=None, min_length=None, procesos=None, tamano_lote=None):
+    """preprocesar_html de muchas páginas, en paralelo si son bastantes. Conserva el orden."""
+    htmls = list(htmls)
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1 or len(htmls) < MINIMO_PARALELO:
+        return [preprocesar_html_rapido(h, tags, min_length) for h in htmls]
+
+    # Lotes de varias páginas para no pagar la comunicación con el pool por cada una
+    tamano_lote = tamano_lote or max(1, len(htmls) // (procesos * 4))
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        return list(pool.map(_procesar, [(h, tags, min_length) for h in htmls], chunksize=tamano_lote))
@@ -1,10 +1,10 @@
 from bs4 import BeautifulSoup
 import html
 
-def preprocesar_html(html_sin_procesar, tags=None, min_length=None) -> str:
-    if not html_sin_procesar:
-        return ""
+# Definimos las etiquetas que queremos que generen un salto de línea
+TAGS_BLOQUE = ['p', 'div', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'tr']
 
+def reparar_texto(html_sin_procesar) -> str:
     # 1. Corregir errores de codificación (Moji-bake: VÃ\xaddeos -> Vídeos)
     try:
         texto = html_sin_procesar.encode('latin-1').decode('utf-8')
@@ -12,15 +12,25 @@ def preprocesar_html(html_sin_procesar, tags=None, min_length=None) -> str:
         texto = html_sin_procesar
 
     # 2. Decodificar entidades HTML (&eacute; -> é)
-    texto = html.unescape(texto)
+    return html.unescape(texto)
+
+def limpiar_lineas(texto_plano) -> str:
+    # 4. Limpieza final de espacios
+    # Eliminamos espacios en blanco al inicio/final de cada línea y 
+    # evitamos que se acumulen más de dos saltos de línea seguidos
+    lineas = [linea.strip() for linea in texto_plano.splitlines()]
+    return "\n".join(linea for linea in lineas if linea)
+
+def preprocesar_html(html_sin_procesar, tags=None, min_length=None) -> str:
+    if not html_sin_procesar:
+        return ""
+
+    texto = reparar_texto(html_sin_procesar)
 
     # 3. Procesar con BeautifulSoup para manejar bloques
     soup = BeautifulSoup(texto, "html.parser")
 
-    # Definimos las etiquetas que queremos que generen un salto de línea
-    tags_bloque = ['p', 'div', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'tr']
-    
-    for tag in soup.find_all(tags_bloque):
+    for tag in soup.find_all(TAGS_BLOQUE):
         # Añadimos un espacio/salto al final del contenido de la etiqueta
         tag.append('\n')
 
@@ -37,13 +47,7 @@ def preprocesar_html(html_sin_procesar, tags=None, min_length=None) -> str:
     else:
         texto_plano = soup.get_text()
 
-    # 4. Limpieza final de espacios
-    # Eliminamos espacios en blanco al inicio/final de cada línea y 
-    # evitamos que se acumulen más de dos saltos de línea seguidos
-    lineas = [linea.strip() for linea in texto_plano.splitlines()]
-    texto_final = "\n".join(linea for linea in lineas if linea)
-
-    return texto_final
+    return limpiar_lineas(texto_plano)
 
 def obtener_pagina_scrapping(url: str, section_id: str = 'content') -> str:
     # Construir URL completa si es relativa
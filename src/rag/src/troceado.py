@@ -0,0 +1,204 @@
+"""
+Troceado por secciones para el índice del RAG.
+
+El troceado original (RecursiveCharacterTextSplitter, 1000 caracteres con
+200 de solape) corta el texto aplanado de la página por donde caiga: un
+mismo apartado acaba repartido en varios chunks y cada chunk repite 200
+caracteres del anterior. Aquí se trocea por la estructura:
+- cada sección es un título (h1-h6 del HTML, o el titulo1/h1 del módulo
+  en la BD) con todo lo que cuelga de él;
+- las listas y las tablas se mantienen juntas y solo se parten entre
+  elementos, los párrafos solo entre frases;
+- cada chunk empieza por la ruta de títulos ("Formas de pago > Financiación")
+  y la lleva en metadata["seccion"], así que se entiende sin sus vecinos
+  (si junta varias secciones, todas sus rutas separadas por " | ");
+- sin solape: las secciones pequeñas se juntan con las siguientes hasta
+  `minimo` caracteres, las grandes se parten hasta `maximo`.
+
+Acepta HTML (html_a_bloques) o el texto ya aplanado por preprocesar_html
+(texto_a_bloques, que reconoce títulos y listas por la forma de la línea).
+"""
+import re
+
+from bs4 import BeautifulSoup, Comment, NavigableString
+
+try:
+    # Cuando se llama desde main.py
+    from rag.src.scrap_url import reparar_texto
+except (ImportError, ModuleNotFoundError):
+    # Cuando se ejecuta desde rag/src
+    from scrap_url import reparar_texto
+
+MAXIMO = 1000
+MINIMO = 500
+SEPARADOR_RUTA = " > "
+# Chroma solo admite metadatos escalares: las rutas de un chunk con varias secciones van en un texto
+SEPARADOR_SECCIONES = " | "
+
+_ITEM_LISTA = re.compile(r"^(\d+º|\d+[.)]|[-•·*])\s*")
+_FIN_FRASE = re.compile(r"(?<=[.!?])\s+")
+
+
+# ==========================================
+# BLOQUES: (tipo, nivel, texto)
+# tipo = "titulo" | "parrafo" | "lista" | "tabla"
+# ==========================================
+
+_TITULOS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+_BLOQUES = _TITULOS | {"li", "tr", "p"}
+
+
+def _bloque(el):
+    texto = " ".join(el.get_text(" ").split())
+    if not texto:
+        return None
+    if el.name in _TITULOS:
+        return ("titulo", int(el.name[1]), texto)
+    if el.name == "li":
+        return ("lista", 0, "- " + texto)
+    if el.name == "tr":
+        celdas = [" ".join(c.get_text(" ").split()) for c in el.find_all(["td", "th"])]
+        return ("tabla", 0, "| " + " | ".join(celdas) + " |")
+    return ("parrafo", 0, texto)
+
+
+def _recorrer(contenedor, bloques):
+    """Añade los bloques de `contenedor`; el texto suelto entre bloques cuenta como párrafo."""
+    suelto = []
+
+    def volcar():
+        texto = " ".join(" ".join(suelto).split())
+        if texto:
+            bloques.append(("parrafo", 0, texto))
+        suelto.clear()
+
+    for hijo in contenedor.children:
+        if isinstance(hijo, Comment):
+            continue
+        if isinstance(hijo, NavigableString):
+            suelto.append(str(hijo))
+        elif hijo.name == "br":
+            volcar()
+        elif hijo.name in _BLOQUES:
+            volcar()
+            bloque = _bloque(hijo)
+            if bloque:
+                bloques.append(bloque)
+        elif hijo.find(list(_BLOQUES) + ["div", "br"]):
+            volcar()
+            _recorrer(hijo, bloques)
+        else:
+            suelto.append(hijo.get_text(" "))
+    volcar()
+
+
+def html_a_bloques(html_pagina):
+    """Recorre el HTML en orden de documento y devuelve sus bloques."""
+    soup = BeautifulSoup(reparar_texto(html_pagina), "html.parser")
+    for tag in soup(["script", "style", "noscript", "iframe", "form", "nav", "footer"]):
+        tag.decompose()
+    bloques = []
+    _recorrer(soup, bloques)
+    return bloques
+
+
+def _parece_titulo(linea, siguiente):
+    if len(linea) > 90 or _ITEM_LISTA.match(linea) or linea.startswith("|"):
+        return False
+    if linea.endswith(("?", ":")):
+        return True
+    # Línea corta sin punto final seguida de un párrafo más largo
+    return not linea.endswith((".", ",", ";")) and siguiente is not None and len(siguiente) > 2 * len(linea)
+
+
+def texto_a_bloques(texto):
+    """Bloques de un texto con un bloque por línea (salida de preprocesar_html)."""
+    lineas = [" ".join(l.split()) for l in texto.splitlines()]
+    lineas = [l for l in lineas if l]
+    bloques = []
+    for i, linea in enumerate(lineas):
+        siguiente = lineas[i + 1] if i + 1 < len(lineas) else None
+        if linea.startswith("|"):
+            bloques.append(("tabla", 0, linea))
+        elif _ITEM_LISTA.match(linea):
+            bloques.append(("lista", 0, linea))
+        elif _parece_titulo(linea, siguiente):
+            bloques.append(("titulo", 2, linea.rstrip(":")))
+        else:
+            bloques.append(("parrafo", 0, linea))
+    return bloques
+
+
+# ==========================================
+# SECCIONES Y CHUNKS
+# ==========================================
+
+def secciones(bloques, titulo_pagina=None):
+    """[(ruta de títulos, [unidades])]; las listas y tablas consecutivas forman una sola unidad."""
+    ruta = [(0, titulo_pagina)] if titulo_pagina else []
+    resultado = [(list(ruta), [])]
+    for tipo, nivel, texto in bloques:
+        if tipo == "titulo":
+            ruta = [(n, t) for n, t in ruta if n < nivel] + [(nivel, texto)]
+            resultado.append((list(ruta), []))
+            continue
+        unidades = resultado[-1][1]
+        if tipo in ("lista", "tabla") and unidades and unidades[-1][0] == tipo:
+            unidades[-1] = (tipo, unidades[-1][1] + "\n" + texto)
+        else:
+            unidades.append((tipo, texto))
+    return [([t for _, t in r], [texto for _, texto in u]) for r, u in resultado if u]
+
+
+def _partir_unidad(unidad, maximo):
+    """Parte una unidad demasiado larga entre elementos (listas/tablas) o entre frases (párrafos)."""
+    piezas = unidad.split("\n") if "\n" in unidad else _FIN_FRASE.split(unidad)
+    partes, actual = [], ""
+    for pieza in piezas:
+        union = "\n" if "\n" in unidad else " "
+        if actual and len(actual) + len(union) + len(pieza) > maximo:
+            partes.append(actual)
+            actual = pieza
+        else:
+            actual = f"{actual}{union}{pieza}" if actual else pieza
+    if actual:
+        partes.append(actual)
+    return partes
+
+
+def trocear(bloques, titulo_pagina=None, maximo=MAXIMO, minimo=MINIMO):
+    """[(texto, {"seccion": ruta})] sin solape, de entre `minimo` y `maximo` caracteres cuando es posible."""
+    piezas = []
+    for ruta, unidades in secciones(bloques, titulo_pagina):
+        cabecera = SEPARADOR_RUTA.join(ruta)
+        espacio = maximo - len(cabecera) - 1
+        grupos, actual = [], ""
+        for unidad in unidades:
+            for parte in (_partir_unidad(unidad, espacio) if len(unidad) > espacio else [unidad]):
+                if actual and len(actual) + 1 + len(parte) > espacio:
+                    grupos.append(actual)
+                    actual = parte
+                else:
+                    actual = f"{actual}\n{parte}" if actual else parte
+        if actual:
+            grupos.append(actual)
+        piezas += [((f"{cabecera}\n{g}" if cabecera else g), cabecera) for g in grupos]
+
+    # Las secciones cortas se juntan con las siguientes (sin pasar del máximo);
+    # metadata["seccion"] lleva todas las rutas del chunk, separadas por SEPARADOR_SECCIONES
+    chunks = []
+    for texto, seccion in piezas:
+        if chunks and len(chunks[-1][0]) < minimo and len(chunks[-1][0]) + 2 + len(texto) <= maximo:
+            anterior, rutas = chunks[-1]
+            chunks[-1] = (f"{anterior}\n\n{texto}", rutas if seccion in rutas else rutas + [seccion])
+        else:
+            chunks.append((texto, [seccion]))
+    return [(texto, {"seccion": SEPARADOR_SECCIONES.join(rutas)}) for texto, rutas in chunks]
+
+
+def trocear_html(html_pagina, titulo_pagina=None, maximo=MAXIMO, minimo=MINIMO):
+    return trocear(html_a_bloques(html_pagina), titulo_pagina, maximo, minimo)
+
+
+def trocear_texto(texto, titulo_pagina=None, maximo=MAXIMO, minimo=MINIMO):
+    return trocear(texto_a_bloques(texto), titulo_pagina, maximo, minimo)
@@ -0,0 +1,258 @@
+"""
+Búsqueda de modelos para modulos/entrenar_modelos.py.
+
+- La matriz de entrada (OneHotEncoder + passthrough) se codifica una sola
+  vez y se guarda en disco, indexada por el contenido del CSV: las dos
+  tareas (satisfacción y mejora de molestias) y todas las configuraciones
+  la reutilizan.
+- Validación cruzada agrupada por pedido (las filas de un mismo pedido
+  nunca se reparten entre entrenamiento y validación) de varias
+  configuraciones de Random Forest y HistGradientBoosting, con todos los
+  (configuración, pliegue) en paralelo en todos los núcleos.
+- De cada configuración se mide además el tamaño del .npz compacto y la
+  latencia de predicción con PredictorForest, que es lo que usa main.py.
+- Se elige la configuración más rápida entre las que quedan a menos de
+  `tolerancia` (relativa) del mejor error de validación.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from predictor_compacto import PredictorForest, exportar_pipeline
+
+FEATURES = ["sexo", "altura", "peso", "imc", "duerme_en_pareja", "nucleo", "grosor", "firmeza", "molestias_antes"]
+CAT_COLS = ["sexo", "nucleo", "grosor"]
+NUM_COLS = ["altura", "peso", "imc", "duerme_en_pareja", "firmeza", "molestias_antes"]
+
+# nombre: (familia, hiperparámetros). rf_300_d12 es la configuración histórica.
+CANDIDATOS = {
+    "rf_300_d12": ("forest", {"n_estimators": 300, "max_depth": 12}),
+    "rf_150_d10": ("forest", {"n_estimators": 150, "max_depth": 10}),
+    "rf_100_d8_hoja5": ("forest", {"n_estimators": 100, "max_depth": 8, "min_samples_leaf": 5}),
+    "hgb_100_lr01_h31": ("boosting", {"max_iter": 100, "learning_rate": 0.1, "max_leaf_nodes": 31}),
+    "hgb_200_lr005_h15": ("boosting", {"max_iter": 200, "learning_rate": 0.05, "max_leaf_nodes": 15}),
+    "hgb_300_lr003_d4": ("boosting", {"max_iter": 300, "learning_rate": 0.03, "max_depth": 4}),
+}
+
+# Métrica de error que se minimiza y métrica secundaria del informe, por tarea
+METRICAS = {
+    "regresion": ("RMSE", "MAE"),
+    "clasificacion": ("Brier", "AUC"),
+}
+
+
+def crear_preprocesador():
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder
+
+    return ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore"), CAT_COLS),
+            ("num", "passthrough", NUM_COLS),
+        ],
+        # Siempre denso: HistGradientBoosting no acepta matrices dispersas
+        sparse_threshold=0,
+    )
+
+
+def crear_estimador(familia, params, tarea, n_jobs=1):
+    from sklearn.ensemble import (HistGradientBoostingClassifier, HistGradientBoostingRegressor,
+                                  RandomForestClassifier, RandomForestRegressor)
+
+    if familia == "forest":
+        clase = RandomForestRegressor if tarea == "regresion" else RandomForestClassifier
+        return clase(random_state=42, n_jobs=n_jobs, **params)
+    clase = HistGradientBoostingRegressor if tarea == "regresion" else HistGradientBoostingClassifier
+    return clase(random_state=42, **params)
+
+
+# ==========================================
+# CODIFICACIÓN CON CACHÉ EN DISCO
+# ==========================================
+
+def codificar_con_cache(df, directorio=".cache_entrenamiento"):
+    """(preprocesador ajustado, matriz float64). Se reutiliza si el CSV no ha cambiado."""
+    import joblib
+    import sklearn
+
+    huella = hashlib.sha256()
+    huella.update(pd.util.hash_pandas_object(df[FEATURES], index=False).to_numpy().tobytes())
+    huella.update(json.dumps([CAT_COLS, NUM_COLS, sklearn.__version__]).encode())
+    clave = huella.hexdigest()[:16]
+    ruta_matriz = os.path.join(directorio, f"matriz_{clave}.npy")
+    ruta_pre = os.path.join(directorio, f"preprocesador_{clave}.pkl")
+
+    if os.path.exists(ruta_matriz) and os.path.exists(ruta_pre):
+        print(f"♻️ Codificación reutilizada de la caché ({ruta_matriz})")
+        return joblib.load(ruta_pre), np.load(ruta_matriz)
+
+    t0 = time.perf_counter()
+    pre = crear_preprocesador().fit(df[FEATURES])
+    M = np.asarray(pre.transform(df[FEATURES]), dtype=np.float64)
+    os.makedirs(directorio, exist_ok=True)
+    np.save(ruta_matriz, M)
+    joblib.dump(pre, ruta_pre)
+    print(f"💾 Codificación guardada en caché: {M.shape[0]}×{M.shape[1]} en {time.perf_counter() - t0:.2f}s")
+    return pre, M
+
+
+# ==========================================
+# VALIDACIÓN CRUZADA EN PARALELO
+# ==========================================
+
+def _puntuar(tarea, y, pred):
+    from sklearn.metrics import mean_absolute_error, roc_auc_score
+
+    if tarea == "regresion":
+        return float(np.sqrt(np.mean((y - pred) ** 2))), float(mean_absolute_error(y, pred))
+    auc = float(roc_auc_score(y, pred)) if len(np.unique(y)) > 1 else float("nan")
+    return float(np.mean((y - pred) ** 2)), auc
+
+
+def _evaluar_pliegue(nombre, familia, params, tarea, M, y, entreno, validacion, devolver_modelo):
+    estimador = crear_estimador(familia, params, tarea)
+    t0 = time.perf_counter()
+    estimador.fit(M[entreno], y[entreno])
+    segundos = time.perf_counter() - t0
+    if tarea == "regresion":
+        pred = estimador.predict(M[validacion])
+    else:
+        pred = estimador.predict_proba(M[validacion])[:, -1]
+    error, secundaria = _puntuar(tarea, y[validacion], pred)
+    return nombre, error, secundaria, segundos, estimador if devolver_modelo else None
+
+
+def pliegues(tarea, y, grupos, n_pliegues):
+    from sklearn.model_selection import GroupKFold, StratifiedGroupKFold
+
+    if tarea == "clasificacion":
+        divisor = StratifiedGroupKFold(n_splits=n_pliegues, shuffle=True, random_state=42)
+    else:
+        divisor = GroupKFold(n_splits=n_pliegues, shuffle=True, random_state=42)
+    return list(divisor.split(np.zeros(len(y)), y, grupos))
+
+
+def validacion_cruzada(M, y, grupos, tarea, candidatos=None, n_pliegues=5, n_jobs=-1):
+    """Evalúa todas las (configuración, pliegue) en paralelo.
+
+    Devuelve {nombre: {"errores", "secundarias", "segundos", "modelo"}}, donde
+    "modelo" es el estimador del primer pliegue (para medir tamaño y latencia).
+    """
+    from joblib import Parallel, delayed
+
+    candidatos = candidatos or CANDIDATOS
+    y = np.asarray(y)
+    tareas = [
+        delayed(_evaluar_pliegue)(nombre, familia, params, tarea, M, y, entreno, validacion, i == 0)
+        for nombre, (familia, params) in candidatos.items()
+        for i, (entreno, validacion) in enumerate(pliegues(tarea, y, grupos, n_pliegues))
+    ]
+    resultados = {nombre: {"errores": [], "secundarias": [], "segundos": [], "modelo": None} for nombre in candidatos}
+    for nombre, error, secundaria, segundos, modelo in Parallel(n_jobs=n_jobs)(tareas):
+        r = resultados[nombre]
+        r["errores"].append(error)
+        r["secundarias"].append(secundaria)
+        r["segundos"].append(segundos)
+        if modelo is not None:
+            r["modelo"] = modelo
+    return resultados
+
+
+# ==========================================
+# TAMAÑO Y LATENCIA DEL MODELO DESPLEGADO
+# ==========================================
+
+def lotes_peticion(df, n_perfiles=20, semilla=0):
+    """DataFrames como los que puntúa logica_recomendar_colchon: catálogo × un perfil."""
+    rnd = np.random.default_rng(semilla)
+    catalogo = df.drop_duplicates(subset=["cod_articulo"])[FEATURES].reset_index(drop=True)
+    lotes = []
+    for _ in range(n_perfiles):
+        X = catalogo.copy()
+        X["sexo"] = rnd.choice(["hombre", "mujer"])
+        X["altura"] = float(rnd.uniform(150, 200))
+        X["peso"] = float(rnd.uniform(45, 130))
+        X["imc"] = X["peso"] / ((X["altura"] / 100) ** 2)
+        X["duerme_en_pareja"] = int(rnd.integers(0, 2))
+        X["molestias_antes"] = int(rnd.integers(0, 2))
+        lotes.append(X)
+    return lotes
+
+
+def medir_despliegue(pipeline, lotes, repeticiones=5):
+    """Tamaño del .npz compacto (MB) y latencia de PredictorForest (µs por fila, ms por petición)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "modelo.npz")
+        exportar_pipeline(pipeline, ruta)
+        tamano_mb = os.path.getsize(ruta) / 1e6
+        predictor = PredictorForest.cargar(ruta)
+    predictor.predict(lotes[0])  # calentamiento
+    filas = sum(len(X) for X in lotes) * repeticiones
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        for X in lotes:
+            predictor.predict(X)
+    segundos = time.perf_counter() - t0
+    return {
+        "tamano_mb": tamano_mb,
+        "us_fila": segundos / filas * 1e6,
+        "ms_peticion": segundos / (len(lotes) * repeticiones) * 1e3,
+    }
+
+
+# ==========================================
+# SELECCIÓN E INFORME
+# ==========================================
+
+def resumir(resultados, pre, lotes, candidatos=None):
+    """Una fila por configuración con precisión, coste de entrenamiento, tamaño y latencia."""
+    from sklearn.pipeline import Pipeline
+
+    candidatos = candidatos or CANDIDATOS
+    filas = []
+    for nombre, r in resultados.items():
+        pipeline = Pipeline([("preprocess", pre), ("model", r["modelo"])])
+        filas.append({
+            "modelo": nombre,
+            "familia": candidatos[nombre][0],
+            "params": candidatos[nombre][1],
+            "error": float(np.mean(r["errores"])),
+            "error_std": float(np.std(r["errores"])),
+            "secundaria": float(np.nanmean(r["secundarias"])),
+            "entreno_s": float(np.mean(r["segundos"])),
+            **medir_despliegue(pipeline, lotes),
+        })
+    return filas
+
+
+def elegir(filas, tolerancia=0.02, presupuesto_ms=None):
+    """Objetivo con latencia: el más rápido entre los que están a menos de `tolerancia`
+    (relativa) del mejor error. Con `presupuesto_ms` se descartan antes los que no caben
+    (si ninguno cabe, se ignora el presupuesto)."""
+    validas = [f for f in filas if presupuesto_ms is None or f["ms_peticion"] <= presupuesto_ms] or filas
+    mejor = min(f["error"] for f in validas)
+    cercanas = [f for f in validas if f["error"] <= mejor * (1 + tolerancia)]
+    return min(cercanas, key=lambda f: (f["ms_peticion"], f["error"]))
+
+
+def tabla_markdown(titulo, tarea, filas, elegida):
+    nombre_error, nombre_secundaria = METRICAS[tarea]
+    lineas = [
+        f"## {titulo}",
+        "",
+        f"| modelo | {nombre_error} CV | {nombre_secundaria} CV | entreno (s/pliegue) | tamaño .npz (MB) "
+        f"| µs/fila | ms/petición | |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for f in sorted(filas, key=lambda f: f["error"]):
+        lineas.append(
+            f"| {f['modelo']} | {f['error']:.4f} ± {f['error_std']:.4f} | {f['secundaria']:.4f} "
+            f"| {f['entreno_s']:.2f} | {f['tamano_mb']:.2f} | {f['us_fila']:.2f} | {f['ms_peticion']:.2f} "
+            f"| {'✅ elegido' if f is elegida else ''} |"
+        )
+    return "\n".join(lineas) + "\n"
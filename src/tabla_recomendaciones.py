@@ -0,0 +1,219 @@
+"""
+Tabla precalculada de recomendaciones sobre una rejilla de perfiles.
+
+Las entradas del recomendador son pocas y de baja cardinalidad (sexo,
+altura, peso -> IMC, duerme_en_pareja, molestias_antes y material), así
+que evaluamos el modelo offline sobre una rejilla cuantizada (por defecto
+2 cm y 2 kg) y guardamos el top-k de artículos de cada celda.
+
+`logica_recomendar_colchon` consulta la tabla en O(1) y solo puntúa el
+catálogo en vivo si el perfil cae fuera de la rejilla.
+
+Se construye con modulos/construir_tabla_recomendaciones.py. Los
+metadatos guardan la huella (sha256) de los ficheros del modelo: tras
+reentrenar, la tabla anterior deja de ser compatible y se puntúa en vivo
+hasta reconstruirla.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+VERSION_FORMATO = 1
+
+SEXOS = ["hombre", "mujer"]
+# Mismas reglas que el filtro de material de logica_recomendar_colchon
+MATERIALES = {
+    "": None,
+    "latex": "latex|látex",
+    "muelle": "muelle",
+    "visco": "visco",
+}
+# Ficheros del modelo que carga main.py: el compacto o, si no hay, el de sklearn
+MODELOS_COMPACTOS = ("modelo_satisfaccion.npz", "modelo_mejoras.npz")
+MODELOS_PKL = ("modelo_satisfaccion.pkl", "modelo_mejoras.pkl")
+FEATURES = ["sexo", "altura", "peso", "imc", "duerme_en_pareja", "nucleo", "grosor", "firmeza", "molestias_antes"]
+
+
+def clave_material(material):
+    """Traduce material_preferido a la clave de la tabla (igual que el filtro en vivo)."""
+    material = (material or "").lower()
+    if "latex" in material or "látex" in material:
+        return "latex"
+    if "muelle" in material:
+        return "muelle"
+    if "visco" in material:
+        return "visco"
+    return ""
+
+
+def huella_modelo(shas):
+    """Identificador del modelo a partir de {fichero: sha256} de sus ficheros."""
+    return hashlib.sha256(json.dumps(shas, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def huella_ficheros_modelo(directorio="."):
+    """huella_modelo de los ficheros del modelo en `directorio` (None si no hay modelo)."""
+    nombres = MODELOS_COMPACTOS if os.path.exists(os.path.join(directorio, MODELOS_COMPACTOS[0])) else MODELOS_PKL
+    shas = {}
+    for nombre in nombres:
+        ruta = os.path.join(directorio, nombre)
+        if os.path.exists(ruta):
+            h = hashlib.sha256()
+            with open(ruta, "rb") as f:
+                for bloque in iter(lambda: f.read(1 << 20), b""):
+                    h.update(bloque)
+            shas[nombre] = h.hexdigest()
+    return huella_modelo(shas) if shas else None
+
+
+def perfil_desde_args(args):
+    """Normaliza los argumentos del tool_call como lo hace el recomendador en vivo."""
+    altura = float(args.get('altura', 170))
+    peso = float(args.get('peso', 70))
+    return {
+        "sexo": args.get('sexo', 'mujer'),
+        "altura": altura,
+        "peso": peso,
+        "imc": peso / ((altura / 100) ** 2),
+        "duerme_en_pareja": 1 if args.get('duerme_en_pareja', False) else 0,
+        "molestias_antes": 1 if args.get('molestias_antes', False) else 0,
+    }
+
+
+def puntuar_catalogo(catalogo, modelo, perfil, material=""):
+    """Puntuación en vivo: devuelve [(cod_articulo, score)] ordenado de mayor a menor.
+
+    Devuelve [] si el filtro de material deja el catálogo vacío.
+    """
+    X = catalogo
+    patron = MATERIALES[clave_material(material)]
+    if patron:
+        X = X[X['nucleo'].str.contains(patron, case=False, na=False)]
+    if X.empty:
+        return []
+    X = X.copy()
+    for col, valor in perfil.items():
+        X[col] = valor
+    scores = np.asarray(modelo.predict(X[FEATURES]), dtype=np.float64)
+    # Orden estable: a igual puntuación se respeta el orden del catálogo
+    orden = np.argsort(-scores, kind="stable")
+    codigos = X["cod_articulo"].to_numpy()
+    return [(int(codigos[i]), float(scores[i])) for i in orden]
+
+
+class TablaRecomendaciones:
+    def __init__(self, arrays):
+        self.meta = json.loads(str(arrays["meta"]))
+        self.articulos = arrays["articulos"]
+        self.top = arrays["top"]
+        self.scores = arrays["scores"]
+        self.materiales = self.meta["materiales"]
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta, allow_pickle=False) as datos:
+            return cls({k: datos[k] for k in datos.files})
+
+    def arrays(self):
+        """Arrays para el paquete de arranque (ver paquete_arranque.py)."""
+        return {"meta": np.array(json.dumps(self.meta, ensure_ascii=False)),
+                "articulos": self.articulos, "top": self.top, "scores": self.scores}
+
+    def compatible_con(self, catalogo, peso_mejora=None, modelo=None):
+        """La tabla solo es válida para el catálogo, el modelo (su huella) y la puntuación con los que se construyó.
+
+        Una tabla sin huella del modelo (anterior a guardarla) no se puede comprobar: con `modelo` se rechaza.
+        """
+        if self.meta.get("peso_mejora") != peso_mejora:
+            return False
+        if modelo is not None and self.meta.get("modelo") != modelo:
+            return False
+        return set(int(c) for c in catalogo["cod_articulo"]) == set(int(c) for c in self.articulos)
+
+    def _indice(self, valor, minimo, paso, n):
+        i = int(round((valor - minimo) / paso))
+        return i if 0 <= i < n else None
+
+    def buscar(self, perfil, material=""):
+        """[(cod_articulo, score)] de la celda del perfil, o None si está fuera de la rejilla."""
+        m = self.meta
+        if perfil["sexo"] not in m["sexos"]:
+            return None
+        i_altura = self._indice(perfil["altura"], m["altura_min"], m["altura_paso"], m["n_altura"])
+        i_peso = self._indice(perfil["peso"], m["peso_min"], m["peso_paso"], m["n_peso"])
+        if i_altura is None or i_peso is None:
+            return None
+        celda = (m["sexos"].index(perfil["sexo"]), i_altura, i_peso,
+                 perfil["duerme_en_pareja"], perfil["molestias_antes"],
+                 self.materiales.index(clave_material(material)))
+        indices = self.top[celda]
+        scores = self.scores[celda]
+        return [(int(self.articulos[i]), float(s)) for i, s in zip(indices, scores) if i >= 0]
+
+
+def construir_tabla(catalogo, modelo, ruta, altura=(140, 210, 2), peso=(40, 160, 2), k=15, filas_lote=20000,
+                    meta_extra=None):
+    """Evalúa `modelo` sobre toda la rejilla y guarda el top-k por celda y material en `ruta` (.npz).
+
+    altura/peso son (mínimo, máximo, paso). `meta_extra` se guarda junto a los
+    metadatos (ej: el peso de la mejora de molestias y la huella del modelo). Devuelve los metadatos.
+    """
+    alturas = np.arange(altura[0], altura[1] + altura[2] / 2, altura[2], dtype=np.float64)
+    pesos = np.arange(peso[0], peso[1] + peso[2] / 2, peso[2], dtype=np.float64)
+    materiales = list(MATERIALES)
+    n_art = len(catalogo)
+
+    # Máscara de artículos válidos por material
+    mascaras = np.ones((len(materiales), n_art), dtype=bool)
+    for j, mat in enumerate(materiales):
+        if MATERIALES[mat]:
+            mascaras[j] = catalogo['nucleo'].str.contains(MATERIALES[mat], case=False, na=False).to_numpy()
+
+    forma = (len(SEXOS), len(alturas), len(pesos), 2, 2)
+    tipo_indice = np.int16 if n_art < np.iinfo(np.int16).max else np.int32
+    top = np.full(forma + (len(materiales), k), -1, dtype=tipo_indice)
+    scores = np.zeros(forma + (len(materiales), k), dtype=np.float32)
+
+    # Todas las celdas de la rejilla en orden C (mismo orden que `forma`)
+    celdas = np.array(np.meshgrid(*[np.arange(n) for n in forma], indexing="ij")).reshape(len(forma), -1).T
+    articulo = catalogo[["nucleo", "grosor", "firmeza"]].reset_index(drop=True)
+    celdas_lote = max(1, filas_lote // n_art)
+
+    for inicio in range(0, len(celdas), celdas_lote):
+        lote = celdas[inicio:inicio + celdas_lote]
+        X = articulo.loc[np.tile(np.arange(n_art), len(lote))].reset_index(drop=True)
+        repetir = lambda v: np.repeat(v, n_art)
+        X["sexo"] = repetir(np.array(SEXOS)[lote[:, 0]])
+        X["altura"] = repetir(alturas[lote[:, 1]])
+        X["peso"] = repetir(pesos[lote[:, 2]])
+        X["imc"] = X["peso"] / ((X["altura"] / 100) ** 2)
+        X["duerme_en_pareja"] = repetir(lote[:, 3])
+        X["molestias_antes"] = repetir(lote[:, 4])
+        s = np.asarray(modelo.predict(X[FEATURES]), dtype=np.float64).reshape(len(lote), n_art)
+
+        for fila, celda in enumerate(lote):
+            orden = np.argsort(-s[fila], kind="stable")
+            for j in range(len(materiales)):
+                validos = orden[mascaras[j][orden]][:k]
+                top[tuple(celda) + (j, slice(0, len(validos)))] = validos
+                scores[tuple(celda) + (j, slice(0, len(validos)))] = s[fila, validos]
+
+    meta = {
+        "version": VERSION_FORMATO,
+        "sexos": SEXOS,
+        "materiales": materiales,
+        "altura_min": float(alturas[0]), "altura_paso": float(altura[2]), "n_altura": len(alturas),
+        "peso_min": float(pesos[0]), "peso_paso": float(peso[2]), "n_peso": len(pesos),
+        "k": k,
+    }
+    meta.update(meta_extra or {})
+    np.savez(
+        ruta,
+        meta=np.array(json.dumps(meta, ensure_ascii=False)),
+        articulos=catalogo["cod_articulo"].to_numpy().astype(np.int64),
+        top=top,
+        scores=scores,
+    )
+    return meta
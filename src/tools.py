@@ -22,11 +22,18 @@ buscar_accesorios = {
     "type": "function",
     "function": {
         "name": "buscar_accesorios_xml",
-        "description": "Busca colchones, almohadas, canapés, bases o ropa de cama por palabra clave.",
+        "description": "Busca colchones, almohadas, canapés, bases o ropa de cama por palabra clave. Usa los filtros cuando el usuario dé categoría, medida, precio, grosor o material.",
         "parameters": {
             "type": "object",
             "properties": {
-                "keywords": {"type": "string", "description": "Palabras clave (ej: 'almohada visco')"}
+                "keywords": {"type": "string", "description": "Palabras clave (ej: 'almohada visco')"},
+                "categoria": {"type": "string", "enum": ["colchon", "almohada", "canape", "somier", "base", "cabecero", "topper", "protector", "funda", "nordico", "sabanas", "cojin", "cama"]},
+                "medida": {"type": "string", "description": "Ancho x largo en cm (ej: '150x190')"},
+                "precio_min": {"type": "number", "description": "Euros"},
+                "precio_max": {"type": "number", "description": "Euros (ej: 'por menos de 400€' -> 400)"},
+                "grosor_min": {"type": "number", "description": "Grosor/altura en cm (para un grosor exacto, el mismo valor en min y max)"},
+                "grosor_max": {"type": "number", "description": "Grosor/altura en cm"},
+                "material": {"type": "string", "enum": ["viscoelastica", "muelles_ensacados", "muelles", "latex", "espuma", "fibra", "plumon", "algodon", "microfibra", "madera", "tapizado", "laminas"]}
             },
             "required": ["keywords"]
         }